@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+from hydrus.client.gui import QtPorting as QP
+from qtpy import QtWidgets as QW
+
+import locale
+
+try: locale.setlocale( locale.LC_ALL, '' )
+except: pass
+
+from hydrus.core import HydrusData
+from hydrus.core import HydrusGlobals as HG
+from hydrus.test import Benchmarks
+from hydrus.test import TestController
+import argparse
+import sys
+import threading
+import traceback
+from twisted.internet import reactor
+
+if __name__ == '__main__':
+    
+    argparser = argparse.ArgumentParser( description = 'hydrus network benchmarks' )
+    
+    argparser.add_argument( '--files', type = int, default = 10000, help = 'number of files in the synthetic client db (default 10,000)' )
+    argparser.add_argument( '--tags', type = int, default = 1000, help = 'number of distinct tags (default 1,000)' )
+    argparser.add_argument( '--mappings', type = int, default = 100000, help = 'roughly how many mappings to add, skewed towards the first tags (default 100,000)' )
+    argparser.add_argument( '--repository_mappings', type = int, default = 10000, help = 'number of mappings in the synthetic repository updates (default 10,000)' )
+    argparser.add_argument( '--runs', type = int, default = 5, help = 'how many times to time each read (default 5)' )
+    argparser.add_argument( '--seed', type = int, default = 0, help = 'random seed for the synthetic data (default 0)' )
+    argparser.add_argument( '--only', help = 'comma-separated benchmark groups to run, from: ' + ', '.join( Benchmarks.BENCHMARK_GROUPS ) )
+    argparser.add_argument( '-o', '--output', help = 'write the json results to this path rather than stdout' )
+    
+    result = argparser.parse_args()
+    
+    if result.only is None:
+        
+        only_run = None
+        
+    else:
+        
+        only_run = [ group.strip() for group in result.only.split( ',' ) ]
+        
+    
+    try:
+        
+        threading.Thread( target = reactor.run, kwargs = { 'installSignalHandlers' : 0 } ).start()
+        
+        QP.MonkeyPatchMissingMethods()
+        app = QW.QApplication( sys.argv )
+        
+        app.call_after_catcher = QP.CallAfterEventCatcher( app )
+        
+        try:
+            
+            win = QW.QWidget( None )
+            win.setWindowTitle( 'Running benchmarks...' )
+            
+            controller = TestController.Controller( win, None )
+            
+            benchmark_runner = Benchmarks.BenchmarkRunner( controller.db_dir, num_files = result.files, num_tags = result.tags, num_mappings = result.mappings, num_repository_mappings = result.repository_mappings, num_runs = result.runs, seed = result.seed, only_run = only_run )
+            
+            def do_it():
+                
+                try:
+                    
+                    benchmark_runner.Run()
+                    
+                    results_json = benchmark_runner.GetResultsJSON()
+                    
+                    if result.output is None:
+                        
+                        print( results_json )
+                        
+                    else:
+                        
+                        with open( result.output, 'w', encoding = 'utf-8' ) as f:
+                            
+                            f.write( results_json )
+                            
+                        
+                    
+                except:
+                    
+                    HydrusData.DebugPrint( traceback.format_exc() )
+                    
+                finally:
+                    
+                    QP.CallAfter( win.deleteLater )
+                    QP.CallAfter( app.quit )
+                    
+                
+            
+            threading.Thread( target = do_it ).start()
+            
+            app.exec_()
+            
+        except:
+            
+            HydrusData.DebugPrint( traceback.format_exc() )
+            
+        finally:
+            
+            HG.view_shutdown = True
+            
+            controller.pubimmediate( 'wake_daemons' )
+            
+            HG.model_shutdown = True
+            
+            controller.pubimmediate( 'wake_daemons' )
+            
+            controller.TidyUp()
+            
+        
+    except:
+        
+        HydrusData.DebugPrint( traceback.format_exc() )
+        
+    finally:
+        
+        reactor.callFromThread( reactor.stop )
+        
@@ -18,6 +18,11 @@ import traceback
 import typing
 import weakref
 
+# bs4 trees are a lot bigger than the text they came from. these are rough
+PARSING_CACHE_SOUP_SIZE_MULTIPLIER = 12
+PARSING_CACHE_LXML_SIZE_MULTIPLIER = 6
+PARSING_CACHE_JSON_SIZE_MULTIPLIER = 4
+
 class DataCache( object ):
     
     def __init__( self, controller, cache_size, timeout = 1200 ):
@@ -179,6 +184,54 @@ class DataCache( object ):
             
         
     
+class ImageTileCache( object ):
+    
+    def __init__( self, controller ):
+        
+        self._controller = controller
+        
+        cache_size = self._controller.new_options.GetInteger( 'image_tile_cache_size' )
+        cache_timeout = self._controller.new_options.GetInteger( 'image_tile_cache_timeout' )
+        
+        self._data_cache = DataCache( self._controller, cache_size, timeout = cache_timeout )
+        
+    
+    def Clear( self ):
+        
+        self._data_cache.Clear()
+        
+    
+    def GetTile( self, image_renderer, media, clip_rect, target_resolution ):
+        
+        hash = media.GetHash()
+        
+        key = ( hash, clip_rect.x(), clip_rect.y(), clip_rect.width(), clip_rect.height(), target_resolution.width(), target_resolution.height() )
+        
+        result = self._data_cache.GetIfHasData( key )
+        
+        if result is None:
+            
+            # check before we render--the full image may arrive while we do it, but it never goes back
+            is_full_quality = image_renderer.IsFullQuality()
+            
+            qt_pixmap = image_renderer.GetQtPixmap( clip_rect = clip_rect, target_resolution = target_resolution )
+            
+            tile = ClientRendering.ImageTile( hash, clip_rect, qt_pixmap )
+            
+            # a stand-in from the reduced image is only good until the full image is in
+            if is_full_quality:
+                
+                self._data_cache.AddData( key, tile )
+                
+            
+        else:
+            
+            tile = result
+            
+        
+        return tile
+        
+    
 class LocalBooruCache( object ):
     
     def __init__( self, controller ):
@@ -524,12 +577,18 @@ class MediaResultCache( object ):
     
 class ParsingCache( object ):
     
-    def __init__( self ):
+    def __init__( self, cache_size = 64 * 1048576, timeout = 60 ):
+        
+        self._cache_size = cache_size
+        self._timeout = timeout
         
         self._next_clean_cache_time = HydrusData.GetNow()
         
-        self._html_to_soups = {}
-        self._json_to_jsons = {}
+        # ( parse_type, text ) -> ( last_accessed, estimated_memory_footprint, parsed_object ), oldest access first
+        self._keys_to_parsed_objects = collections.OrderedDict()
+        self._keys_to_in_flight_events = {}
+        
+        self._total_estimated_memory_footprint = 0
         
         self._lock = threading.Lock()
         
@@ -538,94 +597,160 @@ class ParsingCache( object ):
         
         if HydrusData.TimeHasPassed( self._next_clean_cache_time ):
             
-            for cache in ( self._html_to_soups, self._json_to_jsons ):
+            while len( self._keys_to_parsed_objects ) > 0:
                 
-                dead_datas = set()
+                ( key, ( last_accessed, estimated_memory_footprint, parsed_object ) ) = next( iter( self._keys_to_parsed_objects.items() ) )
                 
-                for ( data, ( last_accessed, parsed_object ) ) in cache.items():
+                if not HydrusData.TimeHasPassed( last_accessed + self._timeout ):
                     
-                    if HydrusData.TimeHasPassed( last_accessed + 10 ):
-                        
-                        dead_datas.add( data )
-                        
+                    break
                     
                 
-                for dead_data in dead_datas:
-                    
-                    del cache[ dead_data ]
-                    
+                self._Delete( key )
                 
             
             self._next_clean_cache_time = HydrusData.GetNow() + 5
             
         
     
-    def CleanCache( self ):
+    def _Delete( self, key ):
         
-        with self._lock:
-            
-            self._CleanCache()
-            
+        ( last_accessed, estimated_memory_footprint, parsed_object ) = self._keys_to_parsed_objects[ key ]
+        
+        del self._keys_to_parsed_objects[ key ]
+        
+        self._total_estimated_memory_footprint -= estimated_memory_footprint
         
     
-    def GetJSON( self, json_text ):
+    def _GetParsedObject( self, parse_type, text ):
         
-        with self._lock:
-            
-            now = HydrusData.GetNow()
+        key = ( parse_type, text )
+        
+        while True:
             
-            if json_text not in self._json_to_jsons:
+            with self._lock:
                 
-                json_object = json.loads( json_text )
+                if key in self._keys_to_parsed_objects:
+                    
+                    ( last_accessed, estimated_memory_footprint, parsed_object ) = self._keys_to_parsed_objects[ key ]
+                    
+                    self._keys_to_parsed_objects[ key ] = ( HydrusData.GetNow(), estimated_memory_footprint, parsed_object )
+                    
+                    self._keys_to_parsed_objects.move_to_end( key )
+                    
+                    return parsed_object
+                    
                 
-                self._json_to_jsons[ json_text ] = ( now, json_object )
+                if key in self._keys_to_in_flight_events:
+                    
+                    in_flight_event = self._keys_to_in_flight_events[ key ]
+                    
+                else:
+                    
+                    in_flight_event = None
+                    
+                    self._keys_to_in_flight_events[ key ] = threading.Event()
+                    
                 
             
-            ( last_accessed, json_object ) = self._json_to_jsons[ json_text ]
-            
-            if last_accessed != now:
+            if in_flight_event is None:
                 
-                self._json_to_jsons[ json_text ] = ( now, json_object )
+                break
                 
             
-            if len( self._json_to_jsons ) > 10:
-                
-                self._CleanCache()
-                
+            # another thread is parsing this same text right now, so wait for it and try the cache again
+            # if it failed or was too big to cache, we'll end up parsing it ourselves
             
-            return json_object
+            in_flight_event.wait()
             
         
-    
-    def GetSoup( self, html ):
-        
-        with self._lock:
-            
-            now = HydrusData.GetNow()
+        try:
             
-            if html not in self._html_to_soups:
+            if parse_type == 'html':
                 
-                soup = ClientParsing.GetSoup( html )
+                parsed_object = ClientParsing.GetSoup( text )
                 
-                self._html_to_soups[ html ] = ( now, soup )
+                estimated_memory_footprint = len( text ) * PARSING_CACHE_SOUP_SIZE_MULTIPLIER
                 
-            
-            ( last_accessed, soup ) = self._html_to_soups[ html ]
-            
-            if last_accessed != now:
+            elif parse_type == 'lxml':
+                
+                parsed_object = ClientParsing.GetLXMLTree( text )
                 
-                self._html_to_soups[ html ] = ( now, soup )
+                estimated_memory_footprint = len( text ) * PARSING_CACHE_LXML_SIZE_MULTIPLIER
+                
+            else:
+                
+                parsed_object = json.loads( text )
+                
+                estimated_memory_footprint = len( text ) * PARSING_CACHE_JSON_SIZE_MULTIPLIER
                 
             
-            if len( self._html_to_soups ) > 10:
+            with self._lock:
+                
+                if estimated_memory_footprint <= self._cache_size:
+                    
+                    self._keys_to_parsed_objects[ key ] = ( HydrusData.GetNow(), estimated_memory_footprint, parsed_object )
+                    
+                    self._total_estimated_memory_footprint += estimated_memory_footprint
+                    
+                    while self._total_estimated_memory_footprint > self._cache_size:
+                        
+                        oldest_key = next( iter( self._keys_to_parsed_objects.keys() ) )
+                        
+                        self._Delete( oldest_key )
+                        
+                    
                 
                 self._CleanCache()
                 
             
-            return soup
+            return parsed_object
+            
+        finally:
+            
+            with self._lock:
+                
+                in_flight_event = self._keys_to_in_flight_events.pop( key )
+                
+            
+            in_flight_event.set()
             
         
     
+    def CleanCache( self ):
+        
+        with self._lock:
+            
+            self._CleanCache()
+            
+        
+    
+    def GetJSON( self, json_text ):
+        
+        return self._GetParsedObject( 'json', json_text )
+        
+    
+    def GetLXMLTree( self, html ):
+        
+        return self._GetParsedObject( 'lxml', html )
+        
+    
+    def GetSizeStatus( self ):
+        
+        with self._lock:
+            
+            return ( len( self._keys_to_parsed_objects ), self._total_estimated_memory_footprint, self._cache_size )
+            
+        
+    
+    def GetSoup( self, html ):
+        
+        return self._GetParsedObject( 'html', html )
+        
+    
+# neighbour prefetch only gets this much of the image cache, so it can't push out what the user has actually been looking at
+IMAGE_PREFETCH_BUDGET_FRACTION = 0.5
+
 class RenderedImageCache( object ):
     
     def __init__( self, controller ):
@@ -637,29 +762,68 @@ class RenderedImageCache( object ):
         
         self._data_cache = DataCache( self._controller, cache_size, timeout = cache_timeout )
         
+        self._prefetch_budget = int( cache_size * IMAGE_PREFETCH_BUDGET_FRACTION )
+        
+        self._lock = threading.Lock()
+        
+        self._prefetch_queue = []
+        
+        self._prefetch_event = threading.Event()
+        
+        self._controller.CallToThreadLongRunning( self.MainLoop )
+        
+    
+    def _EstimateMemoryFootprint( self, media, target_resolution ):
+        
+        ( width, height ) = media.GetResolution()
+        
+        if width is None or height is None:
+            
+            return 0
+            
+        
+        if target_resolution is not None and media.GetMime() == HC.IMAGE_JPEG:
+            
+            reduction = HydrusImageHandling.GetJPEGDecodeReduction( ( width, height ), target_resolution )
+            
+            ( width, height ) = ( width // reduction, height // reduction )
+            
+        
+        return width * height * 3
+        
     
     def Clear( self ):
         
+        with self._lock:
+            
+            self._prefetch_queue = []
+            
+        
         self._data_cache.Clear()
         
     
-    def GetImageRenderer( self, media ):
+    def GetImageRenderer( self, media, target_resolution = None ):
+        
+        # target_resolution is a hint of the size we expect to show at, so a big jpeg can decode smaller
         
         hash = media.GetHash()
         
         key = hash
         
-        result = self._data_cache.GetIfHasData( key )
-        
-        if result is None:
-            
-            image_renderer = ClientRendering.ImageRenderer( media )
-            
-            self._data_cache.AddData( key, image_renderer )
+        with self._lock:
             
-        else:
+            result = self._data_cache.GetIfHasData( key )
             
-            image_renderer = result
+            if result is None:
+                
+                image_renderer = ClientRendering.ImageRenderer( media, target_resolution = target_resolution )
+                
+                self._data_cache.AddData( key, image_renderer )
+                
+            else:
+                
+                image_renderer = result
+                
             
         
         return image_renderer
@@ -672,6 +836,111 @@ class RenderedImageCache( object ):
         return self._data_cache.HasData( key )
         
     
+    def MainLoop( self ):
+        
+        while not HydrusThreading.IsThreadShuttingDown():
+            
+            with self._lock:
+                
+                do_wait = len( self._prefetch_queue ) == 0
+                
+            
+            if do_wait:
+                
+                self._prefetch_event.wait( 1 )
+                
+                self._prefetch_event.clear()
+                
+                continue
+                
+            
+            with self._lock:
+                
+                if len( self._prefetch_queue ) == 0:
+                    
+                    continue
+                    
+                
+                ( media, target_resolution ) = self._prefetch_queue.pop()
+                
+                key = media.GetHash()
+                
+                if self._data_cache.HasData( key ):
+                    
+                    continue
+                    
+                
+                try:
+                    
+                    image_renderer = ClientRendering.ImageRenderer( media, target_resolution = target_resolution, initialise_in_thread = False )
+                    
+                except HydrusExceptions.FileMissingException:
+                    
+                    continue
+                    
+                
+                # in the cache before it is ready, so if the user gets here first, they wait on this decode rather than starting another
+                self._data_cache.AddData( key, image_renderer )
+                
+            
+            try:
+                
+                image_renderer.Initialise()
+                
+            except Exception as e:
+                
+                self._data_cache.DeleteData( key )
+                
+                HydrusData.PrintException( e )
+                
+            
+        
+    
+    def PrefetchImageRenderers( self, medias_and_target_resolutions ):
+        
+        # the list is in priority order. it replaces whatever is still queued, so renders for where the user used to be are cancelled
+        
+        prefetch_queue = []
+        
+        total_estimated_memory_footprint = 0
+        
+        for ( media, target_resolution ) in medias_and_target_resolutions:
+            
+            image_renderer = self._data_cache.GetIfHasData( media.GetHash() ) # this touches it, so neighbours don't age out
+            
+            if image_renderer is None:
+                
+                estimated_memory_footprint = self._EstimateMemoryFootprint( media, target_resolution )
+                
+            else:
+                
+                estimated_memory_footprint = image_renderer.GetEstimatedMemoryFootprint()
+                
+            
+            total_estimated_memory_footprint += estimated_memory_footprint
+            
+            if total_estimated_memory_footprint > self._prefetch_budget:
+                
+                break
+                
+            
+            if image_renderer is None:
+                
+                prefetch_queue.append( ( media, target_resolution ) )
+                
+            
+        
+        # we pop off the end, so reverse
+        prefetch_queue.reverse()
+        
+        with self._lock:
+            
+            self._prefetch_queue = prefetch_queue
+            
+        
+        self._prefetch_event.set()
+        
+    
 class ThumbnailCache( object ):
     
     def __init__( self, controller ):
@@ -1325,3 +1594,46 @@ class ThumbnailCache( object ):
             
         
     
+class ThumbnailCompositeCache( object ):
+    
+    def __init__( self, controller ):
+        
+        self._controller = controller
+        
+        cache_size = self._controller.new_options.GetInteger( 'thumbnail_composite_cache_size' )
+        cache_timeout = self._controller.new_options.GetInteger( 'thumbnail_composite_cache_timeout' )
+        
+        self._data_cache = DataCache( self._controller, cache_size, timeout = cache_timeout )
+        
+        # colours and the various thumbnail options aren't in the draw state, so we just start again
+        self._controller.sub( self, 'Clear', 'notify_new_colourset' )
+        self._controller.sub( self, 'Clear', 'reset_thumbnail_cache' )
+        
+    
+    def AddQtImage( self, key, thumbnail_hydrus_bitmap, draw_state, qt_image ):
+        
+        composite = ClientRendering.ThumbnailComposite( thumbnail_hydrus_bitmap, draw_state, qt_image )
+        
+        # AddData won't overwrite a stale entry
+        self._data_cache.DeleteData( key )
+        
+        self._data_cache.AddData( key, composite )
+        
+    
+    def Clear( self ):
+        
+        self._data_cache.Clear()
+        
+    
+    def GetQtImage( self, key, thumbnail_hydrus_bitmap, draw_state ):
+        
+        composite = self._data_cache.GetIfHasData( key )
+        
+        if composite is None or not composite.IsValid( thumbnail_hydrus_bitmap, draw_state ):
+            
+            return None
+            
+        
+        return composite.qt_image
+        
+    
@@ -21,6 +21,7 @@ from hydrus.client.gui import ClientGUIStyle
 from hydrus.client.gui import ClientGUITopLevelWindowsPanels
 from hydrus.client.importing import ClientImportSubscriptions
 from hydrus.client import ClientManagers
+from hydrus.client import ClientMedia
 from hydrus.client.networking import ClientNetworking
 from hydrus.client.networking import ClientNetworkingBandwidth
 from hydrus.client.networking import ClientNetworkingDomain
@@ -963,10 +964,14 @@ class Controller( HydrusController.HydrusController ):
         self.tag_parents_manager = ClientManagers.TagParentsManager( self )
         self._managers[ 'undo' ] = ClientManagers.UndoManager( self )
         
+        self.media_list_hash_index = ClientMedia.MediaListHashIndex( self, QP.isValid )
+        
         def qt_code():
             
             self._caches[ 'images' ] = ClientCaches.RenderedImageCache( self )
+            self._caches[ 'image_tiles' ] = ClientCaches.ImageTileCache( self )
             self._caches[ 'thumbnail' ] = ClientCaches.ThumbnailCache( self )
+            self._caches[ 'thumbnail_composites' ] = ClientCaches.ThumbnailCompositeCache( self )
             
             self.bitmap_manager = ClientManagers.BitmapManager( self )
             
@@ -1170,6 +1175,20 @@ class Controller( HydrusController.HydrusController ):
             return
             
         
+        tag_cooccurrence_stop_time = stop_time
+        
+        if tag_cooccurrence_stop_time is None:
+            
+            tag_cooccurrence_stop_time = HydrusData.GetNow() + 30
+            
+        
+        self.WriteSynchronous( 'maintain_tag_cooccurrence_cache', maintenance_mode = maintenance_mode, stop_time = tag_cooccurrence_stop_time )
+        
+        if self.ShouldStopThisWork( maintenance_mode, stop_time = stop_time ):
+            
+            return
+            
+        
         self.WriteSynchronous( 'vacuum', maintenance_mode = maintenance_mode, stop_time = stop_time )
         
         if self.ShouldStopThisWork( maintenance_mode, stop_time = stop_time ):
@@ -1920,6 +1939,9 @@ class Controller( HydrusController.HydrusController ):
                     time.sleep( 0.1 )
                     
                 
+                # the viewer may have decoded it small. we want the real thing, and this is the place to wait for it
+                image_renderer.LoadFullNumPyImage()
+                
                 QP.CallAfter( CopyToClipboard )
                 
             
@@ -143,6 +143,8 @@ YAML_DUMP_ID_LOCAL_BOORU = 8
 MIN_CACHED_INTEGER = -99999999
 MAX_CACHED_INTEGER = 99999999
 
+TAG_COOCCURRENCE_CACHE_NUM_TO_KEEP = 250
+
 def BlockingSafeShowMessage( message ):
     
     HG.client_controller.CallBlockingToQt( HG.client_controller.app, QW.QMessageBox.warning, None, 'Warning', message )
@@ -237,6 +239,10 @@ def GenerateSpecificMappingsCacheTableNames( file_service_id, tag_service_id ):
     
     return ( cache_files_table_name, cache_current_mappings_table_name, cache_deleted_mappings_table_name, cache_pending_mappings_table_name, ac_cache_table_name )
     
+def GenerateTagCooccurrenceCacheTableName( service_id ):
+    
+    return 'external_caches.tag_cooccurrence_cache_{}'.format( service_id )
+    
 def GenerateTagSiblingsLookupCacheTableName( service_id ):
     
     return 'external_caches.tag_siblings_lookup_cache_{}'.format( service_id )
@@ -1294,6 +1300,285 @@ class DB( HydrusDB.HydrusDB ):
             
         
     
+    def _CacheTagCooccurrenceAddMappings( self, tag_service_id, tag_id, hash_ids ):
+        
+        hash_ids = self._CacheTagCooccurrenceFilterBuiltHashIds( tag_service_id, hash_ids )
+        
+        if len( hash_ids ) == 0:
+            
+            return
+            
+        
+        other_tag_ids_to_counts = self._CacheTagCooccurrenceGetOtherTagCounts( tag_service_id, tag_id, hash_ids )
+        
+        self._CacheTagCooccurrenceUpdateCounts( tag_service_id, tag_id, other_tag_ids_to_counts, 1 )
+        
+    
+    def _CacheTagCooccurrenceDeleteMappings( self, tag_service_id, tag_id, hash_ids ):
+        
+        hash_ids = self._CacheTagCooccurrenceFilterBuiltHashIds( tag_service_id, hash_ids )
+        
+        if len( hash_ids ) == 0:
+            
+            return
+            
+        
+        # the mappings are already gone, so this counts what the deleted tag used to share with these files
+        
+        other_tag_ids_to_counts = self._CacheTagCooccurrenceGetOtherTagCounts( tag_service_id, tag_id, hash_ids )
+        
+        self._CacheTagCooccurrenceUpdateCounts( tag_service_id, tag_id, other_tag_ids_to_counts, -1 )
+        
+    
+    def _CacheTagCooccurrenceDrop( self, tag_service_id ):
+        
+        cache_tag_cooccurrence_table_name = GenerateTagCooccurrenceCacheTableName( tag_service_id )
+        
+        self._c.execute( 'DROP TABLE IF EXISTS {};'.format( cache_tag_cooccurrence_table_name ) )
+        
+        self._c.execute( 'DELETE FROM tag_cooccurrence_cache_status WHERE service_id = ?;', ( tag_service_id, ) )
+        
+    
+    def _CacheTagCooccurrenceFilterBuiltHashIds( self, tag_service_id, hash_ids ):
+        
+        result = self._c.execute( 'SELECT hash_id_cursor, complete FROM tag_cooccurrence_cache_status WHERE service_id = ?;', ( tag_service_id, ) ).fetchone()
+        
+        if result is None:
+            
+            return []
+            
+        
+        ( hash_id_cursor, complete ) = result
+        
+        if complete:
+            
+            return list( hash_ids )
+            
+        
+        # files past the cursor will be counted by the builder when it gets to them
+        
+        return [ hash_id for hash_id in hash_ids if hash_id <= hash_id_cursor ]
+        
+    
+    def _CacheTagCooccurrenceGenerate( self, tag_service_id ):
+        
+        cache_tag_cooccurrence_table_name = GenerateTagCooccurrenceCacheTableName( tag_service_id )
+        
+        self._c.execute( 'CREATE TABLE IF NOT EXISTS {} ( tag_id INTEGER, other_tag_id INTEGER, count INTEGER, PRIMARY KEY ( tag_id, other_tag_id ) ) WITHOUT ROWID;'.format( cache_tag_cooccurrence_table_name ) )
+        
+        # the table starts empty. the idle-time builder fills it in from hash_id 0 upwards
+        
+        self._c.execute( 'REPLACE INTO tag_cooccurrence_cache_status ( service_id, hash_id_cursor, complete ) VALUES ( ?, ?, ? );', ( tag_service_id, -1, False ) )
+        
+    
+    def _CacheTagCooccurrenceGetOtherTagCounts( self, tag_service_id, tag_id, hash_ids ):
+        
+        ( current_mappings_table_name, deleted_mappings_table_name, pending_mappings_table_name, petitioned_mappings_table_name ) = GenerateMappingsTableNames( tag_service_id )
+        
+        with HydrusDB.TemporaryIntegerTable( self._c, hash_ids, 'hash_id' ) as temp_table_name:
+            
+            self._AnalyzeTempTable( temp_table_name )
+            
+            other_tag_ids_to_counts = dict( self._c.execute( 'SELECT tag_id, COUNT( * ) FROM {} CROSS JOIN {} USING ( hash_id ) WHERE tag_id != ? GROUP BY tag_id;'.format( temp_table_name, current_mappings_table_name ), ( tag_id, ) ) )
+            
+        
+        return other_tag_ids_to_counts
+        
+    
+    def _CacheTagCooccurrenceGetRelatedTagIds( self, tag_service_id, tag_ids, max_results ):
+        
+        cache_tag_cooccurrence_table_name = GenerateTagCooccurrenceCacheTableName( tag_service_id )
+        
+        related_tag_ids_to_num_search_tags = collections.Counter()
+        related_tag_ids_to_counts = collections.Counter()
+        
+        for tag_id in tag_ids:
+            
+            for ( other_tag_id, count ) in self._c.execute( 'SELECT other_tag_id, count FROM {} WHERE tag_id = ? ORDER BY count DESC LIMIT ?;'.format( cache_tag_cooccurrence_table_name ), ( tag_id, TAG_COOCCURRENCE_CACHE_NUM_TO_KEEP ) ):
+                
+                related_tag_ids_to_num_search_tags[ other_tag_id ] += 1
+                related_tag_ids_to_counts[ other_tag_id ] += count
+                
+            
+        
+        for tag_id in tag_ids:
+            
+            if tag_id in related_tag_ids_to_counts:
+                
+                del related_tag_ids_to_counts[ tag_id ]
+                
+            
+        
+        # same 'soft' intersect idea as the file sampling search--tags that go with more of the search tags win, then the raw counts break ties
+        # the tag_id tiebreak keeps the results deterministic
+        
+        sort_key = lambda tag_id: ( related_tag_ids_to_num_search_tags[ tag_id ], related_tag_ids_to_counts[ tag_id ], - tag_id )
+        
+        sorted_tag_ids = sorted( related_tag_ids_to_counts.keys(), key = sort_key, reverse = True )
+        
+        return [ ( tag_id, related_tag_ids_to_counts[ tag_id ] ) for tag_id in sorted_tag_ids[ : max_results ] ]
+        
+    
+    def _CacheTagCooccurrenceIsComplete( self, tag_service_id ):
+        
+        result = self._c.execute( 'SELECT complete FROM tag_cooccurrence_cache_status WHERE service_id = ?;', ( tag_service_id, ) ).fetchone()
+        
+        if result is None:
+            
+            return False
+            
+        
+        ( complete, ) = result
+        
+        return bool( complete )
+        
+    
+    def _CacheTagCooccurrenceMaintain( self, maintenance_mode = HC.MAINTENANCE_FORCED, stop_time = None ):
+        
+        BLOCK_SIZE = 64
+        
+        tag_service_ids = self._STL( self._c.execute( 'SELECT service_id FROM tag_cooccurrence_cache_status WHERE complete = ?;', ( False, ) ) )
+        
+        if len( tag_service_ids ) == 0:
+            
+            return
+            
+        
+        job_key = ClientThreading.JobKey( cancellable = True )
+        
+        try:
+            
+            job_key.SetVariable( 'popup_title', 'database maintenance - tag co-occurrence cache' )
+            
+            self._controller.pub( 'modal_message', job_key )
+            
+            for tag_service_id in tag_service_ids:
+                
+                ( current_mappings_table_name, deleted_mappings_table_name, pending_mappings_table_name, petitioned_mappings_table_name ) = GenerateMappingsTableNames( tag_service_id )
+                
+                cache_tag_cooccurrence_table_name = GenerateTagCooccurrenceCacheTableName( tag_service_id )
+                
+                ( hash_id_cursor, ) = self._c.execute( 'SELECT hash_id_cursor FROM tag_cooccurrence_cache_status WHERE service_id = ?;', ( tag_service_id, ) ).fetchone()
+                
+                while True:
+                    
+                    hash_ids = self._STL( self._c.execute( 'SELECT DISTINCT hash_id FROM {} WHERE hash_id > ? ORDER BY hash_id ASC LIMIT ?;'.format( current_mappings_table_name ), ( hash_id_cursor, BLOCK_SIZE ) ) )
+                    
+                    if len( hash_ids ) == 0:
+                        
+                        self._c.execute( 'UPDATE tag_cooccurrence_cache_status SET complete = ? WHERE service_id = ?;', ( True, tag_service_id ) )
+                        
+                        self._AnalyzeTable( cache_tag_cooccurrence_table_name )
+                        
+                        break
+                        
+                    
+                    text = 'building tag co-occurrence cache {}: up to file {}'.format( tag_service_id, HydrusData.ToHumanInt( hash_ids[-1] ) )
+                    
+                    self._controller.pub( 'splash_set_status_subtext', text )
+                    job_key.SetVariable( 'popup_text_1', text )
+                    
+                    with HydrusDB.TemporaryIntegerTable( self._c, hash_ids, 'hash_id' ) as temp_table_name:
+                        
+                        self._AnalyzeTempTable( temp_table_name )
+                        
+                        query = 'SELECT m1.tag_id, m2.tag_id, COUNT( * ) FROM {} CROSS JOIN {} AS m1 USING ( hash_id ) CROSS JOIN {} AS m2 ON ( m1.hash_id = m2.hash_id ) WHERE m1.tag_id != m2.tag_id GROUP BY m1.tag_id, m2.tag_id;'.format( temp_table_name, current_mappings_table_name, current_mappings_table_name )
+                        
+                        count_rows = self._c.execute( query ).fetchall()
+                        
+                    
+                    self._CacheTagCooccurrenceUpdateCountRows( tag_service_id, count_rows )
+                    
+                    self._CacheTagCooccurrencePrune( tag_service_id, { tag_id for ( tag_id, other_tag_id, count ) in count_rows } )
+                    
+                    hash_id_cursor = hash_ids[-1]
+                    
+                    self._c.execute( 'UPDATE tag_cooccurrence_cache_status SET hash_id_cursor = ? WHERE service_id = ?;', ( hash_id_cursor, tag_service_id ) )
+                    
+                    p1 = HG.client_controller.ShouldStopThisWork( maintenance_mode, stop_time = stop_time )
+                    p2 = job_key.IsCancelled()
+                    
+                    if p1 or p2:
+                        
+                        return
+                        
+                    
+                
+            
+        finally:
+            
+            job_key.SetVariable( 'popup_text_1', 'done!' )
+            
+            job_key.Finish()
+            
+            job_key.Delete( 5 )
+            
+        
+    
+    def _CacheTagCooccurrenceMaintenanceDue( self ):
+        
+        result = self._c.execute( 'SELECT 1 FROM tag_cooccurrence_cache_status WHERE complete = ?;', ( False, ) ).fetchone()
+        
+        return result is not None
+        
+    
+    def _CacheTagCooccurrencePrune( self, tag_service_id, tag_ids ):
+        
+        # we only want the top n for each tag. we let a tag grow to twice that before cutting back so we are not pruning on every update
+        # a pair that gets pruned and then comes back starts from 0 again, but it was not near the top anyway
+        
+        cache_tag_cooccurrence_table_name = GenerateTagCooccurrenceCacheTableName( tag_service_id )
+        
+        for tag_id in tag_ids:
+            
+            ( num_rows, ) = self._c.execute( 'SELECT COUNT( * ) FROM {} WHERE tag_id = ?;'.format( cache_tag_cooccurrence_table_name ), ( tag_id, ) ).fetchone()
+            
+            if num_rows > TAG_COOCCURRENCE_CACHE_NUM_TO_KEEP * 2:
+                
+                ( cutoff_count, ) = self._c.execute( 'SELECT count FROM {} WHERE tag_id = ? ORDER BY count DESC LIMIT 1 OFFSET ?;'.format( cache_tag_cooccurrence_table_name ), ( tag_id, TAG_COOCCURRENCE_CACHE_NUM_TO_KEEP - 1 ) ).fetchone()
+                
+                self._c.execute( 'DELETE FROM {} WHERE tag_id = ? AND count < ?;'.format( cache_tag_cooccurrence_table_name ), ( tag_id, cutoff_count ) )
+                
+            
+        
+    
+    def _CacheTagCooccurrenceUpdateCountRows( self, tag_service_id, count_rows ):
+        
+        cache_tag_cooccurrence_table_name = GenerateTagCooccurrenceCacheTableName( tag_service_id )
+        
+        self._c.executemany( 'INSERT OR IGNORE INTO {} ( tag_id, other_tag_id, count ) VALUES ( ?, ?, ? );'.format( cache_tag_cooccurrence_table_name ), ( ( tag_id, other_tag_id, 0 ) for ( tag_id, other_tag_id, delta ) in count_rows ) )
+        
+        self._c.executemany( 'UPDATE {} SET count = count + ? WHERE tag_id = ? AND other_tag_id = ?;'.format( cache_tag_cooccurrence_table_name ), ( ( delta, tag_id, other_tag_id ) for ( tag_id, other_tag_id, delta ) in count_rows ) )
+        
+        self._c.executemany( 'DELETE FROM {} WHERE tag_id = ? AND other_tag_id = ? AND count <= ?;'.format( cache_tag_cooccurrence_table_name ), ( ( tag_id, other_tag_id, 0 ) for ( tag_id, other_tag_id, delta ) in count_rows ) )
+        
+    
+    def _CacheTagCooccurrenceUpdateCounts( self, tag_service_id, tag_id, other_tag_ids_to_counts, direction ):
+        
+        count_rows = []
+        
+        for ( other_tag_id, count ) in other_tag_ids_to_counts.items():
+            
+            count_rows.append( ( tag_id, other_tag_id, count * direction ) )
+            count_rows.append( ( other_tag_id, tag_id, count * direction ) )
+            
+        
+        if len( count_rows ) == 0:
+            
+            return
+            
+        
+        self._CacheTagCooccurrenceUpdateCountRows( tag_service_id, count_rows )
+        
+        if direction > 0:
+            
+            touched_tag_ids = set( other_tag_ids_to_counts.keys() )
+            touched_tag_ids.add( tag_id )
+            
+            self._CacheTagCooccurrencePrune( tag_service_id, touched_tag_ids )
+            
+        
+    
     def _CacheTagSiblingsLookupDrop( self, tag_service_id ):
         
         cache_tag_siblings_lookup_table_name = GenerateTagSiblingsLookupCacheTableName( tag_service_id )
@@ -1653,6 +1938,7 @@ class DB( HydrusDB.HydrusDB ):
         self._c.execute( 'CREATE TABLE analyze_timestamps ( name TEXT, num_rows INTEGER, timestamp INTEGER );' )
         
         self._c.execute( 'CREATE TABLE client_files_locations ( prefix TEXT, location TEXT );' )
+        self._c.execute( 'CREATE TABLE client_files_prefix_fingerprints ( prefix TEXT PRIMARY KEY, location TEXT, mtime INTEGER, num_entries INTEGER, timestamp INTEGER );' )
         
         self._c.execute( 'CREATE TABLE IF NOT EXISTS ideal_client_files_locations ( location TEXT, weight INTEGER );' )
         self._c.execute( 'CREATE TABLE IF NOT EXISTS ideal_thumbnail_override_location ( location TEXT );' )
@@ -1697,6 +1983,7 @@ class DB( HydrusDB.HydrusDB ):
         self._CreateIndex( 'file_petitions', [ 'hash_id' ] )
         
         self._c.execute( 'CREATE TABLE json_dict ( name TEXT PRIMARY KEY, dump BLOB_BYTES );' )
+        self._c.execute( 'CREATE TABLE json_dump_rows ( dump_type INTEGER, row_key TEXT, timestamp INTEGER, dump BLOB_BYTES, PRIMARY KEY ( dump_type, row_key ) );' )
         self._c.execute( 'CREATE TABLE json_dumps ( dump_type INTEGER PRIMARY KEY, version INTEGER, dump BLOB_BYTES );' )
         self._c.execute( 'CREATE TABLE json_dumps_named ( dump_type INTEGER, dump_name TEXT, version INTEGER, timestamp INTEGER, dump BLOB_BYTES, PRIMARY KEY ( dump_type, dump_name, timestamp ) );' )
         
@@ -1945,6 +2232,8 @@ class DB( HydrusDB.HydrusDB ):
         
         self._c.execute( 'CREATE TABLE IF NOT EXISTS external_caches.local_tags_cache ( tag_id INTEGER PRIMARY KEY, tag TEXT UNIQUE );' )
         
+        self._c.execute( 'CREATE TABLE IF NOT EXISTS external_caches.tag_cooccurrence_cache_status ( service_id INTEGER PRIMARY KEY, hash_id_cursor INTEGER, complete INTEGER_BOOLEAN );' )
+        
     
     def _CullFileViewingStatistics( self ):
         
@@ -2102,6 +2391,7 @@ class DB( HydrusDB.HydrusDB ):
     def _DeleteJSONDump( self, dump_type ):
         
         self._c.execute( 'DELETE FROM json_dumps WHERE dump_type = ?;', ( dump_type, ) )
+        self._c.execute( 'DELETE FROM json_dump_rows WHERE dump_type = ?;', ( dump_type, ) )
         
     
     def _DeleteJSONDumpNamed( self, dump_type, dump_name = None, timestamp = None ):
@@ -2237,6 +2527,8 @@ class DB( HydrusDB.HydrusDB ):
             
             self._CacheCombinedFilesMappingsDrop( service_id )
             
+            self._CacheTagCooccurrenceDrop( service_id )
+            
             file_service_ids = self._GetServiceIds( HC.AUTOCOMPLETE_CACHE_SPECIFIC_FILE_SERVICES )
             
             for file_service_id in file_service_ids:
@@ -2282,6 +2574,13 @@ class DB( HydrusDB.HydrusDB ):
         self.pub_after_job( 'notify_new_pending' )
         
     
+    def _DeleteTagCooccurrenceCache( self, service_key ):
+        
+        service_id = self._GetServiceId( service_key )
+        
+        self._CacheTagCooccurrenceDrop( service_id )
+        
+    
     def _DeleteTagParents( self, service_id, pairs ):
         
         self._c.executemany( 'DELETE FROM tag_parents WHERE service_id = ? AND child_tag_id = ? AND parent_tag_id = ?;', ( ( service_id, child_tag_id, parent_tag_id ) for ( child_tag_id, parent_tag_id ) in pairs ) )
@@ -4763,6 +5062,11 @@ class DB( HydrusDB.HydrusDB ):
         return result
         
     
+    def _GetClientFilesPrefixFingerprints( self ):
+        
+        return { prefix : ( location, mtime, num_entries, timestamp ) for ( prefix, location, mtime, num_entries, timestamp ) in self._c.execute( 'SELECT prefix, location, mtime, num_entries, timestamp FROM client_files_prefix_fingerprints;' ) }
+        
+    
     def _GetFileHashes( self, given_hashes, given_hash_type, desired_hash_type ):
         
         if given_hash_type == 'sha256':
@@ -7032,6 +7336,13 @@ class DB( HydrusDB.HydrusDB ):
             jobs_to_do.append( 'similar files work' )
             
         
+        tag_cooccurrence_due = self._CacheTagCooccurrenceMaintenanceDue()
+        
+        if tag_cooccurrence_due:
+            
+            jobs_to_do.append( 'tag co-occurrence cache building' )
+            
+        
         return jobs_to_do
         
     
@@ -7070,8 +7381,50 @@ class DB( HydrusDB.HydrusDB ):
                 DealWithBrokenJSONDump( self._db_dir, dump, 'dump_type {}'.format( dump_type ) )
                 
             
-            return HydrusSerialisable.CreateFromSerialisableTuple( ( dump_type, version, serialisable_info ) )
+            obj = HydrusSerialisable.CreateFromSerialisableTuple( ( dump_type, version, serialisable_info ) )
+            
+            if isinstance( obj, HydrusSerialisable.SerialisableBaseWithRows ):
+                
+                obj.SetSerialisableRows( self._GetJSONDumpRows( dump_type ) )
+                
+            
+            return obj
+            
+        
+    
+    def _GetJSONDumpRows( self, dump_type ):
+        
+        rows = []
+        
+        broken_row_keys = []
+        
+        for ( row_key, timestamp, dump ) in self._c.execute( 'SELECT row_key, timestamp, dump FROM json_dump_rows WHERE dump_type = ?;', ( dump_type, ) ).fetchall():
+            
+            try:
+                
+                if isinstance( dump, bytes ):
+                    
+                    dump = str( dump, 'utf-8' )
+                    
+                
+                rows.append( ( row_key, timestamp, json.loads( dump ) ) )
+                
+            except:
+                
+                broken_row_keys.append( row_key )
+                
+            
+        
+        if len( broken_row_keys ) > 0:
+            
+            # a row is one entry of a bigger object, so we can lose it without losing the whole thing
             
+            self._c.executemany( 'DELETE FROM json_dump_rows WHERE dump_type = ? AND row_key = ?;', ( ( dump_type, row_key ) for row_key in broken_row_keys ) )
+            
+            HydrusData.ShowText( '{} entries of a serialised object (dump_type {}) failed to load and were deleted! This is most likely due to a hard drive fault. Please check \'help my db is broke.txt\' in the install_dir/db directory.'.format( HydrusData.ToHumanInt( len( broken_row_keys ) ), dump_type ) )
+            
+        
+        return rows
         
     
     def _GetJSONDumpNamed( self, dump_type, dump_name = None, timestamp = None ):
@@ -7561,6 +7914,36 @@ class DB( HydrusDB.HydrusDB ):
         return options
         
     
+    def _GetOrphanHashes( self, test_type, possible_hashes ):
+        
+        # the batch version of _IsAnOrphan. one join per file service rather than several lookups per hash
+        
+        possible_hashes = set( possible_hashes )
+        
+        non_orphan_hashes = set()
+        
+        if test_type == 'file':
+            
+            service_ids = [ self._combined_local_file_service_id ]
+            
+        else:
+            
+            service_ids = self._GetServiceIds( HC.FILE_SERVICES )
+            
+        
+        with HydrusDB.TemporaryBlobTable( self._c, possible_hashes, 'hash' ) as temp_table_name:
+            
+            self._AnalyzeTempTable( temp_table_name )
+            
+            for service_id in service_ids:
+                
+                non_orphan_hashes.update( self._STI( self._c.execute( 'SELECT hash FROM {} CROSS JOIN hashes USING ( hash ) CROSS JOIN current_files USING ( hash_id ) WHERE service_id = ?;'.format( temp_table_name ), ( service_id, ) ) ) )
+                
+            
+        
+        return possible_hashes.difference( non_orphan_hashes )
+        
+    
     def _GetPending( self, service_key ):
         
         service_id = self._GetServiceId( service_key )
@@ -7780,9 +8163,34 @@ class DB( HydrusDB.HydrusDB ):
         
         skip_hash_id = self._GetHashId( skip_hash )
         
+        tag_ids = [ self._GetTagId( tag ) for tag in search_tags ]
+        
+        if self._CacheTagCooccurrenceIsComplete( service_id ):
+            
+            results = self._CacheTagCooccurrenceGetRelatedTagIds( service_id, tag_ids, max_results )
+            
+        else:
+            
+            results = self._GetRelatedTagsSample( service_id, skip_hash_id, tag_ids, max_results, stop_time_for_finding_files, stop_time_for_finding_tags )
+            
+        
+        tags_to_counts = { self._GetTag( tag_id ) : count for ( tag_id, count ) in results }
+        
+        tags_to_counts = siblings_manager.CollapseTagsToCount( service_key, tags_to_counts )
+        
+        inclusive = True
+        pending_count = 0
+        
+        predicates = [ ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_TAG, tag, inclusive, current_count, pending_count ) for ( tag, current_count ) in tags_to_counts.items() ]
+        
+        return predicates
+        
+    
+    def _GetRelatedTagsSample( self, service_id, skip_hash_id, tag_ids, max_results, stop_time_for_finding_files, stop_time_for_finding_tags ):
+        
         ( current_mappings_table_name, deleted_mappings_table_name, pending_mappings_table_name, petitioned_mappings_table_name ) = GenerateMappingsTableNames( service_id )
         
-        tag_ids = [ self._GetTagId( tag ) for tag in search_tags ]
+        tag_ids = list( tag_ids )
         
         random.shuffle( tag_ids )
         
@@ -7857,16 +8265,7 @@ class DB( HydrusDB.HydrusDB ):
         
         results = counter.most_common( max_results )
         
-        tags_to_counts = { self._GetTag( tag_id ) : count for ( tag_id, count ) in results }
-        
-        tags_to_counts = siblings_manager.CollapseTagsToCount( service_key, tags_to_counts )
-        
-        inclusive = True
-        pending_count = 0
-        
-        predicates = [ ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_TAG, tag, inclusive, current_count, pending_count ) for ( tag, current_count ) in tags_to_counts.items() ]
-        
-        return predicates
+        return results
         
     
     def _GetRepositoryProgress( self, service_key ):
@@ -8285,6 +8684,11 @@ class DB( HydrusDB.HydrusDB ):
         return site_id
         
     
+    def _GetSlowJobProfileThresholdMS( self ):
+        
+        return self._controller.new_options.GetNoneableInteger( 'db_slow_job_profile_threshold_ms' )
+        
+    
     def _GetSubtagId( self, subtag ):
         
         result = self._c.execute( 'SELECT subtag_id FROM subtags WHERE subtag = ?;', ( subtag, ) ).fetchone()
@@ -8780,105 +9184,147 @@ class DB( HydrusDB.HydrusDB ):
     
     def _ImportFile( self, file_import_job ):
         
+        ( result, ) = self._ImportFiles( ( file_import_job, ) )
+        
+        return result
+        
+    
+    def _ImportFiles( self, file_import_jobs ):
+        
         if HG.file_import_report_mode:
             
-            HydrusData.ShowText( 'File import job starting db job' )
+            HydrusData.ShowText( 'File import job starting db job for {} files'.format( HydrusData.ToHumanInt( len( file_import_jobs ) ) ) )
             
         
-        hash = file_import_job.GetHash()
+        results = []
         
-        hash_id = self._GetHashId( hash )
+        timestamp = HydrusData.GetNow()
         
-        ( status, status_hash, note ) = self._GetHashIdStatus( hash_id, prefix = 'file recognised' )
+        files_info_rows = []
+        local_file_rows = []
+        archive_hash_ids = []
+        inbox_hash_ids = []
+        
+        content_updates = []
+        new_file_info_hashes = set()
         
-        if status != CC.STATUS_SUCCESSFUL_BUT_REDUNDANT:
+        hash_ids_done = set()
+        
+        for file_import_job in file_import_jobs:
             
-            if HG.file_import_report_mode:
+            hash = file_import_job.GetHash()
+            
+            hash_id = self._GetHashId( hash )
+            
+            if hash_id in hash_ids_done:
                 
-                HydrusData.ShowText( 'File import job adding new file' )
+                # the same file twice in one batch. the rows for the first are not in yet, so a status lookup would say 'new'
+                
+                results.append( ( CC.STATUS_SUCCESSFUL_BUT_REDUNDANT, 'file recognised: imported earlier in the same batch' ) )
+                
+                continue
                 
             
-            ( size, mime, width, height, duration, num_frames, has_audio, num_words ) = file_import_job.GetFileInfo()
-            
-            timestamp = HydrusData.GetNow()
+            hash_ids_done.add( hash_id )
             
-            phashes = file_import_job.GetPHashes()
+            ( status, status_hash, note ) = self._GetHashIdStatus( hash_id, prefix = 'file recognised' )
             
-            if phashes is not None:
+            if status != CC.STATUS_SUCCESSFUL_BUT_REDUNDANT:
                 
                 if HG.file_import_report_mode:
                     
-                    HydrusData.ShowText( 'File import job associating phashes' )
+                    HydrusData.ShowText( 'File import job adding new file' )
                     
                 
-                self._PHashesAssociatePHashes( hash_id, phashes )
+                ( size, mime, width, height, duration, num_frames, has_audio, num_words ) = file_import_job.GetFileInfo()
                 
-            
-            if HG.file_import_report_mode:
+                phashes = file_import_job.GetPHashes()
                 
-                HydrusData.ShowText( 'File import job adding file info row' )
+                if phashes is not None:
+                    
+                    if HG.file_import_report_mode:
+                        
+                        HydrusData.ShowText( 'File import job associating phashes' )
+                        
+                    
+                    self._PHashesAssociatePHashes( hash_id, phashes )
+                    
                 
-            
-            self._AddFilesInfo( [ ( hash_id, size, mime, width, height, duration, num_frames, has_audio, num_words ) ], overwrite = True )
-            
-            if HG.file_import_report_mode:
+                files_info_rows.append( ( hash_id, size, mime, width, height, duration, num_frames, has_audio, num_words ) )
                 
-                HydrusData.ShowText( 'File import job mapping file to local file service' )
+                local_file_rows.append( ( hash_id, timestamp ) )
                 
-            
-            self._AddFiles( self._local_file_service_id, [ ( hash_id, timestamp ) ] )
-            
-            file_info_manager = ClientMediaManagers.FileInfoManager( hash_id, hash, size, mime, width, height, duration, num_frames, has_audio, num_words )
-            
-            content_update = HydrusData.ContentUpdate( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_ADD, ( file_info_manager, timestamp ) )
-            
-            self.pub_content_updates_after_commit( { CC.LOCAL_FILE_SERVICE_KEY : [ content_update ] } )
-            
-            ( md5, sha1, sha512 ) = file_import_job.GetExtraHashes()
-            
-            self._c.execute( 'INSERT OR IGNORE INTO local_hashes ( hash_id, md5, sha1, sha512 ) VALUES ( ?, ?, ?, ? );', ( hash_id, sqlite3.Binary( md5 ), sqlite3.Binary( sha1 ), sqlite3.Binary( sha512 ) ) )
-            
-            file_modified_timestamp = file_import_job.GetFileModifiedTimestamp()
-            
-            self._c.execute( 'REPLACE INTO file_modified_timestamps ( hash_id, file_modified_timestamp ) VALUES ( ?, ? );', ( hash_id, file_modified_timestamp ) )
-            
-            file_import_options = file_import_job.GetFileImportOptions()
-            
-            if file_import_options.AutomaticallyArchives():
+                file_info_manager = ClientMediaManagers.FileInfoManager( hash_id, hash, size, mime, width, height, duration, num_frames, has_audio, num_words )
                 
-                if HG.file_import_report_mode:
+                content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_ADD, ( file_info_manager, timestamp ) ) )
+                
+                ( md5, sha1, sha512 ) = file_import_job.GetExtraHashes()
+                
+                self._c.execute( 'INSERT OR IGNORE INTO local_hashes ( hash_id, md5, sha1, sha512 ) VALUES ( ?, ?, ?, ? );', ( hash_id, sqlite3.Binary( md5 ), sqlite3.Binary( sha1 ), sqlite3.Binary( sha512 ) ) )
+                
+                file_modified_timestamp = file_import_job.GetFileModifiedTimestamp()
+                
+                self._c.execute( 'REPLACE INTO file_modified_timestamps ( hash_id, file_modified_timestamp ) VALUES ( ?, ? );', ( hash_id, file_modified_timestamp ) )
+                
+                file_import_options = file_import_job.GetFileImportOptions()
+                
+                if file_import_options.AutomaticallyArchives():
                     
-                    HydrusData.ShowText( 'File import job archiving new file' )
+                    archive_hash_ids.append( hash_id )
+                    
+                else:
+                    
+                    inbox_hash_ids.append( hash_id )
                     
                 
-                self._ArchiveFiles( ( hash_id, ) )
+                status = CC.STATUS_SUCCESSFUL_AND_NEW
                 
-            else:
-                
-                if HG.file_import_report_mode:
+                if self._weakref_media_result_cache.HasFile( hash_id ):
                     
-                    HydrusData.ShowText( 'File import job inboxing new file' )
+                    self._weakref_media_result_cache.DropMediaResult( hash_id, hash )
+                    
+                    new_file_info_hashes.add( hash )
                     
                 
-                self._InboxFiles( ( hash_id, ) )
+            
+            if HG.file_import_report_mode:
                 
+                HydrusData.ShowText( 'File import job done at db level, final status: {}, {}'.format( CC.status_string_lookup[ status ], note ) )
+                
+            
+            results.append( ( status, note ) )
+            
+        
+        if len( files_info_rows ) > 0:
+            
+            if HG.file_import_report_mode:
+                
+                HydrusData.ShowText( 'File import job adding {} file info rows and mapping them to the local file service'.format( HydrusData.ToHumanInt( len( files_info_rows ) ) ) )
+                
+            
+            self._AddFilesInfo( files_info_rows, overwrite = True )
             
-            status = CC.STATUS_SUCCESSFUL_AND_NEW
+            self._AddFiles( self._local_file_service_id, local_file_rows )
             
-            if self._weakref_media_result_cache.HasFile( hash_id ):
+            if len( archive_hash_ids ) > 0:
                 
-                self._weakref_media_result_cache.DropMediaResult( hash_id, hash )
+                self._ArchiveFiles( archive_hash_ids )
+                
+            
+            if len( inbox_hash_ids ) > 0:
                 
-                self._controller.pub( 'new_file_info', set( ( hash, ) ) )
+                self._InboxFiles( inbox_hash_ids )
                 
             
+            self.pub_content_updates_after_commit( { CC.LOCAL_FILE_SERVICE_KEY : content_updates } )
+            
         
-        if HG.file_import_report_mode:
+        if len( new_file_info_hashes ) > 0:
             
-            HydrusData.ShowText( 'File import job done at db level, final status: {}, {}'.format( CC.status_string_lookup[ status ], note ) )
+            self._controller.pub( 'new_file_info', new_file_info_hashes )
             
         
-        return ( status, note )
+        return results
         
     
     def _ImportUpdate( self, update_network_bytes, update_hash, mime ):
@@ -9184,6 +9630,64 @@ class DB( HydrusDB.HydrusDB ):
         self._c.execute( 'DROP TABLE {};'.format( database_temp_job_name ) )
         
     
+    def _MigrationConvertHashes( self, given_hashes, given_hash_type, desired_hash_type, file_service_key = CC.COMBINED_FILE_SERVICE_KEY ):
+        
+        # this does a whole batch in a couple of joins, rather than a lookup per hash
+        # it does not add new hashes to the master table, so hashes we have never seen are simply dropped
+        
+        given_hashes = [ given_hash for given_hash in given_hashes if given_hash is not None ]
+        
+        if given_hash_type == 'sha256':
+            
+            select_statement = 'SELECT given_hash, hash_id FROM {} CROSS JOIN hashes ON ( hashes.hash = {}.given_hash )'
+            
+        else:
+            
+            select_statement = 'SELECT given_hash, hash_id FROM {} CROSS JOIN local_hashes ON ( local_hashes.' + given_hash_type + ' = {}.given_hash )'
+            
+        
+        with HydrusDB.TemporaryBlobTable( self._c, given_hashes, 'given_hash' ) as temp_table_name:
+            
+            self._AnalyzeTempTable( temp_table_name )
+            
+            if file_service_key == CC.COMBINED_FILE_SERVICE_KEY:
+                
+                hash_ids_to_given_hashes = { hash_id : given_hash for ( given_hash, hash_id ) in self._c.execute( select_statement.format( temp_table_name, temp_table_name ) + ';' ) }
+                
+            else:
+                
+                file_service_id = self._GetServiceId( file_service_key )
+                
+                select_statement += ' CROSS JOIN current_files USING ( hash_id ) WHERE service_id = ?;'
+                
+                hash_ids_to_given_hashes = { hash_id : given_hash for ( given_hash, hash_id ) in self._c.execute( select_statement.format( temp_table_name, temp_table_name ), ( file_service_id, ) ) }
+                
+            
+        
+        if given_hash_type == desired_hash_type:
+            
+            return { given_hash : given_hash for given_hash in hash_ids_to_given_hashes.values() }
+            
+        
+        if desired_hash_type == 'sha256':
+            
+            hash_ids_to_desired_hashes = self._GetHashIdsToHashes( hash_ids = hash_ids_to_given_hashes.keys() )
+            
+        else:
+            
+            with HydrusDB.TemporaryIntegerTable( self._c, hash_ids_to_given_hashes.keys(), 'hash_id' ) as temp_table_name:
+                
+                self._AnalyzeTempTable( temp_table_name )
+                
+                hash_ids_to_desired_hashes = dict( self._c.execute( 'SELECT hash_id, ' + desired_hash_type + ' FROM {} CROSS JOIN local_hashes USING ( hash_id );'.format( temp_table_name ) ) )
+                
+            
+        
+        given_hashes_to_desired_hashes = { hash_ids_to_given_hashes[ hash_id ] : desired_hash for ( hash_id, desired_hash ) in hash_ids_to_desired_hashes.items() }
+        
+        return given_hashes_to_desired_hashes
+        
+    
     def _MigrationGetMappings( self, database_temp_job_name, file_service_key, tag_service_key, hash_type, tag_filter, content_statuses ):
         
         time_started_precise = HydrusData.GetNowPrecise()
@@ -11421,6 +11925,7 @@ class DB( HydrusDB.HydrusDB ):
         if action == 'autocomplete_predicates': result = self._GetAutocompletePredicates( *args, **kwargs )
         elif action == 'boned_stats': result = self._GetBonedStats( *args, **kwargs )
         elif action == 'client_files_locations': result = self._GetClientFilesLocations( *args, **kwargs )
+        elif action == 'client_files_prefix_fingerprints': result = self._GetClientFilesPrefixFingerprints( *args, **kwargs )
         elif action == 'duplicate_pairs_for_filtering': result = self._DuplicatesGetPotentialDuplicatePairsForFiltering( *args, **kwargs )
         elif action == 'file_duplicate_hashes': result = self._DuplicatesGetFileHashesByDuplicateType( *args, **kwargs )
         elif action == 'file_duplicate_info': result = self._DuplicatesGetFileDuplicateInfo( *args, **kwargs )
@@ -11447,6 +11952,7 @@ class DB( HydrusDB.HydrusDB ):
         elif action == 'media_result': result = self._GetMediaResultFromHash( *args, **kwargs )
         elif action == 'media_results': result = self._GetMediaResultsFromHashes( *args, **kwargs )
         elif action == 'media_results_from_ids': result = self._GetMediaResults( *args, **kwargs )
+        elif action == 'migration_convert_hashes': result = self._MigrationConvertHashes( *args, **kwargs )
         elif action == 'migration_get_mappings': result = self._MigrationGetMappings( *args, **kwargs )
         elif action == 'migration_get_pairs': result = self._MigrationGetPairs( *args, **kwargs )
         elif action == 'missing_repository_update_hashes': result = self._GetRepositoryUpdateHashesIDoNotHave( *args, **kwargs )
@@ -11454,6 +11960,7 @@ class DB( HydrusDB.HydrusDB ):
         elif action == 'nums_pending': result = self._GetNumsPending( *args, **kwargs )
         elif action == 'trash_hashes': result = self._GetTrashHashes( *args, **kwargs )
         elif action == 'options': result = self._GetOptions( *args, **kwargs )
+        elif action == 'orphan_hashes': result = self._GetOrphanHashes( *args, **kwargs )
         elif action == 'pending': result = self._GetPending( *args, **kwargs )
         elif action == 'random_potential_duplicate_hashes': result = self._DuplicatesGetRandomPotentialDuplicateHashes( *args, **kwargs )
         elif action == 'recent_tags': result = self._GetRecentTags( *args, **kwargs )
@@ -11471,6 +11978,7 @@ class DB( HydrusDB.HydrusDB ):
         elif action == 'service_info': result = self._GetServiceInfo( *args, **kwargs )
         elif action == 'services': result = self._GetServices( *args, **kwargs )
         elif action == 'similar_files_maintenance_status': result = self._PHashesGetMaintenanceStatus( *args, **kwargs )
+        elif action == 'sorted_hash_ids': result = self._SortHashIds( *args, **kwargs )
         elif action == 'related_tags': result = self._GetRelatedTags( *args, **kwargs )
         elif action == 'tag_parents': result = self._GetTagParents( *args, **kwargs )
         elif action == 'tag_siblings': result = self._GetTagSiblings( *args, **kwargs )
@@ -11481,6 +11989,15 @@ class DB( HydrusDB.HydrusDB ):
         return result
         
     
+    def _RegenerateTagCooccurrenceCache( self, service_key ):
+        
+        service_id = self._GetServiceId( service_key )
+        
+        self._CacheTagCooccurrenceDrop( service_id )
+        
+        self._CacheTagCooccurrenceGenerate( service_id )
+        
+    
     def _RegenerateTagMappingsCache( self ):
         
         job_key = ClientThreading.JobKey( cancellable = True )
@@ -11668,6 +12185,24 @@ class DB( HydrusDB.HydrusDB ):
         
         repository_service_ids = self._GetServiceIds( HC.REPOSITORIES )
         
+        # main
+        
+        existing_main_tables = self._STS( self._c.execute( 'SELECT name FROM main.sqlite_master WHERE type = ?;', ( 'table', ) ) )
+        
+        if 'json_dump_rows' not in existing_main_tables:
+            
+            # older dbs saved the network managers as single dumps. they'll move over to rows on their next save, so there is nothing to tell the user
+            
+            self._c.execute( 'CREATE TABLE IF NOT EXISTS main.json_dump_rows ( dump_type INTEGER, row_key TEXT, timestamp INTEGER, dump BLOB_BYTES, PRIMARY KEY ( dump_type, row_key ) );' )
+            
+        
+        if 'client_files_prefix_fingerprints' not in existing_main_tables:
+            
+            # this only lets the orphan scan skip folders it has seen before, so an empty one just means a full scan next time
+            
+            self._c.execute( 'CREATE TABLE IF NOT EXISTS main.client_files_prefix_fingerprints ( prefix TEXT PRIMARY KEY, location TEXT, mtime INTEGER, num_entries INTEGER, timestamp INTEGER );' )
+            
+        
         # master
         
         existing_master_tables = self._STS( self._c.execute( 'SELECT name FROM external_master.sqlite_master WHERE type = ?;', ( 'table', ) ) )
@@ -11812,6 +12347,18 @@ class DB( HydrusDB.HydrusDB ):
         
         main_cache_tables.add( 'integer_subtags' )
         
+        if 'tag_cooccurrence_cache_status' not in existing_cache_tables:
+            
+            # this only tracks the optional co-occurrence caches, so there is no need to bother the user about it
+            
+            self._c.execute( 'CREATE TABLE IF NOT EXISTS external_caches.tag_cooccurrence_cache_status ( service_id INTEGER PRIMARY KEY, hash_id_cursor INTEGER, complete INTEGER_BOOLEAN );' )
+            
+            for tag_service_id in tag_service_ids:
+                
+                self._c.execute( 'DROP TABLE IF EXISTS {};'.format( GenerateTagCooccurrenceCacheTableName( tag_service_id ) ) )
+                
+            
+        
         missing_main_tables = main_cache_tables.difference( existing_cache_tables )
         
         if len( missing_main_tables ) > 0:
@@ -12107,6 +12654,11 @@ class DB( HydrusDB.HydrusDB ):
         self._ScheduleRepositoryUpdateFileMaintenance( service_id, job_type )
         
     
+    def _SetClientFilesPrefixFingerprints( self, fingerprint_rows ):
+        
+        self._c.executemany( 'REPLACE INTO client_files_prefix_fingerprints ( prefix, location, mtime, num_entries, timestamp ) VALUES ( ?, ?, ?, ?, ? );', fingerprint_rows )
+        
+    
     def _SetIdealClientFilesLocations( self, locations_to_ideal_weights, ideal_thumbnail_override_location ):
         
         if len( locations_to_ideal_weights ) == 0:
@@ -12207,7 +12759,16 @@ class DB( HydrusDB.HydrusDB ):
             
         else:
             
-            ( dump_type, version, serialisable_info ) = obj.GetSerialisableTuple()
+            if isinstance( obj, HydrusSerialisable.SerialisableBaseWithRows ):
+                
+                ( ( dump_type, version, serialisable_info ), rows, deletee_row_keys ) = obj.GetSerialisableMainTupleAndDirtyRows()
+                
+                self._SetJSONDumpRows( dump_type, rows, deletee_row_keys )
+                
+            else:
+                
+                ( dump_type, version, serialisable_info ) = obj.GetSerialisableTuple()
+                
             
             try:
                 
@@ -12240,6 +12801,39 @@ class DB( HydrusDB.HydrusDB ):
             
         
     
+    def _SetJSONDumpRows( self, dump_type, rows, deletee_row_keys ):
+        
+        self._c.executemany( 'DELETE FROM json_dump_rows WHERE dump_type = ? AND row_key = ?;', ( ( dump_type, row_key ) for row_key in deletee_row_keys ) )
+        
+        if len( rows ) == 0:
+            
+            return
+            
+        
+        timestamp = HydrusData.GetNow()
+        
+        insert_rows = []
+        
+        for ( row_key, serialisable_row_info ) in rows:
+            
+            try:
+                
+                dump = json.dumps( serialisable_row_info )
+                
+            except Exception as e:
+                
+                HydrusData.ShowException( e )
+                HydrusData.Print( serialisable_row_info )
+                
+                raise Exception( 'Trying to json dump a row of a dump_type {} object caused an error. Its serialisable info has been dumped to the log.'.format( dump_type ) )
+                
+            
+            insert_rows.append( ( dump_type, row_key, timestamp, sqlite3.Binary( bytes( dump, 'utf-8' ) ) ) )
+            
+        
+        self._c.executemany( 'REPLACE INTO json_dump_rows ( dump_type, row_key, timestamp, dump ) VALUES ( ?, ?, ?, ? );', insert_rows )
+        
+    
     def _SetJSONSimple( self, name, value ):
         
         if value is None:
@@ -12353,6 +12947,13 @@ class DB( HydrusDB.HydrusDB ):
             
         
     
+    def _SortHashIds( self, file_service_key, hash_ids, sort_by ):
+        
+        file_service_id = self._GetServiceId( file_service_key )
+        
+        return self._TryToSortHashIds( file_service_id, hash_ids, sort_by )
+        
+    
     def _SubtagExists( self, subtag ):
         
         try:
@@ -14732,6 +15333,8 @@ class DB( HydrusDB.HydrusDB ):
         
         file_service_ids = self._GetServiceIds( HC.AUTOCOMPLETE_CACHE_SPECIFIC_FILE_SERVICES )
         
+        do_tag_cooccurrence = self._c.execute( 'SELECT 1 FROM tag_cooccurrence_cache_status WHERE service_id = ?;', ( tag_service_id, ) ).fetchone() is not None
+        
         change_in_num_mappings = 0
         change_in_num_deleted_mappings = 0
         change_in_num_pending_mappings = 0
@@ -14786,10 +15389,22 @@ class DB( HydrusDB.HydrusDB ):
                 
                 num_pending_deleted = self._GetRowCount()
                 
+                if do_tag_cooccurrence:
+                    
+                    select_statement = 'SELECT hash_id FROM ' + current_mappings_table_name + ' WHERE tag_id = ? AND hash_id = ?;'
+                    
+                    existing_current_hash_ids = self._STS( self._ExecuteManySelect( select_statement, ( ( tag_id, hash_id ) for hash_id in hash_ids ) ) )
+                    
+                
                 self._c.executemany( 'INSERT OR IGNORE INTO ' + current_mappings_table_name + ' VALUES ( ?, ? );', ( ( tag_id, hash_id ) for hash_id in hash_ids ) )
                 
                 num_current_inserted = self._GetRowCount()
                 
+                if do_tag_cooccurrence and num_current_inserted > 0:
+                    
+                    self._CacheTagCooccurrenceAddMappings( tag_service_id, tag_id, set( hash_ids ).difference( existing_current_hash_ids ) )
+                    
+                
                 change_in_num_deleted_mappings -= num_deleted_deleted
                 change_in_num_pending_mappings -= num_pending_deleted
                 change_in_num_mappings += num_current_inserted
@@ -14808,10 +15423,22 @@ class DB( HydrusDB.HydrusDB ):
             
             for ( tag_id, hash_ids ) in deleted_mappings_ids:
                 
+                if do_tag_cooccurrence:
+                    
+                    select_statement = 'SELECT hash_id FROM ' + current_mappings_table_name + ' WHERE tag_id = ? AND hash_id = ?;'
+                    
+                    existing_current_hash_ids = self._STS( self._ExecuteManySelect( select_statement, ( ( tag_id, hash_id ) for hash_id in hash_ids ) ) )
+                    
+                
                 self._c.executemany( 'DELETE FROM ' + current_mappings_table_name + ' WHERE tag_id = ? AND hash_id = ?;', ( ( tag_id, hash_id ) for hash_id in hash_ids ) )
                 
                 num_current_deleted = self._GetRowCount()
                 
+                if do_tag_cooccurrence and num_current_deleted > 0:
+                    
+                    self._CacheTagCooccurrenceDeleteMappings( tag_service_id, tag_id, existing_current_hash_ids )
+                    
+                
                 self._c.executemany( 'DELETE FROM ' + petitioned_mappings_table_name + ' WHERE tag_id = ? AND hash_id = ?;', ( ( tag_id, hash_id ) for hash_id in hash_ids ) )
                 
                 num_petitions_deleted = self._GetRowCount()
@@ -15255,6 +15882,7 @@ class DB( HydrusDB.HydrusDB ):
         elif action == 'clear_false_positive_relations_between_groups': self._DuplicatesClearFalsePositiveRelationsBetweenGroupsFromHashes( *args, **kwargs )
         elif action == 'clear_orphan_file_records': self._ClearOrphanFileRecords( *args, **kwargs )
         elif action == 'clear_orphan_tables': self._ClearOrphanTables( *args, **kwargs )
+        elif action == 'client_files_prefix_fingerprints': self._SetClientFilesPrefixFingerprints( *args, **kwargs )
         elif action == 'content_updates': self._ProcessContentUpdates( *args, **kwargs )
         elif action == 'cull_file_viewing_statistics': self._CullFileViewingStatistics( *args, **kwargs )
         elif action == 'db_integrity': self._CheckDBIntegrity( *args, **kwargs )
@@ -15263,6 +15891,7 @@ class DB( HydrusDB.HydrusDB ):
         elif action == 'delete_pending': self._DeletePending( *args, **kwargs )
         elif action == 'delete_serialisable_named': self._DeleteJSONDumpNamed( *args, **kwargs )
         elif action == 'delete_service_info': self._DeleteServiceInfo( *args, **kwargs )
+        elif action == 'delete_tag_cooccurrence_cache': self._DeleteTagCooccurrenceCache( *args, **kwargs )
         elif action == 'delete_potential_duplicate_pairs': self._DuplicatesDeleteAllPotentialDuplicatePairs( *args, **kwargs )
         elif action == 'dirty_services': self._SaveDirtyServices( *args, **kwargs )
         elif action == 'dissolve_alternates_group': self._DuplicatesDissolveAlternatesGroupIdFromHashes( *args, **kwargs )
@@ -15276,11 +15905,13 @@ class DB( HydrusDB.HydrusDB ):
         elif action == 'imageboard': self._SetYAMLDump( YAML_DUMP_ID_IMAGEBOARD, *args, **kwargs )
         elif action == 'ideal_client_files_locations': self._SetIdealClientFilesLocations( *args, **kwargs )
         elif action == 'import_file': result = self._ImportFile( *args, **kwargs )
+        elif action == 'import_files': result = self._ImportFiles( *args, **kwargs )
         elif action == 'import_update': self._ImportUpdate( *args, **kwargs )
         elif action == 'last_shutdown_work_time': self._SetLastShutdownWorkTime( *args, **kwargs )
         elif action == 'local_booru_share': self._SetYAMLDump( YAML_DUMP_ID_LOCAL_BOORU, *args, **kwargs )
         elif action == 'maintain_similar_files_search_for_potential_duplicates': self._PHashesSearchForPotentialDuplicates( *args, **kwargs )
         elif action == 'maintain_similar_files_tree': self._PHashesMaintainTree( *args, **kwargs )
+        elif action == 'maintain_tag_cooccurrence_cache': self._CacheTagCooccurrenceMaintain( *args, **kwargs )
         elif action == 'migration_clear_job': self._MigrationClearJob( *args, **kwargs )
         elif action == 'migration_start_mappings_job': self._MigrationStartMappingsJob( *args, **kwargs )
         elif action == 'migration_start_pairs_job': self._MigrationStartPairsJob( *args, **kwargs )
@@ -15288,6 +15919,7 @@ class DB( HydrusDB.HydrusDB ):
         elif action == 'process_repository_definitions': result = self._ProcessRepositoryDefinitions( *args, **kwargs )
         elif action == 'push_recent_tags': self._PushRecentTags( *args, **kwargs )
         elif action == 'regenerate_similar_files': self._PHashesRegenerateTree( *args, **kwargs )
+        elif action == 'regenerate_tag_cooccurrence_cache': self._RegenerateTagCooccurrenceCache( *args, **kwargs )
         elif action == 'regenerate_tag_mappings_cache': self._RegenerateTagMappingsCache( *args, **kwargs )
         elif action == 'regenerate_tag_siblings_cache': self._RegenerateTagSiblingsCache( *args, **kwargs )
         elif action == 'repopulate_tag_search_cache': self._RepopulateAndUpdateTagSearchCache( *args, **kwargs )
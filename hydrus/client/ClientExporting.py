@@ -10,7 +10,9 @@ from hydrus.core import HydrusSerialisable
 from hydrus.core import HydrusTags
 from hydrus.core import HydrusThreading
 import os
+import queue
 import re
+import threading
 
 MAX_PATH_LENGTH = 240 # bit of padding from 255 for .txt neigbouring and other surprises
 
@@ -251,7 +253,7 @@ class ExportFolder( HydrusSerialisable.SerialisableBaseNamed ):
     
     SERIALISABLE_TYPE = HydrusSerialisable.SERIALISABLE_TYPE_EXPORT_FOLDER
     SERIALISABLE_NAME = 'Export Folder'
-    SERIALISABLE_VERSION = 4
+    SERIALISABLE_VERSION = 5
     
     def __init__( self, name, path = '', export_type = HC.EXPORT_FOLDER_TYPE_REGULAR, delete_from_client_after_export = False, file_search_context = None, run_regularly = True, period = 3600, phrase = None, last_checked = 0, paused = False, run_now = False ):
         
@@ -283,17 +285,24 @@ class ExportFolder( HydrusSerialisable.SerialisableBaseNamed ):
         self._paused = paused and not run_now
         self._run_now = run_now
         
+        # filename (relative to the export path) -> ( hash, size, modified_timestamp ) of what we last wrote
+        # it is only valid for the path it was made for
+        self._manifest_path = None
+        self._manifest = {}
+        
     
     def _GetSerialisableInfo( self ):
         
         serialisable_file_search_context = self._file_search_context.GetSerialisableTuple()
         
-        return ( self._path, self._export_type, self._delete_from_client_after_export, serialisable_file_search_context, self._run_regularly, self._period, self._phrase, self._last_checked, self._paused, self._run_now )
+        serialisable_manifest = [ ( filename, hash.hex(), size, modified_timestamp ) for ( filename, ( hash, size, modified_timestamp ) ) in self._manifest.items() ]
+        
+        return ( self._path, self._export_type, self._delete_from_client_after_export, serialisable_file_search_context, self._run_regularly, self._period, self._phrase, self._last_checked, self._paused, self._run_now, self._manifest_path, serialisable_manifest )
         
     
     def _InitialiseFromSerialisableInfo( self, serialisable_info ):
         
-        ( self._path, self._export_type, self._delete_from_client_after_export, serialisable_file_search_context, self._run_regularly, self._period, self._phrase, self._last_checked, self._paused, self._run_now ) = serialisable_info
+        ( self._path, self._export_type, self._delete_from_client_after_export, serialisable_file_search_context, self._run_regularly, self._period, self._phrase, self._last_checked, self._paused, self._run_now, self._manifest_path, serialisable_manifest ) = serialisable_info
         
         if self._export_type == HC.EXPORT_FOLDER_TYPE_SYNCHRONISE:
             
@@ -302,6 +311,8 @@ class ExportFolder( HydrusSerialisable.SerialisableBaseNamed ):
         
         self._file_search_context = HydrusSerialisable.CreateFromSerialisableTuple( serialisable_file_search_context )
         
+        self._manifest = { filename : ( bytes.fromhex( encoded_hash ), size, modified_timestamp ) for ( filename, encoded_hash, size, modified_timestamp ) in serialisable_manifest }
+        
     
     def _UpdateSerialisableInfo( self, version, old_serialisable_info ):
         
@@ -340,6 +351,145 @@ class ExportFolder( HydrusSerialisable.SerialisableBaseNamed ):
             return ( 4, new_serialisable_info )
             
         
+        if version == 4:
+            
+            ( path, export_type, delete_from_client_after_export, serialisable_file_search_context, run_regularly, period, phrase, last_checked, paused, run_now ) = old_serialisable_info
+            
+            manifest_path = None
+            serialisable_manifest = []
+            
+            new_serialisable_info = ( path, export_type, delete_from_client_after_export, serialisable_file_search_context, run_regularly, period, phrase, last_checked, paused, run_now, manifest_path, serialisable_manifest )
+            
+            return ( 5, new_serialisable_info )
+            
+        
+    
+    def _CopyFiles( self, copy_jobs ):
+        
+        filenames_to_manifest_rows = {}
+        
+        if len( copy_jobs ) == 0:
+            
+            return filenames_to_manifest_rows
+            
+        
+        jobs_queue = queue.Queue()
+        
+        for copy_job in copy_jobs:
+            
+            jobs_queue.put( copy_job )
+            
+        
+        lock = threading.Lock()
+        
+        # an error in a worker would only kill that thread, so we catch it here and raise it once they are all done
+        errors = []
+        
+        def do_it():
+            
+            while not ( HC.options[ 'pause_export_folders_sync' ] or HG.model_shutdown ):
+                
+                with lock:
+                    
+                    if len( errors ) > 0:
+                        
+                        return
+                        
+                    
+                
+                try:
+                    
+                    ( filename, hash, source_path, dest_path ) = jobs_queue.get_nowait()
+                    
+                except queue.Empty:
+                    
+                    return
+                    
+                
+                try:
+                    
+                    HydrusPaths.MakeSureDirectoryExists( os.path.dirname( dest_path ) )
+                    
+                    copied = HydrusPaths.MirrorFile( source_path, dest_path )
+                    
+                    if copied:
+                        
+                        HydrusPaths.MakeFileWritable( dest_path )
+                        
+                        stat_result = os.stat( dest_path )
+                        
+                        with lock:
+                            
+                            filenames_to_manifest_rows[ filename ] = ( hash, stat_result.st_size, int( stat_result.st_mtime ) )
+                            
+                        
+                    
+                except Exception as e:
+                    
+                    with lock:
+                        
+                        errors.append( e )
+                        
+                    
+                    return
+                    
+                
+            
+        
+        num_threads = min( HG.client_controller.new_options.GetInteger( 'export_folder_copy_threads' ), len( copy_jobs ) )
+        
+        threads = [ threading.Thread( target = do_it, name = 'export folder copy', daemon = True ) for i in range( num_threads ) ]
+        
+        for thread in threads:
+            
+            thread.start()
+            
+        
+        for thread in threads:
+            
+            thread.join()
+            
+        
+        if len( errors ) > 0:
+            
+            raise errors[0]
+            
+        
+        return filenames_to_manifest_rows
+        
+    
+    def _DeleteEmptyDirs( self, dirs_to_check ):
+        
+        # only folders we just deleted from (or walked, on a fresh run) can have become empty, so no need to walk the whole export
+        
+        num_dirs_deleted = 0
+        
+        dirs_to_check = set( dirs_to_check )
+        
+        while len( dirs_to_check ) > 0:
+            
+            # deepest first, so a parent is checked after its children
+            dir_to_check = max( dirs_to_check, key = len )
+            
+            dirs_to_check.discard( dir_to_check )
+            
+            if os.path.normpath( dir_to_check ) == os.path.normpath( self._path ) or not os.path.isdir( dir_to_check ):
+                
+                continue
+                
+            
+            if len( os.listdir( dir_to_check ) ) == 0:
+                
+                HydrusPaths.DeletePath( dir_to_check )
+                
+                num_dirs_deleted += 1
+                
+                dirs_to_check.add( os.path.dirname( dir_to_check ) )
+                
+            
+        
+        return num_dirs_deleted
+        
     
     def _DoExport( self ):
         
@@ -374,18 +524,37 @@ class ExportFolder( HydrusSerialisable.SerialisableBaseNamed ):
         
         terms = ParseExportPhrase( self._phrase )
         
-        previous_paths = set()
+        manifest_is_valid = self._manifest_path == self._path
         
-        for ( root, dirnames, filenames ) in os.walk( self._path ):
+        previous_dirs = set()
+        
+        if manifest_is_valid:
             
-            previous_paths.update( ( os.path.join( root, filename ) for filename in filenames ) )
+            manifest = self._manifest
+            
+            previous_filenames = set( manifest.keys() )
+            
+        else:
+            
+            # first run, or the path has changed, so we do not know what is in there. we have to look
+            
+            manifest = {}
+            
+            previous_filenames = set()
+            
+            for ( root, dirnames, filenames ) in os.walk( self._path ):
+                
+                previous_dirs.add( root )
+                
+                previous_filenames.update( ( os.path.relpath( os.path.join( root, filename ), self._path ) for filename in filenames ) )
+                
             
-        
-        sync_paths = set()
         
         client_files_manager = HG.client_controller.client_files_manager
         
-        num_copied = 0
+        sync_filenames = set()
+        new_manifest = {}
+        copy_jobs = []
         
         for media_result in media_results:
             
@@ -396,9 +565,6 @@ class ExportFolder( HydrusSerialisable.SerialisableBaseNamed ):
             
             hash = media_result.GetHash()
             mime = media_result.GetMime()
-            size = media_result.GetSize()
-            
-            source_path = client_files_manager.GetFilePath( hash, mime )
             
             filename = GenerateExportFilename( self._path, media_result, terms )
             
@@ -409,25 +575,62 @@ class ExportFolder( HydrusSerialisable.SerialisableBaseNamed ):
                 raise Exception( 'It seems a destination path for export folder "{}" was above the main export directory! The file was "{}" and its destination path was "{}".'.format( self._path, hash.hex(), dest_path ) )
                 
             
-            dest_path_dir = os.path.dirname( dest_path )
+            filename = os.path.relpath( dest_path, self._path )
             
-            HydrusPaths.MakeSureDirectoryExists( dest_path_dir )
+            if filename in sync_filenames:
+                
+                continue
+                
             
-            if dest_path not in sync_paths:
+            sync_filenames.add( filename )
+            
+            if filename in manifest:
                 
-                copied = HydrusPaths.MirrorFile( source_path, dest_path )
+                ( manifest_hash, manifest_size, manifest_modified_timestamp ) = manifest[ filename ]
                 
-                if copied:
-                    
-                    num_copied += 1
+                if manifest_hash == hash:
                     
-                    HydrusPaths.MakeFileWritable( dest_path )
+                    try:
+                        
+                        stat_result = os.stat( dest_path )
+                        
+                        if stat_result.st_size == manifest_size and int( stat_result.st_mtime ) == manifest_modified_timestamp:
+                            
+                            new_manifest[ filename ] = manifest[ filename ]
+                            
+                            continue
+                            
+                        
+                    except OSError:
+                        
+                        pass
+                        
                     
                 
             
-            sync_paths.add( dest_path )
+            source_path = client_files_manager.GetFilePath( hash, mime )
+            
+            copy_jobs.append( ( filename, hash, source_path, dest_path ) )
+            
+        
+        filenames_to_manifest_rows = self._CopyFiles( copy_jobs )
+        
+        new_manifest.update( filenames_to_manifest_rows )
+        
+        if len( filenames_to_manifest_rows ) < len( copy_jobs ) and ( HC.options[ 'pause_export_folders_sync' ] or HydrusThreading.IsThreadShuttingDown() ):
+            
+            # we were interrupted. remember what we did and pick up the rest next time
+            
+            if manifest_is_valid:
+                
+                self._manifest.update( filenames_to_manifest_rows )
+                
+            
+            return
             
         
+        num_copied = len( filenames_to_manifest_rows )
+        
         if num_copied > 0:
             
             HydrusData.Print( 'Export folder ' + self._name + ' exported ' + HydrusData.ToHumanInt( num_copied ) + ' files.' )
@@ -435,48 +638,28 @@ class ExportFolder( HydrusSerialisable.SerialisableBaseNamed ):
         
         if self._export_type == HC.EXPORT_FOLDER_TYPE_SYNCHRONISE:
             
-            deletee_paths = previous_paths.difference( sync_paths )
+            deletee_filenames = previous_filenames.difference( sync_filenames )
+            
+            deletee_paths = [ os.path.join( self._path, filename ) for filename in deletee_filenames ]
             
             for deletee_path in deletee_paths:
                 
                 ClientPaths.DeletePath( deletee_path )
                 
             
-            deletee_dirs = set()
+            dirs_to_check = previous_dirs.union( ( os.path.dirname( deletee_path ) for deletee_path in deletee_paths ) )
             
-            for ( root, dirnames, filenames ) in os.walk( self._path, topdown = False ):
-                
-                if root == self._path:
-                    
-                    continue
-                    
-                
-                no_files = len( filenames ) == 0
-                
-                useful_dirnames = [ dirname for dirname in dirnames if os.path.join( root, dirname ) not in deletee_dirs ]
-                
-                no_useful_dirs = len( useful_dirnames ) == 0
-                
-                if no_useful_dirs and no_files:
-                    
-                    deletee_dirs.add( root )
-                    
-                
-            
-            for deletee_dir in deletee_dirs:
-                
-                if os.path.exists( deletee_dir ):
-                    
-                    HydrusPaths.DeletePath( deletee_dir )
-                    
-                
+            num_dirs_deleted = self._DeleteEmptyDirs( dirs_to_check )
             
             if len( deletee_paths ) > 0:
                 
-                HydrusData.Print( 'Export folder {} deleted {} files and {} folders.'.format( self._name, HydrusData.ToHumanInt( len( deletee_paths ) ), HydrusData.ToHumanInt( len( deletee_dirs ) ) ) )
+                HydrusData.Print( 'Export folder {} deleted {} files and {} folders.'.format( self._name, HydrusData.ToHumanInt( len( deletee_paths ) ), HydrusData.ToHumanInt( num_dirs_deleted ) ) )
                 
             
         
+        self._manifest_path = self._path
+        self._manifest = new_manifest
+        
         if self._delete_from_client_after_export:
             
             deletee_hashes = { media_result.GetHash() for media_result in media_results }
@@ -541,12 +724,23 @@ class ExportFolder( HydrusSerialisable.SerialisableBaseNamed ):
             
         
     
+    def GetManifest( self ):
+        
+        return ( self._manifest_path, dict( self._manifest ) )
+        
+    
     def RunNow( self ):
         
         self._paused = False
         self._run_now = True
         
     
+    def SetManifest( self, manifest_path, manifest ):
+        
+        self._manifest_path = manifest_path
+        self._manifest = dict( manifest )
+        
+    
     def ToTuple( self ):
         
         return ( self._name, self._path, self._export_type, self._delete_from_client_after_export, self._file_search_context, self._run_regularly, self._period, self._phrase, self._last_checked, self._paused, self._run_now )
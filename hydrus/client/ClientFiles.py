@@ -14,6 +14,7 @@ from hydrus.core import HydrusNetworking
 from hydrus.core import HydrusPaths
 from hydrus.core import HydrusThreading
 import os
+import queue
 import random
 import threading
 import time
@@ -88,6 +89,28 @@ regen_file_enum_to_job_weight_lookup[ REGENERATE_FILE_DATA_JOB_CHECK_SIMILAR_FIL
 regen_file_enum_to_job_weight_lookup[ REGENERATE_FILE_DATA_JOB_SIMILAR_FILES_METADATA ] = 100
 regen_file_enum_to_job_weight_lookup[ REGENERATE_FILE_DATA_JOB_FILE_MODIFIED_TIMESTAMP ] = 10
 
+# how many files of each job can be worked on at once. the heavy stuff is file reading, hashing, image decoding or ffmpeg, which all drop the GIL or happen in a subprocess, so threads are fine
+# jobs that mostly talk to the db get one, since the db does them one at a time anyway
+
+regen_file_enum_to_max_threads_lookup = {}
+
+regen_file_enum_to_max_threads_lookup[ REGENERATE_FILE_DATA_JOB_FILE_METADATA ] = 4
+regen_file_enum_to_max_threads_lookup[ REGENERATE_FILE_DATA_JOB_FORCE_THUMBNAIL ] = 4
+regen_file_enum_to_max_threads_lookup[ REGENERATE_FILE_DATA_JOB_REFIT_THUMBNAIL ] = 4
+regen_file_enum_to_max_threads_lookup[ REGENERATE_FILE_DATA_JOB_OTHER_HASHES ] = 4
+regen_file_enum_to_max_threads_lookup[ REGENERATE_FILE_DATA_JOB_DELETE_NEIGHBOUR_DUPES ] = 1
+regen_file_enum_to_max_threads_lookup[ REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE ] = 8
+regen_file_enum_to_max_threads_lookup[ REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_URL ] = 8
+regen_file_enum_to_max_threads_lookup[ REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA ] = 4
+regen_file_enum_to_max_threads_lookup[ REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_URL ] = 4
+regen_file_enum_to_max_threads_lookup[ REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_SILENT_DELETE ] = 4
+regen_file_enum_to_max_threads_lookup[ REGENERATE_FILE_DATA_JOB_FIX_PERMISSIONS ] = 8
+regen_file_enum_to_max_threads_lookup[ REGENERATE_FILE_DATA_JOB_CHECK_SIMILAR_FILES_MEMBERSHIP ] = 1
+regen_file_enum_to_max_threads_lookup[ REGENERATE_FILE_DATA_JOB_SIMILAR_FILES_METADATA ] = 4
+regen_file_enum_to_max_threads_lookup[ REGENERATE_FILE_DATA_JOB_FILE_MODIFIED_TIMESTAMP ] = 8
+
+regen_file_integrity_job_types = { REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_URL, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_URL, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_SILENT_DELETE }
+
 regen_file_enum_to_overruled_jobs = {}
 
 regen_file_enum_to_overruled_jobs[ REGENERATE_FILE_DATA_JOB_FILE_METADATA ] = []
@@ -107,6 +130,10 @@ regen_file_enum_to_overruled_jobs[ REGENERATE_FILE_DATA_JOB_FILE_MODIFIED_TIMEST
 
 ALL_REGEN_JOBS_IN_PREFERRED_ORDER = [ REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_URL, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_URL, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_SILENT_DELETE, REGENERATE_FILE_DATA_JOB_FILE_METADATA, REGENERATE_FILE_DATA_JOB_REFIT_THUMBNAIL, REGENERATE_FILE_DATA_JOB_FORCE_THUMBNAIL, REGENERATE_FILE_DATA_JOB_SIMILAR_FILES_METADATA, REGENERATE_FILE_DATA_JOB_CHECK_SIMILAR_FILES_MEMBERSHIP, REGENERATE_FILE_DATA_JOB_FIX_PERMISSIONS, REGENERATE_FILE_DATA_JOB_FILE_MODIFIED_TIMESTAMP, REGENERATE_FILE_DATA_JOB_OTHER_HASHES, REGENERATE_FILE_DATA_JOB_DELETE_NEIGHBOUR_DUPES ]
 
+ORPHAN_SCAN_BATCH_SIZE = 1000
+ORPHAN_SCAN_NUM_THREADS = 4
+ORPHAN_SCAN_FINGERPRINT_PERIOD = 30 * 86400
+
 def GetAllFilePaths( raw_paths, do_human_sort = True ):
     
     file_paths = []
@@ -527,42 +554,6 @@ class ClientFilesManager( object ):
         return None
         
     
-    def _IterateAllFilePaths( self ):
-        
-        for ( prefix, location ) in list(self._prefixes_to_locations.items()):
-            
-            if prefix.startswith( 'f' ):
-                
-                dir = os.path.join( location, prefix )
-                
-                filenames = os.listdir( dir )
-                
-                for filename in filenames:
-                    
-                    yield os.path.join( dir, filename )
-                    
-                
-            
-        
-    
-    def _IterateAllThumbnailPaths( self ):
-        
-        for ( prefix, location ) in list(self._prefixes_to_locations.items()):
-            
-            if prefix.startswith( 't' ):
-                
-                dir = os.path.join( location, prefix )
-                
-                filenames = os.listdir( dir )
-                
-                for filename in filenames:
-                    
-                    yield os.path.join( dir, filename )
-                    
-                
-            
-        
-    
     def _LookForFilePath( self, hash ):
         
         for potential_mime in HC.ALLOWED_MIMES:
@@ -707,6 +698,238 @@ class ClientFilesManager( object ):
             
         
     
+    def _ScanForOrphans( self, job_key, test_type ):
+        
+        # a few prefix directories at once, each streamed through _ScanPrefixForOrphans
+        
+        if test_type == 'file':
+            
+            prefix_type = 'f'
+            description = 'file'
+            
+        else:
+            
+            prefix_type = 't'
+            description = 'thumbnail'
+            
+        
+        prefixes_to_fingerprints = self._controller.Read( 'client_files_prefix_fingerprints' )
+        
+        prefixes_and_locations = [ ( prefix, location ) for ( prefix, location ) in self._prefixes_to_locations.items() if prefix.startswith( prefix_type ) ]
+        
+        prefixes_and_locations.sort()
+        
+        num_to_do = len( prefixes_and_locations )
+        
+        jobs_queue = queue.Queue()
+        
+        for prefix_and_location in prefixes_and_locations:
+            
+            jobs_queue.put( prefix_and_location )
+            
+        
+        lock = threading.Lock()
+        
+        orphan_paths = []
+        fingerprint_rows = []
+        worker_exceptions = []
+        
+        progress = {}
+        
+        progress[ 'num_done' ] = 0
+        progress[ 'num_skipped' ] = 0
+        
+        def do_it():
+            
+            while True:
+                
+                ( i_paused, should_quit ) = job_key.WaitIfNeeded()
+                
+                if should_quit or len( worker_exceptions ) > 0:
+                    
+                    return
+                    
+                
+                try:
+                    
+                    ( prefix, location ) = jobs_queue.get_nowait()
+                    
+                except queue.Empty:
+                    
+                    return
+                    
+                
+                try:
+                    
+                    result = self._ScanPrefixForOrphans( job_key, test_type, prefix, location, prefixes_to_fingerprints.get( prefix, None ) )
+                    
+                except Exception as e:
+                    
+                    worker_exceptions.append( e )
+                    
+                    return
+                    
+                
+                if result is None:
+                    
+                    return
+                    
+                
+                ( prefix_orphan_paths, fingerprint_row, was_skipped ) = result
+                
+                with lock:
+                    
+                    orphan_paths.extend( prefix_orphan_paths )
+                    
+                    if fingerprint_row is not None:
+                        
+                        fingerprint_rows.append( fingerprint_row )
+                        
+                    
+                    progress[ 'num_done' ] += 1
+                    
+                    if was_skipped:
+                        
+                        progress[ 'num_skipped' ] += 1
+                        
+                    
+                    status = 'reviewed {} {} folders ({} unchanged), found {} orphans'.format( HydrusData.ConvertValueRangeToPrettyString( progress[ 'num_done' ], num_to_do ), description, HydrusData.ToHumanInt( progress[ 'num_skipped' ] ), HydrusData.ToHumanInt( len( orphan_paths ) ) )
+                    
+                    job_key.SetVariable( 'popup_text_1', status )
+                    
+                
+            
+        
+        num_threads = min( ORPHAN_SCAN_NUM_THREADS, num_to_do )
+        
+        threads = [ threading.Thread( target = do_it, name = 'orphan scan', daemon = True ) for i in range( num_threads ) ]
+        
+        for thread in threads:
+            
+            thread.start()
+            
+        
+        for thread in threads:
+            
+            thread.join()
+            
+        
+        if len( worker_exceptions ) > 0:
+            
+            raise worker_exceptions[0]
+            
+        
+        if len( fingerprint_rows ) > 0:
+            
+            self._controller.Write( 'client_files_prefix_fingerprints', fingerprint_rows )
+            
+        
+        orphan_paths.sort()
+        
+        return orphan_paths
+        
+    
+    def _ScanPrefixForOrphans( self, job_key, test_type, prefix, location, old_fingerprint ):
+        
+        # returns ( orphan_paths, fingerprint_row, was_skipped ), or None if cancelled
+        # the fingerprint is the directory's mtime and entry count. we only record it for a clean directory, and trust it for a while, so a folder nobody has touched since is not checked against the db again
+        
+        dir = os.path.join( location, prefix )
+        
+        # stat before we list, so anything that changes while we work shows up as a different mtime next time
+        mtime = os.stat( dir ).st_mtime_ns
+        
+        if old_fingerprint is not None:
+            
+            ( old_location, old_mtime, old_num_entries, old_timestamp ) = old_fingerprint
+            
+            if old_location == location and old_mtime == mtime and not HydrusData.TimeHasPassed( old_timestamp + ORPHAN_SCAN_FINGERPRINT_PERIOD ):
+                
+                with os.scandir( dir ) as scan:
+                    
+                    num_entries = sum( 1 for entry in scan )
+                    
+                
+                if num_entries == old_num_entries:
+                    
+                    return ( [], None, True )
+                    
+                
+            
+        
+        orphan_paths = []
+        num_entries = 0
+        
+        hashes_to_paths = collections.defaultdict( list )
+        
+        def check_batch():
+            
+            orphan_hashes = self._controller.Read( 'orphan_hashes', test_type, list( hashes_to_paths.keys() ) )
+            
+            for orphan_hash in orphan_hashes:
+                
+                orphan_paths.extend( hashes_to_paths[ orphan_hash ] )
+                
+            
+            hashes_to_paths.clear()
+            
+        
+        with os.scandir( dir ) as scan:
+            
+            for entry in scan:
+                
+                num_entries += 1
+                
+                # DirEntry carries the file type from the listing, so no extra stat here
+                if not entry.is_file():
+                    
+                    continue
+                    
+                
+                try:
+                    
+                    hash = bytes.fromhex( entry.name[:64] )
+                    
+                except ValueError:
+                    
+                    orphan_paths.append( entry.path )
+                    
+                    continue
+                    
+                
+                # a hash can have more than one file here, e.g. a leftover from an ext change
+                hashes_to_paths[ hash ].append( entry.path )
+                
+                if len( hashes_to_paths ) >= ORPHAN_SCAN_BATCH_SIZE:
+                    
+                    if job_key.IsCancelled():
+                        
+                        return None
+                        
+                    
+                    check_batch()
+                    
+                
+            
+        
+        if len( hashes_to_paths ) > 0:
+            
+            check_batch()
+            
+        
+        if len( orphan_paths ) == 0:
+            
+            fingerprint_row = ( prefix, location, mtime, num_entries, HydrusData.GetNow() )
+            
+        else:
+            
+            # we are about to move or delete them, so this dir will look different next time anyway
+            fingerprint_row = None
+            
+        
+        return ( orphan_paths, fingerprint_row, False )
+        
+    
     def _WaitOnWakeup( self ):
         
         if HG.client_controller.new_options.GetBoolean( 'file_system_waits_on_wakeup' ):
@@ -791,100 +1014,36 @@ class ClientFilesManager( object ):
             
             self._controller.pub( 'message', job_key )
             
-            orphan_paths = []
-            orphan_thumbnails = []
+            orphan_paths = self._ScanForOrphans( job_key, 'file' )
             
-            for ( i, path ) in enumerate( self._IterateAllFilePaths() ):
-                
-                ( i_paused, should_quit ) = job_key.WaitIfNeeded()
+            if job_key.IsCancelled():
                 
-                if should_quit:
-                    
-                    return
-                    
+                return
                 
-                if i % 100 == 0:
-                    
-                    status = 'reviewed ' + HydrusData.ToHumanInt( i ) + ' files, found ' + HydrusData.ToHumanInt( len( orphan_paths ) ) + ' orphans'
-                    
-                    job_key.SetVariable( 'popup_text_1', status )
-                    
+            
+            if move_location is not None:
                 
-                try:
-                    
-                    is_an_orphan = False
-                    
-                    ( directory, filename ) = os.path.split( path )
+                for path in orphan_paths:
                     
-                    should_be_a_hex_hash = filename[:64]
+                    ( source_dir, filename ) = os.path.split( path )
                     
-                    hash = bytes.fromhex( should_be_a_hex_hash )
+                    dest = os.path.join( move_location, filename )
                     
-                    is_an_orphan = HG.client_controller.Read( 'is_an_orphan', 'file', hash )
+                    dest = HydrusPaths.AppendPathUntilNoConflicts( dest )
                     
-                except:
+                    HydrusData.Print( 'Moving the orphan ' + path + ' to ' + dest )
                     
-                    is_an_orphan = True
-                    
-                
-                if is_an_orphan:
-                    
-                    if move_location is not None:
-                        
-                        ( source_dir, filename ) = os.path.split( path )
-                        
-                        dest = os.path.join( move_location, filename )
-                        
-                        dest = HydrusPaths.AppendPathUntilNoConflicts( dest )
-                        
-                        HydrusData.Print( 'Moving the orphan ' + path + ' to ' + dest )
-                        
-                        HydrusPaths.MergeFile( path, dest )
-                        
-                    
-                    orphan_paths.append( path )
+                    HydrusPaths.MergeFile( path, dest )
                     
                 
             
             time.sleep( 2 )
             
-            for ( i, path ) in enumerate( self._IterateAllThumbnailPaths() ):
-                
-                ( i_paused, should_quit ) = job_key.WaitIfNeeded()
-                
-                if should_quit:
-                    
-                    return
-                    
-                
-                if i % 100 == 0:
-                    
-                    status = 'reviewed ' + HydrusData.ToHumanInt( i ) + ' thumbnails, found ' + HydrusData.ToHumanInt( len( orphan_thumbnails ) ) + ' orphans'
-                    
-                    job_key.SetVariable( 'popup_text_1', status )
-                    
-                
-                try:
-                    
-                    is_an_orphan = False
-                    
-                    ( directory, filename ) = os.path.split( path )
-                    
-                    should_be_a_hex_hash = filename[:64]
-                    
-                    hash = bytes.fromhex( should_be_a_hex_hash )
-                    
-                    is_an_orphan = HG.client_controller.Read( 'is_an_orphan', 'thumbnail', hash )
-                    
-                except:
-                    
-                    is_an_orphan = True
-                    
+            orphan_thumbnails = self._ScanForOrphans( job_key, 'thumbnail' )
+            
+            if job_key.IsCancelled():
                 
-                if is_an_orphan:
-                    
-                    orphan_thumbnails.append( path )
-                    
+                return
                 
             
             time.sleep( 2 )
@@ -897,7 +1056,7 @@ class ClientFilesManager( object ):
                 
                 time.sleep( 5 )
                 
-                for path in orphan_paths:
+                for ( i, path ) in enumerate( orphan_paths ):
                     
                     ( i_paused, should_quit ) = job_key.WaitIfNeeded()
                     
@@ -1336,6 +1495,10 @@ class FilesMaintenanceManager( object ):
         self._maintenance_lock = threading.Lock()
         self._lock = threading.Lock()
         
+        # background workers check in and out of each file under the lock, so an immediate job can hold the lock and wait here for them to clear
+        self._num_background_files_in_progress = 0
+        self._background_files_done_condition = threading.Condition( self._lock )
+        
         self._wake_background_event = threading.Event()
         self._reset_background_event = threading.Event()
         self._shutdown = False
@@ -1753,128 +1916,205 @@ class FilesMaintenanceManager( object ):
         self._active_work_rules.AddRule( HC.BANDWIDTH_TYPE_REQUESTS, file_maintenance_active_throttle_time_delta, file_maintenance_active_throttle_files * NORMALISED_BIG_JOB_WEIGHT )
         
     
-    def _RunJob( self, media_results, job_type, job_key ):
+    def _RunJob( self, media_results, job_type, job_key, wait_to_work = None ):
         
-        num_bad_files = 0
-        num_thumb_refits = 0
+        # wait_to_work is called before each file is started. it blocks until the throttle allows more work, returns False if we should stop early, and raises ShutdownException on shutdown
+        # only background work passes it, and those files are checked in and out under the lock so they never overlap an immediate job
         
-        next_gc_collect = HydrusData.GetNow() + 10
+        num_to_do = len( media_results )
         
-        try:
+        if num_to_do == 0:
             
-            cleared_jobs = []
+            return
             
-            num_to_do = len( media_results )
+        
+        if HG.file_report_mode:
             
-            if HG.file_report_mode:
-                
-                HydrusData.ShowText( 'file maintenance: {} for {} files'.format( regen_file_enum_to_str_lookup[ job_type ], HydrusData.ToHumanInt( num_to_do ) ) )
-                
+            HydrusData.ShowText( 'file maintenance: {} for {} files'.format( regen_file_enum_to_str_lookup[ job_type ], HydrusData.ToHumanInt( num_to_do ) ) )
             
-            for ( i, media_result ) in enumerate( media_results ):
-                
-                hash = media_result.GetHash()
+        
+        media_results_to_do = collections.deque( media_results )
+        
+        start_lock = threading.Lock()
+        results_lock = threading.Lock()
+        
+        stop_event = threading.Event()
+        
+        progress = {}
+        
+        progress[ 'num_done' ] = 0
+        progress[ 'num_bad_files' ] = 0
+        progress[ 'num_thumb_refits' ] = 0
+        progress[ 'time_last_saved' ] = HydrusData.GetNow()
+        
+        # the db job queue is our progress record--a job is only cleared once its file is done, so anything interrupted is picked up again next time
+        cleared_jobs = []
+        
+        worker_exceptions = []
+        
+        def do_it():
+            
+            while True:
                 
-                if job_key.IsCancelled():
+                with start_lock:
                     
-                    return
+                    if stop_event.is_set() or job_key.IsCancelled() or len( media_results_to_do ) == 0:
+                        
+                        return
+                        
+                    
+                    if wait_to_work is not None and not wait_to_work():
+                        
+                        stop_event.set()
+                        
+                        return
+                        
+                    
+                    media_result = media_results_to_do.popleft()
+                    
+                    # we book the work as we start it, so several threads can't all sneak under the throttle at once
+                    self._work_tracker.ReportRequestUsed( num_requests = regen_file_enum_to_job_weight_lookup[ job_type ] )
                     
                 
-                status_text = '{}: {}'.format( regen_file_enum_to_str_lookup[ job_type ], HydrusData.ConvertValueRangeToPrettyString( i + 1, num_to_do ) )
-                
-                job_key.SetVariable( 'popup_text_1', status_text )
-                job_key.SetVariable( 'popup_gauge_1', ( i + 1, num_to_do ) )
+                hash = media_result.GetHash()
                 
                 additional_data = None
+                file_was_bad = False
+                thumb_was_regenerated = False
                 
-                try:
+                if wait_to_work is not None:
                     
-                    if job_type == REGENERATE_FILE_DATA_JOB_FILE_METADATA:
-                        
-                        additional_data = self._RegenFileMetadata( media_result )
-                        
-                    elif job_type == REGENERATE_FILE_DATA_JOB_FILE_MODIFIED_TIMESTAMP:
-                        
-                        additional_data = self._RegenFileModifiedTimestamp( media_result )
-                        
-                    elif job_type == REGENERATE_FILE_DATA_JOB_OTHER_HASHES:
-                        
-                        additional_data = self._RegenFileOtherHashes( media_result )
-                        
-                    elif job_type == REGENERATE_FILE_DATA_JOB_FORCE_THUMBNAIL:
-                        
-                        self._RegenFileThumbnailForce( media_result )
+                    with self._lock:
                         
-                    elif job_type == REGENERATE_FILE_DATA_JOB_REFIT_THUMBNAIL:
+                        self._num_background_files_in_progress += 1
                         
-                        was_regenerated = self._RegenFileThumbnailRefit( media_result )
+                    
+                
+                try:
+                    
+                    ( additional_data, file_was_bad, thumb_was_regenerated ) = self._RunJobOnFile( media_result, job_type )
+                    
+                except Exception as e:
+                    
+                    HydrusData.PrintException( e )
+                    
+                    message = 'There was a problem performing maintenance task {} on file {}! The job will not be reattempted. A full traceback of this error should be written to the log.'.format( regen_file_enum_to_str_lookup[ job_type ], hash.hex() )
+                    message += os.linesep * 2
+                    message += str( e )
+                    
+                    HydrusData.ShowText( message )
+                    
+                finally:
+                    
+                    if wait_to_work is not None:
                         
-                        if was_regenerated:
+                        with self._lock:
                             
-                            num_thumb_refits += 1
+                            self._num_background_files_in_progress -= 1
+                            
+                            self._background_files_done_condition.notify_all()
                             
                         
-                        job_key.SetVariable( 'popup_text_2', 'thumbs needing regen: {}'.format( HydrusData.ToHumanInt( num_thumb_refits ) ) )
-                        
-                    elif job_type == REGENERATE_FILE_DATA_JOB_DELETE_NEIGHBOUR_DUPES:
-                        
-                        self._DeleteNeighbourDupes( media_result )
-                        
-                    elif job_type == REGENERATE_FILE_DATA_JOB_CHECK_SIMILAR_FILES_MEMBERSHIP:
-                        
-                        additional_data = self._CheckSimilarFilesMembership( media_result )
-                        
-                    elif job_type == REGENERATE_FILE_DATA_JOB_SIMILAR_FILES_METADATA:
-                        
-                        additional_data = self._RegenSimilarFilesMetadata( media_result )
-                        
-                    elif job_type == REGENERATE_FILE_DATA_JOB_FIX_PERMISSIONS:
+                    
+                
+                cleared_jobs_to_save = []
+                
+                with results_lock:
+                    
+                    progress[ 'num_done' ] += 1
+                    
+                    num_done = progress[ 'num_done' ]
+                    
+                    status_text = '{}: {}'.format( regen_file_enum_to_str_lookup[ job_type ], HydrusData.ConvertValueRangeToPrettyString( num_done, num_to_do ) )
+                    
+                    job_key.SetVariable( 'popup_text_1', status_text )
+                    job_key.SetVariable( 'popup_gauge_1', ( num_done, num_to_do ) )
+                    
+                    if job_type == REGENERATE_FILE_DATA_JOB_REFIT_THUMBNAIL:
                         
-                        self._FixFilePermissions( media_result )
+                        if thumb_was_regenerated:
+                            
+                            progress[ 'num_thumb_refits' ] += 1
+                            
                         
-                    elif job_type in ( REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_URL, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_URL, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_SILENT_DELETE ):
+                        job_key.SetVariable( 'popup_text_2', 'thumbs needing regen: {}'.format( HydrusData.ToHumanInt( progress[ 'num_thumb_refits' ] ) ) )
                         
-                        file_was_bad = self._CheckFileIntegrity( media_result, job_type )
+                    elif job_type in regen_file_integrity_job_types:
                         
                         if file_was_bad:
                             
-                            num_bad_files += 1
+                            progress[ 'num_bad_files' ] += 1
                             
                         
-                        job_key.SetVariable( 'popup_text_2', 'missing or invalid files: {}'.format( HydrusData.ToHumanInt( num_bad_files ) ) )
+                        job_key.SetVariable( 'popup_text_2', 'missing or invalid files: {}'.format( HydrusData.ToHumanInt( progress[ 'num_bad_files' ] ) ) )
                         
                     
-                except Exception as e:
+                    cleared_jobs.append( ( hash, job_type, additional_data ) )
                     
-                    HydrusData.PrintException( e )
+                    if len( cleared_jobs ) >= 100 or HydrusData.TimeHasPassed( progress[ 'time_last_saved' ] + 10 ):
+                        
+                        cleared_jobs_to_save = list( cleared_jobs )
+                        
+                        del cleared_jobs[:]
+                        
+                        progress[ 'time_last_saved' ] = HydrusData.GetNow()
+                        
                     
-                    message = 'There was a problem performing maintenance task {} on file {}! The job will not be reattempted. A full traceback of this error should be written to the log.'.format( regen_file_enum_to_str_lookup[ job_type ], hash.hex() )
-                    message += os.linesep * 2
-                    message += str( e )
+                    self._jobs_since_last_gc_collect += 1
                     
-                    HydrusData.ShowText( message )
+                    if self._jobs_since_last_gc_collect > 100:
+                        
+                        gc.collect()
+                        
+                        self._jobs_since_last_gc_collect = 0
+                        
                     
-                finally:
+                
+                if len( cleared_jobs_to_save ) > 0:
                     
-                    self._work_tracker.ReportRequestUsed( num_requests = regen_file_enum_to_job_weight_lookup[ job_type ] )
+                    self._controller.WriteSynchronous( 'file_maintenance_clear_jobs', cleared_jobs_to_save )
                     
-                    cleared_jobs.append( ( hash, job_type, additional_data ) )
+                    self._controller.pub( 'notify_files_maintenance_done' )
                     
                 
-                self._jobs_since_last_gc_collect += 1
+            
+        
+        def work():
+            
+            try:
                 
-                if self._jobs_since_last_gc_collect > 100:
-                    
-                    gc.collect()
+                do_it()
+                
+            except Exception as e:
+                
+                # shutdown, or something broke outside of a single file's job. stop everyone and pass it up to the caller
+                
+                worker_exceptions.append( e )
+                
+                stop_event.set()
+                
+            
+        
+        try:
+            
+            num_threads = min( regen_file_enum_to_max_threads_lookup[ job_type ], self._controller.new_options.GetInteger( 'file_maintenance_threads' ), num_to_do )
+            
+            if num_threads <= 1:
+                
+                work()
+                
+            else:
+                
+                threads = [ threading.Thread( target = work, name = 'file maintenance', daemon = True ) for i in range( num_threads ) ]
+                
+                for thread in threads:
                     
-                    self._jobs_since_last_gc_collect = 0
+                    thread.start()
                     
                 
-                if len( cleared_jobs ) > 100:
-                    
-                    self._controller.WriteSynchronous( 'file_maintenance_clear_jobs', cleared_jobs )
+                for thread in threads:
                     
-                    cleared_jobs = []
+                    thread.join()
                     
                 
             
@@ -1882,10 +2122,75 @@ class FilesMaintenanceManager( object ):
             
             if len( cleared_jobs ) > 0:
                 
-                self._controller.Write( 'file_maintenance_clear_jobs', cleared_jobs )
+                self._controller.WriteSynchronous( 'file_maintenance_clear_jobs', cleared_jobs )
                 
             
         
+        if len( worker_exceptions ) > 0:
+            
+            raise worker_exceptions[0]
+            
+        
+    
+    def _RunJobOnFile( self, media_result, job_type ):
+        
+        additional_data = None
+        file_was_bad = False
+        thumb_was_regenerated = False
+        
+        if job_type == REGENERATE_FILE_DATA_JOB_FILE_METADATA:
+            
+            additional_data = self._RegenFileMetadata( media_result )
+            
+        elif job_type == REGENERATE_FILE_DATA_JOB_FILE_MODIFIED_TIMESTAMP:
+            
+            additional_data = self._RegenFileModifiedTimestamp( media_result )
+            
+        elif job_type == REGENERATE_FILE_DATA_JOB_OTHER_HASHES:
+            
+            additional_data = self._RegenFileOtherHashes( media_result )
+            
+        elif job_type == REGENERATE_FILE_DATA_JOB_FORCE_THUMBNAIL:
+            
+            self._RegenFileThumbnailForce( media_result )
+            
+        elif job_type == REGENERATE_FILE_DATA_JOB_REFIT_THUMBNAIL:
+            
+            thumb_was_regenerated = self._RegenFileThumbnailRefit( media_result )
+            
+        elif job_type == REGENERATE_FILE_DATA_JOB_DELETE_NEIGHBOUR_DUPES:
+            
+            self._DeleteNeighbourDupes( media_result )
+            
+        elif job_type == REGENERATE_FILE_DATA_JOB_CHECK_SIMILAR_FILES_MEMBERSHIP:
+            
+            additional_data = self._CheckSimilarFilesMembership( media_result )
+            
+        elif job_type == REGENERATE_FILE_DATA_JOB_SIMILAR_FILES_METADATA:
+            
+            additional_data = self._RegenSimilarFilesMetadata( media_result )
+            
+        elif job_type == REGENERATE_FILE_DATA_JOB_FIX_PERMISSIONS:
+            
+            self._FixFilePermissions( media_result )
+            
+        elif job_type in regen_file_integrity_job_types:
+            
+            file_was_bad = self._CheckFileIntegrity( media_result, job_type )
+            
+        
+        return ( additional_data, file_was_bad, thumb_was_regenerated )
+        
+    
+    def _WaitOnBackgroundFiles( self ):
+        
+        # call this holding the lock. the reset event should already be set, so the background workers will not start anything new
+        
+        while self._num_background_files_in_progress > 0:
+            
+            self._background_files_done_condition.wait()
+            
+        
     
     def CancelJobs( self, job_type ):
         
@@ -1957,6 +2262,8 @@ class FilesMaintenanceManager( object ):
                     
                     with self._lock:
                         
+                        self._WaitOnBackgroundFiles()
+                        
                         self._RunJob( media_results, job_type, job_key )
                         
                     
@@ -2022,6 +2329,13 @@ class FilesMaintenanceManager( object ):
                 
             
         
+        def wait_to_work():
+            
+            wait_on_maintenance()
+            
+            return not should_reset()
+            
+        
         try:
             
             time_to_start = HydrusData.GetNow() + 15
@@ -2049,8 +2363,6 @@ class FilesMaintenanceManager( object ):
                         
                         job_key = ClientThreading.JobKey()
                         
-                        i = 0
-                        
                         try:
                             
                             ( hashes, job_type ) = job
@@ -2063,29 +2375,8 @@ class FilesMaintenanceManager( object ):
                             
                             self._ClearJobs( missing_hashes, job_type )
                             
-                            for media_result in media_results:
-                                
-                                wait_on_maintenance()
-                                
-                                if should_reset():
-                                    
-                                    break
-                                    
-                                
-                                with self._lock:
-                                    
-                                    self._RunJob( ( media_result, ), job_type, job_key )
-                                    
-                                
-                                time.sleep( 0.0001 )
-                                
-                                i += 1
-                                
-                                if i % 100 == 0:
-                                    
-                                    self._controller.pub( 'notify_files_maintenance_done' )
-                                    
-                                
+                            # the workers check the throttle and the reset flag before every file, so a RunJobImmediately or ForceMaintenance only waits on the files already in progress
+                            self._RunJob( media_results, job_type, job_key, wait_to_work = wait_to_work )
                             
                         finally:
                             
@@ -2135,6 +2426,8 @@ class FilesMaintenanceManager( object ):
             
             try:
                 
+                self._WaitOnBackgroundFiles()
+                
                 self._RunJob( media_results, job_type, job_key )
                 
             finally:
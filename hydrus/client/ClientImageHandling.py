@@ -23,11 +23,11 @@ def DiscardBlankPerceptualHashes( phashes ):
     
     return phashes
     
-def GenerateNumPyImage( path, mime ):
+def GenerateNumPyImage( path, mime, target_resolution = None ):
     
     force_pil = HG.client_controller.new_options.GetBoolean( 'load_images_with_pil' )
     
-    return HydrusImageHandling.GenerateNumPyImage( path, mime, force_pil = force_pil )
+    return HydrusImageHandling.GenerateNumPyImage( path, mime, force_pil = force_pil, target_resolution = target_resolution )
     
 def GenerateShapePerceptualHashes( path, mime ):
     
@@ -189,6 +189,73 @@ def GenerateShapePerceptualHashes( path, mime ):
     
     return phashes
     
+def GenerateHalfSizeNumPyImage( numpy_image ):
+    
+    # a level of a mip pyramid, so zoomed out views can resample from something close to the size they want
+    
+    ( image_height, image_width, depth ) = numpy_image.shape
+    
+    target_resolution = ( max( 1, image_width // 2 ), max( 1, image_height // 2 ) )
+    
+    return cv2.resize( numpy_image, target_resolution, interpolation = cv2.INTER_AREA )
+    
+def ResizeNumPyImageClipForMediaViewer( mime, numpy_image, clip, target_resolution ):
+    
+    # render just one region of the resized image. every pixel is sampled where a resize of the whole image would sample it, so neighbouring tiles line up
+    
+    ( clip_x, clip_y, clip_width, clip_height ) = clip
+    ( target_width, target_height ) = target_resolution
+    
+    ( image_height, image_width, depth ) = numpy_image.shape
+    
+    x_scale = target_width / clip_width
+    y_scale = target_height / clip_height
+    
+    if x_scale == 1.0 and y_scale == 1.0 and clip_x == int( clip_x ) and clip_y == int( clip_y ):
+        
+        ( clip_x, clip_y ) = ( int( clip_x ), int( clip_y ) )
+        
+        return numpy_image[ clip_y : clip_y + target_height, clip_x : clip_x + target_width ].copy()
+        
+    
+    new_options = HG.client_controller.new_options
+    
+    ( scale_up_quality, scale_down_quality ) = new_options.GetMediaZoomQuality( mime )
+    
+    if x_scale > 1.0 or y_scale > 1.0:
+        
+        interpolation = cv_interpolation_enum_lookup[ scale_up_quality ]
+        
+    else:
+        
+        interpolation = cv_interpolation_enum_lookup[ scale_down_quality ]
+        
+    
+    if interpolation == cv2.INTER_AREA:
+        
+        # warpAffine can't do area. the mip pyramid keeps us within a factor of two of the source, so linear is fine
+        interpolation = cv2.INTER_LINEAR
+        
+    
+    # we only need the source under the clip, plus a margin for the interpolation kernel to see its neighbours
+    margin = 4
+    
+    crop_x = max( 0, int( clip_x ) - margin )
+    crop_y = max( 0, int( clip_y ) - margin )
+    
+    crop_right = min( image_width, int( clip_x + clip_width ) + 1 + margin )
+    crop_bottom = min( image_height, int( clip_y + clip_height ) + 1 + margin )
+    
+    crop = numpy_image[ crop_y : crop_bottom, crop_x : crop_right ]
+    
+    # cv2.resize puts pixel centres at ( src + 0.5 ) * scale - 0.5, so we do the same, shifted to our clip
+    x_offset = ( crop_x - clip_x + 0.5 ) * x_scale - 0.5
+    y_offset = ( crop_y - clip_y + 0.5 ) * y_scale - 0.5
+    
+    transform = numpy.array( [ [ x_scale, 0.0, x_offset ], [ 0.0, y_scale, y_offset ] ] )
+    
+    return cv2.warpAffine( crop, transform, ( target_width, target_height ), flags = interpolation, borderMode = cv2.BORDER_REPLICATE )
+    
 def ResizeNumPyImageForMediaViewer( mime, numpy_image, target_resolution ):
     
     ( target_width, target_height ) = target_resolution
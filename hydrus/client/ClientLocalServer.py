@@ -74,6 +74,7 @@ class HydrusServiceClientAPI( HydrusClientService ):
         get_files.putChild( b'search_files', ClientLocalServerResources.HydrusResourceClientAPIRestrictedGetFilesSearchFiles( self._service, self._client_requests_domain ) )
         get_files.putChild( b'file_metadata', ClientLocalServerResources.HydrusResourceClientAPIRestrictedGetFilesFileMetadata( self._service, self._client_requests_domain ) )
         get_files.putChild( b'file', ClientLocalServerResources.HydrusResourceClientAPIRestrictedGetFilesGetFile( self._service, self._client_requests_domain ) )
+        get_files.putChild( b'files_archive', ClientLocalServerResources.HydrusResourceClientAPIRestrictedGetFilesGetFilesArchive( self._service, self._client_requests_domain ) )
         get_files.putChild( b'thumbnail', ClientLocalServerResources.HydrusResourceClientAPIRestrictedGetFilesGetThumbnail( self._service, self._client_requests_domain ) )
         
         manage_cookies = NoResource()
@@ -83,6 +84,12 @@ class HydrusServiceClientAPI( HydrusClientService ):
         manage_cookies.putChild( b'get_cookies', ClientLocalServerResources.HydrusResourceClientAPIRestrictedManageCookiesGetCookies( self._service, self._client_requests_domain ) )
         manage_cookies.putChild( b'set_cookies', ClientLocalServerResources.HydrusResourceClientAPIRestrictedManageCookiesSetCookies( self._service, self._client_requests_domain ) )
         
+        manage_database = NoResource()
+        
+        root.putChild( b'manage_database', manage_database )
+        
+        manage_database.putChild( b'get_db_job_statistics', ClientLocalServerResources.HydrusResourceClientAPIRestrictedManageDatabaseGetDBJobStatistics( self._service, self._client_requests_domain ) )
+        
         manage_pages = NoResource()
         
         root.putChild( b'manage_pages', manage_pages )
@@ -7,6 +7,7 @@ from hydrus.client.networking import ClientNetworkingContexts
 from hydrus.client.networking import ClientNetworkingDomain
 from hydrus.client import ClientSearch
 from hydrus.client import ClientTags
+from hydrus.core import HydrusArchiveStreams
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
 from hydrus.core import HydrusExceptions
@@ -29,12 +30,111 @@ LOCAL_BOORU_STRING_PARAMS = set()
 LOCAL_BOORU_JSON_PARAMS = set()
 LOCAL_BOORU_JSON_BYTE_LIST_PARAMS = set()
 
-CLIENT_API_INT_PARAMS = { 'file_id' }
-CLIENT_API_BYTE_PARAMS = { 'hash', 'destination_page_key', 'page_key', 'Hydrus-Client-API-Access-Key', 'Hydrus-Client-API-Session-Key' }
-CLIENT_API_STRING_PARAMS = { 'name', 'url', 'domain' }
-CLIENT_API_JSON_PARAMS = { 'basic_permissions', 'system_inbox', 'system_archive', 'tags', 'file_ids', 'only_return_identifiers', 'simple' }
+CLIENT_API_INT_PARAMS = { 'file_id', 'offset' }
+CLIENT_API_BYTE_PARAMS = { 'hash', 'start_hash', 'destination_page_key', 'page_key', 'Hydrus-Client-API-Access-Key', 'Hydrus-Client-API-Session-Key' }
+CLIENT_API_STRING_PARAMS = { 'name', 'url', 'domain', 'archive_type' }
+CLIENT_API_JSON_PARAMS = { 'basic_permissions', 'system_inbox', 'system_archive', 'tags', 'file_ids', 'only_return_identifiers', 'simple', 'include_metadata' }
 CLIENT_API_JSON_BYTE_LIST_PARAMS = { 'hashes' }
 
+def GenerateFileMetadataRow( media_result, service_keys_to_names ):
+    
+    services_manager = HG.client_controller.services_manager
+    
+    metadata_row = {}
+    
+    file_info_manager = media_result.GetFileInfoManager()
+    
+    metadata_row[ 'file_id' ] = file_info_manager.hash_id
+    metadata_row[ 'hash' ] = file_info_manager.hash.hex()
+    metadata_row[ 'size' ] = file_info_manager.size
+    metadata_row[ 'mime' ] = HC.mime_mimetype_string_lookup[ file_info_manager.mime ]
+    metadata_row[ 'ext' ] = HC.mime_ext_lookup[ file_info_manager.mime ]
+    metadata_row[ 'width' ] = file_info_manager.width
+    metadata_row[ 'height' ] = file_info_manager.height
+    metadata_row[ 'duration' ] = file_info_manager.duration
+    metadata_row[ 'num_frames' ] = file_info_manager.num_frames
+    metadata_row[ 'num_words' ] = file_info_manager.num_words
+    metadata_row[ 'has_audio' ] = file_info_manager.has_audio
+    
+    known_urls = list( media_result.GetLocationsManager().GetURLs() )
+    
+    known_urls.sort()
+    
+    metadata_row[ 'known_urls' ] = known_urls
+    
+    tags_manager = media_result.GetTagsManager()
+    
+    service_names_to_statuses_to_tags = {}
+    
+    service_keys_to_statuses_to_tags = tags_manager.GetServiceKeysToStatusesToTags( ClientTags.TAG_DISPLAY_STORAGE )
+    
+    for ( service_key, statuses_to_tags ) in service_keys_to_statuses_to_tags.items():
+        
+        if service_key not in service_keys_to_names:
+            
+            service_keys_to_names[ service_key ] = services_manager.GetName( service_key )
+            
+        
+        service_name = service_keys_to_names[ service_key ]
+        
+        service_names_to_statuses_to_tags[ service_name ] = { str( status ) : list( tags ) for ( status, tags ) in statuses_to_tags.items() }
+        
+    
+    metadata_row[ 'service_names_to_statuses_to_tags' ] = service_names_to_statuses_to_tags
+    
+    return metadata_row
+    
+def GenerateFilesArchiveMembers( hash_ids, include_metadata ):
+    
+    # this runs in the archive producer's thread, a bit at a time, so we only ever hold one chunk of media results
+    
+    service_keys_to_names = {}
+    
+    for group_of_hash_ids in HydrusData.SplitListIntoChunks( hash_ids, 256 ):
+        
+        media_results = HG.client_controller.Read( 'media_results_from_ids', group_of_hash_ids )
+        
+        hash_ids_to_media_results = { media_result.GetHashId() : media_result for media_result in media_results }
+        
+        for hash_id in group_of_hash_ids:
+            
+            if hash_id not in hash_ids_to_media_results:
+                
+                continue
+                
+            
+            media_result = hash_ids_to_media_results[ hash_id ]
+            
+            hash = media_result.GetHash()
+            mime = media_result.GetMime()
+            
+            try:
+                
+                path = HG.client_controller.client_files_manager.GetFilePath( hash, mime )
+                
+            except HydrusExceptions.FileMissingException:
+                
+                continue
+                
+            
+            filename = hash.hex() + HC.mime_ext_lookup[ mime ]
+            
+            size = os.path.getsize( path )
+            timestamp = os.path.getmtime( path )
+            
+            yield ( filename, size, timestamp, HydrusArchiveStreams.IterateFileChunks( path ) )
+            
+            if include_metadata:
+                
+                metadata_row = GenerateFileMetadataRow( media_result, service_keys_to_names )
+                
+                metadata_bytes = bytes( json.dumps( metadata_row ), 'utf-8' )
+                
+                yield ( filename + '.json', len( metadata_bytes ), timestamp, ( metadata_bytes, ) )
+                
+            
+        
+    
 def ParseLocalBooruGETArgs( requests_args ):
     
     args = HydrusNetworking.ParseTwistedRequestGETArgs( requests_args, LOCAL_BOORU_INT_PARAMS, LOCAL_BOORU_BYTE_PARAMS, LOCAL_BOORU_STRING_PARAMS, LOCAL_BOORU_JSON_PARAMS, LOCAL_BOORU_JSON_BYTE_LIST_PARAMS )
@@ -1389,6 +1489,108 @@ class HydrusResourceClientAPIRestrictedGetFilesGetFile( HydrusResourceClientAPIR
         return response_context
         
     
+class HydrusResourceClientAPIRestrictedGetFilesGetFilesArchive( HydrusResourceClientAPIRestrictedGetFiles ):
+    
+    def _threadDoGETJob( self, request ):
+        
+        archive_type = request.parsed_request_args.GetValue( 'archive_type', str, default_value = 'zip' )
+        include_metadata = request.parsed_request_args.GetValue( 'include_metadata', bool, default_value = False )
+        
+        if archive_type not in ( 'zip', 'tar' ):
+            
+            raise HydrusExceptions.BadRequestException( 'The archive_type has to be "zip" or "tar"!' )
+            
+        
+        try:
+            
+            if 'file_ids' in request.parsed_request_args:
+                
+                file_ids = request.parsed_request_args.GetValue( 'file_ids', list )
+                
+                request.client_api_permissions.CheckPermissionToSeeFiles( file_ids )
+                
+                hash_ids = file_ids
+                
+            elif 'hashes' in request.parsed_request_args:
+                
+                request.client_api_permissions.CheckCanSeeAllFiles()
+                
+                hashes = request.parsed_request_args.GetValue( 'hashes', list )
+                
+                hash_ids_to_hashes = HG.client_controller.Read( 'hash_ids_to_hashes', hashes = hashes )
+                
+                hashes_to_hash_ids = { hash : hash_id for ( hash_id, hash ) in hash_ids_to_hashes.items() }
+                
+                hash_ids = [ hashes_to_hash_ids[ hash ] for hash in hashes ]
+                
+            elif 'tags' in request.parsed_request_args:
+                
+                tag_search_context = ClientSearch.TagSearchContext( service_key = CC.COMBINED_TAG_SERVICE_KEY )
+                predicates = ParseClientAPISearchPredicates( request )
+                
+                file_search_context = ClientSearch.FileSearchContext( file_service_key = CC.LOCAL_FILE_SERVICE_KEY, tag_search_context = tag_search_context, predicates = predicates )
+                
+                # newest first, same as search_files
+                sort_by = ClientMedia.MediaSort( sort_type = ( 'system', CC.SORT_FILES_BY_IMPORT_TIME ), sort_asc = CC.SORT_DESC )
+                
+                hash_ids = HG.client_controller.Read( 'file_query_ids', file_search_context, sort_by = sort_by )
+                
+                request.client_api_permissions.SetLastSearchResults( hash_ids )
+                
+            else:
+                
+                raise HydrusExceptions.BadRequestException( 'Please include a file_ids, hashes or tags parameter!' )
+                
+            
+        except HydrusExceptions.DataMissing as e:
+            
+            raise HydrusExceptions.NotFoundException( 'One or more of those file identifiers was missing!' )
+            
+        
+        hash_ids = HydrusData.DedupeList( hash_ids )
+        
+        # resuming an interrupted download
+        
+        if 'start_hash' in request.parsed_request_args:
+            
+            start_hash = request.parsed_request_args.GetValue( 'start_hash', bytes )
+            
+            hash_ids_to_hashes = HG.client_controller.Read( 'hash_ids_to_hashes', hashes = ( start_hash, ) )
+            
+            ( start_hash_id, ) = hash_ids_to_hashes.keys()
+            
+            if start_hash_id not in hash_ids:
+                
+                raise HydrusExceptions.NotFoundException( 'That start_hash was not in the files to send!' )
+                
+            
+            hash_ids = hash_ids[ hash_ids.index( start_hash_id ) : ]
+            
+        
+        offset = request.parsed_request_args.GetValue( 'offset', int, default_value = 0 )
+        
+        hash_ids = hash_ids[ offset : ]
+        
+        members = GenerateFilesArchiveMembers( hash_ids, include_metadata )
+        
+        if archive_type == 'zip':
+            
+            body_generator = HydrusArchiveStreams.GenerateZipChunks( members )
+            mime = HC.APPLICATION_ZIP
+            filename = 'hydrus files.zip'
+            
+        else:
+            
+            body_generator = HydrusArchiveStreams.GenerateTarChunks( members )
+            mime = HC.APPLICATION_OCTET_STREAM
+            filename = 'hydrus files.tar'
+            
+        
+        response_context = HydrusServerResources.ResponseContext( 200, mime = mime, body_generator = body_generator, filename = filename )
+        
+        return response_context
+        
+    
 class HydrusResourceClientAPIRestrictedGetFilesFileMetadata( HydrusResourceClientAPIRestrictedGetFiles ):
     
     def _threadDoGETJob( self, request ):
@@ -1455,53 +1657,11 @@ class HydrusResourceClientAPIRestrictedGetFilesFileMetadata( HydrusResourceClien
             
         else:
             
-            services_manager = HG.client_controller.services_manager
-            
             service_keys_to_names = {}
             
             for media_result in media_results:
                 
-                metadata_row = {}
-                
-                file_info_manager = media_result.GetFileInfoManager()
-                
-                metadata_row[ 'file_id' ] = file_info_manager.hash_id
-                metadata_row[ 'hash' ] = file_info_manager.hash.hex()
-                metadata_row[ 'size' ] = file_info_manager.size
-                metadata_row[ 'mime' ] = HC.mime_mimetype_string_lookup[ file_info_manager.mime ]
-                metadata_row[ 'ext' ] = HC.mime_ext_lookup[ file_info_manager.mime ]
-                metadata_row[ 'width' ] = file_info_manager.width
-                metadata_row[ 'height' ] = file_info_manager.height
-                metadata_row[ 'duration' ] = file_info_manager.duration
-                metadata_row[ 'num_frames' ] = file_info_manager.num_frames
-                metadata_row[ 'num_words' ] = file_info_manager.num_words
-                metadata_row[ 'has_audio' ] = file_info_manager.has_audio
-                
-                known_urls = list( media_result.GetLocationsManager().GetURLs() )
-                
-                known_urls.sort()
-                
-                metadata_row[ 'known_urls' ] = known_urls
-                
-                tags_manager = media_result.GetTagsManager()
-                
-                service_names_to_statuses_to_tags = {}
-                
-                service_keys_to_statuses_to_tags = tags_manager.GetServiceKeysToStatusesToTags( ClientTags.TAG_DISPLAY_STORAGE )
-                
-                for ( service_key, statuses_to_tags ) in service_keys_to_statuses_to_tags.items():
-                    
-                    if service_key not in service_keys_to_names:
-                        
-                        service_keys_to_names[ service_key ] = services_manager.GetName( service_key )
-                        
-                    
-                    service_name = service_keys_to_names[ service_key ]
-                    
-                    service_names_to_statuses_to_tags[ service_name ] = { str( status ) : list( tags ) for ( status, tags ) in statuses_to_tags.items() }
-                    
-                
-                metadata_row[ 'service_names_to_statuses_to_tags' ] = service_names_to_statuses_to_tags
+                metadata_row = GenerateFileMetadataRow( media_result, service_keys_to_names )
                 
                 metadata.append( metadata_row )
                 
@@ -1692,6 +1852,28 @@ class HydrusResourceClientAPIRestrictedManageCookiesSetCookies( HydrusResourceCl
         return response_context
         
     
+class HydrusResourceClientAPIRestrictedManageDatabase( HydrusResourceClientAPIRestricted ):
+    
+    def _CheckAPIPermissions( self, request ):
+        
+        request.client_api_permissions.CheckPermission( ClientAPI.CLIENT_API_PERMISSION_MANAGE_DATABASE )
+        
+    
+class HydrusResourceClientAPIRestrictedManageDatabaseGetDBJobStatistics( HydrusResourceClientAPIRestrictedManageDatabase ):
+    
+    def _threadDoGETJob( self, request ):
+        
+        db_job_statistics = HG.client_controller.GetDBJobStatistics()
+        
+        body_dict = { 'db_job_statistics' : db_job_statistics }
+        
+        body = json.dumps( body_dict )
+        
+        response_context = HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_JSON, body = body )
+        
+        return response_context
+        
+    
 class HydrusResourceClientAPIRestrictedManagePages( HydrusResourceClientAPIRestricted ):
     
     def _CheckAPIPermissions( self, request ):
@@ -1,17 +1,22 @@
+import bisect
 import collections
+import numpy
 import typing
 
 from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientMediaManagers
+from hydrus.client import ClientSearch
 from hydrus.client import ClientTags
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusText
 import random
+import threading
 from hydrus.core import HydrusData
 from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusImageHandling
 from hydrus.core import HydrusSerialisable
+import weakref
 
 hashes_to_jpeg_quality = {}
 hashes_to_pixel_hashes = {}
@@ -495,6 +500,47 @@ def GetMediasTagCount( pool, tag_service_key, tag_display_type ):
     
     return ( current_tags_to_count, deleted_tags_to_count, pending_tags_to_count, petitioned_tags_to_count )
     
+def GetSortedIndices( sort_passes ):
+    
+    # sort_passes is a list of ( keys, reverse ), least significant first, just like several stable sorts in a row
+    
+    if len( sort_passes ) == 0:
+        
+        return []
+        
+    
+    if False not in ( isinstance( key, ( int, float ) ) for ( keys, reverse ) in sort_passes for key in keys ):
+        
+        # all numbers, so we can do it all in one lexsort, which is stable and reads its columns most significant last
+        
+        columns = []
+        
+        for ( keys, reverse ) in sort_passes:
+            
+            column = numpy.array( keys, dtype = numpy.float64 )
+            
+            if reverse:
+                
+                column = - column
+                
+            
+            columns.append( column )
+            
+        
+        return numpy.lexsort( columns ).tolist()
+        
+    
+    num_items = len( sort_passes[0][0] )
+    
+    indices = list( range( num_items ) )
+    
+    for ( keys, reverse ) in sort_passes:
+        
+        indices.sort( key = keys.__getitem__, reverse = reverse )
+        
+    
+    return indices
+    
 class MediaResult( object ):
     
     def __init__(
@@ -962,6 +1008,10 @@ class MediaList( object ):
         self._media_sort = MediaSort( ( 'system', CC.SORT_FILES_BY_FILESIZE ), CC.SORT_ASC )
         self._media_collect = MediaCollect()
         
+        # asking the tags and ratings managers is the slow part of a sort or collect, so we remember the answers until the media changes
+        self._sort_ids_to_medias_to_sort_keys = {}
+        self._collect_ids_to_hashes_to_collect_keys = {}
+        
         self._sorted_media = SortedList( [ self._GenerateMediaSingleton( media_result ) for media_result in media_results ] )
         self._selected_media = set()
         
@@ -983,8 +1033,26 @@ class MediaList( object ):
         namespaces_to_collect_by = list( media_collect.namespaces )
         ratings_to_collect_by = list( media_collect.rating_service_keys )
         
+        collect_id = ( tuple( namespaces_to_collect_by ), tuple( ratings_to_collect_by ) )
+        
+        if collect_id not in self._collect_ids_to_hashes_to_collect_keys:
+            
+            self._collect_ids_to_hashes_to_collect_keys = { collect_id : {} }
+            
+        
+        hashes_to_collect_keys = self._collect_ids_to_hashes_to_collect_keys[ collect_id ]
+        
         for media in medias:
             
+            hash = media.GetHash()
+            
+            if hash in hashes_to_collect_keys:
+                
+                keys_to_medias[ hashes_to_collect_keys[ hash ] ].append( media )
+                
+                continue
+                
+            
             if len( namespaces_to_collect_by ) > 0:
                 
                 namespace_key = media.GetTagsManager().GetNamespaceSlice( namespaces_to_collect_by, ClientTags.TAG_DISPLAY_SIBLINGS_AND_PARENTS )
@@ -1003,12 +1071,68 @@ class MediaList( object ):
                 rating_key = frozenset()
                 
             
-            keys_to_medias[ ( namespace_key, rating_key ) ].append( media )
+            collect_key = ( namespace_key, rating_key )
+            
+            hashes_to_collect_keys[ hash ] = collect_key
+            
+            keys_to_medias[ collect_key ].append( media )
+            
+        
+        if len( hashes_to_collect_keys ) > len( medias ):
+            
+            self._collect_ids_to_hashes_to_collect_keys[ collect_id ] = { media.GetHash() : hashes_to_collect_keys[ media.GetHash() ] for media in medias }
             
         
         return keys_to_medias
         
     
+    def _DirtySortAndCollectKeys( self, hashes = None ):
+        
+        if hashes is None:
+            
+            self._sort_ids_to_medias_to_sort_keys = {}
+            self._collect_ids_to_hashes_to_collect_keys = {}
+            
+            for media in self._collected_media:
+                
+                media._DirtySortAndCollectKeys()
+                
+            
+            return
+            
+        
+        for hashes_to_collect_keys in self._collect_ids_to_hashes_to_collect_keys.values():
+            
+            for hash in hashes:
+                
+                if hash in hashes_to_collect_keys:
+                    
+                    del hashes_to_collect_keys[ hash ]
+                    
+                
+            
+        
+        if len( self._sort_ids_to_medias_to_sort_keys ) > 0:
+            
+            hashes = set( hashes )
+            
+            cache_keys = set( hashes )
+            
+            cache_keys.update( self._GetMedia( hashes, discriminator = 'collections' ) )
+            
+            for medias_to_sort_keys in self._sort_ids_to_medias_to_sort_keys.values():
+                
+                for cache_key in cache_keys:
+                    
+                    if cache_key in medias_to_sort_keys:
+                        
+                        del medias_to_sort_keys[ cache_key ]
+                        
+                    
+                
+            
+        
+    
     def _GenerateMediaCollection( self, media_results ):
         
         return MediaCollection( self._file_service_key, media_results )
@@ -1100,6 +1224,77 @@ class MediaList( object ):
             
         
     
+    def _GetSortId( self, media_sort ):
+        
+        ( sort_metatype, sort_data ) = media_sort.sort_type
+        
+        if sort_metatype == 'system' and sort_data == CC.SORT_FILES_BY_RANDOM:
+            
+            return None
+            
+        
+        if sort_metatype == 'namespaces':
+            
+            sort_data = tuple( sort_data )
+            
+        
+        return ( sort_metatype, sort_data )
+        
+    
+    def _GetSortKeys( self, media_sort, medias ):
+        
+        ( sort_key, reverse ) = media_sort.GetSortKeyAndReverse( self._file_service_key )
+        
+        sort_id = self._GetSortId( media_sort )
+        
+        if sort_id is None:
+            
+            return ( [ sort_key( media ) for media in medias ], reverse )
+            
+        
+        if sort_id not in self._sort_ids_to_medias_to_sort_keys:
+            
+            self._sort_ids_to_medias_to_sort_keys[ sort_id ] = {}
+            
+        
+        medias_to_sort_keys = self._sort_ids_to_medias_to_sort_keys[ sort_id ]
+        
+        keys = []
+        
+        for media in medias:
+            
+            cache_key = self._GetSortKeysCacheKey( media )
+            
+            if cache_key in medias_to_sort_keys:
+                
+                key = medias_to_sort_keys[ cache_key ]
+                
+            else:
+                
+                key = sort_key( media )
+                
+                medias_to_sort_keys[ cache_key ] = key
+                
+            
+            keys.append( key )
+            
+        
+        return ( keys, reverse )
+        
+    
+    def _GetSortKeysCacheKey( self, media ):
+        
+        # singletons get regenerated on every collect, so we remember them by hash
+        
+        if media.IsCollection():
+            
+            return media
+            
+        else:
+            
+            return media.GetHash()
+            
+        
     def _HasHashes( self, hashes ):
         
         for hash in hashes:
@@ -1263,6 +1458,8 @@ class MediaList( object ):
     
     def DeletePending( self, service_key ):
         
+        self._DirtySortAndCollectKeys()
+        
         for media in self._collected_media:
             
             media.DeletePending( service_key )
@@ -1729,9 +1926,38 @@ class MediaList( object ):
     
     def ProcessContentUpdates( self, service_keys_to_content_updates ):
         
-        for m in self._collected_media:
+        # collections only hear about their own files. an update with no hashes (e.g. advanced mappings) could affect anyone
+        
+        if len( self._collected_media ) > 0:
+            
+            collections_to_service_keys_to_content_updates = collections.defaultdict( lambda: collections.defaultdict( list ) )
+            
+            for ( service_key, content_updates ) in service_keys_to_content_updates.items():
+                
+                for content_update in content_updates:
+                    
+                    hashes = content_update.GetHashes()
+                    
+                    if len( hashes ) == 0:
+                        
+                        affected_collections = self._collected_media
+                        
+                    else:
+                        
+                        affected_collections = { self._hashes_to_collected_media[ hash ] for hash in hashes if hash in self._hashes_to_collected_media }
+                        
+                    
+                    for m in affected_collections:
+                        
+                        collections_to_service_keys_to_content_updates[ m ][ service_key ].append( content_update )
+                        
+                    
+                
             
-            m.ProcessContentUpdates( service_keys_to_content_updates )
+            for ( m, collection_service_keys_to_content_updates ) in collections_to_service_keys_to_content_updates.items():
+                
+                m.ProcessContentUpdates( dict( collection_service_keys_to_content_updates ) )
+                
             
         
         for ( service_key, content_updates ) in service_keys_to_content_updates.items():
@@ -1742,6 +1968,8 @@ class MediaList( object ):
                 
                 hashes = content_update.GetHashes()
                 
+                self._DirtySortAndCollectKeys( hashes )
+                
                 if data_type == HC.CONTENT_TYPE_FILES:
                     
                     if action == HC.CONTENT_UPDATE_DELETE:
@@ -1794,6 +2022,8 @@ class MediaList( object ):
     
     def ResetService( self, service_key ):
         
+        self._DirtySortAndCollectKeys()
+        
         if service_key == self._file_service_key:
             
             self._RemoveMediaDirectly( self._singleton_media, self._collected_media )
@@ -1820,15 +2050,48 @@ class MediaList( object ):
         
         media_sort_fallback = HG.client_controller.new_options.GetFallbackSort()
         
-        ( sort_key, reverse ) = media_sort_fallback.GetSortKeyAndReverse( self._file_service_key )
+        medias = list( self._sorted_media )
+        
+        sort_ids_in_use = { self._GetSortId( media_sort_fallback ), self._GetSortId( self._media_sort ) }
+        
+        self._sort_ids_to_medias_to_sort_keys = { sort_id : medias_to_sort_keys for ( sort_id, medias_to_sort_keys ) in self._sort_ids_to_medias_to_sort_keys.items() if sort_id in sort_ids_in_use }
         
-        self._sorted_media.sort( sort_key, reverse = reverse )
+        # the primary sort goes last, so the fallback order remains for equal items
+        
+        sort_passes = [ self._GetSortKeys( media_sort_fallback, medias ), self._GetSortKeys( self._media_sort, medias ) ]
+        
+        # anything not in the list any more, like old collections, can go
+        
+        for medias_to_sort_keys in self._sort_ids_to_medias_to_sort_keys.values():
+            
+            if len( medias_to_sort_keys ) > len( medias ):
+                
+                for cache_key in set( medias_to_sort_keys.keys() ).difference( ( self._GetSortKeysCacheKey( media ) for media in medias ) ):
+                    
+                    del medias_to_sort_keys[ cache_key ]
+                    
+                
+            
         
-        # this is a stable sort, so the fallback order above will remain for equal items
+        sorted_medias = [ medias[ index ] for index in GetSortedIndices( sort_passes ) ]
         
         ( sort_key, reverse ) = self._media_sort.GetSortKeyAndReverse( self._file_service_key )
         
-        self._sorted_media.sort( sort_key = sort_key, reverse = reverse )
+        self._sorted_media.set_sorted_items( sorted_medias, sort_key, reverse )
+        
+    
+    def UpdateFileInfo( self, hashes_to_media_results ):
+        
+        hashes = set( hashes_to_media_results.keys() )
+        
+        # sizes, durations and so on may have changed, so the cached keys for these are stale
+        
+        self._DirtySortAndCollectKeys( hashes )
+        
+        for media in self._GetMedia( hashes ):
+            
+            media.UpdateFileInfo( hashes_to_media_results )
+            
         
     
 FILE_FILTER_ALL = 0
@@ -1995,81 +2258,668 @@ class FileFilter( object ):
         return s
         
     
-class ListeningMediaList( MediaList ):
+class MediaListHashIndex( object ):
     
-    def __init__( self, file_service_key, media_results ):
+    # content updates used to go to every open media list, which is a lot of looping with many pages open and a big update
+    # so we sub once here, remember which lists hold which hashes, and only send each list the updates for its files
+    
+    def __init__( self, controller, valid_callable ):
         
-        MediaList.__init__( self, file_service_key, media_results )
+        self._controller = controller
+        self._valid_callable = valid_callable
         
-        HG.client_controller.sub( self, 'ProcessContentUpdates', 'content_updates_gui' )
-        HG.client_controller.sub( self, 'ProcessServiceUpdates', 'service_updates_gui' )
+        self._lock = threading.Lock()
+        
+        self._next_media_list_id = 0
+        
+        self._media_list_ids_to_media_lists = weakref.WeakValueDictionary()
+        self._media_list_ids_to_hashes = {}
+        self._hashes_to_media_list_ids = {}
+        
+        # some lists, like the virtual thumbnail page, do not know their hashes and want everything
+        self._all_hashes_media_list_ids = set()
+        
+        # lists die whenever the garbage collector gets to them, which may be while this thread holds the lock, so their finalizers only leave a note here
+        self._dead_media_list_ids = collections.deque()
+        
+        self._controller.sub( self, 'ProcessContentUpdates', 'content_updates_gui' )
         
     
-    def AddMediaResults( self, media_results ):
+    def _AddHashes( self, media_list_id, hashes ):
         
-        new_media = []
+        my_hashes = self._media_list_ids_to_hashes[ media_list_id ]
         
-        for media_result in media_results:
-            
-            hash = media_result.GetHash()
+        for hash in hashes:
             
-            if hash in self._hashes:
+            if hash in my_hashes:
                 
                 continue
                 
             
-            new_media.append( self._GenerateMediaSingleton( media_result ) )
+            my_hashes.add( hash )
+            
+            if hash in self._hashes_to_media_list_ids:
+                
+                self._hashes_to_media_list_ids[ hash ].add( media_list_id )
+                
+            else:
+                
+                self._hashes_to_media_list_ids[ hash ] = { media_list_id }
+                
             
         
-        self.AddMedia( new_media )
+    
+    def _ClearDeadMediaLists( self ):
         
-        return new_media
+        while len( self._dead_media_list_ids ) > 0:
+            
+            media_list_id = self._dead_media_list_ids.popleft()
+            
+            if media_list_id not in self._media_list_ids_to_hashes:
+                
+                continue
+                
+            
+            self._RemoveHashes( media_list_id, list( self._media_list_ids_to_hashes[ media_list_id ] ) )
+            
+            del self._media_list_ids_to_hashes[ media_list_id ]
+            
+            self._all_hashes_media_list_ids.discard( media_list_id )
+            
         
     
-class MediaCollection( MediaList, Media ):
-    
-    def __init__( self, file_service_key, media_results ):
+    def _NotifyMediaListDead( self, media_list_id ):
         
-        # note for later: ideal here is to stop this multiple inheritance mess and instead have this be a media that *has* a list, not *is* a list
+        # no lock here! deque append is atomic, and the next locked call clears it up
         
-        Media.__init__( self )
-        MediaList.__init__( self, file_service_key, media_results )
+        self._dead_media_list_ids.append( media_list_id )
         
-        self._archive = True
-        self._inbox = False
+    
+    def _RemoveHashes( self, media_list_id, hashes ):
         
-        self._size = 0
-        self._size_definite = True
+        my_hashes = self._media_list_ids_to_hashes[ media_list_id ]
         
-        self._width = None
-        self._height = None
-        self._duration = None
-        self._num_frames = None
-        self._num_words = None
-        self._has_audio = None
-        self._tags_manager = None
-        self._locations_manager = None
-        self._file_viewing_stats_manager = None
+        for hash in hashes:
+            
+            if hash not in my_hashes:
+                
+                continue
+                
+            
+            my_hashes.discard( hash )
+            
+            media_list_ids = self._hashes_to_media_list_ids[ hash ]
+            
+            media_list_ids.discard( media_list_id )
+            
+            if len( media_list_ids ) == 0:
+                
+                del self._hashes_to_media_list_ids[ hash ]
+                
+            
         
-        self._internals_dirty = False
+    
+    def AddHashes( self, media_list_id, hashes ):
         
-        self._RecalcInternals()
+        with self._lock:
+            
+            self._ClearDeadMediaLists()
+            
+            if media_list_id in self._media_list_ids_to_hashes:
+                
+                self._AddHashes( media_list_id, hashes )
+                
+            
         
     
-    def _RecalcInternals( self ):
+    def AddMediaList( self, media_list, wants_all_hashes = False ):
         
-        self._RecalcHashes()
+        with self._lock:
+            
+            self._ClearDeadMediaLists()
+            
+            media_list_id = self._next_media_list_id
+            
+            self._next_media_list_id += 1
+            
+            self._media_list_ids_to_media_lists[ media_list_id ] = media_list
+            self._media_list_ids_to_hashes[ media_list_id ] = set()
+            
+            if wants_all_hashes:
+                
+                self._all_hashes_media_list_ids.add( media_list_id )
+                
+            
         
-        self._archive = True in ( media.HasArchive() for media in self._sorted_media )
-        self._inbox = True in ( media.HasInbox() for media in self._sorted_media )
+        # pages are not closed explicitly, so we clear up when the list is collected
+        weakref.finalize( media_list, self._NotifyMediaListDead, media_list_id )
         
-        self._size = sum( [ media.GetSize() for media in self._sorted_media ] )
-        self._size_definite = not False in ( media.IsSizeDefinite() for media in self._sorted_media )
+        return media_list_id
         
-        duration_sum = sum( [ media.GetDuration() for media in self._sorted_media if media.HasDuration() ] )
+    
+    def GetNumHashes( self ):
         
-        if duration_sum > 0: self._duration = duration_sum
-        else: self._duration = None
+        with self._lock:
+            
+            self._ClearDeadMediaLists()
+            
+            return len( self._hashes_to_media_list_ids )
+            
+        
+    
+    def ProcessContentUpdates( self, service_keys_to_content_updates ):
+        
+        media_list_ids_to_service_keys_to_content_updates = collections.defaultdict( lambda: collections.defaultdict( list ) )
+        
+        with self._lock:
+            
+            self._ClearDeadMediaLists()
+            
+            for ( service_key, content_updates ) in service_keys_to_content_updates.items():
+                
+                for content_update in content_updates:
+                    
+                    hashes = content_update.GetHashes()
+                    
+                    if len( hashes ) == 0:
+                        
+                        # an advanced update or similar. we can't tell who it touches, so everyone gets it
+                        
+                        media_list_ids = set( self._media_list_ids_to_hashes.keys() )
+                        
+                    else:
+                        
+                        media_list_ids = set( self._all_hashes_media_list_ids )
+                        
+                        for hash in hashes:
+                            
+                            if hash in self._hashes_to_media_list_ids:
+                                
+                                media_list_ids.update( self._hashes_to_media_list_ids[ hash ] )
+                                
+                            
+                        
+                    
+                    for media_list_id in media_list_ids:
+                        
+                        media_list_ids_to_service_keys_to_content_updates[ media_list_id ][ service_key ].append( content_update )
+                        
+                    
+                
+            
+            media_lists_and_updates = []
+            
+            for ( media_list_id, media_list_service_keys_to_content_updates ) in media_list_ids_to_service_keys_to_content_updates.items():
+                
+                media_list = self._media_list_ids_to_media_lists.get( media_list_id, None )
+                
+                if media_list is not None:
+                    
+                    media_lists_and_updates.append( ( media_list, dict( media_list_service_keys_to_content_updates ) ) )
+                    
+                
+            
+        
+        for ( media_list, media_list_service_keys_to_content_updates ) in media_lists_and_updates:
+            
+            if not self._valid_callable( media_list ):
+                
+                continue
+                
+            
+            try:
+                
+                media_list.ProcessContentUpdates( media_list_service_keys_to_content_updates )
+                
+            except HydrusExceptions.ShutdownException:
+                
+                return
+                
+            except Exception as e:
+                
+                HydrusData.ShowException( e )
+                
+            
+        
+    
+    def SetHashes( self, media_list_id, hashes ):
+        
+        with self._lock:
+            
+            self._ClearDeadMediaLists()
+            
+            if media_list_id not in self._media_list_ids_to_hashes:
+                
+                return
+                
+            
+            my_hashes = self._media_list_ids_to_hashes[ media_list_id ]
+            
+            self._RemoveHashes( media_list_id, my_hashes.difference( hashes ) )
+            self._AddHashes( media_list_id, hashes )
+            
+        
+    
+TAG_COUNT_STATUSES = ( HC.CONTENT_STATUS_CURRENT, HC.CONTENT_STATUS_DELETED, HC.CONTENT_STATUS_PENDING, HC.CONTENT_STATUS_PETITIONED )
+
+class TagCountIndex( object ):
+    
+    # the tag counts for every file in a media list, for one tag service and display type
+    # we remember what we counted for each file, so a tag change or an add/remove only recounts those files, not the whole page
+    
+    def __init__( self, tag_service_key, tag_display_type ):
+        
+        self._tag_service_key = tag_service_key
+        self._tag_display_type = tag_display_type
+        
+        self._lock = threading.Lock()
+        
+        self._hashes_to_medias_and_counted_tags = {}
+        
+        self._statuses_to_tags_to_count = { status : collections.Counter() for status in TAG_COUNT_STATUSES }
+        
+        # for the autocomplete. sorted searchable text -> tag, where the text is every place a search can start matching
+        self._search_keys = []
+        self._search_tags = []
+        self._tags_in_search_index = set()
+        
+    
+    def _AddFile( self, hash, media ):
+        
+        statuses_to_tags = media.GetTagsManager().GetStatusesToTags( self._tag_service_key, self._tag_display_type )
+        
+        counted_tags = tuple( ( frozenset( statuses_to_tags[ status ] ) for status in TAG_COUNT_STATUSES ) )
+        
+        self._hashes_to_medias_and_counted_tags[ hash ] = ( media, counted_tags )
+        
+        for ( status, tags ) in zip( TAG_COUNT_STATUSES, counted_tags ):
+            
+            self._statuses_to_tags_to_count[ status ].update( tags )
+            
+        
+    
+    def _GetSearchPrefix( self, search_text ):
+        
+        # the literal text a match has to start with. a namespace search may match across the colon, so we stop there
+        
+        prefix = search_text
+        
+        for char in ( '*', ':' ):
+            
+            if char in prefix:
+                
+                prefix = prefix.split( char, 1 )[0]
+                
+            
+        
+        return prefix
+        
+    
+    def _RebuildSearchIndex( self ):
+        
+        siblings_manager = HG.client_controller.tag_siblings_manager
+        
+        tags = set( self._statuses_to_tags_to_count[ HC.CONTENT_STATUS_CURRENT ] )
+        tags.update( self._statuses_to_tags_to_count[ HC.CONTENT_STATUS_PENDING ] )
+        
+        keys_and_tags = []
+        
+        for tag in tags:
+            
+            keys = set()
+            
+            # the search matches siblings too
+            for possible_tag in siblings_manager.GetAllSiblings( self._tag_service_key, tag ):
+                
+                searchable_tag = ClientSearch.ConvertTagToSearchable( possible_tag )
+                
+                keys.add( searchable_tag )
+                
+                for ( i, char ) in enumerate( searchable_tag ):
+                    
+                    if char == ':' or char.isspace():
+                        
+                        keys.add( searchable_tag[ i + 1 : ] )
+                        
+                    
+                
+            
+            keys_and_tags.extend( ( ( key, tag ) for key in keys ) )
+            
+        
+        keys_and_tags.sort()
+        
+        self._search_keys = [ key for ( key, tag ) in keys_and_tags ]
+        self._search_tags = [ tag for ( key, tag ) in keys_and_tags ]
+        self._tags_in_search_index = tags
+        
+    
+    def _RemoveFile( self, hash ):
+        
+        ( media, counted_tags ) = self._hashes_to_medias_and_counted_tags[ hash ]
+        
+        del self._hashes_to_medias_and_counted_tags[ hash ]
+        
+        for ( status, tags ) in zip( TAG_COUNT_STATUSES, counted_tags ):
+            
+            tags_to_count = self._statuses_to_tags_to_count[ status ]
+            
+            for tag in tags:
+                
+                count = tags_to_count[ tag ] - 1
+                
+                if count == 0:
+                    
+                    del tags_to_count[ tag ]
+                    
+                else:
+                    
+                    tags_to_count[ tag ] = count
+                    
+                
+            
+        
+    
+    def AddMedia( self, medias ):
+        
+        with self._lock:
+            
+            for media in FlattenMedia( medias ):
+                
+                hash = media.GetHash()
+                
+                if hash not in self._hashes_to_medias_and_counted_tags:
+                    
+                    self._AddFile( hash, media )
+                    
+                
+            
+        
+    
+    def GetCurrentAndPendingCountsForSearch( self, search_text ):
+        
+        # this is a quick prefix lookup for the tags that could match. the caller still needs to do the proper wildcard filter
+        
+        with self._lock:
+            
+            current_tags_to_count = self._statuses_to_tags_to_count[ HC.CONTENT_STATUS_CURRENT ]
+            pending_tags_to_count = self._statuses_to_tags_to_count[ HC.CONTENT_STATUS_PENDING ]
+            
+            prefix = self._GetSearchPrefix( search_text )
+            
+            if prefix == '':
+                
+                tags = set( current_tags_to_count )
+                tags.update( pending_tags_to_count )
+                
+            else:
+                
+                # tags that drop to zero stay in the search index, so we only need to rebuild when a new one turns up
+                
+                if not self._tags_in_search_index.issuperset( current_tags_to_count ) or not self._tags_in_search_index.issuperset( pending_tags_to_count ):
+                    
+                    self._RebuildSearchIndex()
+                    
+                
+                tags = set()
+                
+                i = bisect.bisect_left( self._search_keys, prefix )
+                
+                num_keys = len( self._search_keys )
+                
+                while i < num_keys and self._search_keys[ i ].startswith( prefix ):
+                    
+                    tags.add( self._search_tags[ i ] )
+                    
+                    i += 1
+                    
+                
+            
+            return ( { tag : current_tags_to_count[ tag ] for tag in tags if tag in current_tags_to_count }, { tag : pending_tags_to_count[ tag ] for tag in tags if tag in pending_tags_to_count } )
+            
+        
+    
+    def GetNumFiles( self ):
+        
+        with self._lock:
+            
+            return len( self._hashes_to_medias_and_counted_tags )
+            
+        
+    
+    def GetTagsToCounts( self ):
+        
+        with self._lock:
+            
+            return tuple( ( collections.Counter( self._statuses_to_tags_to_count[ status ] ) for status in TAG_COUNT_STATUSES ) )
+            
+        
+    
+    def RefreshHashes( self, hashes ):
+        
+        with self._lock:
+            
+            for hash in hashes:
+                
+                if hash in self._hashes_to_medias_and_counted_tags:
+                    
+                    ( media, counted_tags ) = self._hashes_to_medias_and_counted_tags[ hash ]
+                    
+                    self._RemoveFile( hash )
+                    self._AddFile( hash, media )
+                    
+                
+            
+        
+    
+    def RemoveHashesNotIn( self, hashes ):
+        
+        with self._lock:
+            
+            for hash in [ hash for hash in self._hashes_to_medias_and_counted_tags.keys() if hash not in hashes ]:
+                
+                self._RemoveFile( hash )
+                
+            
+        
+    
+class ListeningMediaList( MediaList ):
+    
+    WANTS_ALL_HASHES = False
+    
+    def __init__( self, file_service_key, media_results ):
+        
+        # content updates come via the hash index, which needs to know us before we add any media
+        self._media_list_hash_index_id = HG.client_controller.media_list_hash_index.AddMediaList( self, wants_all_hashes = self.WANTS_ALL_HASHES )
+        
+        self._tag_service_keys_and_display_types_to_tag_count_indices = {}
+        
+        MediaList.__init__( self, file_service_key, media_results )
+        
+        HG.client_controller.sub( self, 'ProcessServiceUpdates', 'service_updates_gui' )
+        HG.client_controller.sub( self, 'NotifyNewTagPresentation', 'refresh_all_tag_presentation_gui' )
+        
+    
+    def _RecalcHashes( self ):
+        
+        MediaList._RecalcHashes( self )
+        
+        HG.client_controller.media_list_hash_index.SetHashes( self._media_list_hash_index_id, self._hashes )
+        
+        for tag_count_index in self._tag_service_keys_and_display_types_to_tag_count_indices.values():
+            
+            tag_count_index.RemoveHashesNotIn( self._hashes )
+            
+        
+    
+    def AddMedia( self, new_media ):
+        
+        new_media = MediaList.AddMedia( self, new_media )
+        
+        HG.client_controller.media_list_hash_index.AddHashes( self._media_list_hash_index_id, [ media.GetHash() for media in new_media ] )
+        
+        for tag_count_index in self._tag_service_keys_and_display_types_to_tag_count_indices.values():
+            
+            tag_count_index.AddMedia( new_media )
+            
+        
+        return new_media
+        
+    
+    def AddMediaResults( self, media_results ):
+        
+        new_media = []
+        
+        for media_result in media_results:
+            
+            hash = media_result.GetHash()
+            
+            if hash in self._hashes:
+                
+                continue
+                
+            
+            new_media.append( self._GenerateMediaSingleton( media_result ) )
+            
+        
+        self.AddMedia( new_media )
+        
+        return new_media
+        
+    
+    def DeletePending( self, service_key ):
+        
+        MediaList.DeletePending( self, service_key )
+        
+        self._tag_service_keys_and_display_types_to_tag_count_indices = {}
+        
+    
+    def GetTagCountIndex( self, tag_service_key, tag_display_type ):
+        
+        key = ( tag_service_key, tag_display_type )
+        
+        if key not in self._tag_service_keys_and_display_types_to_tag_count_indices:
+            
+            tag_count_index = TagCountIndex( tag_service_key, tag_display_type )
+            
+            tag_count_index.AddMedia( self._sorted_media )
+            
+            self._tag_service_keys_and_display_types_to_tag_count_indices[ key ] = tag_count_index
+            
+        
+        return self._tag_service_keys_and_display_types_to_tag_count_indices[ key ]
+        
+    
+    def NotifyNewTagPresentation( self ):
+        
+        # siblings or display rules changed under us, so any tag sort or collect keys and tag counts are stale
+        
+        self._DirtySortAndCollectKeys()
+        
+        self._tag_service_keys_and_display_types_to_tag_count_indices = {}
+        
+    
+    def ProcessContentUpdates( self, service_keys_to_content_updates ):
+        
+        MediaList.ProcessContentUpdates( self, service_keys_to_content_updates )
+        
+        if len( self._tag_service_keys_and_display_types_to_tag_count_indices ) == 0:
+            
+            return
+            
+        
+        hashes_to_recount = set()
+        
+        for content_updates in service_keys_to_content_updates.values():
+            
+            for content_update in content_updates:
+                
+                data_type = content_update.GetDataType()
+                
+                if data_type == HC.CONTENT_TYPE_MAPPINGS:
+                    
+                    hashes = content_update.GetHashes()
+                    
+                    if len( hashes ) == 0:
+                        
+                        # advanced update, could be anything
+                        
+                        self._tag_service_keys_and_display_types_to_tag_count_indices = {}
+                        
+                        return
+                        
+                    
+                    hashes_to_recount.update( hashes )
+                    
+                elif data_type in ( HC.CONTENT_TYPE_TAG_SIBLINGS, HC.CONTENT_TYPE_TAG_PARENTS ):
+                    
+                    self._tag_service_keys_and_display_types_to_tag_count_indices = {}
+                    
+                    return
+                    
+                
+            
+        
+        if len( hashes_to_recount ) > 0:
+            
+            for tag_count_index in self._tag_service_keys_and_display_types_to_tag_count_indices.values():
+                
+                tag_count_index.RefreshHashes( hashes_to_recount )
+                
+            
+        
+    
+    def ResetService( self, service_key ):
+        
+        MediaList.ResetService( self, service_key )
+        
+        self._tag_service_keys_and_display_types_to_tag_count_indices = {}
+        
+    
+class MediaCollection( MediaList, Media ):
+    
+    def __init__( self, file_service_key, media_results ):
+        
+        # note for later: ideal here is to stop this multiple inheritance mess and instead have this be a media that *has* a list, not *is* a list
+        
+        Media.__init__( self )
+        MediaList.__init__( self, file_service_key, media_results )
+        
+        self._archive = True
+        self._inbox = False
+        
+        self._size = 0
+        self._size_definite = True
+        
+        self._width = None
+        self._height = None
+        self._duration = None
+        self._num_frames = None
+        self._num_words = None
+        self._has_audio = None
+        self._tags_manager = None
+        self._locations_manager = None
+        self._file_viewing_stats_manager = None
+        
+        self._internals_dirty = False
+        
+        self._RecalcInternals()
+        
+    
+    def _RecalcInternals( self ):
+        
+        self._RecalcHashes()
+        
+        self._archive = True in ( media.HasArchive() for media in self._sorted_media )
+        self._inbox = True in ( media.HasInbox() for media in self._sorted_media )
+        
+        self._size = sum( [ media.GetSize() for media in self._sorted_media ] )
+        self._size_definite = not False in ( media.IsSizeDefinite() for media in self._sorted_media )
+        
+        duration_sum = sum( [ media.GetDuration() for media in self._sorted_media if media.HasDuration() ] )
+        
+        if duration_sum > 0: self._duration = duration_sum
+        else: self._duration = None
         
         self._has_audio = True in ( media.HasAudio() for media in self._sorted_media )
         
@@ -2356,10 +3206,7 @@ class MediaCollection( MediaList, Media ):
     
     def UpdateFileInfo( self, hashes_to_media_results ):
         
-        for media in self._sorted_media:
-            
-            media.UpdateFileInfo( hashes_to_media_results )
-            
+        MediaList.UpdateFileInfo( self, hashes_to_media_results )
         
         self._RecalcInternals()
         
@@ -3282,6 +4129,18 @@ class SortedList( object ):
         self._DirtyIndices()
         
     
+    def set_sorted_items( self, items, sort_key, reverse = False ):
+        
+        # for when the caller has done the sort more cleverly than we can
+        
+        self._sort_key = sort_key
+        self._sort_reverse = reverse
+        
+        self._sorted_list = list( items )
+        
+        self._DirtyIndices()
+        
+    
     def sort( self, sort_key = None, reverse = False ):
         
         if sort_key is None:
@@ -3300,3 +4159,365 @@ class SortedList( object ):
         self._DirtyIndices()
         
     
+class IndexRanges( object ):
+    
+    # a set of ints stored as sorted, non-overlapping [ start, end ) ranges
+    # 'select all' on a million files is then one range, not a million objects
+    
+    def __init__( self ):
+        
+        self._starts = []
+        self._ends = []
+        
+    
+    def __contains__( self, index ):
+        
+        i = bisect.bisect_right( self._starts, index ) - 1
+        
+        return i >= 0 and index < self._ends[ i ]
+        
+    
+    def __len__( self ):
+        
+        return sum( ( end - start for ( start, end ) in zip( self._starts, self._ends ) ) )
+        
+    
+    def AddIndices( self, indices ):
+        
+        run_start = None
+        run_end = None
+        
+        for index in sorted( indices ):
+            
+            if run_start is None:
+                
+                run_start = index
+                run_end = index + 1
+                
+            elif index < run_end:
+                
+                continue
+                
+            elif index == run_end:
+                
+                run_end += 1
+                
+            else:
+                
+                self.AddRange( run_start, run_end )
+                
+                run_start = index
+                run_end = index + 1
+                
+            
+        
+        if run_start is not None:
+            
+            self.AddRange( run_start, run_end )
+            
+        
+    
+    def AddRange( self, start, end ):
+        
+        if start >= end:
+            
+            return
+            
+        
+        # everything touching or overlapping gets merged
+        
+        first = bisect.bisect_left( self._ends, start )
+        last = bisect.bisect_right( self._starts, end )
+        
+        if first < last:
+            
+            start = min( start, self._starts[ first ] )
+            end = max( end, self._ends[ last - 1 ] )
+            
+        
+        self._starts[ first : last ] = [ start ]
+        self._ends[ first : last ] = [ end ]
+        
+    
+    def Clear( self ):
+        
+        self._starts = []
+        self._ends = []
+        
+    
+    def GetInverse( self, count ):
+        
+        inverse = IndexRanges()
+        
+        previous_end = 0
+        
+        for ( start, end ) in zip( self._starts, self._ends ):
+            
+            inverse.AddRange( previous_end, min( start, count ) )
+            
+            previous_end = end
+            
+        
+        inverse.AddRange( previous_end, count )
+        
+        return inverse
+        
+    
+    def GetRanges( self ):
+        
+        return list( zip( self._starts, self._ends ) )
+        
+    
+    def IterateIndices( self ):
+        
+        for ( start, end ) in zip( self._starts, self._ends ):
+            
+            yield from range( start, end )
+            
+        
+    
+    def RemoveRange( self, start, end ):
+        
+        if start >= end:
+            
+            return
+            
+        
+        first = bisect.bisect_right( self._ends, start )
+        last = bisect.bisect_left( self._starts, end )
+        
+        if first >= last:
+            
+            return
+            
+        
+        remaining_starts = []
+        remaining_ends = []
+        
+        if self._starts[ first ] < start:
+            
+            remaining_starts.append( self._starts[ first ] )
+            remaining_ends.append( start )
+            
+        
+        if self._ends[ last - 1 ] > end:
+            
+            remaining_starts.append( end )
+            remaining_ends.append( self._ends[ last - 1 ] )
+            
+        
+        self._starts[ first : last ] = remaining_starts
+        self._ends[ first : last ] = remaining_ends
+        
+    
+VIRTUAL_MEDIA_RESULT_CACHE_SIZE = 8192
+
+class VirtualMediaList( object ):
+    
+    # for pages too big to hold every media result in memory
+    # we keep the ordered hash_ids and a selection of index ranges, and media results only for what has been looked at recently
+    # the hashes are small, so we keep them all too. session saves and the client api want them, and the Qt thread should not wait on the db for them
+    
+    def __init__( self, file_service_key, hash_ids, hash_ids_to_hashes ):
+        
+        self._file_service_key = file_service_key
+        
+        self._hash_ids = HydrusData.DedupeList( hash_ids )
+        
+        self._hash_ids_to_hashes = { hash_id : hash_ids_to_hashes[ hash_id ] for hash_id in self._hash_ids }
+        
+        self._selected_indices = IndexRanges()
+        
+        self._hash_ids_to_media_results = collections.OrderedDict()
+        
+    
+    def _SetHashIds( self, hash_ids ):
+        
+        if len( self._selected_indices ) == len( self._hash_ids ):
+            
+            self._hash_ids = hash_ids
+            
+            self._selected_indices.Clear()
+            
+            self._selected_indices.AddRange( 0, len( self._hash_ids ) )
+            
+        else:
+            
+            selected_hash_ids = set( self.GetSelectedHashIds() )
+            
+            self._hash_ids = hash_ids
+            
+            self._selected_indices.Clear()
+            
+            self._selected_indices.AddIndices( ( index for ( index, hash_id ) in enumerate( self._hash_ids ) if hash_id in selected_hash_ids ) )
+            
+        
+    
+    def AppendMediaResults( self, media_results ):
+        
+        existing_hash_ids = set( self._hash_ids )
+        
+        new_hash_ids = [ hash_id for hash_id in HydrusData.DedupeList( ( media_result.GetHashId() for media_result in media_results ) ) if hash_id not in existing_hash_ids ]
+        
+        self._hash_ids.extend( new_hash_ids )
+        
+        for media_result in media_results:
+            
+            self._hash_ids_to_hashes[ media_result.GetHashId() ] = media_result.GetHash()
+            
+        
+        self.CacheMediaResults( media_results )
+        
+    
+    def CacheMediaResults( self, media_results ):
+        
+        for media_result in media_results:
+            
+            hash_id = media_result.GetHashId()
+            
+            self._hash_ids_to_media_results[ hash_id ] = media_result
+            
+            self._hash_ids_to_media_results.move_to_end( hash_id )
+            
+        
+        while len( self._hash_ids_to_media_results ) > VIRTUAL_MEDIA_RESULT_CACHE_SIZE:
+            
+            self._hash_ids_to_media_results.popitem( last = False )
+            
+        
+    
+    def DeselectRange( self, start, end ):
+        
+        self._selected_indices.RemoveRange( max( 0, start ), min( end, len( self._hash_ids ) ) )
+        
+    
+    def GetFileServiceKey( self ):
+        
+        return self._file_service_key
+        
+    
+    def GetHashId( self, index ):
+        
+        return self._hash_ids[ index ]
+        
+    
+    def GetHashes( self, ordered = False ):
+        
+        if ordered:
+            
+            return [ self._hash_ids_to_hashes[ hash_id ] for hash_id in self._hash_ids ]
+            
+        else:
+            
+            return set( self._hash_ids_to_hashes.values() )
+            
+        
+    
+    def GetHashIds( self ):
+        
+        return list( self._hash_ids )
+        
+    
+    def GetIndex( self, hash_id ):
+        
+        try:
+            
+            return self._hash_ids.index( hash_id )
+            
+        except ValueError:
+            
+            return None
+            
+        
+    
+    def GetMediaResult( self, index ):
+        
+        hash_id = self._hash_ids[ index ]
+        
+        if hash_id in self._hash_ids_to_media_results:
+            
+            self._hash_ids_to_media_results.move_to_end( hash_id )
+            
+            return self._hash_ids_to_media_results[ hash_id ]
+            
+        
+        return None
+        
+    
+    def GetMissingHashIds( self, start, end ):
+        
+        return [ hash_id for hash_id in self._hash_ids[ max( 0, start ) : end ] if hash_id not in self._hash_ids_to_media_results ]
+        
+    
+    def GetNumFiles( self ):
+        
+        return len( self._hash_ids )
+        
+    
+    def GetNumSelected( self ):
+        
+        return len( self._selected_indices )
+        
+    
+    def GetSelectedHashIds( self ):
+        
+        return [ self._hash_ids[ index ] for index in self._selected_indices.IterateIndices() ]
+        
+    
+    def HasMediaResult( self, hash_id ):
+        
+        return hash_id in self._hash_ids_to_media_results
+        
+    
+    def InvertSelection( self ):
+        
+        self._selected_indices = self._selected_indices.GetInverse( len( self._hash_ids ) )
+        
+    
+    def IsSelected( self, index ):
+        
+        return index in self._selected_indices
+        
+    
+    def RemoveHashIds( self, hash_ids ):
+        
+        hash_ids = set( hash_ids )
+        
+        for hash_id in hash_ids:
+            
+            if hash_id in self._hash_ids_to_media_results:
+                
+                del self._hash_ids_to_media_results[ hash_id ]
+                
+            
+            if hash_id in self._hash_ids_to_hashes:
+                
+                del self._hash_ids_to_hashes[ hash_id ]
+                
+            
+        
+        self._SetHashIds( [ hash_id for hash_id in self._hash_ids if hash_id not in hash_ids ] )
+        
+    
+    def SelectAll( self ):
+        
+        self._selected_indices.AddRange( 0, len( self._hash_ids ) )
+        
+    
+    def SelectNone( self ):
+        
+        self._selected_indices.Clear()
+        
+    
+    def SelectRange( self, start, end ):
+        
+        self._selected_indices.AddRange( max( 0, start ), min( end, len( self._hash_ids ) ) )
+        
+    
+    def SetSortedHashIds( self, sorted_hash_ids ):
+        
+        # the selection follows the files, not the positions
+        
+        self._SetHashIds( HydrusData.DedupeList( sorted_hash_ids ) )
+        
+    
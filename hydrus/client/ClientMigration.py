@@ -93,16 +93,11 @@ class MigrationDestinationHTA( MigrationDestination ):
         
         time_started_precise = HydrusData.GetNowPrecise()
         
-        num_done = 0
-        
         data = source.GetSomeData()
         
-        for ( hash, tags ) in data:
-            
-            self._hta.AddMappings( hash, tags )
-            
-            num_done += len( tags )
-            
+        self._hta.AddMappingsBulk( data )
+        
+        num_done = sum( ( len( tags ) for ( hash, tags ) in data ) )
         
         return GetBasicSpeedStatement( num_done, time_started_precise )
         
@@ -440,27 +435,15 @@ class MigrationSourceHTA( MigrationSource ):
         self._iterator = None
         
     
-    def _ConvertHashes( self, source_hash_type, desired_hash_type, data ):
+    def _ConvertHashes( self, source_hash_type, desired_hash_type, data, file_service_key = CC.COMBINED_FILE_SERVICE_KEY ):
         
-        if source_hash_type != desired_hash_type:
+        if source_hash_type != desired_hash_type or file_service_key != CC.COMBINED_FILE_SERVICE_KEY:
             
-            fixed_data = []
+            source_hashes = [ hash for ( hash, tags ) in data ]
             
-            for ( hash, tags ) in data:
-                
-                result = self._controller.Read( 'file_hashes', ( hash, ), source_hash_type, desired_hash_type )
-                
-                if len( result ) == 0:
-                    
-                    continue
-                    
-                
-                desired_hash = result[0]
-                
-                fixed_data.append( ( desired_hash, tags ) )
-                
+            source_hashes_to_desired_hashes = self._controller.Read( 'migration_convert_hashes', source_hashes, source_hash_type, desired_hash_type, file_service_key = file_service_key )
             
-            data = fixed_data
+            data = [ ( source_hashes_to_desired_hashes[ hash ], tags ) for ( hash, tags ) in data if hash in source_hashes_to_desired_hashes ]
             
         
         return data
@@ -473,40 +456,9 @@ class MigrationSourceHTA( MigrationSource ):
             data = [ ( hash, tags ) for ( hash, tags ) in data if hash in self._hashes ]
             
         
-        if self._file_service_key != CC.COMBINED_FILE_SERVICE_KEY:
-            
-            filtered_data = []
-            
-            all_hashes = [ hash for ( hash, tags ) in data ]
-            
-            hashes_to_media_results = { media_result.GetHash() : media_result for media_result in self._controller.Read( 'media_results', all_hashes ) }
-            
-            for ( hash, tags ) in data:
-                
-                if hash in hashes_to_media_results:
-                    
-                    media_result = hashes_to_media_results[ hash ]
-                    
-                    if self._file_service_key not in media_result.GetLocationsManager().GetCurrent():
-                        
-                        continue
-                        
-                    
-                    filtered_data.append( ( hash, tags ) )
-                    
-                
-            
-            data = filtered_data
-            
-        
         return data
         
     
-    def _SHA256FilteringNeeded( self ):
-        
-        return self._hashes is not None or self._file_service_key != CC.COMBINED_FILE_SERVICE_KEY
-        
-    
     def CleanUp( self ):
         
         self._hta.CommitBigJob()
@@ -519,7 +471,7 @@ class MigrationSourceHTA( MigrationSource ):
     
     def GetSomeData( self ):
         
-        data = HydrusData.PullNFromIterator( self._iterator, 256 )
+        data = HydrusData.PullNFromIterator( self._iterator, 1024 )
         
         if len( data ) == 0:
             
@@ -545,32 +497,31 @@ class MigrationSourceHTA( MigrationSource ):
             data = filtered_data
             
         
-        if self._SHA256FilteringNeeded():
+        # the file service filter happens in the same db job as the hash conversion
+        
+        if self._hashes is None:
             
-            if self._source_hash_type == 'sha256':
-                
-                data = self._FilterSHA256Hashes( data )
-                
-                data = self._ConvertHashes( self._source_hash_type, self._desired_hash_type, data )
-                
-            elif self._desired_hash_type == 'sha256':
-                
-                data = self._ConvertHashes( self._source_hash_type, self._desired_hash_type, data )
-                
-                data = self._FilterSHA256Hashes( data )
-                
-            else:
-                
-                data = self._ConvertHashes( self._source_hash_type, 'sha256', data )
-                
-                data = self._FilterSHA256Hashes( data )
-                
-                data = self._ConvertHashes( 'sha256', self._desired_hash_type, data )
-                
+            data = self._ConvertHashes( self._source_hash_type, self._desired_hash_type, data, file_service_key = self._file_service_key )
+            
+        elif self._source_hash_type == 'sha256':
+            
+            data = self._FilterSHA256Hashes( data )
+            
+            data = self._ConvertHashes( self._source_hash_type, self._desired_hash_type, data, file_service_key = self._file_service_key )
+            
+        elif self._desired_hash_type == 'sha256':
+            
+            data = self._ConvertHashes( self._source_hash_type, self._desired_hash_type, data, file_service_key = self._file_service_key )
+            
+            data = self._FilterSHA256Hashes( data )
             
         else:
             
-            data = self._ConvertHashes( self._source_hash_type, self._desired_hash_type, data )
+            data = self._ConvertHashes( self._source_hash_type, 'sha256', data, file_service_key = self._file_service_key )
+            
+            data = self._FilterSHA256Hashes( data )
+            
+            data = self._ConvertHashes( 'sha256', self._desired_hash_type, data )
             
         
         return data
@@ -2,6 +2,7 @@ from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientDefaults
 from hydrus.client import ClientDownloading
 from hydrus.client import ClientDuplicates
+from hydrus.client import ClientParsing
 from hydrus.client.importing import ClientImporting
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusGlobals as HG
@@ -339,19 +340,31 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
         self._dictionary[ 'integers' ][ 'thumbnail_cache_timeout' ] = 86400
         self._dictionary[ 'integers' ][ 'image_cache_timeout' ] = 600
         
+        self._dictionary[ 'integers' ][ 'image_tile_cache_size' ] = 256 * 1048576
+        self._dictionary[ 'integers' ][ 'image_tile_cache_timeout' ] = 300
+        
+        self._dictionary[ 'integers' ][ 'thumbnail_composite_cache_size' ] = 128 * 1048576
+        self._dictionary[ 'integers' ][ 'thumbnail_composite_cache_timeout' ] = 3600
+        
         self._dictionary[ 'integers' ][ 'thumbnail_border' ] = 1
         self._dictionary[ 'integers' ][ 'thumbnail_margin' ] = 2
         
+        self._dictionary[ 'integers' ][ 'export_folder_copy_threads' ] = 4
+        
         self._dictionary[ 'integers' ][ 'file_maintenance_idle_throttle_files' ] = 1
         self._dictionary[ 'integers' ][ 'file_maintenance_idle_throttle_time_delta' ] = 2
         
         self._dictionary[ 'integers' ][ 'file_maintenance_active_throttle_files' ] = 1
         self._dictionary[ 'integers' ][ 'file_maintenance_active_throttle_time_delta' ] = 20
         
+        self._dictionary[ 'integers' ][ 'file_maintenance_threads' ] = 4
+        
         self._dictionary[ 'integers' ][ 'subscription_network_error_delay' ] = 12 * 3600
         self._dictionary[ 'integers' ][ 'subscription_other_error_delay' ] = 36 * 3600
         self._dictionary[ 'integers' ][ 'downloader_network_error_delay' ] = 90 * 60
         
+        self._dictionary[ 'integers' ][ 'html_parsing_backend' ] = ClientParsing.HTML_PARSING_BACKEND_BS4
+        
         self._dictionary[ 'integers' ][ 'file_viewing_stats_menu_display' ] = CC.FILE_VIEWING_STATS_MENU_DISPLAY_MEDIA_AND_PREVIEW_IN_SUBMENU
         
         self._dictionary[ 'integers' ][ 'number_of_gui_session_backups' ] = 10
@@ -386,6 +399,8 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
         
         self._dictionary[ 'noneable_integers' ][ 'maintenance_vacuum_period_days' ] = 30
         
+        self._dictionary[ 'noneable_integers' ][ 'db_slow_job_profile_threshold_ms' ] = 10000
+        
         self._dictionary[ 'noneable_integers' ][ 'duplicate_background_switch_intensity' ] = 3
         
         self._dictionary[ 'noneable_integers' ][ 'last_review_bandwidth_search_distance' ] = 7 * 86400
@@ -401,6 +416,8 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
         
         self._dictionary[ 'noneable_integers' ][ 'media_viewer_cursor_autohide_time_ms' ] = 700
         
+        self._dictionary[ 'noneable_integers' ][ 'virtualised_page_threshold' ] = 250000
+        
         #
         
         self._dictionary[ 'simple_downloader_formulae' ] = HydrusSerialisable.SerialisableList()
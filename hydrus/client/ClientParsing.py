@@ -5,6 +5,7 @@ import codecs
 from hydrus.client.networking import ClientNetworkingDomain
 from hydrus.client.networking import ClientNetworkingJobs
 import collections
+import itertools
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
 from hydrus.core import HydrusExceptions
@@ -32,6 +33,8 @@ except ImportError:
 try:
     
     import lxml
+    import lxml.etree
+    import lxml.html
     
     LXML_IS_OK = True
     
@@ -39,6 +42,41 @@ except ImportError:
     
     LXML_IS_OK = False
     
+HTML_PARSING_BACKEND_DEFAULT = 0
+HTML_PARSING_BACKEND_BS4 = 1
+HTML_PARSING_BACKEND_LXML = 2
+
+html_parsing_backend_str_lookup = {}
+
+html_parsing_backend_str_lookup[ HTML_PARSING_BACKEND_DEFAULT ] = 'use the global default'
+html_parsing_backend_str_lookup[ HTML_PARSING_BACKEND_BS4 ] = 'beautifulsoup (most compatible)'
+html_parsing_backend_str_lookup[ HTML_PARSING_BACKEND_LXML ] = 'lxml (fast)'
+
+# these mirror bs4's html tree builder, which splits these attributes on whitespace and lets a rule match any one value
+LXML_MULTI_VALUED_ATTRIBUTES = {
+    '*' : { 'class', 'accesskey', 'dropzone' },
+    'a' : { 'rel', 'rev' },
+    'link' : { 'rel', 'rev' },
+    'td' : { 'headers' },
+    'th' : { 'headers' },
+    'form' : { 'accept-charset' },
+    'object' : { 'archive' },
+    'area' : { 'rel' },
+    'icon' : { 'sizes' },
+    'iframe' : { 'sandbox' },
+    'output' : { 'for' }
+}
+
+# bs4 gives text under these tags its own string type, and a tag's text only counts strings of its own type
+LXML_STRING_CONTAINER_TAG_NAMES = { 'rp', 'rt', 'script', 'style', 'template' }
+
+# bs4 also collapses whitespace-only strings to a single space or newline, except under these
+LXML_PRESERVE_WHITESPACE_TAG_NAMES = { 'pre', 'textarea' }
+LXML_ASCII_WHITESPACE = '\x20\x0a\x09\x0c\x0d'
+
+LXML_XPATH_SAFE_NAME_RE = re.compile( r'^[A-Za-z_][A-Za-z0-9_.\-]*$' )
+LXML_XML_DECLARATION_RE = re.compile( r'^\s*<\?xml[^>]*\?>' )
+
 def ConvertParseResultToPrettyString( result ):
     
     ( ( name, content_type, additional_info ), parsed_text ) = result
@@ -259,11 +297,19 @@ def GetHashesFromParseResults( results ):
     
     return hash_results
     
-def GetHTMLTagString( tag ):
+def GetHTMLTagString( tag, post = None ):
     
     try:
         
-        all_strings = [ s for s in tag.strings if len( s ) > 0 ]
+        all_strings = tag.strings
+        
+        if post is not None:
+            
+            # the strings of a post we are parsing in place, as if it had been written out without its newlines and parsed again
+            all_strings = [ HydrusText.RemoveNewlines( s ) for s in all_strings ]
+            
+        
+        all_strings = [ s for s in all_strings if len( s ) > 0 ]
         
     except:
         
@@ -281,6 +327,122 @@ def GetHTMLTagString( tag ):
     
     return result
     
+def GetHTMLParsingBackend( parsing_context ):
+    
+    html_parsing_backend = parsing_context.get( 'html_parsing_backend', HTML_PARSING_BACKEND_DEFAULT )
+    
+    if html_parsing_backend == HTML_PARSING_BACKEND_DEFAULT:
+        
+        html_parsing_backend = HG.client_controller.new_options.GetInteger( 'html_parsing_backend' )
+        
+    
+    if html_parsing_backend == HTML_PARSING_BACKEND_LXML and not LXML_IS_OK:
+        
+        html_parsing_backend = HTML_PARSING_BACKEND_BS4
+        
+    
+    return html_parsing_backend
+    
+def GetLXMLTagString( tag, post = None ):
+    
+    # the lxml equivalent of GetHTMLTagString--the first non-empty string bs4 would give for tag.strings
+    
+    try:
+        
+        if isinstance( tag, lxml.etree._ElementTree ):
+            
+            tag_container_name = None
+            
+        else:
+            
+            tag_container_name = tag.tag if tag.tag in LXML_STRING_CONTAINER_TAG_NAMES else None
+            
+        
+        for text_node in tag.xpath( 'descendant::text()' ):
+            
+            s = str( text_node )
+            
+            if post is not None:
+                
+                s = HydrusText.RemoveNewlines( s )
+                
+            
+            if len( s ) == 0:
+                
+                continue
+                
+            
+            owner = text_node.getparent()
+            
+            if text_node.is_tail:
+                
+                owner = owner.getparent()
+                
+            
+            string_container_name = None
+            preserve_whitespace = False
+            
+            while owner is not None:
+                
+                if post is not None and owner is post.getparent():
+                    
+                    break
+                    
+                
+                if owner.tag in LXML_STRING_CONTAINER_TAG_NAMES and string_container_name is None:
+                    
+                    string_container_name = owner.tag
+                    
+                
+                if owner.tag in LXML_PRESERVE_WHITESPACE_TAG_NAMES:
+                    
+                    preserve_whitespace = True
+                    
+                
+                owner = owner.getparent()
+                
+            
+            if string_container_name == tag_container_name:
+                
+                if not preserve_whitespace and s.strip( LXML_ASCII_WHITESPACE ) == '':
+                    
+                    s = '\n' if '\n' in s else ' '
+                    
+                
+                return s
+                
+            
+        
+    except:
+        
+        return ''
+        
+    
+    return ''
+    
+def GetLXMLTree( html ):
+    
+    if not LXML_IS_OK:
+        
+        raise HydrusExceptions.ParseException( 'This client does not have access to lxml, and so it cannot use the lxml parsing backend.' )
+        
+    
+    # lxml will not take a str that declares its own encoding
+    html = LXML_XML_DECLARATION_RE.sub( '', html, count = 1 )
+    
+    try:
+        
+        root = lxml.html.document_fromstring( html )
+        
+    except lxml.etree.ParserError:
+        
+        # empty document
+        root = lxml.html.document_fromstring( '<html></html>' )
+        
+    
+    # the tree stands in for bs4's soup object, which sits above <html>
+    return root.getroottree()
+    
 def GetNamespacesFromParsableContent( parsable_content ):
     
     content_type_to_additional_infos = HydrusData.BuildKeyToSetDict( ( ( content_type, additional_infos ) for ( name, content_type, additional_infos ) in parsable_content ) )
@@ -494,6 +656,57 @@ def RenderJSONParseRule( rule ):
     
     return s
     
+PARSING_NODE_TYPE_SOUP = 0
+PARSING_NODE_TYPE_LXML = 1
+PARSING_NODE_TYPE_JSON = 2
+
+class ParsingNode( object ):
+    
+    # a post that a formula has already found in a bigger page, handed down to a sub-page parser without writing it out to text and parsing it again
+    
+    def __init__( self, node_type, node ):
+        
+        self._node_type = node_type
+        self._node = node
+        
+        self._text = None
+        
+    
+    def GetNode( self ):
+        
+        return self._node
+        
+    
+    def GetNodeType( self ):
+        
+        return self._node_type
+        
+    
+    def GetText( self ):
+        
+        # what the formula would have given as text, for anything that can't work on the node
+        
+        if self._text is None:
+            
+            if self._node_type == PARSING_NODE_TYPE_SOUP:
+                
+                text = str( self._node )
+                
+            elif self._node_type == PARSING_NODE_TYPE_LXML:
+                
+                text = lxml.etree.tostring( self._node, method = 'html', encoding = 'unicode', with_tail = False )
+                
+            elif self._node_type == PARSING_NODE_TYPE_JSON:
+                
+                text = json.dumps( self._node )
+                
+            
+            self._text = HydrusText.RemoveNewlines( text )
+            
+        
+        return self._text
+        
+    
 class ParseFormula( HydrusSerialisable.SerialisableBase ):
     
     def __init__( self, string_match = None, string_converter = None ):
@@ -564,6 +777,13 @@ class ParseFormula( HydrusSerialisable.SerialisableBase ):
         return result
         
     
+    def ParseSeparatedContent( self, parsing_context, parsing_text ):
+        
+        # the posts a sub-page parser will work on. formulae that can hand down the nodes they found override this
+        
+        return self.Parse( parsing_context, parsing_text )
+        
+    
     def ParsesSeparatedContent( self ):
         
         return False
@@ -819,18 +1039,107 @@ class ParseFormulaHTML( ParseFormula ):
         self._attribute_to_fetch = attribute_to_fetch
         
     
-    def _FindHTMLTags( self, root ):
+    def _CanHandDownNodes( self ):
+        
+        # the posts are the html of the tags, untouched, so the tags themselves will do
+        
+        return self._content_to_fetch == HTML_CONTENT_HTML and self._string_match.MatchesAnything() and not self._string_converter.MakesChanges()
+        
+    
+    def _CanUseLXML( self ):
+        
+        return False not in ( tag_rule.CanUseLXML() for tag_rule in self._tag_rules )
+        
+    
+    def _FindHTMLTags( self, root, post = None ):
+        
+        tags = ( root, )
+        
+        for tag_rule in self._tag_rules:
+            
+            tags = list( tag_rule.GetNodes( tags, post = post ) )
+            
+        
+        return tags
+        
+    
+    def _FindLXMLTags( self, root, post = None ):
         
         tags = ( root, )
         
         for tag_rule in self._tag_rules:
             
-            tags = list( tag_rule.GetNodes( tags ) )
+            tags = list( tag_rule.GetLXMLNodes( tags, post = post ) )
             
         
         return tags
         
     
+    def _FindTags( self, parsing_context, parsing_text ):
+        
+        # rules that cannot be compiled to xpath drop the whole formula back to bs4--we can't mix trees
+        use_lxml = GetHTMLParsingBackend( parsing_context ) == HTML_PARSING_BACKEND_LXML and self._CanUseLXML()
+        
+        if isinstance( parsing_text, ParsingNode ):
+            
+            # if we were handed a post, we search it in place, and the tags we find still belong to it
+            
+            node_type = PARSING_NODE_TYPE_LXML if use_lxml else PARSING_NODE_TYPE_SOUP
+            
+            if parsing_text.GetNodeType() == node_type:
+                
+                post = parsing_text.GetNode()
+                
+                try:
+                    
+                    if use_lxml:
+                        
+                        tags = self._FindLXMLTags( parsing_text, post = post )
+                        
+                    else:
+                        
+                        tags = self._FindHTMLTags( parsing_text, post = post )
+                        
+                    
+                    return ( tags, use_lxml, post )
+                    
+                except HydrusExceptions.ParseNodeNeedsTextException:
+                    
+                    pass
+                    
+                
+            
+            parsing_text = parsing_text.GetText()
+            
+        
+        try:
+            
+            if use_lxml:
+                
+                root = HG.client_controller.parsing_cache.GetLXMLTree( parsing_text )
+                
+            else:
+                
+                root = HG.client_controller.parsing_cache.GetSoup( parsing_text )
+                
+            
+        except Exception as e:
+            
+            raise HydrusExceptions.ParseException( 'Unable to parse that HTML: {}. HTML Sample: {}'.format( str( e ), parsing_text[:1024] ) )
+            
+        
+        if use_lxml:
+            
+            tags = self._FindLXMLTags( root )
+            
+        else:
+            
+            tags = self._FindHTMLTags( root )
+            
+        
+        return ( tags, use_lxml, None )
+        
+    
     def _GetParsePrettySeparator( self ):
         
         if self._content_to_fetch == HTML_CONTENT_HTML:
@@ -843,7 +1152,71 @@ class ParseFormulaHTML( ParseFormula ):
             
         
     
-    def _GetRawTextFromTag( self, tag ):
+    def _GetRawTextFromLXMLTag( self, tag, post = None ):
+        
+        if tag is None:
+            
+            result = None
+            
+        elif self._content_to_fetch == HTML_CONTENT_ATTRIBUTE:
+            
+            if isinstance( tag, lxml.etree._ElementTree ):
+                
+                result = None
+                
+            else:
+                
+                result = tag.get( self._attribute_to_fetch )
+                
+            
+            if result is None:
+                
+                raise HydrusExceptions.ParseException( 'Attribute ' + self._attribute_to_fetch + ' not found!' )
+                
+            
+            multi_valued_attributes = LXML_MULTI_VALUED_ATTRIBUTES[ '*' ].union( LXML_MULTI_VALUED_ATTRIBUTES.get( tag.tag, set() ) )
+            
+            if self._attribute_to_fetch in multi_valued_attributes:
+                
+                # bs4 splits these into a list, and we join it back up again
+                values = result.split()
+                
+                if len( values ) == 0:
+                    
+                    raise HydrusExceptions.ParseException( 'Attribute ' + self._attribute_to_fetch + ' not found!' )
+                    
+                
+                result = ' '.join( values )
+                
+            
+        elif self._content_to_fetch == HTML_CONTENT_STRING:
+            
+            result = GetLXMLTagString( tag, post = post )
+            
+        elif self._content_to_fetch == HTML_CONTENT_HTML:
+            
+            if isinstance( tag, lxml.etree._ElementTree ):
+                
+                tag = tag.getroot()
+                
+            
+            result = lxml.etree.tostring( tag, method = 'html', encoding = 'unicode', with_tail = False )
+            
+        
+        if post is not None and result is not None:
+            
+            result = HydrusText.RemoveNewlines( result )
+            
+        
+        if result is None or result == '':
+            
+            raise HydrusExceptions.ParseException( 'Empty/No results found!' )
+            
+        
+        return result
+        
+    
+    def _GetRawTextFromTag( self, tag, post = None ):
         
         if tag is None:
             
@@ -879,13 +1252,18 @@ class ParseFormulaHTML( ParseFormula ):
             
         elif self._content_to_fetch == HTML_CONTENT_STRING:
             
-            result = GetHTMLTagString( tag )
+            result = GetHTMLTagString( tag, post = post )
             
         elif self._content_to_fetch == HTML_CONTENT_HTML:
             
             result = str( tag )
             
         
+        if post is not None and result is not None:
+            
+            result = HydrusText.RemoveNewlines( result )
+            
+        
         if result is None or result == '':
             
             raise HydrusExceptions.ParseException( 'Empty/No results found!' )
@@ -894,7 +1272,7 @@ class ParseFormulaHTML( ParseFormula ):
         return result
         
     
-    def _GetRawTextsFromTags( self, tags ):
+    def _GetRawTextsFromLXMLTags( self, tags, post = None ):
         
         raw_texts = []
         
@@ -902,7 +1280,28 @@ class ParseFormulaHTML( ParseFormula ):
             
             try:
                 
-                raw_text = self._GetRawTextFromTag( tag )
+                raw_text = self._GetRawTextFromLXMLTag( tag, post = post )
+                
+                raw_texts.append( raw_text )
+                
+            except HydrusExceptions.ParseException:
+                
+                continue
+                
+            
+        
+        return raw_texts
+        
+    
+    def _GetRawTextsFromTags( self, tags, post = None ):
+        
+        raw_texts = []
+        
+        for tag in tags:
+            
+            try:
+                
+                raw_text = self._GetRawTextFromTag( tag, post = post )
                 
                 raw_texts.append( raw_text )
                 
@@ -937,19 +1336,17 @@ class ParseFormulaHTML( ParseFormula ):
     
     def _ParseRawTexts( self, parsing_context, parsing_text ):
         
-        try:
+        ( tags, use_lxml, post ) = self._FindTags( parsing_context, parsing_text )
+        
+        if use_lxml:
             
-            root = HG.client_controller.parsing_cache.GetSoup( parsing_text )
+            raw_texts = self._GetRawTextsFromLXMLTags( tags, post = post )
             
-        except Exception as e:
+        else:
             
-            raise HydrusExceptions.ParseException( 'Unable to parse that HTML: {}. HTML Sample: {}'.format( str( e ), parsing_text[:1024] ) )
+            raw_texts = self._GetRawTextsFromTags( tags, post = post )
             
         
-        tags = self._FindHTMLTags( root )
-        
-        raw_texts = self._GetRawTextsFromTags( tags )
-        
         return raw_texts
         
     
@@ -1064,6 +1461,59 @@ class ParseFormulaHTML( ParseFormula ):
             
         
     
+    def ParseSeparatedContent( self, parsing_context, parsing_text ):
+        
+        if not self._CanHandDownNodes():
+            
+            return self.Parse( parsing_context, parsing_text )
+            
+        
+        ( tags, use_lxml, post ) = self._FindTags( parsing_context, parsing_text )
+        
+        posts = []
+        
+        for tag in tags:
+            
+            if use_lxml:
+                
+                can_hand_down = not isinstance( tag, lxml.etree._ElementTree ) and tag.tag not in ( 'html', 'head', 'body' )
+                
+            else:
+                
+                can_hand_down = not isinstance( tag, bs4.BeautifulSoup ) and tag.name not in ( 'html', 'head', 'body' )
+                
+            
+            if can_hand_down:
+                
+                posts.append( ParsingNode( PARSING_NODE_TYPE_LXML if use_lxml else PARSING_NODE_TYPE_SOUP, tag ) )
+                
+            else:
+                
+                # a whole document can't be searched as if it were wrapped in its own, so these go down as text
+                
+                try:
+                    
+                    if use_lxml:
+                        
+                        raw_text = self._GetRawTextFromLXMLTag( tag, post = post )
+                        
+                    else:
+                        
+                        raw_text = self._GetRawTextFromTag( tag, post = post )
+                        
+                    
+                except HydrusExceptions.ParseException:
+                    
+                    continue
+                    
+                
+                posts.append( HydrusText.RemoveNewlines( raw_text ) )
+                
+            
+        
+        return posts
+        
+    
     def ParsesSeparatedContent( self ):
         
         return self._content_to_fetch == HTML_CONTENT_HTML
@@ -1130,69 +1580,356 @@ class ParseRuleHTML( HydrusSerialisable.SerialisableBase ):
                 
             
         
-        if rule_type == HTML_RULE_TYPE_DESCENDING:
+        if rule_type == HTML_RULE_TYPE_DESCENDING:
+            
+            if tag_attributes is None:
+                
+                tag_attributes = {}
+                
+            
+        elif rule_type == HTML_RULE_TYPE_ASCENDING:
+            
+            if tag_depth is None:
+                
+                tag_depth = 1
+                
+            
+        
+        if tag_string_string_match is None:
+            
+            tag_string_string_match = StringMatch()
+            
+        
+        self._rule_type = rule_type
+        self._tag_name = tag_name
+        self._tag_attributes = tag_attributes
+        self._tag_index = tag_index
+        self._tag_depth = tag_depth
+        self._should_test_tag_string = should_test_tag_string
+        self._tag_string_string_match = tag_string_string_match
+        
+        self._lxml_query = None
+        self._lxml_query_compiled = False
+        
+    
+    def _CheckCanSearchPostRoot( self ):
+        
+        # a post is searched as if it had been written out and parsed as its own document, which would wrap it in <html> and <body>
+        
+        if self._tag_name in ( None, 'html', 'head', 'body' ) and len( self._tag_attributes ) == 0:
+            
+            raise HydrusExceptions.ParseNodeNeedsTextException( 'This rule could match the post\'s document wrappers.' )
+            
+        
+    
+    def _CheckCanWalkOutOfPost( self ):
+        
+        # as its own document, a post's only ancestors would be those <body> and <html> wrappers
+        
+        if self._tag_name in ( None, 'html', 'body' ):
+            
+            raise HydrusExceptions.ParseNodeNeedsTextException( 'This rule could walk up to the post\'s document wrappers.' )
+            
+        
+    
+    def _CompileLXMLQuery( self ):
+        
+        # a descending rule becomes one xpath query that we can run from each node
+        # anything we can't translate exactly returns None and is left to bs4
+        
+        if not LXML_IS_OK or self._rule_type != HTML_RULE_TYPE_DESCENDING:
+            
+            return None
+            
+        
+        if self._tag_name is None:
+            
+            name_test = '*'
+            
+        elif isinstance( self._tag_name, str ) and LXML_XPATH_SAFE_NAME_RE.match( self._tag_name ) is not None:
+            
+            name_test = self._tag_name
+            
+        else:
+            
+            return None
+            
+        
+        predicates = []
+        variables = {}
+        
+        for ( i, ( key, value ) ) in enumerate( self._tag_attributes.items() ):
+            
+            if not isinstance( key, str ) or LXML_XPATH_SAFE_NAME_RE.match( key ) is None:
+                
+                return None
+                
+            
+            if not isinstance( value, str ):
+                
+                return None
+                
+            
+            # bs4 splits multi-valued attributes on unicode whitespace, but xpath only knows about ascii whitespace
+            if True in ( c.isspace() and c not in ' \t\n\r' for c in value ):
+                
+                return None
+                
+            
+            variable_name = 'v' + str( i )
+            
+            variables[ variable_name ] = value
+            
+            plain_predicate = '@{} = ${}'.format( key, variable_name )
+            
+            if value == '' or True in ( c.isspace() for c in value ):
+                
+                # bs4 also matches the whole list, joined with single spaces. an empty value matches an empty list, but not a missing attribute
+                multi_valued_predicate = '( @{} and normalize-space( @{} ) = ${} )'.format( key, key, variable_name )
+                
+            else:
+                
+                multi_valued_predicate = 'contains( concat( \' \', normalize-space( @{} ), \' \' ), concat( \' \', ${}, \' \' ) )'.format( key, variable_name )
+                
+            
+            multi_valued_tag_names = sorted( ( tag_name for ( tag_name, keys ) in LXML_MULTI_VALUED_ATTRIBUTES.items() if tag_name != '*' and key in keys ) )
+            
+            if key in LXML_MULTI_VALUED_ATTRIBUTES[ '*' ]:
+                
+                predicate = multi_valued_predicate
+                
+            elif len( multi_valued_tag_names ) == 0:
+                
+                predicate = plain_predicate
+                
+            elif self._tag_name is not None:
+                
+                predicate = multi_valued_predicate if self._tag_name in multi_valued_tag_names else plain_predicate
+                
+            else:
+                
+                self_test = ' or '.join( ( 'self::' + tag_name for tag_name in multi_valued_tag_names ) )
+                
+                predicate = '( ( ( {} ) and {} ) or ( not( {} ) and {} ) )'.format( self_test, multi_valued_predicate, self_test, plain_predicate )
+                
+            
+            predicates.append( '[' + predicate + ']' )
+            
+        
+        location_path = name_test + ''.join( predicates )
+        
+        xpath = lxml.etree.XPath( 'descendant::' + location_path )
+        
+        # lxml runs xpath on a tree from its root element, but bs4 searching the soup includes <html> itself
+        document_xpath = lxml.etree.XPath( 'descendant-or-self::' + location_path )
+        
+        return ( xpath, document_xpath, variables )
+        
+    
+    def _GetLXMLQuery( self ):
+        
+        if not self._lxml_query_compiled:
+            
+            self._lxml_query = self._CompileLXMLQuery()
+            
+            self._lxml_query_compiled = True
+            
+        
+        return self._lxml_query
+        
+    
+    def _PostRootMatches( self, tag ):
+        
+        # does the post itself match, as bs4 searching its document would see it?
+        
+        if self._tag_name is not None and tag.name != self._tag_name:
+            
+            return False
+            
+        
+        for ( key, value ) in self._tag_attributes.items():
+            
+            if not isinstance( value, str ):
+                
+                raise HydrusExceptions.ParseNodeNeedsTextException( 'This rule has a non-text attribute value.' )
+                
+            
+            tag_value = tag.get( key )
+            
+            if tag_value is None:
+                
+                return False
+                
+            
+            if isinstance( tag_value, list ):
+                
+                if value not in tag_value and ' '.join( tag_value ) != value:
+                    
+                    return False
+                    
+                
+            elif tag_value != value:
+                
+                return False
+                
+            
+        
+        return True
+        
+    
+    def _GetSerialisableInfo( self ):
+        
+        serialisable_tag_string_string_match = self._tag_string_string_match.GetSerialisableTuple()
+        
+        return ( self._rule_type, self._tag_name, self._tag_attributes, self._tag_index, self._tag_depth, self._should_test_tag_string, serialisable_tag_string_string_match )
+        
+    
+    def _InitialiseFromSerialisableInfo( self, serialisable_info ):
+        
+        ( self._rule_type, self._tag_name, self._tag_attributes, self._tag_index, self._tag_depth, self._should_test_tag_string, serialisable_tag_string_string_match ) = serialisable_info
+        
+        self._tag_string_string_match = HydrusSerialisable.CreateFromSerialisableTuple( serialisable_tag_string_string_match )
+        
+    
+    def _UpdateSerialisableInfo( self, version, old_serialisable_info ):
+        
+        if version == 1:
+            
+            ( rule_type, tag_name, tag_attributes, tag_index, tag_depth ) = old_serialisable_info
+            
+            should_test_tag_string = False
+            
+            tag_string_string_match = StringMatch()
+            
+            serialisable_tag_string_string_match = tag_string_string_match.GetSerialisableTuple()
+            
+            new_serialisable_info = ( rule_type, tag_name, tag_attributes, tag_index, tag_depth, should_test_tag_string, serialisable_tag_string_string_match )
+            
+            return ( 2, new_serialisable_info )
+            
+        
+    
+    def CanUseLXML( self ):
+        
+        if self._rule_type == HTML_RULE_TYPE_DESCENDING:
+            
+            return self._GetLXMLQuery() is not None
+            
+        else:
+            
+            return LXML_IS_OK
+            
+        
+    
+    def GetLXMLNodes( self, nodes, post = None ):
+        
+        new_nodes = []
+        
+        for node in nodes:
+            
+            if self._rule_type == HTML_RULE_TYPE_DESCENDING:
+                
+                ( xpath, document_xpath, variables ) = self._GetLXMLQuery()
+                
+                if isinstance( node, ParsingNode ):
+                    
+                    self._CheckCanSearchPostRoot()
+                    
+                    found_nodes = document_xpath( node.GetNode(), **variables )
+                    
+                elif isinstance( node, lxml.etree._ElementTree ):
+                    
+                    found_nodes = document_xpath( node, **variables )
+                    
+                else:
+                    
+                    found_nodes = xpath( node, **variables )
+                    
+                
+                if self._tag_index is not None:
+                    
+                    if len( found_nodes ) < self._tag_index + 1:
+                        
+                        found_nodes = []
+                        
+                    else:
+                        
+                        found_nodes = [ found_nodes[ self._tag_index ] ]
+                        
+                    
+                
+            elif self._rule_type == HTML_RULE_TYPE_ASCENDING:
+                
+                found_nodes = []
+                
+                if isinstance( node, ( ParsingNode, lxml.etree._ElementTree ) ):
+                    
+                    continue
+                    
+                
+                # if bs4 goes one above html, it gets the soup itself, so the tree stands in for that
+                potential_parents = itertools.chain( node.iterancestors(), ( node.getroottree(), ) )
+                
+                num_found = 0
+                
+                left_post = post is not None and node is post
+                
+                for potential_parent in potential_parents:
+                    
+                    if left_post:
+                        
+                        self._CheckCanWalkOutOfPost()
+                        
+                        break
+                        
+                    
+                    if self._tag_name is None:
+                        
+                        num_found += 1
+                        
+                    else:
+                        
+                        if not isinstance( potential_parent, lxml.etree._ElementTree ) and potential_parent.tag == self._tag_name:
+                            
+                            num_found += 1
+                            
+                        
+                    
+                    if num_found == self._tag_depth:
+                        
+                        found_nodes = [ potential_parent ]
+                        
+                        break
+                        
+                    
+                    left_post = post is not None and potential_parent is post
+                    
+                
+            
+            new_nodes.extend( found_nodes )
+            
+        
+        if self._should_test_tag_string:
             
-            if tag_attributes is None:
-                
-                tag_attributes = {}
-                
+            potential_nodes = new_nodes
             
-        elif rule_type == HTML_RULE_TYPE_ASCENDING:
+            new_nodes = []
             
-            if tag_depth is None:
+            for node in potential_nodes:
                 
-                tag_depth = 1
+                s = GetLXMLTagString( node, post = post )
+                
+                if self._tag_string_string_match.Matches( s ):
+                    
+                    new_nodes.append( node )
+                    
                 
             
         
-        if tag_string_string_match is None:
-            
-            tag_string_string_match = StringMatch()
-            
-        
-        self._rule_type = rule_type
-        self._tag_name = tag_name
-        self._tag_attributes = tag_attributes
-        self._tag_index = tag_index
-        self._tag_depth = tag_depth
-        self._should_test_tag_string = should_test_tag_string
-        self._tag_string_string_match = tag_string_string_match
-        
-        
-    
-    def _GetSerialisableInfo( self ):
-        
-        serialisable_tag_string_string_match = self._tag_string_string_match.GetSerialisableTuple()
-        
-        return ( self._rule_type, self._tag_name, self._tag_attributes, self._tag_index, self._tag_depth, self._should_test_tag_string, serialisable_tag_string_string_match )
-        
-    
-    def _InitialiseFromSerialisableInfo( self, serialisable_info ):
-        
-        ( self._rule_type, self._tag_name, self._tag_attributes, self._tag_index, self._tag_depth, self._should_test_tag_string, serialisable_tag_string_string_match ) = serialisable_info
-        
-        self._tag_string_string_match = HydrusSerialisable.CreateFromSerialisableTuple( serialisable_tag_string_string_match )
-        
-    
-    def _UpdateSerialisableInfo( self, version, old_serialisable_info ):
-        
-        if version == 1:
-            
-            ( rule_type, tag_name, tag_attributes, tag_index, tag_depth ) = old_serialisable_info
-            
-            should_test_tag_string = False
-            
-            tag_string_string_match = StringMatch()
-            
-            serialisable_tag_string_string_match = tag_string_string_match.GetSerialisableTuple()
-            
-            new_serialisable_info = ( rule_type, tag_name, tag_attributes, tag_index, tag_depth, should_test_tag_string, serialisable_tag_string_string_match )
-            
-            return ( 2, new_serialisable_info )
-            
+        return new_nodes
         
     
-    def GetNodes( self, nodes ):
+    def GetNodes( self, nodes, post = None ):
         
         new_nodes = []
         
@@ -1211,7 +1948,20 @@ class ParseRuleHTML( HydrusSerialisable.SerialisableBase ):
                     kwargs[ 'name' ] = self._tag_name
                     
                 
-                found_nodes = node.find_all( **kwargs )
+                if isinstance( node, ParsingNode ):
+                    
+                    self._CheckCanSearchPostRoot()
+                    
+                    post_tag = node.GetNode()
+                    
+                    found_nodes = [ post_tag ] if self._PostRootMatches( post_tag ) else []
+                    
+                    found_nodes.extend( post_tag.find_all( **kwargs ) )
+                    
+                else:
+                    
+                    found_nodes = node.find_all( **kwargs )
+                    
                 
                 if self._tag_index is not None:
                     
@@ -1229,14 +1979,28 @@ class ParseRuleHTML( HydrusSerialisable.SerialisableBase ):
                 
                 found_nodes = []
                 
+                if isinstance( node, ParsingNode ):
+                    
+                    continue
+                    
+                
                 still_in_tree = lambda node: isinstance( node, bs4.element.Tag ) # if we go one above html, we get the BS document itself
                 
                 num_found = 0
                 
                 potential_parent = node.parent
                 
+                left_post = post is not None and node is post
+                
                 while still_in_tree( potential_parent ):
                     
+                    if left_post:
+                        
+                        self._CheckCanWalkOutOfPost()
+                        
+                        break
+                        
+                    
                     if self._tag_name is None:
                         
                         num_found += 1
@@ -1256,6 +2020,8 @@ class ParseRuleHTML( HydrusSerialisable.SerialisableBase ):
                         break
                         
                     
+                    left_post = post is not None and potential_parent is post
+                    
                     potential_parent = potential_parent.parent
                     
                 
@@ -1271,7 +2037,7 @@ class ParseRuleHTML( HydrusSerialisable.SerialisableBase ):
             
             for node in potential_nodes:
                 
-                s = GetHTMLTagString( node )
+                s = GetHTMLTagString( node, post = post )
                 
                 if self._tag_string_string_match.Matches( s ):
                     
@@ -1374,6 +2140,39 @@ class ParseFormulaJSON( ParseFormula ):
         self._content_to_fetch = content_to_fetch
         
     
+    def _CanHandDownNodes( self ):
+        
+        # the posts are the json of the roots, untouched, so the roots themselves will do
+        
+        return self._content_to_fetch == JSON_CONTENT_JSON and self._string_match.MatchesAnything() and not self._string_converter.MakesChanges()
+        
+    
+    def _GetJSON( self, parsing_text ):
+        
+        if isinstance( parsing_text, ParsingNode ):
+            
+            if parsing_text.GetNodeType() == PARSING_NODE_TYPE_JSON:
+                
+                return parsing_text.GetNode()
+                
+            
+            parsing_text = parsing_text.GetText()
+            
+        
+        try:
+            
+            j = HG.client_controller.parsing_cache.GetJSON( parsing_text )
+            
+        except Exception as e:
+            
+            message = 'Unable to parse that JSON: {}. JSON sample: {}'.format( str( e ), parsing_text[:1024] )
+            
+            raise HydrusExceptions.ParseException( message )
+            
+        
+        return j
+        
+    
     def _GetParsePrettySeparator( self ):
         
         if self._content_to_fetch == JSON_CONTENT_JSON:
@@ -1388,6 +2187,52 @@ class ParseFormulaJSON( ParseFormula ):
     
     def _GetRawTextsFromJSON( self, j ):
         
+        roots = self._GetRootsFromJSON( j )
+        
+        raw_texts = []
+        
+        for root in roots:
+            
+            if self._content_to_fetch == JSON_CONTENT_STRING:
+                
+                if isinstance( root, ( list, dict ) ):
+                    
+                    continue
+                    
+                
+                raw_text = str( root )
+                
+                raw_texts.append( raw_text )
+                
+            elif self._content_to_fetch == JSON_CONTENT_JSON:
+                
+                raw_text = json.dumps( root )
+                
+                raw_texts.append( raw_text )
+                
+            elif self._content_to_fetch == JSON_CONTENT_DICT_KEYS:
+                
+                if isinstance( root, dict ):
+                    
+                    pairs = list( root.items() )
+                    
+                    pairs.sort()
+                    
+                    for ( key, value ) in pairs:
+                        
+                        raw_text = str( key )
+                        
+                        raw_texts.append( raw_text )
+                        
+                    
+                
+            
+        
+        return raw_texts
+        
+    
+    def _GetRootsFromJSON( self, j ):
+        
         roots = ( j, )
         
         for ( parse_rule_type, parse_rule ) in self._parse_rules:
@@ -1460,46 +2305,7 @@ class ParseFormulaJSON( ParseFormula ):
             roots = next_roots
             
         
-        raw_texts = []
-        
-        for root in roots:
-            
-            if self._content_to_fetch == JSON_CONTENT_STRING:
-                
-                if isinstance( root, ( list, dict ) ):
-                    
-                    continue
-                    
-                
-                raw_text = str( root )
-                
-                raw_texts.append( raw_text )
-                
-            elif self._content_to_fetch == JSON_CONTENT_JSON:
-                
-                raw_text = json.dumps( root )
-                
-                raw_texts.append( raw_text )
-                
-            elif self._content_to_fetch == JSON_CONTENT_DICT_KEYS:
-                
-                if isinstance( root, dict ):
-                    
-                    pairs = list( root.items() )
-                    
-                    pairs.sort()
-                    
-                    for ( key, value ) in pairs:
-                        
-                        raw_text = str( key )
-                        
-                        raw_texts.append( raw_text )
-                        
-                    
-                
-            
-        
-        return raw_texts
+        return roots
         
     
     def _GetSerialisableInfo( self ):
@@ -1522,16 +2328,7 @@ class ParseFormulaJSON( ParseFormula ):
     
     def _ParseRawTexts( self, parsing_context, parsing_text ):
         
-        try:
-            
-            j = HG.client_controller.parsing_cache.GetJSON( parsing_text )
-            
-        except Exception as e:
-            
-            message = 'Unable to parse that JSON: {}. JSON sample: {}'.format( str( e ), parsing_text[:1024] )
-            
-            raise HydrusExceptions.ParseException( message )
-            
+        j = self._GetJSON( parsing_text )
         
         raw_texts = self._GetRawTextsFromJSON( j )
         
@@ -1572,6 +2369,20 @@ class ParseFormulaJSON( ParseFormula ):
             
         
     
+    def ParseSeparatedContent( self, parsing_context, parsing_text ):
+        
+        if not self._CanHandDownNodes():
+            
+            return self.Parse( parsing_context, parsing_text )
+            
+        
+        j = self._GetJSON( parsing_text )
+        
+        roots = self._GetRootsFromJSON( j )
+        
+        return [ ParsingNode( PARSING_NODE_TYPE_JSON, root ) for root in roots ]
+        
+    
     def ParsesSeparatedContent( self ):
         
         return self._content_to_fetch == JSON_CONTENT_JSON
@@ -1970,9 +2781,9 @@ class PageParser( HydrusSerialisable.SerialisableBaseNamed ):
     
     SERIALISABLE_TYPE = HydrusSerialisable.SERIALISABLE_TYPE_PAGE_PARSER
     SERIALISABLE_NAME = 'Page Parser'
-    SERIALISABLE_VERSION = 2
+    SERIALISABLE_VERSION = 3
     
-    def __init__( self, name, parser_key = None, string_converter = None, sub_page_parsers = None, content_parsers = None, example_urls = None, example_parsing_context = None ):
+    def __init__( self, name, parser_key = None, string_converter = None, sub_page_parsers = None, content_parsers = None, example_urls = None, example_parsing_context = None, html_parsing_backend = None ):
         
         if parser_key is None:
             
@@ -2006,6 +2817,11 @@ class PageParser( HydrusSerialisable.SerialisableBaseNamed ):
             example_parsing_context[ 'url' ] = 'http://example.com/posts/index.php?id=123456'
             
         
+        if html_parsing_backend is None:
+            
+            html_parsing_backend = HTML_PARSING_BACKEND_DEFAULT
+            
+        
         HydrusSerialisable.SerialisableBaseNamed.__init__( self, name )
         
         self._parser_key = parser_key
@@ -2014,6 +2830,7 @@ class PageParser( HydrusSerialisable.SerialisableBaseNamed ):
         self._content_parsers = content_parsers
         self._example_urls = example_urls
         self._example_parsing_context = example_parsing_context
+        self._html_parsing_backend = html_parsing_backend
         
     
     def _GetSerialisableInfo( self ):
@@ -2025,12 +2842,12 @@ class PageParser( HydrusSerialisable.SerialisableBaseNamed ):
         
         serialisable_content_parsers = HydrusSerialisable.SerialisableList( self._content_parsers ).GetSerialisableTuple()
         
-        return ( self._name, serialisable_parser_key, serialisable_string_converter, serialisable_sub_page_parsers, serialisable_content_parsers, self._example_urls, self._example_parsing_context )
+        return ( self._name, serialisable_parser_key, serialisable_string_converter, serialisable_sub_page_parsers, serialisable_content_parsers, self._example_urls, self._example_parsing_context, self._html_parsing_backend )
         
     
     def _InitialiseFromSerialisableInfo( self, serialisable_info ):
         
-        ( self._name, serialisable_parser_key, serialisable_string_converter, serialisable_sub_page_parsers, serialisable_content_parsers, self._example_urls, self._example_parsing_context ) = serialisable_info
+        ( self._name, serialisable_parser_key, serialisable_string_converter, serialisable_sub_page_parsers, serialisable_content_parsers, self._example_urls, self._example_parsing_context, self._html_parsing_backend ) = serialisable_info
         
         self._parser_key = bytes.fromhex( serialisable_parser_key )
         self._string_converter = HydrusSerialisable.CreateFromSerialisableTuple( serialisable_string_converter )
@@ -2053,6 +2870,17 @@ class PageParser( HydrusSerialisable.SerialisableBaseNamed ):
             return ( 2, new_serialisable_info )
             
         
+        if version == 2:
+            
+            ( name, serialisable_parser_key, serialisable_string_converter, serialisable_sub_page_parsers, serialisable_content_parsers, example_urls, example_parsing_context ) = old_serialisable_info
+            
+            html_parsing_backend = HTML_PARSING_BACKEND_DEFAULT
+            
+            new_serialisable_info = ( name, serialisable_parser_key, serialisable_string_converter, serialisable_sub_page_parsers, serialisable_content_parsers, example_urls, example_parsing_context, html_parsing_backend )
+            
+            return ( 3, new_serialisable_info )
+            
+        
     
     def CanOnlyGenerateGalleryURLs( self ):
         
@@ -2096,6 +2924,11 @@ class PageParser( HydrusSerialisable.SerialisableBaseNamed ):
         return self._example_urls
         
     
+    def GetHTMLParsingBackend( self ):
+        
+        return self._html_parsing_backend
+        
+    
     def GetNamespaces( self ):
         
         # this in future could expand to be more granular like:
@@ -2145,6 +2978,12 @@ class PageParser( HydrusSerialisable.SerialisableBaseNamed ):
     
     def Parse( self, parsing_context, parsing_text ):
         
+        if isinstance( parsing_text, ParsingNode ) and self._string_converter.MakesChanges():
+            
+            # a post our parent's formula found. we work on it in place unless we have to change its text
+            parsing_text = parsing_text.GetText()
+            
+        
         try:
             
             converted_parsing_text = self._string_converter.Convert( parsing_text )
@@ -2165,6 +3004,14 @@ class PageParser( HydrusSerialisable.SerialisableBaseNamed ):
         
         #
         
+        if self._html_parsing_backend != HTML_PARSING_BACKEND_DEFAULT:
+            
+            # sub-page parsers inherit this unless they set their own
+            parsing_context = dict( parsing_context )
+            
+            parsing_context[ 'html_parsing_backend' ] = self._html_parsing_backend
+            
+        
         whole_page_parse_results = []
         
         try:
@@ -2211,7 +3058,7 @@ class PageParser( HydrusSerialisable.SerialisableBaseNamed ):
                 
                 for ( formula, page_parser ) in self._sub_page_parsers:
                     
-                    posts = formula.Parse( parsing_context, converted_parsing_text )
+                    posts = formula.ParseSeparatedContent( parsing_context, converted_parsing_text )
                     
                     for post in posts:
                         
@@ -2293,6 +3140,11 @@ class PageParser( HydrusSerialisable.SerialisableBaseNamed ):
         self._example_parsing_context = example_parsing_context
         
     
+    def SetHTMLParsingBackend( self, html_parsing_backend ):
+        
+        self._html_parsing_backend = html_parsing_backend
+        
+    
     def SetParserKey( self, parser_key ):
         
         self._parser_key = parser_key
@@ -3197,6 +4049,11 @@ class StringMatch( HydrusSerialisable.SerialisableBase ):
             
         
     
+    def MatchesAnything( self ):
+        
+        return self._match_type == STRING_MATCH_ANY and self._min_chars is None and self._max_chars is None
+        
+    
     def Test( self, text ):
         
         text_len = len( text )
@@ -80,10 +80,18 @@ def GenerateHydrusBitmapFromPILImage( pil_image, compressed = True ):
     
 class ImageRenderer( object ):
     
-    def __init__( self, media ):
+    def __init__( self, media, target_resolution = None, initialise_in_thread = True ):
         
         self._numpy_image = None
         
+        # halved copies of the image, for zoomed out views
+        self._mip_numpy_images = []
+        
+        # if we know roughly what size we'll be shown at, a big jpeg can decode smaller. we go back for the full image if a bigger zoom asks for it
+        self._decode_target_resolution = target_resolution
+        self._numpy_image_is_reduced = False
+        self._full_numpy_image_load_started = False
+        
         self._hash = media.GetHash()
         self._mime = media.GetMime()
         
@@ -94,26 +102,108 @@ class ImageRenderer( object ):
         
         self._path = client_files_manager.GetFilePath( self._hash, self._mime )
         
-        HG.client_controller.CallToThread( self._Initialise )
+        self._lock = threading.Lock()
+        
+        if initialise_in_thread:
+            
+            HG.client_controller.CallToThread( self.Initialise )
+            
         
     
-    def _GetNumPyImage( self, target_resolution = None ):
+    def _GetMipNumPyImage( self, zoom ):
+        
+        # the smallest level that is still at least as big as what we want, so we only ever scale down a little from it
         
-        if target_resolution is None:
+        numpy_image = self._numpy_image
+        
+        level = 0
+        
+        while zoom * 2 ** ( level + 1 ) <= 1.0:
             
-            numpy_image = self._numpy_image
+            ( height, width, depth ) = numpy_image.shape
             
-        else:
+            if width == 1 or height == 1:
+                
+                break
+                
             
-            numpy_image = ClientImageHandling.ResizeNumPyImageForMediaViewer( self._mime, self._numpy_image, ( target_resolution.width(), target_resolution.height() ) )
+            if level == len( self._mip_numpy_images ):
+                
+                self._mip_numpy_images.append( ClientImageHandling.GenerateHalfSizeNumPyImage( numpy_image ) )
+                
+            
+            numpy_image = self._mip_numpy_images[ level ]
+            
+            level += 1
             
         
         return numpy_image
         
     
-    def _Initialise( self ):
+    def _GetNumPyImage( self, clip_rect = None, target_resolution = None ):
+        
+        # clip_rect is a region of the image as it is at target_resolution
+        
+        with self._lock:
+            
+            # the full image may come in from the worker at any time, so we stick with whatever we have now for this whole call
+            numpy_image = self._numpy_image
+            
+            ( image_height, image_width, depth ) = numpy_image.shape
+            
+            if self._numpy_image_is_reduced:
+                
+                if target_resolution is None or target_resolution.width() > image_width or target_resolution.height() > image_height:
+                    
+                    # this is often the Qt thread, so we draw from the reduced image for now and let the worker swap the full one in
+                    self._StartFullNumPyImageLoad()
+                    
+                
+            
+            if target_resolution is None:
+                
+                ( target_width, target_height ) = ( image_width, image_height )
+                
+            else:
+                
+                ( target_width, target_height ) = ( target_resolution.width(), target_resolution.height() )
+                
+            
+            if clip_rect is None and ( target_width, target_height ) == ( image_width, image_height ):
+                
+                return numpy_image
+                
+            
+            zoom = min( target_width / image_width, target_height / image_height )
+            
+            source_numpy_image = self._GetMipNumPyImage( zoom )
+            
+        
+        if clip_rect is None:
+            
+            return ClientImageHandling.ResizeNumPyImageForMediaViewer( self._mime, source_numpy_image, ( target_width, target_height ) )
+            
+        
+        ( source_height, source_width, depth ) = source_numpy_image.shape
+        
+        x_scale = target_width / source_width
+        y_scale = target_height / source_height
+        
+        clip = ( clip_rect.x() / x_scale, clip_rect.y() / y_scale, clip_rect.width() / x_scale, clip_rect.height() / y_scale )
+        
+        return ClientImageHandling.ResizeNumPyImageClipForMediaViewer( self._mime, source_numpy_image, clip, ( clip_rect.width(), clip_rect.height() ) )
+        
+    
+    def _StartFullNumPyImageLoad( self ):
+        
+        if self._full_numpy_image_load_started:
+            
+            return
+            
+        
+        self._full_numpy_image_load_started = True
         
-        self._numpy_image = ClientImageHandling.GenerateNumPyImage( self._path, self._mime )
+        HG.client_controller.CallToThread( self.LoadFullNumPyImage )
         
     
     def GetEstimatedMemoryFootprint( self ):
@@ -126,7 +216,7 @@ class ImageRenderer( object ):
             
         else:
             
-            return self._numpy_image.nbytes
+            return self._numpy_image.nbytes + sum( ( mip_numpy_image.nbytes for mip_numpy_image in self._mip_numpy_images ) )
             
         
     
@@ -136,11 +226,9 @@ class ImageRenderer( object ):
     
     def GetResolution( self ): return self._resolution
     
-    def GetQtImage( self, target_resolution = None ):
+    def GetQtImage( self, clip_rect = None, target_resolution = None ):
         
-        # add region param to this to allow clipping before resize
-        
-        numpy_image = self._GetNumPyImage( target_resolution = target_resolution )
+        numpy_image = self._GetNumPyImage( clip_rect = clip_rect, target_resolution = target_resolution )
         
         ( height, width, depth ) = numpy_image.shape
         
@@ -149,11 +237,9 @@ class ImageRenderer( object ):
         return HG.client_controller.bitmap_manager.GetQtImageFromBuffer( width, height, depth * 8, data )
         
     
-    def GetQtPixmap( self, target_resolution = None ):
-        
-        # add region param to this to allow clipping before resize
+    def GetQtPixmap( self, clip_rect = None, target_resolution = None ):
         
-        numpy_image = self._GetNumPyImage( target_resolution = target_resolution )
+        numpy_image = self._GetNumPyImage( clip_rect = clip_rect, target_resolution = target_resolution )
         
         ( height, width, depth ) = numpy_image.shape
         
@@ -162,11 +248,98 @@ class ImageRenderer( object ):
         return HG.client_controller.bitmap_manager.GetQtPixmapFromBuffer( width, height, depth * 8, data )
         
     
+    def Initialise( self ):
+        
+        numpy_image = ClientImageHandling.GenerateNumPyImage( self._path, self._mime, target_resolution = self._decode_target_resolution )
+        
+        if self._decode_target_resolution is not None:
+            
+            ( image_height, image_width, depth ) = numpy_image.shape
+            ( media_width, media_height ) = self._resolution
+            
+            # area rather than width/height, in case of EXIF rotation
+            self._numpy_image_is_reduced = image_width * image_height < media_width * media_height
+            
+        
+        self._numpy_image = numpy_image
+        
+    
+    def IsFullQuality( self ):
+        
+        return not self._numpy_image_is_reduced
+        
+    
     def IsReady( self ):
         
         return self._numpy_image is not None
         
     
+    def LoadFullNumPyImage( self ):
+        
+        # slow, so never call this on the Qt thread
+        
+        if not self._numpy_image_is_reduced:
+            
+            return
+            
+        
+        numpy_image = ClientImageHandling.GenerateNumPyImage( self._path, self._mime )
+        
+        with self._lock:
+            
+            if not self._numpy_image_is_reduced:
+                
+                return
+                
+            
+            self._numpy_image = numpy_image
+            
+            self._mip_numpy_images = []
+            
+            self._numpy_image_is_reduced = False
+            
+        
+    
+class ImageTile( object ):
+    
+    def __init__( self, hash, clip_rect, qt_pixmap ):
+        
+        self.hash = hash
+        self.clip_rect = clip_rect
+        self.qt_pixmap = qt_pixmap
+        
+        self._num_bytes = self.qt_pixmap.width() * self.qt_pixmap.height() * 3
+        
+    
+    def GetEstimatedMemoryFootprint( self ):
+        
+        return self._num_bytes
+        
+    
+class ThumbnailComposite( object ):
+    
+    def __init__( self, thumbnail_hydrus_bitmap, draw_state, qt_image ):
+        
+        # the thumbnail as it is in the grid, with background, border, banners and icons drawn on
+        # it is good as long as the raw thumbnail and everything that went into drawing it are the same
+        
+        self.thumbnail_hydrus_bitmap = thumbnail_hydrus_bitmap
+        self.draw_state = draw_state
+        self.qt_image = qt_image
+        
+        self._num_bytes = self.qt_image.width() * self.qt_image.height() * 3
+        
+    
+    def GetEstimatedMemoryFootprint( self ):
+        
+        return self._num_bytes
+        
+    
+    def IsValid( self, thumbnail_hydrus_bitmap, draw_state ):
+        
+        return thumbnail_hydrus_bitmap is self.thumbnail_hydrus_bitmap and draw_state == self.draw_state
+        
+    
 class RasterContainer( object ):
     
     def __init__( self, media, target_resolution = None ):
@@ -1046,6 +1046,8 @@ class FrameGUI( ClientGUITopLevelWindows.MainFrameThatResizes ):
         
         text = 'This will iterate through every file in your database\'s file storage, removing any it does not expect to be there. It may take some time.'
         text += os.linesep * 2
+        text += 'Folders that were clean on a previous run in the last 30 days and have not changed since are skipped.'
+        text += os.linesep * 2
         text += 'Files and thumbnails will be inaccessible while this occurs, so it is best to leave the client alone until it is done.'
         
         result = ClientGUIDialogsQuick.GetYesNo( self, text, yes_label = 'do it', no_label = 'forget it' )
@@ -3008,6 +3010,39 @@ class FrameGUI( ClientGUITopLevelWindows.MainFrameThatResizes ):
         self._statusbar.SetStatusText( db_status, 5, tooltip = db_tooltip )
         
     
+    def _RegenerateTagCooccurrenceCache( self ):
+        
+        service_key = ClientGUIDialogsQuick.SelectServiceKey( service_types = HC.REAL_TAG_SERVICES )
+        
+        if service_key is None:
+            
+            return
+            
+        
+        choice_tuples = []
+        
+        choice_tuples.append( ( 'build the cache', True, 'Start a fresh co-occurrence cache for this service. It makes related tag suggestions fast and consistent, at the cost of some disk space and a little extra work whenever tags change. It is built during idle time, and related tags will use the old sampling search until it is done.' ) )
+        choice_tuples.append( ( 'delete the cache', False, 'Delete any co-occurrence cache for this service. Related tags will go back to the old sampling search.' ) )
+        
+        try:
+            
+            build_it = ClientGUIDialogsQuick.SelectFromListButtons( self, 'tag co-occurrence cache', choice_tuples )
+            
+        except HydrusExceptions.CancelledException:
+            
+            return
+            
+        
+        if build_it:
+            
+            self._controller.Write( 'regenerate_tag_cooccurrence_cache', service_key )
+            
+        else:
+            
+            self._controller.Write( 'delete_tag_cooccurrence_cache', service_key )
+            
+        
+    
     def _RegenerateTagMappingsCache( self ):
         
         message = 'This will delete and then recreate the entire tag mappings cache, which is used for tag searching, loading, and autocomplete counts. This is useful if miscounting has somehow occurred.'
@@ -3094,6 +3129,15 @@ class FrameGUI( ClientGUITopLevelWindows.MainFrameThatResizes ):
         frame.SetPanel( panel )
         
     
+    def _ReviewDBJobStatistics( self ):
+        
+        frame = ClientGUITopLevelWindowsPanels.FrameThatTakesScrollablePanel( self, 'review db job statistics' )
+        
+        panel = ClientGUIScrolledPanelsReview.ReviewDBJobStatistics( frame, self._controller )
+        
+        frame.SetPanel( panel )
+        
+    
     def _ReviewFileMaintenance( self ):
         
         frame = ClientGUITopLevelWindowsPanels.FrameThatTakesScrollablePanel( self, 'file maintenance' )
@@ -4317,6 +4361,7 @@ The password is cleartext here but obscured in the entry dialog. Enter a blank p
             
             ClientGUIMenus.AppendMenuItem( submenu, 'tag mappings cache', 'Delete and recreate the tag mappings cache, fixing any miscounts.', self._RegenerateTagMappingsCache )
             ClientGUIMenus.AppendMenuItem( submenu, 'tag siblings cache', 'Delete and recreate the tag siblings cache.', self._RegenerateTagSiblingsCache )
+            ClientGUIMenus.AppendMenuItem( submenu, 'tag co-occurrence cache', 'Build or delete the cache that speeds up related tag suggestions.', self._RegenerateTagCooccurrenceCache )
             ClientGUIMenus.AppendMenuItem( submenu, 'repopulate and correct tag search cache', 'Repopulate the cache hydrus uses for fast tag search.', self._RepopulateTagSearchCache )
             ClientGUIMenus.AppendMenuItem( submenu, 'similar files search tree', 'Delete and recreate the similar files search tree.', self._RegenerateSimilarFilesTree )
             
@@ -4678,6 +4723,7 @@ The password is cleartext here but obscured in the entry dialog. Enter a blank p
             data_actions = QW.QMenu( debug )
             
             ClientGUIMenus.AppendMenuCheckItem( data_actions, 'db ui-hang relief mode', 'Have UI-synchronised database jobs process pending Qt events while they wait.', HG.db_ui_hang_relief_mode, self._SwitchBoolean, 'db_ui_hang_relief_mode' )
+            ClientGUIMenus.AppendMenuItem( data_actions, 'review db job statistics', 'Show how many times each database job has run, how long they took, and how long they waited.', self._ReviewDBJobStatistics )
             ClientGUIMenus.AppendMenuItem( data_actions, 'review threads', 'Show current threads and what they are doing.', self._ReviewThreads )
             ClientGUIMenus.AppendMenuItem( data_actions, 'show scheduled jobs', 'Print some information about the currently scheduled jobs log.', self._DebugShowScheduledJobs )
             ClientGUIMenus.AppendMenuItem( data_actions, 'subscription manager snapshot', 'Have the subscription system show what it is doing.', self._controller.subscriptions_manager.ShowSnapshot )
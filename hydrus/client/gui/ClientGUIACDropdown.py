@@ -1,5 +1,3 @@
-import collections
-import itertools
 import os
 import typing
 
@@ -7,7 +5,6 @@ from qtpy import QtCore as QC
 from qtpy import QtWidgets as QW
 
 from hydrus.core import HydrusConstants as HC
-from hydrus.core import HydrusData
 from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusTags
@@ -69,7 +66,7 @@ def InsertTagPredicates( predicates: list, tag_service_key: bytes, parsed_autoco
         PutAtTopOfMatches( predicates, ideal_sibling_predicate, insert_if_does_not_exist = insert_if_does_not_exist )
         
     
-def ReadFetch( win, job_key, results_callable, parsed_autocomplete_text: ClientSearch.ParsedAutocompleteText, qt_media_callable, file_search_context: ClientSearch.FileSearchContext, synchronised, include_unusual_predicate_types, results_cache: ClientSearch.PredicateResultsCache, under_construction_or_predicate, force_system_everything ):
+def ReadFetch( win, job_key, results_callable, parsed_autocomplete_text: ClientSearch.ParsedAutocompleteText, qt_tag_count_index_callable, file_search_context: ClientSearch.FileSearchContext, synchronised, include_unusual_predicate_types, results_cache: ClientSearch.PredicateResultsCache, under_construction_or_predicate, force_system_everything ):
     
     file_service_key = file_search_context.GetFileServiceKey()
     tag_search_context = file_search_context.GetTagSearchContext()
@@ -118,11 +115,11 @@ def ReadFetch( win, job_key, results_callable, parsed_autocomplete_text: ClientS
         
         fetch_from_db = True
         
-        if synchronised and qt_media_callable is not None:
+        if synchronised and qt_tag_count_index_callable is not None:
             
             try:
                 
-                media = HG.client_controller.CallBlockingToQt( win, qt_media_callable )
+                tag_count_index = HG.client_controller.CallBlockingToQt( win, qt_tag_count_index_callable, tag_service_key, ClientTags.TAG_DISPLAY_SIBLINGS_AND_PARENTS )
                 
             except HydrusExceptions.QtDeadWindowException:
                 
@@ -134,7 +131,7 @@ def ReadFetch( win, job_key, results_callable, parsed_autocomplete_text: ClientS
                 return
                 
             
-            media_available_and_good = media is not None and len( media ) > 0
+            media_available_and_good = tag_count_index is not None and tag_count_index.GetNumFiles() > 0
             
             if media_available_and_good:
                 
@@ -216,50 +213,23 @@ def ReadFetch( win, job_key, results_callable, parsed_autocomplete_text: ClientS
             
         else:
             
-            # it is possible that media will change between calls to this, so don't cache it
-            # it's also quick as hell, so who cares
+            # the page keeps its tag counts up to date as its media and tags change, and the index gives us a quick shortlist of tags for this text
             
-            tags_managers = []
+            ( current_tags_to_count, pending_tags_to_count ) = tag_count_index.GetCurrentAndPendingCountsForSearch( autocomplete_search_text )
             
-            for m in media:
+            if not tag_search_context.include_current_tags:
                 
-                if m.IsCollection():
-                    
-                    tags_managers.extend( m.GetSingletonsTagsManagers() )
-                    
-                else:
-                    
-                    tags_managers.append( m.GetTagsManager() )
-                    
+                current_tags_to_count = {}
                 
             
-            if job_key.IsCancelled():
+            if not tag_search_context.include_pending_tags:
                 
-                return
+                pending_tags_to_count = {}
                 
             
-            current_tags_to_count = collections.Counter()
-            pending_tags_to_count = collections.Counter()
-            
-            include_current_tags = tag_search_context.include_current_tags
-            include_pending_tags = tag_search_context.include_pending_tags
-            
-            for group_of_tags_managers in HydrusData.SplitListIntoChunks( tags_managers, 1000 ):
-                
-                if include_current_tags:
-                    
-                    current_tags_to_count.update( itertools.chain.from_iterable( tags_manager.GetCurrent( tag_service_key, ClientTags.TAG_DISPLAY_SIBLINGS_AND_PARENTS ) for tags_manager in group_of_tags_managers ) )
-                    
-                
-                if include_pending_tags:
-                    
-                    pending_tags_to_count.update( itertools.chain.from_iterable( [ tags_manager.GetPending( tag_service_key, ClientTags.TAG_DISPLAY_SIBLINGS_AND_PARENTS ) for tags_manager in group_of_tags_managers ] ) )
-                    
+            if job_key.IsCancelled():
                 
-                if job_key.IsCancelled():
-                    
-                    return
-                    
+                return
                 
             
             tags_to_do = set()
@@ -274,7 +244,7 @@ def ReadFetch( win, job_key, results_callable, parsed_autocomplete_text: ClientS
                 return
                 
             
-            predicates = [ ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_TAG, tag, parsed_autocomplete_text.inclusive, current_tags_to_count[ tag ], pending_tags_to_count[ tag ] ) for tag in tags_to_do ]
+            predicates = [ ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_TAG, tag, parsed_autocomplete_text.inclusive, current_tags_to_count.get( tag, 0 ), pending_tags_to_count.get( tag, 0 ) ) for tag in tags_to_do ]
             
             if job_key.IsCancelled():
                 
@@ -1428,7 +1398,7 @@ class AutoCompleteDropdownTagsRead( AutoCompleteDropdownTags ):
     searchChanged = QC.Signal( ClientSearch.FileSearchContext )
     searchCancelled = QC.Signal()
     
-    def __init__( self, parent: QW.QWidget, page_key, file_search_context: ClientSearch.FileSearchContext, media_sort_widget: typing.Optional[ ClientGUISearch.MediaSortControl ] = None, media_collect_widget: typing.Optional[ ClientGUISearch.MediaCollectControl ] = None, media_callable = None, synchronised = True, include_unusual_predicate_types = True, allow_all_known_files = True, force_system_everything = False, hide_favourites_edit_actions = False ):
+    def __init__( self, parent: QW.QWidget, page_key, file_search_context: ClientSearch.FileSearchContext, media_sort_widget: typing.Optional[ ClientGUISearch.MediaSortControl ] = None, media_collect_widget: typing.Optional[ ClientGUISearch.MediaCollectControl ] = None, tag_count_index_callable = None, synchronised = True, include_unusual_predicate_types = True, allow_all_known_files = True, force_system_everything = False, hide_favourites_edit_actions = False ):
         
         self._page_key = page_key
         
@@ -1446,7 +1416,7 @@ class AutoCompleteDropdownTagsRead( AutoCompleteDropdownTags ):
         
         self._allow_all_known_files = allow_all_known_files
         
-        self._media_callable = media_callable
+        self._tag_count_index_callable = tag_count_index_callable
         
         self._under_construction_or_predicate = None
         
@@ -1869,7 +1839,7 @@ class AutoCompleteDropdownTagsRead( AutoCompleteDropdownTags ):
             under_construction_or_predicate = self._under_construction_or_predicate.Duplicate()
             
         
-        HG.client_controller.CallToThread( ReadFetch, self, job_key, self.SetFetchedResults, parsed_autocomplete_text, self._media_callable, self._file_search_context.Duplicate(), self._synchronised.IsOn(), self._include_unusual_predicate_types, self._results_cache, under_construction_or_predicate, self._force_system_everything )
+        HG.client_controller.CallToThread( ReadFetch, self, job_key, self.SetFetchedResults, parsed_autocomplete_text, self._tag_count_index_callable, self._file_search_context.Duplicate(), self._synchronised.IsOn(), self._include_unusual_predicate_types, self._results_cache, under_construction_or_predicate, self._force_system_everything )
         
     
     def _ShouldTakeResponsibilityForEnter( self ):
@@ -1,3 +1,4 @@
+import collections
 import typing
 
 from qtpy import QtCore as QC
@@ -54,6 +55,11 @@ zoom_centerpoints_str_lookup[ ZOOM_CENTERPOINT_MEDIA_TOP_LEFT ] = 'media top-lef
 
 OPEN_EXTERNALLY_BUTTON_SIZE = ( 200, 45 )
 
+PREFETCH_MIN_NUM_NEIGHBOURS = 8
+PREFETCH_MAX_NUM_NEIGHBOURS = 24
+PREFETCH_NAVIGATION_HISTORY_LENGTH = 10
+PREFETCH_NAVIGATION_HISTORY_TIMEOUT = 60
+
 def AddAudioVolumeMenu( menu, canvas_type ):
     
     mute_volume_type = None
@@ -332,6 +338,53 @@ def CalculateMediaSize( media, zoom ):
     
     return ( media_width, media_height )
     
+def CalculatePrefetchOffsets( navigation_history, now ):
+    
+    # navigation_history is recent ( direction, timestamp ) moves, oldest first
+    # we return the offsets from the current media worth prefetching, most useful first
+    # with no history, this is five forward and three back
+    
+    navigation_history = [ ( direction, timestamp ) for ( direction, timestamp ) in navigation_history if timestamp > now - PREFETCH_NAVIGATION_HISTORY_TIMEOUT ]
+    
+    num_forward = len( [ 1 for ( direction, timestamp ) in navigation_history if direction > 0 ] )
+    
+    forward_weight = ( num_forward + 5 ) / ( len( navigation_history ) + 8 )
+    
+    num_neighbours = PREFETCH_MIN_NUM_NEIGHBOURS
+    
+    if len( navigation_history ) >= 2:
+        
+        # someone flicking through an archive/delete filter wants more queued up
+        
+        ( first_direction, first_timestamp ) = navigation_history[0]
+        ( last_direction, last_timestamp ) = navigation_history[-1]
+        
+        average_interval = ( last_timestamp - first_timestamp ) / ( len( navigation_history ) - 1 )
+        
+        if average_interval > 0:
+            
+            num_neighbours = int( PREFETCH_MIN_NUM_NEIGHBOURS * 2.0 / average_interval )
+            
+        else:
+            
+            num_neighbours = PREFETCH_MAX_NUM_NEIGHBOURS
+            
+        
+        num_neighbours = max( PREFETCH_MIN_NUM_NEIGHBOURS, min( num_neighbours, PREFETCH_MAX_NUM_NEIGHBOURS ) )
+        
+    
+    # each step away costs more in the direction we are less likely to go
+    
+    forward_cost = 1 / forward_weight
+    backward_cost = 1 / ( 1 - forward_weight )
+    
+    costs_and_offsets = [ ( i * forward_cost, i ) for i in range( 1, num_neighbours + 1 ) ]
+    costs_and_offsets.extend( ( ( i * backward_cost, - i ) for i in range( 1, num_neighbours + 1 ) ) )
+    
+    costs_and_offsets.sort( key = lambda cost_and_offset: ( cost_and_offset[0], - cost_and_offset[1] ) )
+    
+    return [ offset for ( cost, offset ) in costs_and_offsets[ : num_neighbours ] ]
+    
 class Canvas( QW.QWidget ):
     
     PREVIEW_WINDOW = False
@@ -3389,6 +3442,8 @@ class CanvasMediaList( ClientMedia.ListeningMediaList, CanvasWithHovers ):
         
         self._just_started = True
         
+        self._navigation_history = collections.deque( maxlen = PREFETCH_NAVIGATION_HISTORY_LENGTH )
+        
         self._widget_event_filter.EVT_LEFT_DOWN( self.EventDragBegin )
         self._widget_event_filter.EVT_LEFT_UP( self.EventDragEnd )
         
@@ -3424,71 +3479,71 @@ class CanvasMediaList( ClientMedia.ListeningMediaList, CanvasWithHovers ):
     
     def _PrefetchNeighbours( self ):
         
-        media_looked_at = set()
-        
-        to_render = []
-        
-        previous = self._current_media
-        next = self._current_media
-        
-        delay_base = 0.1
+        offsets = CalculatePrefetchOffsets( self._navigation_history, HydrusData.GetNowPrecise() )
         
-        num_to_go_back = 3
-        num_to_go_forward = 5
+        media_looked_at = { self._current_media }
         
-        # if media_looked_at nukes the list, we want shorter delays, so do next first
+        offsets_to_media = {}
         
-        for i in range( num_to_go_forward ):
+        for ( step, get_neighbour ) in ( ( 1, self._GetNext ), ( -1, self._GetPrevious ) ):
             
-            next = self._GetNext( next )
+            neighbour = self._current_media
             
-            if next in media_looked_at:
+            for i in range( max( [ offset * step for offset in offsets ] + [ 0 ] ) ):
                 
-                break
+                neighbour = get_neighbour( neighbour )
                 
-            else:
+                if neighbour in media_looked_at:
+                    
+                    break
+                    
                 
-                media_looked_at.add( next )
+                media_looked_at.add( neighbour )
+                
+                offsets_to_media[ ( i + 1 ) * step ] = neighbour
                 
             
-            delay = delay_base * ( i + 1 )
+        
+        medias_and_target_resolutions = []
+        
+        for offset in offsets:
             
-            to_render.append( ( next, delay ) )
+            if offset not in offsets_to_media:
+                
+                continue
+                
             
-        
-        for i in range( num_to_go_back ):
+            media = offsets_to_media[ offset ]
             
-            previous = self._GetPrevious( previous )
+            if not media.IsStaticImage():
+                
+                continue
+                
             
-            if previous in media_looked_at:
+            if self._maintain_pan_and_zoom:
                 
-                break
+                target_resolution = None
                 
             else:
                 
-                media_looked_at.add( previous )
+                ( media_show_action, media_start_paused, media_start_with_embed ) = self._GetShowAction( media )
+                
+                ( default_zoom, canvas_zoom ) = CalculateCanvasZooms( self, media, media_show_action )
+                
+                target_resolution = CalculateMediaSize( media, default_zoom )
                 
             
-            delay = delay_base * 2 * ( i + 1 )
-            
-            to_render.append( ( previous, delay ) )
+            medias_and_target_resolutions.append( ( media, target_resolution ) )
             
         
         image_cache = HG.client_controller.GetCache( 'images' )
         
-        for ( media, delay ) in to_render:
-            
-            hash = media.GetHash()
-            mime = media.GetMime()
-            
-            if media.IsStaticImage():
-                
-                if not image_cache.HasImageRenderer( hash ):
-                    
-                    HG.client_controller.CallLaterQtSafe(self, delay, image_cache.GetImageRenderer, media)
-                    
-                
-            
+        image_cache.PrefetchImageRenderers( medias_and_target_resolutions )
+        
+    
+    def _RecordNavigation( self, direction ):
+        
+        self._navigation_history.append( ( direction, HydrusData.GetNowPrecise() ) )
         
     
     def _Remove( self ):
@@ -3520,6 +3575,8 @@ class CanvasMediaList( ClientMedia.ListeningMediaList, CanvasWithHovers ):
             
         else:
             
+            self._RecordNavigation( 1 )
+            
             self.SetMedia( next_media )
             
         
@@ -3536,11 +3593,15 @@ class CanvasMediaList( ClientMedia.ListeningMediaList, CanvasWithHovers ):
     
     def _ShowNext( self ):
         
+        self._RecordNavigation( 1 )
+        
         self.SetMedia( self._GetNext( self._current_media ) )
         
     
     def _ShowPrevious( self ):
         
+        self._RecordNavigation( -1 )
+        
         self.SetMedia( self._GetPrevious( self._current_media ) )
         
     
@@ -1,3 +1,4 @@
+import itertools
 import typing
 
 from qtpy import QtCore as QC
@@ -942,7 +943,7 @@ class MediaContainer( QW.QWidget ):
         self._animation_bar.hide()
         
     
-    def _MakeMediaWindow( self ):
+    def _MakeMediaWindow( self, initial_size = None ):
         
         old_media_window = self._media_window
         destroy_old_media_window = True
@@ -982,7 +983,16 @@ class MediaContainer( QW.QWidget ):
                     self._media_window = self._static_image_window
                     
                 
-                self._media_window.SetMedia( self._media )
+                if initial_size is None:
+                    
+                    target_resolution = None
+                    
+                else:
+                    
+                    target_resolution = ( initial_size.width(), initial_size.height() )
+                    
+                
+                self._media_window.SetMedia( self._media, target_resolution = target_resolution )
                 
             else:
                 
@@ -1147,7 +1157,7 @@ class MediaContainer( QW.QWidget ):
         
         self._embed_button.hide()
         
-        self._MakeMediaWindow()
+        self._MakeMediaWindow( initial_size = self.size() )
         
         self._SizeAndPositionChildren()
         
@@ -1350,7 +1360,7 @@ class MediaContainer( QW.QWidget ):
             
             self._embed_button.hide()
             
-            self._MakeMediaWindow()
+            self._MakeMediaWindow( initial_size = initial_size )
             
         
         self.setFixedSize( initial_size )
@@ -1572,6 +1582,8 @@ class OpenExternallyPanel( QW.QWidget ):
         HydrusPaths.LaunchFile( path, launch_path )
         
     
+STATIC_IMAGE_TILE_DIMENSION = 512
+
 class StaticImage( QW.QWidget ):
     
     launchMediaViewer = QC.Signal()
@@ -1594,7 +1606,11 @@ class StaticImage( QW.QWidget ):
         
         self._is_rendered = False
         
-        self._canvas_qt_pixmap = None
+        # we only draw the tiles we can see, so a 20,000px image zoomed in doesn't need a 20,000px pixmap
+        self._canvas_tiles = {}
+        
+        # tiles drawn from a reduced decode while the full image loads in the background
+        self._canvas_tiles_are_reduced = False
         
         if self._canvas_type == ClientGUICommon.CANVAS_MEDIA_VIEWER:
             
@@ -1608,9 +1624,11 @@ class StaticImage( QW.QWidget ):
         self._my_shortcut_handler = ClientGUIShortcuts.ShortcutsHandler( self, [ shortcut_set ], catch_mouse = True )
         
     
-    def _ClearCanvasBitmap( self ):
+    def _ClearCanvasTiles( self ):
         
-        self._canvas_qt_pixmap = None
+        self._canvas_tiles = {}
+        
+        self._canvas_tiles_are_reduced = False
         
         self._is_rendered = False
         
@@ -1628,61 +1646,90 @@ class StaticImage( QW.QWidget ):
         self._first_background_drawn = True
         
     
-    def _TryToDrawCanvasBitmap( self ):
+    def _GetTile( self, tile_coordinate ):
         
-        if self._image_renderer is not None and self._image_renderer.IsReady():
-            
-            my_size = self.size()
-            
-            width = my_size.width()
-            height = my_size.height()
-            
-            self._canvas_qt_pixmap = HG.client_controller.bitmap_manager.GetQtPixmap( width, height )
-            
-            painter = QG.QPainter( self._canvas_qt_pixmap )
-            
-            self._DrawBackground( painter )
-            
-            qt_bitmap = self._image_renderer.GetQtImage( self.size() )
-            
-            painter.drawImage( 0, 0, qt_bitmap )
+        ( tile_x, tile_y ) = tile_coordinate
+        
+        # edge tiles are cut short
+        clip_rect = QC.QRect( tile_x * STATIC_IMAGE_TILE_DIMENSION, tile_y * STATIC_IMAGE_TILE_DIMENSION, STATIC_IMAGE_TILE_DIMENSION, STATIC_IMAGE_TILE_DIMENSION ).intersected( self.rect() )
+        
+        image_tile_cache = HG.client_controller.GetCache( 'image_tiles' )
+        
+        tile = image_tile_cache.GetTile( self._image_renderer, self._media, clip_rect, self.size() )
+        
+        return tile
+        
+    
+    def _GetTileCoordinatesInRect( self, rect ):
+        
+        rect = rect.intersected( self.rect() )
+        
+        if rect.isEmpty():
             
-            self._is_rendered = True
+            return []
             
         
+        x_range = range( rect.left() // STATIC_IMAGE_TILE_DIMENSION, rect.right() // STATIC_IMAGE_TILE_DIMENSION + 1 )
+        y_range = range( rect.top() // STATIC_IMAGE_TILE_DIMENSION, rect.bottom() // STATIC_IMAGE_TILE_DIMENSION + 1 )
+        
+        return list( itertools.product( x_range, y_range ) )
+        
     
     def ClearMedia( self ):
         
         self._media = None
         self._image_renderer = None
         
-        self._ClearCanvasBitmap()
+        self._ClearCanvasTiles()
         
         self.update()
         
     
-    def paintEvent( self, event ):           
+    def paintEvent( self, event ):
         
-        if self._canvas_qt_pixmap is None:
+        painter = QG.QPainter( self )
+        
+        self._DrawBackground( painter )
+        
+        if self._image_renderer is None or not self._image_renderer.IsReady():
             
-            self._TryToDrawCanvasBitmap()
+            return
             
         
-        painter = QG.QPainter( self )
-        
-        if self._canvas_qt_pixmap is None:
+        for tile_coordinate in self._GetTileCoordinatesInRect( event.rect() ):
             
-            self._DrawBackground( painter )
+            if tile_coordinate not in self._canvas_tiles:
+                
+                if not self._image_renderer.IsFullQuality():
+                    
+                    self._canvas_tiles_are_reduced = True
+                    
+                    HG.client_controller.gui.RegisterAnimationUpdateWindow( self )
+                    
+                
+                self._canvas_tiles[ tile_coordinate ] = self._GetTile( tile_coordinate )
+                
             
-        else:
+            tile = self._canvas_tiles[ tile_coordinate ]
             
-            painter.drawPixmap( 0, 0, self._canvas_qt_pixmap )
+            painter.drawPixmap( tile.clip_rect.topLeft(), tile.qt_pixmap )
+            
+        
+        # forget tiles that have scrolled out of view. the tile cache will still have them for a bit
+        
+        visible_tile_coordinates = set( self._GetTileCoordinatesInRect( self.visibleRegion().boundingRect() ) )
+        
+        for tile_coordinate in set( self._canvas_tiles.keys() ).difference( visible_tile_coordinates ):
+            
+            del self._canvas_tiles[ tile_coordinate ]
             
         
+        self._is_rendered = True
+        
     
     def resizeEvent( self, event ):
         
-        self._ClearCanvasBitmap()
+        self._ClearCanvasTiles()
         
     
     def IsRendered( self ):
@@ -1729,15 +1776,15 @@ class StaticImage( QW.QWidget ):
         return command_processed
         
     
-    def SetMedia( self, media ):
+    def SetMedia( self, media, target_resolution = None ):
         
         self._media = media
         
         image_cache = HG.client_controller.GetCache( 'images' )
         
-        self._image_renderer = image_cache.GetImageRenderer( self._media )
+        self._image_renderer = image_cache.GetImageRenderer( self._media, target_resolution = target_resolution )
         
-        self._ClearCanvasBitmap()
+        self._ClearCanvasTiles()
         
         if not self._image_renderer.IsReady():
             
@@ -1751,7 +1798,25 @@ class StaticImage( QW.QWidget ):
         
         try:
             
-            if self._image_renderer is None or self._image_renderer.IsReady():
+            if self._image_renderer is None:
+                
+                HG.client_controller.gui.UnregisterAnimationUpdateWindow( self )
+                
+            elif self._canvas_tiles_are_reduced:
+                
+                if self._image_renderer.IsFullQuality():
+                    
+                    # the image is already showing, so just swap the tiles out
+                    self._canvas_tiles = {}
+                    
+                    self._canvas_tiles_are_reduced = False
+                    
+                    self.update()
+                    
+                    HG.client_controller.gui.UnregisterAnimationUpdateWindow( self )
+                    
+                
+            elif self._image_renderer.IsReady():
                 
                 self.update()
                 
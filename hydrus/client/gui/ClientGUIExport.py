@@ -412,6 +412,10 @@ If you select synchronise, be careful!'''
         
         export_folder = ClientExporting.ExportFolder( name, path = path, export_type = export_type, delete_from_client_after_export = delete_from_client_after_export, file_search_context = file_search_context, run_regularly = run_regularly, period = period, phrase = phrase, last_checked = self._last_checked, paused = paused, run_now = run_now )
         
+        ( manifest_path, manifest ) = self._export_folder.GetManifest()
+        
+        export_folder.SetManifest( manifest_path, manifest )
+        
         return export_folder
         
     
@@ -2957,6 +2957,10 @@ class ListBoxTagsMedia( ListBoxTags ):
         self._sort = HC.options[ 'default_tag_sort' ]
         
         self._last_media = set()
+        self._last_media_is_all_media = False
+        
+        # a page can give us its own running tag counts, which is much faster than counting all its media again
+        self._tag_count_index_callable = None
         
         self._tag_service_key = CC.COMBINED_TAG_SERVICE_KEY
         self._tag_display_type = tag_display_type
@@ -2975,6 +2979,18 @@ class ListBoxTagsMedia( ListBoxTags ):
         self._show_petitioned = True
         
     
+    def _GetMediasTagCount( self, media, all_media ):
+        
+        if all_media and self._tag_count_index_callable is not None:
+            
+            tag_count_index = self._tag_count_index_callable( self._tag_service_key, self._tag_display_type )
+            
+            return tag_count_index.GetTagsToCounts()
+            
+        
+        return ClientMedia.GetMediasTagCount( media, self._tag_service_key, self._tag_display_type )
+        
+    
     def _GetNamespaceFromTerm( self, term ):
         
         tag = term
@@ -3107,7 +3123,7 @@ class ListBoxTagsMedia( ListBoxTags ):
         
         self._tag_service_key = service_key
         
-        self.SetTagsByMedia( self._last_media )
+        self.SetTagsByMedia( self._last_media, all_media = self._last_media_is_all_media )
         
     
     def SetSort( self, sort ):
@@ -3154,11 +3170,16 @@ class ListBoxTagsMedia( ListBoxTags ):
         self._last_media.update( media )
         
     
-    def SetTagsByMedia( self, media ):
+    def SetTagCountIndexCallable( self, tag_count_index_callable ):
+        
+        self._tag_count_index_callable = tag_count_index_callable
+        
+    
+    def SetTagsByMedia( self, media, all_media = False ):
         
         media = set( media )
         
-        ( current_tags_to_count, deleted_tags_to_count, pending_tags_to_count, petitioned_tags_to_count ) = ClientMedia.GetMediasTagCount( media, self._tag_service_key, self._tag_display_type )
+        ( current_tags_to_count, deleted_tags_to_count, pending_tags_to_count, petitioned_tags_to_count ) = self._GetMediasTagCount( media, all_media )
         
         self._current_tags_to_count = current_tags_to_count
         self._deleted_tags_to_count = deleted_tags_to_count
@@ -3168,11 +3189,21 @@ class ListBoxTagsMedia( ListBoxTags ):
         self._RecalcStrings()
         
         self._last_media = media
+        self._last_media_is_all_media = all_media
         
         self._DataHasChanged()
         
     
-    def SetTagsByMediaFromMediaPanel( self, media, tags_changed ):
+    def SetTagsByMediaFromMediaPanel( self, media, tags_changed, all_media = False ):
+        
+        if all_media and self._tag_count_index_callable is not None:
+            
+            # the page keeps these counts up to date as it goes, so this is cheap
+            
+            self.SetTagsByMedia( media, all_media = True )
+            
+            return
+            
         
         # this uses the last-set media and count cache to generate new numbers and is faster than re-counting from scratch when the tags have not changed
         
@@ -3237,6 +3268,7 @@ class ListBoxTagsMedia( ListBoxTags ):
             
         
         self._last_media = media
+        self._last_media_is_all_media = False
         
         self._DataHasChanged()
         
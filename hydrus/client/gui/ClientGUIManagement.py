@@ -776,6 +776,8 @@ class ManagementPanel( QW.QScrollArea ):
         
         if self._current_selection_tags_list is not None:
             
+            self._current_selection_tags_list.SetTagCountIndexCallable( media_panel.GetTagCountIndex )
+            
             media_panel.selectedMediaTagPresentationChanged.connect( self._current_selection_tags_list.SetTagsByMediaFromMediaPanel )
             media_panel.selectedMediaTagPresentationIncremented.connect( self._current_selection_tags_list.IncrementTagsByMedia )
             self._media_sort.sortChanged.connect( media_panel.Sort )
@@ -4432,7 +4434,7 @@ class ManagementPanelQuery( ManagementPanel ):
             
             synchronised = self._management_controller.GetVariable( 'synchronised' )
             
-            self._tag_autocomplete = ClientGUIACDropdown.AutoCompleteDropdownTagsRead( self._search_panel, self._page_key, file_search_context, media_sort_widget = self._media_sort, media_collect_widget = self._media_collect, media_callable = self._page.GetMedia, synchronised = synchronised )
+            self._tag_autocomplete = ClientGUIACDropdown.AutoCompleteDropdownTagsRead( self._search_panel, self._page_key, file_search_context, media_sort_widget = self._media_sort, media_collect_widget = self._media_collect, tag_count_index_callable = self._page.GetTagCountIndex, synchronised = synchronised )
             
             self._tag_autocomplete.searchCancelled.connect( self._CancelSearch )
             
@@ -4678,6 +4680,20 @@ class ManagementPanelQuery( ManagementPanel ):
             
         
     
+    def ShowFinishedVirtualQuery( self, query_job_key, hash_ids, hash_ids_to_hashes ):
+        
+        if query_job_key == self._query_job_key:
+            
+            file_service_key = self._management_controller.GetKey( 'file_service' )
+            
+            panel = ClientGUIResults.MediaPanelVirtualThumbnails( self._page, self._page_key, file_service_key, hash_ids, hash_ids_to_hashes )
+            
+            panel.Sort( self._media_sort.GetSort() )
+            
+            self._page.SwapMediaPanel( panel )
+            
+        
+    
     def Start( self ):
         
         file_search_context = self._management_controller.GetVariable( 'file_search_context' )
@@ -4723,6 +4739,45 @@ class ManagementPanelQuery( ManagementPanel ):
             return
             
         
+        virtualised_page_threshold = HG.client_controller.new_options.GetNoneableInteger( 'virtualised_page_threshold' )
+        
+        if virtualised_page_threshold is not None and len( query_hash_ids ) > virtualised_page_threshold:
+            
+            # too many to load, so the page will fetch what it shows as it goes
+            
+            def qt_code_virtual():
+                
+                query_job_key.Finish()
+                
+                if not self or not QP.isValid( self ):
+                    
+                    return
+                    
+                
+                self.ShowFinishedVirtualQuery( query_job_key, query_hash_ids, hash_ids_to_hashes )
+                
+            
+            # the page keeps the hashes next to the ids, so it never has to ask for them on the Qt thread
+            
+            hash_ids_to_hashes = {}
+            
+            for sub_query_hash_ids in HydrusData.SplitListIntoChunks( query_hash_ids, 65536 ):
+                
+                if query_job_key.IsCancelled():
+                    
+                    return
+                    
+                
+                hash_ids_to_hashes.update( controller.Read( 'hash_ids_to_hashes', hash_ids = sub_query_hash_ids ) )
+                
+            
+            search_context.SetComplete()
+            
+            QP.CallAfter( qt_code_virtual )
+            
+            return
+            
+        
         media_results = []
         
         for sub_query_hash_ids in HydrusData.SplitListIntoChunks( query_hash_ids, QUERY_CHUNK_SIZE ):
@@ -616,12 +616,6 @@ class Page( QW.QSplitter ):
         return self._management_panel
         
     
-    # used by autocomplete
-    def GetMedia( self ):
-        
-        return self._media_panel.GetSortedMedia()
-        
-    
     def GetMediaPanel( self ):
         
         return self._media_panel
@@ -707,9 +701,23 @@ class Page( QW.QSplitter ):
         return ( x, y )
         
     
+    # used by autocomplete
+    def GetTagCountIndex( self, tag_service_key, tag_display_type ):
+        
+        return self._media_panel.GetTagCountIndex( tag_service_key, tag_display_type )
+        
+    
     def GetTotalWeight( self ):
         
-        num_hashes = len( self.GetHashes() )
+        if self._initialised:
+            
+            num_hashes = self._media_panel.GetNumFiles()
+            
+        else:
+            
+            num_hashes = len( self._initial_hashes )
+            
+        
         num_seeds = self._management_controller.GetNumSeeds()
         
         # hashes are smaller, but seeds tend to need more cpu, so we'll just say 1:1 for now
@@ -833,6 +841,28 @@ class Page( QW.QSplitter ):
             
         
     
+    def SetVirtualHashIds( self, hash_ids, hash_ids_to_hashes ):
+        
+        if self._management_controller.IsImporter():
+            
+            file_service_key = CC.LOCAL_FILE_SERVICE_KEY
+            
+        else:
+            
+            file_service_key = self._management_controller.GetKey( 'file_service' )
+            
+        
+        
+        media_panel = ClientGUIResults.MediaPanelVirtualThumbnails( self, self._page_key, file_service_key, hash_ids, hash_ids_to_hashes )
+        
+        self._SwapMediaPanel( media_panel )
+        
+        self._initialised = True
+        self._initial_hashes = []
+        
+        QP.CallAfter( self._management_panel.Start )
+        
+    
     def SynchronisedWaitSwitch( self ):
         
         self._management_panel.SynchronisedWaitSwitch()
@@ -900,6 +930,31 @@ class Page( QW.QSplitter ):
             self.SetMediaResults( media_results )
             
         
+        virtualised_page_threshold = controller.new_options.GetNoneableInteger( 'virtualised_page_threshold' )
+        
+        if virtualised_page_threshold is not None and len( initial_hashes ) > virtualised_page_threshold:
+            
+            def qt_code_publish_virtual( hash_ids ):
+                
+                if not self or not QP.isValid( self ):
+                    
+                    return
+                    
+                
+                self.SetVirtualHashIds( hash_ids, hash_ids_to_hashes )
+                
+            
+            hash_ids_to_hashes = controller.Read( 'hash_ids_to_hashes', hashes = initial_hashes )
+            
+            hashes_to_hash_ids = { hash : hash_id for ( hash_id, hash ) in hash_ids_to_hashes.items() }
+            
+            sorted_initial_hash_ids = [ hashes_to_hash_ids[ hash ] for hash in initial_hashes ]
+            
+            QP.CallAfter( qt_code_publish_virtual, sorted_initial_hash_ids )
+            
+            return
+            
+        
         initial_media_results = []
         
         for group_of_initial_hashes in HydrusData.SplitListIntoChunks( initial_hashes, 256 ):
@@ -2897,6 +2897,19 @@ class EditPageParserPanel( ClientGUIScrolledPanels.EditPanel ):
         
         self._name = QW.QLineEdit( main_panel )
         
+        self._html_parsing_backend = ClientGUICommon.BetterChoice( main_panel )
+        
+        for html_parsing_backend in ( ClientParsing.HTML_PARSING_BACKEND_DEFAULT, ClientParsing.HTML_PARSING_BACKEND_BS4, ClientParsing.HTML_PARSING_BACKEND_LXML ):
+            
+            self._html_parsing_backend.addItem( ClientParsing.html_parsing_backend_str_lookup[ html_parsing_backend ], html_parsing_backend )
+            
+        
+        tt = 'lxml is much faster on big pages. It is only used for html formulae whose rules it can do exactly--the rest still use beautifulsoup.'
+        tt += os.linesep * 2
+        tt += 'Sub-page parsers will use this too, unless they have their own setting.'
+        
+        self._html_parsing_backend.setToolTip( tt )
+        
         #
         
         conversion_panel = ClientGUICommon.StaticBox( main_panel, 'pre-parsing conversion' )
@@ -2982,6 +2995,8 @@ class EditPageParserPanel( ClientGUIScrolledPanels.EditPanel ):
         
         self._name.setText( name )
         
+        self._html_parsing_backend.SetValue( parser.GetHTMLParsingBackend() )
+        
         self._sub_page_parsers.AddDatas( sub_page_parsers )
         
         self._sub_page_parsers.Sort()
@@ -3006,6 +3021,7 @@ class EditPageParserPanel( ClientGUIScrolledPanels.EditPanel ):
         rows = []
         
         rows.append( ( 'name or description (optional): ', self._name ) )
+        rows.append( ( 'html parsing backend: ', self._html_parsing_backend ) )
         
         gridbox = ClientGUICommon.WrapInGrid( main_panel, rows )
         
@@ -3284,7 +3300,9 @@ class EditPageParserPanel( ClientGUIScrolledPanels.EditPanel ):
         
         example_parsing_context = self._test_panel.GetExampleParsingContext()
         
-        parser = ClientParsing.PageParser( name, parser_key = parser_key, string_converter = string_converter, sub_page_parsers = sub_page_parsers, content_parsers = content_parsers, example_urls = example_urls, example_parsing_context = example_parsing_context )
+        html_parsing_backend = self._html_parsing_backend.GetValue()
+        
+        parser = ClientParsing.PageParser( name, parser_key = parser_key, string_converter = string_converter, sub_page_parsers = sub_page_parsers, content_parsers = content_parsers, example_urls = example_urls, example_parsing_context = example_parsing_context, html_parsing_backend = html_parsing_backend )
         
         return parser
         
@@ -46,7 +46,7 @@ from hydrus.client.gui import QtPorting as QP
 
 class MediaPanel( ClientMedia.ListeningMediaList, QW.QScrollArea ):
     
-    selectedMediaTagPresentationChanged = QC.Signal( list, bool )
+    selectedMediaTagPresentationChanged = QC.Signal( list, bool, bool )
     selectedMediaTagPresentationIncremented = QC.Signal( list )
     
     focusMediaChanged = QC.Signal( ClientMedia.Media )
@@ -1112,7 +1112,9 @@ class MediaPanel( ClientMedia.ListeningMediaList, QW.QScrollArea ):
         
         if HG.client_controller.gui.IsCurrentPage( self._page_key ):
             
-            if len( self._selected_media ) == 0:
+            all_media = len( self._selected_media ) == 0
+            
+            if all_media:
                 
                 tags_media = self._sorted_media
                 
@@ -1125,7 +1127,7 @@ class MediaPanel( ClientMedia.ListeningMediaList, QW.QScrollArea ):
             
             tags_changed = tags_changed or self._had_changes_to_tag_presentation_while_hidden
             
-            self.selectedMediaTagPresentationChanged.emit( tags_media, tags_changed )
+            self.selectedMediaTagPresentationChanged.emit( tags_media, tags_changed, all_media )
             
             HG.client_controller.pub( 'new_page_status', self._page_key, self._GetPrettyStatus() )
             
@@ -4092,10 +4094,7 @@ class MediaPanelThumbnails( MediaPanel ):
             
             affected_media = self._GetMedia( set( hashes_to_media_results.keys() ) )
             
-            for media in affected_media:
-                
-                media.UpdateFileInfo( hashes_to_media_results )
-                
+            self.UpdateFileInfo( hashes_to_media_results )
             
             self._RedrawMedia( affected_media )
             
@@ -4377,247 +4376,1310 @@ class MediaPanelThumbnails( MediaPanel ):
             
         
     
-def AddRemoveMenu( win: MediaPanel, menu, filter_counts, all_specific_file_domains, has_local_and_remote ):
+VIRTUAL_PAGE_FETCH_MARGIN = 2
+VIRTUAL_PAGE_MEDIA_VIEWER_RADIUS = 512
+
+class MediaPanelVirtualThumbnails( MediaPanel ):
     
-    file_filter_all = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_ALL )
+    # for pages too big to load all at once. we hold the ordered hash_ids and fetch media results for whatever is on screen
+    # collect, non-db sorts and most of the file actions need every media result, so they are not here. open the selection in a new page for those
+    # we work in hash_ids, not hashes, so the content update hash index sends us everything
+    # the hashes come in with the hash_ids from the worker that did the search, so we never have to fetch them on the Qt thread
     
-    if file_filter_all.GetCount( win, filter_counts ) > 0:
+    WANTS_ALL_HASHES = True
+    
+    def __init__( self, parent, page_key, file_service_key, hash_ids, hash_ids_to_hashes ):
         
-        remove_menu = QW.QMenu( menu )
+        self._virtual_media_list = ClientMedia.VirtualMediaList( file_service_key, hash_ids, hash_ids_to_hashes )
         
-        #
+        self._hash_ids_to_thumbnails = {}
+        self._hash_ids_waterfalling = set()
         
-        file_filter_selected = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_SELECTED )
+        self._fetching_media_results = False
+        self._sorting = False
+        self._unsortable_media_sort = None
         
-        file_filter_inbox = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_INBOX )
+        self._focused_index = None
+        self._shift_focused_index = None
         
-        file_filter_archive = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_ARCHIVE )
+        self._num_columns = 1
         
-        file_filter_not_selected = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_NOT_SELECTED )
+        MediaPanel.__init__( self, parent, page_key, file_service_key, [] )
         
-        #
+        self.setVerticalScrollBarPolicy( QC.Qt.ScrollBarAlwaysOff )
+        self.setHorizontalScrollBarPolicy( QC.Qt.ScrollBarAlwaysOff )
         
-        selected_count = file_filter_selected.GetCount( win, filter_counts )
+        inner_widget = QW.QWidget( self )
         
-        if selected_count > 0 and selected_count < file_filter_all.GetCount( win, filter_counts ):
+        self._canvas = MediaPanelVirtualThumbnails._Canvas( inner_widget, self )
+        
+        # a million files in one column is a couple hundred million pixels, which fits in the scrollbar's int but not in a widget
+        self._scroll_bar = QW.QScrollBar( QC.Qt.Vertical, inner_widget )
+        
+        self._scroll_bar.valueChanged.connect( self._canvas.update )
+        
+        hbox = QP.HBoxLayout( margin = 0, spacing = 0 )
+        
+        QP.AddToLayout( hbox, self._canvas, CC.FLAGS_EXPAND_BOTH_WAYS )
+        QP.AddToLayout( hbox, self._scroll_bar, CC.FLAGS_EXPAND_PERPENDICULAR )
+        
+        inner_widget.setLayout( hbox )
+        
+        self.setWidget( inner_widget )
+        self.setWidgetResizable( True )
+        
+        self.RefreshAcceleratorTable()
+        
+        HG.client_controller.sub( self, 'NotifyNewFileInfo', 'new_file_info' )
+        HG.client_controller.sub( self, 'RedrawAllThumbnails', 'refresh_all_tag_presentation_gui' )
+        HG.client_controller.sub( self, 'RefreshAcceleratorTable', 'notify_new_options' )
+        HG.client_controller.sub( self, 'ThumbnailsReset', 'notify_complete_thumbnail_reset' )
+        HG.client_controller.sub( self, 'WaterfallThumbnails', 'waterfall_thumbnails' )
+        
+    
+    def _ActivateIndex( self, index ):
+        
+        if index is None:
             
-            ClientGUIMenus.AppendMenuItem( remove_menu, file_filter_selected.ToString( win, filter_counts ), 'Remove all the selected files from the current view.', win._Remove, file_filter_selected )
+            return
             
         
-        if file_filter_all.GetCount( win, filter_counts ) > 0:
-            
-            ClientGUIMenus.AppendSeparator( remove_menu )
+        thumbnail = self._GetThumbnail( index )
+        
+        if thumbnail is None:
             
-            ClientGUIMenus.AppendMenuItem( remove_menu, file_filter_all.ToString( win, filter_counts ), 'Remove all the files from the current view.', win._Remove, file_filter_all )
+            return
             
         
-        if file_filter_inbox.GetCount( win, filter_counts ) > 0 and file_filter_archive.GetCount( win, filter_counts ) > 0:
+        locations_manager = thumbnail.GetLocationsManager()
+        
+        if locations_manager.IsLocal():
             
-            ClientGUIMenus.AppendSeparator( remove_menu )
+            self._LaunchMediaViewer( thumbnail )
             
-            ClientGUIMenus.AppendMenuItem( remove_menu, file_filter_inbox.ToString( win, filter_counts ), 'Remove all the inbox files from the current view.', win._Remove, file_filter_inbox )
+        elif len( locations_manager.GetCurrentRemote() ) > 0:
             
-            ClientGUIMenus.AppendMenuItem( remove_menu, file_filter_archive.ToString( win, filter_counts ), 'Remove all the archived files from the current view.', win._Remove, file_filter_archive )
+            self._DownloadHashes( thumbnail.GetHashes() )
             
         
-        if len( all_specific_file_domains ) > 1:
+    
+    def _DrawCanvas( self, painter ):
+        
+        new_options = HG.client_controller.new_options
+        
+        bg_colour = new_options.GetColour( CC.COLOUR_THUMBGRID_BACKGROUND )
+        
+        painter.setBackground( QG.QBrush( bg_colour ) )
+        
+        painter.eraseRect( painter.viewport() )
+        
+        background_pixmap = HG.client_controller.bitmap_manager.GetMediaBackgroundPixmap()
+        
+        if background_pixmap is not None:
             
-            ClientGUIMenus.AppendSeparator( remove_menu )
+            my_size = self._canvas.size()
             
-            all_specific_file_domains = list( all_specific_file_domains )
+            pixmap_size = background_pixmap.size()
             
-            if CC.TRASH_SERVICE_KEY in all_specific_file_domains:
+            painter.drawPixmap( my_size.width() - pixmap_size.width(), my_size.height() - pixmap_size.height(), background_pixmap )
+            
+        
+        ( thumbnail_span_width, thumbnail_span_height ) = self._GetThumbnailSpanDimensions()
+        
+        thumbnail_margin = new_options.GetInteger( 'thumbnail_margin' )
+        
+        y_offset = self._scroll_bar.value()
+        
+        ( start_index, end_index ) = self._GetVisibleIndexRange()
+        
+        thumbnail_cache = HG.client_controller.GetCache( 'thumbnail' )
+        
+        thumbnails_to_render_later = []
+        
+        for index in range( start_index, end_index ):
+            
+            thumbnail = self._GetThumbnail( index )
+            
+            if thumbnail is None:
                 
-                all_specific_file_domains.remove( CC.TRASH_SERVICE_KEY )
-                all_specific_file_domains.insert( 0, CC.TRASH_SERVICE_KEY )
+                continue
                 
             
-            if CC.LOCAL_FILE_SERVICE_KEY in all_specific_file_domains:
+            if self._virtual_media_list.IsSelected( index ):
                 
-                all_specific_file_domains.remove( CC.LOCAL_FILE_SERVICE_KEY )
-                all_specific_file_domains.insert( 0, CC.LOCAL_FILE_SERVICE_KEY )
+                thumbnail.Select()
+                
+            else:
+                
+                thumbnail.Deselect()
                 
             
-            for file_service_key in all_specific_file_domains:
+            if thumbnail_cache.HasThumbnailCached( thumbnail ):
                 
-                file_filter = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_FILE_SERVICE, file_service_key )
+                x = ( index % self._num_columns ) * thumbnail_span_width + thumbnail_margin
+                y = ( index // self._num_columns ) * thumbnail_span_height - y_offset + thumbnail_margin
                 
-                ClientGUIMenus.AppendMenuItem( remove_menu, file_filter.ToString( win, filter_counts ), 'Remove all the files that are in this file domain.', win._Remove, file_filter )
+                painter.drawImage( x, y, thumbnail.GetQtImage() )
+                
+            else:
+                
+                hash_id = thumbnail.GetMediaResult().GetHashId()
+                
+                if hash_id not in self._hash_ids_waterfalling:
+                    
+                    self._hash_ids_waterfalling.add( hash_id )
+                    
+                    thumbnails_to_render_later.append( thumbnail )
+                    
                 
             
         
-        if has_local_and_remote:
-            
-            file_filter_local = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_LOCAL )
-            file_filter_remote = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_REMOTE )
-            
-            ClientGUIMenus.AppendSeparator( remove_menu )
+        if len( thumbnails_to_render_later ) > 0:
             
-            ClientGUIMenus.AppendMenuItem( remove_menu, file_filter_local.ToString( win, filter_counts ), 'Remove all the files that are in this client.', win._Remove, file_filter_local )
-            ClientGUIMenus.AppendMenuItem( remove_menu, file_filter_remote.ToString( win, filter_counts ), 'Remove all the files that are not in this client.', win._Remove, file_filter_remote )
+            thumbnail_cache.Waterfall( self._page_key, thumbnails_to_render_later )
             
         
-        not_selected_count = file_filter_not_selected.GetCount( win, filter_counts )
+        self._FetchMissingMediaResults()
         
-        if not_selected_count > 0 and selected_count > 0:
-            
-            ClientGUIMenus.AppendSeparator( remove_menu )
+    
+    def _FetchMissingMediaResults( self ):
+        
+        if self._fetching_media_results:
             
-            ClientGUIMenus.AppendMenuItem( remove_menu, file_filter_not_selected.ToString( win, filter_counts ), 'Remove all the not selected files from the current view.', win._Remove, file_filter_not_selected )
+            return
             
         
-        ClientGUIMenus.AppendMenu( menu, remove_menu, 'remove' )
+        ( start_index, end_index ) = self._GetVisibleIndexRange()
         
-    
-def AddSelectMenu( win: MediaPanel, menu, filter_counts, all_specific_file_domains, has_local_and_remote ):
-    
-    file_filter_all = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_ALL )
-    
-    if file_filter_all.GetCount( win, filter_counts ) > 0:
+        margin = ( end_index - start_index ) * VIRTUAL_PAGE_FETCH_MARGIN
         
-        select_menu = QW.QMenu( menu )
+        # what is on screen first, then below, then above
         
-        #
+        hash_ids = self._virtual_media_list.GetMissingHashIds( start_index, end_index )
         
-        file_filter_inbox = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_INBOX )
+        hash_ids.extend( self._virtual_media_list.GetMissingHashIds( end_index, end_index + margin ) )
+        hash_ids.extend( self._virtual_media_list.GetMissingHashIds( start_index - margin, start_index ) )
         
-        file_filter_archive = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_ARCHIVE )
+        if len( hash_ids ) == 0:
+            
+            return
+            
         
-        file_filter_not_selected = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_NOT_SELECTED )
+        self._fetching_media_results = True
         
-        file_filter_none = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_NONE )
+        HG.client_controller.CallToThread( self.THREADFetchMediaResults, hash_ids )
         
-        #
+    
+    def _GetIndexUnderMouse( self, mouse_event ):
         
-        if file_filter_all.GetCount( win, filter_counts ) > 0:
-            
-            ClientGUIMenus.AppendSeparator( select_menu )
+        x = mouse_event.pos().x()
+        y = mouse_event.pos().y() + self._scroll_bar.value()
+        
+        ( t_span_x, t_span_y ) = self._GetThumbnailSpanDimensions()
+        
+        x_mod = x % t_span_x
+        y_mod = y % t_span_y
+        
+        thumbnail_margin = HG.client_controller.new_options.GetInteger( 'thumbnail_margin' )
+        
+        if x_mod <= thumbnail_margin or y_mod <= thumbnail_margin or x_mod > t_span_x - thumbnail_margin or y_mod > t_span_y - thumbnail_margin:
             
-            ClientGUIMenus.AppendMenuItem( select_menu, file_filter_all.ToString( win, filter_counts ), 'Select all the files in the current view.', win._Select, file_filter_all )
+            return None
             
         
-        if file_filter_inbox.GetCount( win, filter_counts ) > 0 and file_filter_archive.GetCount( win, filter_counts ) > 0:
+        column_index = x // t_span_x
+        row_index = y // t_span_y
+        
+        if column_index >= self._num_columns:
             
-            ClientGUIMenus.AppendSeparator( select_menu )
+            return None
             
-            ClientGUIMenus.AppendMenuItem( select_menu, file_filter_inbox.ToString( win, filter_counts ), 'Select all the inbox files in the current view.', win._Select, file_filter_inbox )
+        
+        index = self._num_columns * row_index + column_index
+        
+        if index >= self._virtual_media_list.GetNumFiles():
             
-            ClientGUIMenus.AppendMenuItem( select_menu, file_filter_archive.ToString( win, filter_counts ), 'Select all the archived files in the current view.', win._Select, file_filter_archive )
+            return None
             
         
-        if len( all_specific_file_domains ) > 1:
+        return index
+        
+    
+    def _GetNumSelected( self ):
+        
+        return self._virtual_media_list.GetNumSelected()
+        
+    
+    def _GetPrettyStatus( self ):
+        
+        num_files = self._virtual_media_list.GetNumFiles()
+        
+        num_selected = self._virtual_media_list.GetNumSelected()
+        
+        if num_files == 1:
             
-            ClientGUIMenus.AppendSeparator( select_menu )
+            s = '1 file'
             
-            all_specific_file_domains = list( all_specific_file_domains )
+        else:
             
-            if CC.TRASH_SERVICE_KEY in all_specific_file_domains:
-                
-                all_specific_file_domains.remove( CC.TRASH_SERVICE_KEY )
-                all_specific_file_domains.insert( 0, CC.TRASH_SERVICE_KEY )
-                
+            s = HydrusData.ToHumanInt( num_files ) + ' files'
             
-            if CC.LOCAL_FILE_SERVICE_KEY in all_specific_file_domains:
-                
-                all_specific_file_domains.remove( CC.LOCAL_FILE_SERVICE_KEY )
-                all_specific_file_domains.insert( 0, CC.LOCAL_FILE_SERVICE_KEY )
-                
+        
+        if num_selected > 0:
             
-            for file_service_key in all_specific_file_domains:
-                
-                file_filter = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_FILE_SERVICE, file_service_key )
-                
-                ClientGUIMenus.AppendMenuItem( select_menu, file_filter.ToString( win, filter_counts ), 'Select all the files in this file domain.', win._Select, file_filter )
-                
+            s += ' - ' + HydrusData.ToHumanInt( num_selected ) + ' selected'
             
         
-        if has_local_and_remote:
+        if self._sorting:
             
-            file_filter_local = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_LOCAL )
-            file_filter_remote = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_REMOTE )
+            s += ' - sorting\u2026'
             
-            ClientGUIMenus.AppendSeparator( select_menu )
+        elif self._unsortable_media_sort is not None:
             
-            ClientGUIMenus.AppendMenuItem( select_menu, file_filter_local.ToString( win, filter_counts ), 'Remove all the files that are in this client.', win._Select, file_filter_local )
-            ClientGUIMenus.AppendMenuItem( select_menu, file_filter_remote.ToString( win, filter_counts ), 'Remove all the files that are not in this client.', win._Select, file_filter_remote )
+            s += ' - too many files to sort by ' + self._unsortable_media_sort.ToString()
             
         
-        file_filter_selected = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_SELECTED )
-        selected_count = file_filter_selected.GetCount( win, filter_counts )
+        return s
         
-        not_selected_count = file_filter_not_selected.GetCount( win, filter_counts )
+    
+    def _GetThumbnail( self, index ):
         
-        if selected_count > 0:
+        media_result = self._virtual_media_list.GetMediaResult( index )
+        
+        if media_result is None:
             
-            if not_selected_count > 0:
-                
-                ClientGUIMenus.AppendSeparator( select_menu )
-                
-                ClientGUIMenus.AppendMenuItem( select_menu, file_filter_not_selected.ToString( win, filter_counts ), 'Swap what is and is not selected.', win._Select, file_filter_not_selected )
-                
+            return None
             
-            ClientGUIMenus.AppendSeparator( select_menu )
+        
+        hash_id = media_result.GetHashId()
+        
+        if hash_id not in self._hash_ids_to_thumbnails:
             
-            ClientGUIMenus.AppendMenuItem( select_menu, file_filter_none.ToString( win, filter_counts ), 'Deselect everything selected.', win._Select, file_filter_none )
+            self._hash_ids_to_thumbnails[ hash_id ] = ThumbnailMediaSingleton( self._file_service_key, media_result )
             
         
-        ClientGUIMenus.AppendMenu( menu, select_menu, 'select' )
+        return self._hash_ids_to_thumbnails[ hash_id ]
         
     
-class Selectable( object ):
-    
-    def __init__( self ): self._selected = False
-    
-    def Deselect( self ): self._selected = False
-    
-    def IsSelected( self ): return self._selected
-    
-    def Select( self ): self._selected = True
-    
-class Thumbnail( Selectable ):
-    
-    def __init__( self, file_service_key ):
-        
-        Selectable.__init__( self )
-        
-        self._dump_status = CC.DUMPER_NOT_DUMPED
-        self._file_service_key = file_service_key
+    def _GetThumbnailSpanDimensions( self ):
         
-        self._last_tags = None
+        thumbnail_border = HG.client_controller.new_options.GetInteger( 'thumbnail_border' )
+        thumbnail_margin = HG.client_controller.new_options.GetInteger( 'thumbnail_margin' )
         
-        self._last_upper_summary = None
-        self._last_lower_summary = None
+        return ClientData.AddPaddingToDimensions( HC.options[ 'thumbnail_dimensions' ], ( thumbnail_border + thumbnail_margin ) * 2 )
         
     
-    def _ScaleUpThumbnailDimensions( self, thumbnail_dimensions, scale_up_dimensions ):
-        
-        ( thumb_width, thumb_height ) = thumbnail_dimensions
-        ( scale_up_width, scale_up_height ) = scale_up_dimensions
+    def _GetVisibleIndexRange( self ):
         
-        # we want to expand the image so that the smallest dimension fills everything
-        
-        scale_factor = max( scale_up_width / thumb_width, scale_up_height / thumb_height )
+        ( thumbnail_span_width, thumbnail_span_height ) = self._GetThumbnailSpanDimensions()
         
-        destination_width = int( round( thumb_width * scale_factor ) )
-        destination_height = int( round( thumb_height * scale_factor ) )
+        y_offset = self._scroll_bar.value()
         
-        offset_x = ( scale_up_width - destination_width ) // 2
-        offset_y = ( scale_up_height - destination_height ) // 2
+        first_row = y_offset // thumbnail_span_height
+        last_row = ( y_offset + self._canvas.height() ) // thumbnail_span_height
         
-        offset_position = ( offset_x, offset_y )
-        destination_dimensions = ( destination_width, destination_height )
+        start_index = first_row * self._num_columns
+        end_index = min( ( last_row + 1 ) * self._num_columns, self._virtual_media_list.GetNumFiles() )
         
-        return ( offset_position, destination_dimensions )
+        return ( start_index, end_index )
         
     
-    def Dumped( self, dump_status ):
+    def _HitIndex( self, index, ctrl, shift ):
         
-        self._dump_status = dump_status
+        if index is None:
+            
+            if not ctrl and not shift:
+                
+                self._virtual_media_list.SelectNone()
+                self._SetFocusedIndex( None )
+                self._shift_focused_index = None
+                
+            
+        else:
+            
+            if ctrl:
+                
+                if self._virtual_media_list.IsSelected( index ):
+                    
+                    self._virtual_media_list.DeselectRange( index, index + 1 )
+                    
+                    if self._focused_index == index:
+                        
+                        self._SetFocusedIndex( None )
+                        
+                    
+                    self._shift_focused_index = None
+                    
+                else:
+                    
+                    self._virtual_media_list.SelectRange( index, index + 1 )
+                    
+                    if self._focused_index is None:
+                        
+                        self._SetFocusedIndex( index )
+                        
+                    
+                    self._shift_focused_index = index
+                    
+                
+            elif shift and self._shift_focused_index is not None:
+                
+                start_index = min( index, self._shift_focused_index )
+                end_index = max( index, self._shift_focused_index ) + 1
+                
+                self._virtual_media_list.SelectRange( start_index, end_index )
+                
+                self._SetFocusedIndex( index )
+                
+                self._shift_focused_index = index
+                
+            else:
+                
+                if not self._virtual_media_list.IsSelected( index ):
+                    
+                    self._virtual_media_list.SelectNone()
+                    
+                    self._virtual_media_list.SelectRange( index, index + 1 )
+                    
+                
+                self._SetFocusedIndex( index )
+                self._shift_focused_index = index
+                
+            
+        
+        self._canvas.update()
+        
+        self._PublishSelectionChange()
+        
+    
+    def _MoveFocusedThumbnail( self, rows, columns, shift ):
+        
+        num_files = self._virtual_media_list.GetNumFiles()
+        
+        if num_files == 0:
+            
+            return
+            
+        
+        if self._focused_index is None:
+            
+            new_index = 0
+            
+        else:
+            
+            new_index = self._focused_index + ( rows * self._num_columns ) + columns
+            
+            new_index = max( 0, min( new_index, num_files - 1 ) )
+            
+        
+        self._HitIndex( new_index, False, shift )
+        
+        self._ScrollToIndex( new_index )
+        
+    
+    def _RemoveMediaByHashes( self, hashes ):
+        
+        if len( hashes ) > 0:
+            
+            HG.client_controller.CallToThread( self.THREADRemoveHashes, set( hashes ) )
+            
+        
+    
+    def _ReorderFinished( self, focused_hash_id ):
+        
+        if focused_hash_id is None:
+            
+            self._focused_index = None
+            
+        else:
+            
+            self._focused_index = self._virtual_media_list.GetIndex( focused_hash_id )
+            
+            if self._focused_index is None:
+                
+                self._SetFocusedIndex( None )
+                
+            
+        
+        self._shift_focused_index = self._focused_index
+        
+        self._UpdateScrollBar()
+        
+        self._canvas.update()
+        
+        self._PublishSelectionChange()
+        
+    
+    def _ScrollEnd( self, shift = False ):
+        
+        num_files = self._virtual_media_list.GetNumFiles()
+        
+        if num_files > 0:
+            
+            self._HitIndex( num_files - 1, False, shift )
+            
+            self._ScrollToIndex( num_files - 1 )
+            
+        
+    
+    def _ScrollHome( self, shift = False ):
+        
+        if self._virtual_media_list.GetNumFiles() > 0:
+            
+            self._HitIndex( 0, False, shift )
+            
+            self._ScrollToIndex( 0 )
+            
+        
+    
+    def _ScrollToIndex( self, index ):
+        
+        ( thumbnail_span_width, thumbnail_span_height ) = self._GetThumbnailSpanDimensions()
+        
+        y = ( index // self._num_columns ) * thumbnail_span_height
+        
+        y_offset = self._scroll_bar.value()
+        canvas_height = self._canvas.height()
+        
+        if y < y_offset:
+            
+            self._scroll_bar.setValue( y )
+            
+        elif y + thumbnail_span_height > y_offset + canvas_height:
+            
+            self._scroll_bar.setValue( y + thumbnail_span_height - canvas_height )
+            
+        
+    
+    def _Select( self, file_filter ):
+        
+        # anything cleverer than this needs every media result
+        
+        if file_filter.filter_type == ClientMedia.FILE_FILTER_ALL:
+            
+            self._virtual_media_list.SelectAll()
+            
+        elif file_filter.filter_type == ClientMedia.FILE_FILTER_NONE:
+            
+            self._virtual_media_list.SelectNone()
+            
+        elif file_filter.filter_type == ClientMedia.FILE_FILTER_NOT_SELECTED:
+            
+            self._virtual_media_list.InvertSelection()
+            
+        else:
+            
+            return
+            
+        
+        if self._focused_index is not None and not self._virtual_media_list.IsSelected( self._focused_index ):
+            
+            self._SetFocusedIndex( None )
+            
+        
+        self._canvas.update()
+        
+        self._PublishSelectionChange()
+        
+    
+    def _SetFocusedIndex( self, index ):
+        
+        self._focused_index = index
+        
+        if index is None:
+            
+            thumbnail = None
+            
+        else:
+            
+            thumbnail = self._GetThumbnail( index )
+            
+        
+        self._SetFocusedMedia( thumbnail )
+        
+    
+    def _SetFocusedMedia( self, media ):
+        
+        # the base version wants to walk the whole list to find the next best media, which we don't have
+        
+        self._focused_media = media
+        
+        if media is None or media.GetDisplayMedia() is None:
+            
+            self.focusMediaCleared.emit()
+            
+        else:
+            
+            self.focusMediaChanged.emit( media.GetDisplayMedia() )
+            
+        
+    
+    def _ShowSelectionInNewPage( self ):
+        
+        hash_ids = self._virtual_media_list.GetSelectedHashIds()
+        
+        if len( hash_ids ) > 0:
+            
+            HG.client_controller.CallToThread( self.THREADShowHashIdsInNewPage, hash_ids )
+            
+        
+    
+    def _UpdateScrollBar( self ):
+        
+        ( thumbnail_span_width, thumbnail_span_height ) = self._GetThumbnailSpanDimensions()
+        
+        canvas_size = self._canvas.size()
+        
+        self._num_columns = max( 1, canvas_size.width() // thumbnail_span_width )
+        
+        num_rows = - ( - self._virtual_media_list.GetNumFiles() // self._num_columns )
+        
+        virtual_height = num_rows * thumbnail_span_height
+        
+        thumbnail_scroll_rate = float( HG.client_controller.new_options.GetString( 'thumbnail_scroll_rate' ) )
+        
+        self._scroll_bar.setRange( 0, max( 0, virtual_height - canvas_size.height() ) )
+        self._scroll_bar.setPageStep( max( 1, canvas_size.height() ) )
+        self._scroll_bar.setSingleStep( int( round( thumbnail_span_height * thumbnail_scroll_rate ) ) )
+        
+    
+    class _Canvas( QW.QWidget ):
+        
+        def __init__( self, parent, media_panel ):
+            
+            QW.QWidget.__init__( self, parent )
+            
+            self._media_panel = media_panel
+            
+        
+        def mouseDoubleClickEvent( self, event ):
+            
+            if event.button() == QC.Qt.LeftButton:
+                
+                self._media_panel._ActivateIndex( self._media_panel._GetIndexUnderMouse( event ) )
+                
+            
+        
+        def mousePressEvent( self, event ):
+            
+            index = self._media_panel._GetIndexUnderMouse( event )
+            
+            if event.button() == QC.Qt.MiddleButton:
+                
+                self._media_panel._ActivateIndex( index )
+                
+                return
+                
+            
+            right_on_whitespace = event.button() == QC.Qt.RightButton and index is None
+            
+            if not right_on_whitespace:
+                
+                self._media_panel._HitIndex( index, event.modifiers() & QC.Qt.ControlModifier, event.modifiers() & QC.Qt.ShiftModifier )
+                
+            
+        
+        def mouseReleaseEvent( self, event ):
+            
+            if event.button() == QC.Qt.RightButton:
+                
+                self._media_panel.ShowMenu()
+                
+            
+        
+        def paintEvent( self, event ):
+            
+            painter = QG.QPainter( self )
+            
+            self._media_panel._DrawCanvas( painter )
+            
+        
+        def resizeEvent( self, event ):
+            
+            self._media_panel._UpdateScrollBar()
+            
+        
+        def wheelEvent( self, event ):
+            
+            QW.QApplication.sendEvent( self._media_panel._scroll_bar, event )
+            
+        
+    
+    def AddMediaResults( self, page_key, media_results ):
+        
+        if page_key == self._page_key:
+            
+            HG.client_controller.pub( 'refresh_page_name', self._page_key )
+            
+            self._virtual_media_list.AppendMediaResults( media_results )
+            
+            self._UpdateScrollBar()
+            
+            self._canvas.update()
+            
+            self._PublishSelectionChange()
+            
+        
+    
+    def Collect( self, page_key, media_collect = None ):
+        
+        pass
+        
+    
+    def contextMenuEvent( self, event ):
+        
+        if event.reason() == QG.QContextMenuEvent.Keyboard:
+            
+            self.ShowMenu()
+            
+        
+    
+    def GenerateMediaResults( self, has_location = None, discriminant = None, selected_media = None, unrated = None, for_media_viewer = False ):
+        
+        # the media viewer gets what is loaded around the focus
+        
+        if self._focused_index is None:
+            
+            return []
+            
+        
+        start_index = max( 0, self._focused_index - VIRTUAL_PAGE_MEDIA_VIEWER_RADIUS )
+        end_index = min( self._focused_index + VIRTUAL_PAGE_MEDIA_VIEWER_RADIUS, self._virtual_media_list.GetNumFiles() )
+        
+        media_results = []
+        
+        for index in range( start_index, end_index ):
+            
+            media_result = self._virtual_media_list.GetMediaResult( index )
+            
+            if media_result is None:
+                
+                continue
+                
+            
+            if discriminant == CC.DISCRIMINANT_LOCAL and not media_result.GetLocationsManager().IsLocal():
+                
+                continue
+                
+            
+            media_results.append( media_result )
+            
+        
+        return media_results
+        
+    
+    def GetAPIInfoDict( self, simple ):
+        
+        d = {}
+        
+        d[ 'num_files' ] = self.GetNumFiles()
+        
+        d[ 'hash_ids' ] = self._virtual_media_list.GetHashIds()
+        
+        if not simple:
+            
+            hashes = self.GetHashes( ordered = True )
+            
+            d[ 'hashes' ] = [ hash.hex() for hash in hashes ]
+            
+        
+        return d
+        
+    
+    def GetHashes( self, has_location = None, discriminant = None, not_uploaded_to = None, ordered = False ):
+        
+        return self._virtual_media_list.GetHashes( ordered = ordered )
+        
+    
+    def GetNumFiles( self ):
+        
+        return self._virtual_media_list.GetNumFiles()
+        
+    
+    def GetSortedMedia( self ):
+        
+        return []
+        
+    
+    def NotifyNewFileInfo( self, hashes ):
+        
+        self._canvas.update()
+        
+    
+    def ProcessApplicationCommand( self, command ):
+        
+        command_processed = True
+        
+        command_type = command.GetCommandType()
+        data = command.GetData()
+        
+        if command_type == CC.APPLICATION_COMMAND_TYPE_SIMPLE:
+            
+            action = data
+            
+            if action == 'open_selection_in_new_page':
+                
+                self._ShowSelectionInNewPage()
+                
+            else:
+                
+                command_processed = False
+                
+            
+        else:
+            
+            command_processed = False
+            
+        
+        return command_processed
+        
+    
+    def ProcessContentUpdates( self, service_keys_to_content_updates ):
+        
+        # our media results are the db's live ones, so they are already updated. deletes come through _RemoveMediaByHashes
+        
+        MediaPanel.ProcessContentUpdates( self, service_keys_to_content_updates )
+        
+        self._canvas.update()
+        
+    
+    def RedrawAllThumbnails( self ):
+        
+        self._canvas.update()
+        
+    
+    def RefreshAcceleratorTable( self ):
+        
+        if not self or not QP.isValid( self ):
+            
+            return
+            
+        
+        for child in self.children():
+            
+            if isinstance( child, QW.QShortcut ):
+                
+                child.setParent( None )
+                child.deleteLater()
+                
+            
+        
+        QP.AddShortcut( self, QC.Qt.NoModifier, QC.Qt.Key_Home, self._ScrollHome, False )
+        QP.AddShortcut( self, QC.Qt.KeypadModifier, QC.Qt.Key_Home, self._ScrollHome, False )
+        QP.AddShortcut( self, QC.Qt.NoModifier, QC.Qt.Key_End, self._ScrollEnd, False )
+        QP.AddShortcut( self, QC.Qt.KeypadModifier, QC.Qt.Key_End, self._ScrollEnd, False )
+        QP.AddShortcut( self, QC.Qt.NoModifier, QC.Qt.Key_Return, self._LaunchMediaViewer )
+        QP.AddShortcut( self, QC.Qt.KeypadModifier, QC.Qt.Key_Enter, self._LaunchMediaViewer )
+        QP.AddShortcut( self, QC.Qt.NoModifier, QC.Qt.Key_Up, self._MoveFocusedThumbnail, -1, 0, False )
+        QP.AddShortcut( self, QC.Qt.KeypadModifier, QC.Qt.Key_Up, self._MoveFocusedThumbnail, -1, 0, False )
+        QP.AddShortcut( self, QC.Qt.NoModifier, QC.Qt.Key_Down, self._MoveFocusedThumbnail, 1, 0, False )
+        QP.AddShortcut( self, QC.Qt.KeypadModifier, QC.Qt.Key_Down, self._MoveFocusedThumbnail, 1, 0, False )
+        QP.AddShortcut( self, QC.Qt.NoModifier, QC.Qt.Key_Left, self._MoveFocusedThumbnail, 0, -1, False )
+        QP.AddShortcut( self, QC.Qt.KeypadModifier, QC.Qt.Key_Left, self._MoveFocusedThumbnail, 0, -1, False )
+        QP.AddShortcut( self, QC.Qt.NoModifier, QC.Qt.Key_Right, self._MoveFocusedThumbnail, 0, 1, False )
+        QP.AddShortcut( self, QC.Qt.KeypadModifier, QC.Qt.Key_Right, self._MoveFocusedThumbnail, 0, 1, False )
+        QP.AddShortcut( self, QC.Qt.NoModifier, QC.Qt.Key_PageUp, lambda: self._MoveFocusedThumbnail( - max( 1, self._canvas.height() // self._GetThumbnailSpanDimensions()[1] ), 0, False ) )
+        QP.AddShortcut( self, QC.Qt.NoModifier, QC.Qt.Key_PageDown, lambda: self._MoveFocusedThumbnail( max( 1, self._canvas.height() // self._GetThumbnailSpanDimensions()[1] ), 0, False ) )
+        QP.AddShortcut( self, QC.Qt.ShiftModifier, QC.Qt.Key_Home, self._ScrollHome, True )
+        QP.AddShortcut( self, QC.Qt.ShiftModifier | QC.Qt.KeypadModifier, QC.Qt.Key_Home, self._ScrollHome, True )
+        QP.AddShortcut( self, QC.Qt.ShiftModifier, QC.Qt.Key_End, self._ScrollEnd, True )
+        QP.AddShortcut( self, QC.Qt.ShiftModifier | QC.Qt.KeypadModifier, QC.Qt.Key_End, self._ScrollEnd, True )
+        QP.AddShortcut( self, QC.Qt.ShiftModifier, QC.Qt.Key_Up, self._MoveFocusedThumbnail, -1, 0, True )
+        QP.AddShortcut( self, QC.Qt.ShiftModifier | QC.Qt.KeypadModifier, QC.Qt.Key_Up, self._MoveFocusedThumbnail, -1, 0, True )
+        QP.AddShortcut( self, QC.Qt.ShiftModifier, QC.Qt.Key_Down, self._MoveFocusedThumbnail, 1, 0, True )
+        QP.AddShortcut( self, QC.Qt.ShiftModifier | QC.Qt.KeypadModifier, QC.Qt.Key_Down, self._MoveFocusedThumbnail, 1, 0, True )
+        QP.AddShortcut( self, QC.Qt.ShiftModifier, QC.Qt.Key_Left, self._MoveFocusedThumbnail, 0, -1, True )
+        QP.AddShortcut( self, QC.Qt.ShiftModifier | QC.Qt.KeypadModifier, QC.Qt.Key_Left, self._MoveFocusedThumbnail, 0, -1, True )
+        QP.AddShortcut( self, QC.Qt.ShiftModifier, QC.Qt.Key_Right, self._MoveFocusedThumbnail, 0, 1, True )
+        QP.AddShortcut( self, QC.Qt.ShiftModifier | QC.Qt.KeypadModifier, QC.Qt.Key_Right, self._MoveFocusedThumbnail, 0, 1, True )
+        QP.AddShortcut( self, QC.Qt.NoModifier, QC.Qt.Key_Escape, self._Select, ClientMedia.FileFilter( ClientMedia.FILE_FILTER_NONE ) )
+        QP.AddShortcut( self, QC.Qt.ControlModifier, QC.Qt.Key_A, self._Select, ClientMedia.FileFilter( ClientMedia.FILE_FILTER_ALL ) )
+        
+    
+    def SetFocusedMedia( self, media ):
+        
+        if media is None:
+            
+            self._SetFocusedIndex( None )
+            
+        else:
+            
+            display_media = media.GetDisplayMedia()
+            
+            if display_media is None:
+                
+                return
+                
+            
+            index = self._virtual_media_list.GetIndex( display_media.GetMediaResult().GetHashId() )
+            
+            if index is not None:
+                
+                self._HitIndex( index, False, False )
+                
+                self._ScrollToIndex( index )
+                
+            
+        
+    
+    def ShowMenu( self ):
+        
+        num_files = self._virtual_media_list.GetNumFiles()
+        num_selected = self._virtual_media_list.GetNumSelected()
+        
+        menu = QW.QMenu()
+        
+        ClientGUIMenus.AppendMenuLabel( menu, self._GetPrettyStatus() )
+        
+        ClientGUIMenus.AppendSeparator( menu )
+        
+        ClientGUIMenus.AppendMenuItem( menu, 'refresh', 'Refresh the current search.', self.refreshQuery.emit )
+        
+        if num_files > 0:
+            
+            ClientGUIMenus.AppendSeparator( menu )
+            
+            select_menu = QW.QMenu( menu )
+            
+            if num_selected < num_files:
+                
+                ClientGUIMenus.AppendMenuItem( select_menu, 'all', 'Select all the files in the current view.', self._Select, ClientMedia.FileFilter( ClientMedia.FILE_FILTER_ALL ) )
+                
+            
+            if num_selected > 0:
+                
+                ClientGUIMenus.AppendMenuItem( select_menu, 'invert', 'Swap what is and is not selected.', self._Select, ClientMedia.FileFilter( ClientMedia.FILE_FILTER_NOT_SELECTED ) )
+                ClientGUIMenus.AppendMenuItem( select_menu, 'none', 'Deselect everything selected.', self._Select, ClientMedia.FileFilter( ClientMedia.FILE_FILTER_NONE ) )
+                
+            
+            ClientGUIMenus.AppendMenu( menu, select_menu, 'select' )
+            
+        
+        if num_selected > 0:
+            
+            ClientGUIMenus.AppendSeparator( menu )
+            
+            ClientGUIMenus.AppendMenuItem( menu, 'open selection in a new page', 'Copy your current selection into a simple new page, where you can do everything to it.', self._ShowSelectionInNewPage )
+            
+        
+        CGC.core().PopupMenu( self, menu )
+        
+    
+    def showEvent( self, event ):
+        
+        self._UpdateScrollBar()
+        
+    
+    def Sort( self, media_sort = None ):
+        
+        if media_sort is None:
+            
+            media_sort = self._media_sort
+            
+        
+        self._media_sort = media_sort
+        
+        self._sorting = True
+        
+        self._PublishSelectionChange()
+        
+        HG.client_controller.CallToThread( self.THREADSort, media_sort, self._virtual_media_list.GetHashIds() )
+        
+    
+    def ThumbnailsReset( self ):
+        
+        self._hash_ids_to_thumbnails = {}
+        self._hash_ids_waterfalling = set()
+        
+        self._UpdateScrollBar()
+        
+        self._canvas.update()
+        
+    
+    def THREADFetchMediaResults( self, hash_ids ):
+        
+        def qt_code():
+            
+            if not self or not QP.isValid( self ):
+                
+                return
+                
+            
+            self._fetching_media_results = False
+            
+            self._virtual_media_list.CacheMediaResults( media_results )
+            
+            self._hash_ids_to_thumbnails = { hash_id : thumbnail for ( hash_id, thumbnail ) in self._hash_ids_to_thumbnails.items() if self._virtual_media_list.HasMediaResult( hash_id ) }
+            
+            if self._focused_index is not None and self._focused_media is None:
+                
+                self._SetFocusedIndex( self._focused_index )
+                
+            
+            # the paint will fetch again if we scrolled in the meantime
+            self._canvas.update()
+            
+        
+        media_results = []
+        
+        try:
+            
+            for sub_hash_ids in HydrusData.SplitListIntoChunks( hash_ids, 256 ):
+                
+                more_media_results = HG.client_controller.Read( 'media_results_from_ids', sub_hash_ids )
+                
+                media_results.extend( more_media_results )
+                
+            
+        finally:
+            
+            QP.CallAfter( qt_code )
+            
+        
+    
+    def THREADRemoveHashes( self, hashes ):
+        
+        def qt_code():
+            
+            if not self or not QP.isValid( self ):
+                
+                return
+                
+            
+            if self._focused_index is None:
+                
+                focused_hash_id = None
+                
+            else:
+                
+                focused_hash_id = self._virtual_media_list.GetHashId( self._focused_index )
+                
+            
+            self._virtual_media_list.RemoveHashIds( hash_ids )
+            
+            for hash_id in hash_ids:
+                
+                if hash_id in self._hash_ids_to_thumbnails:
+                    
+                    del self._hash_ids_to_thumbnails[ hash_id ]
+                    
+                
+            
+            if focused_hash_id in hash_ids:
+                
+                focused_hash_id = None
+                
+                self._SetFocusedIndex( None )
+                
+            
+            self._ReorderFinished( focused_hash_id )
+            
+            HG.client_controller.pub( 'refresh_page_name', self._page_key )
+            
+        
+        hash_ids = set( HG.client_controller.Read( 'hash_ids_to_hashes', hashes = hashes ).keys() )
+        
+        QP.CallAfter( qt_code )
+        
+    
+    def THREADShowHashIdsInNewPage( self, hash_ids ):
+        
+        hash_ids_to_hashes = HG.client_controller.Read( 'hash_ids_to_hashes', hash_ids = hash_ids )
+        
+        hashes = [ hash_ids_to_hashes[ hash_id ] for hash_id in hash_ids ]
+        
+        HG.client_controller.pub( 'new_page_query', self._file_service_key, initial_hashes = hashes )
+        
+    
+    def THREADSort( self, media_sort, hash_ids ):
+        
+        def qt_code():
+            
+            if not self or not QP.isValid( self ):
+                
+                return
+                
+            
+            if media_sort is not self._media_sort:
+                
+                # a newer sort is on its way
+                
+                return
+                
+            
+            self._sorting = False
+            
+            if did_sort:
+                
+                self._unsortable_media_sort = None
+                
+                if self._focused_index is None:
+                    
+                    focused_hash_id = None
+                    
+                else:
+                    
+                    focused_hash_id = self._virtual_media_list.GetHashId( self._focused_index )
+                    
+                
+                self._virtual_media_list.SetSortedHashIds( sorted_hash_ids )
+                
+                self._ReorderFinished( focused_hash_id )
+                
+            else:
+                
+                self._unsortable_media_sort = media_sort
+                
+                self._PublishSelectionChange()
+                
+            
+        
+        ( sort_metatype, sort_data ) = media_sort.sort_type
+        
+        if sort_metatype == 'system' and sort_data == CC.SORT_FILES_BY_RANDOM:
+            
+            sorted_hash_ids = list( hash_ids )
+            
+            random.shuffle( sorted_hash_ids )
+            
+            did_sort = True
+            
+        else:
+            
+            ( did_sort, sorted_hash_ids ) = HG.client_controller.Read( 'sorted_hash_ids', self._file_service_key, hash_ids, media_sort )
+            
+        
+        QP.CallAfter( qt_code )
+        
+    
+    def WaterfallThumbnails( self, page_key, thumbnails ):
+        
+        if self._page_key == page_key:
+            
+            for thumbnail in thumbnails:
+                
+                self._hash_ids_waterfalling.discard( thumbnail.GetMediaResult().GetHashId() )
+                
+            
+            self._canvas.update()
+            
+        
+    
+def AddRemoveMenu( win: MediaPanel, menu, filter_counts, all_specific_file_domains, has_local_and_remote ):
+    
+    file_filter_all = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_ALL )
+    
+    if file_filter_all.GetCount( win, filter_counts ) > 0:
+        
+        remove_menu = QW.QMenu( menu )
+        
+        #
+        
+        file_filter_selected = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_SELECTED )
+        
+        file_filter_inbox = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_INBOX )
+        
+        file_filter_archive = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_ARCHIVE )
+        
+        file_filter_not_selected = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_NOT_SELECTED )
+        
+        #
+        
+        selected_count = file_filter_selected.GetCount( win, filter_counts )
+        
+        if selected_count > 0 and selected_count < file_filter_all.GetCount( win, filter_counts ):
+            
+            ClientGUIMenus.AppendMenuItem( remove_menu, file_filter_selected.ToString( win, filter_counts ), 'Remove all the selected files from the current view.', win._Remove, file_filter_selected )
+            
+        
+        if file_filter_all.GetCount( win, filter_counts ) > 0:
+            
+            ClientGUIMenus.AppendSeparator( remove_menu )
+            
+            ClientGUIMenus.AppendMenuItem( remove_menu, file_filter_all.ToString( win, filter_counts ), 'Remove all the files from the current view.', win._Remove, file_filter_all )
+            
+        
+        if file_filter_inbox.GetCount( win, filter_counts ) > 0 and file_filter_archive.GetCount( win, filter_counts ) > 0:
+            
+            ClientGUIMenus.AppendSeparator( remove_menu )
+            
+            ClientGUIMenus.AppendMenuItem( remove_menu, file_filter_inbox.ToString( win, filter_counts ), 'Remove all the inbox files from the current view.', win._Remove, file_filter_inbox )
+            
+            ClientGUIMenus.AppendMenuItem( remove_menu, file_filter_archive.ToString( win, filter_counts ), 'Remove all the archived files from the current view.', win._Remove, file_filter_archive )
+            
+        
+        if len( all_specific_file_domains ) > 1:
+            
+            ClientGUIMenus.AppendSeparator( remove_menu )
+            
+            all_specific_file_domains = list( all_specific_file_domains )
+            
+            if CC.TRASH_SERVICE_KEY in all_specific_file_domains:
+                
+                all_specific_file_domains.remove( CC.TRASH_SERVICE_KEY )
+                all_specific_file_domains.insert( 0, CC.TRASH_SERVICE_KEY )
+                
+            
+            if CC.LOCAL_FILE_SERVICE_KEY in all_specific_file_domains:
+                
+                all_specific_file_domains.remove( CC.LOCAL_FILE_SERVICE_KEY )
+                all_specific_file_domains.insert( 0, CC.LOCAL_FILE_SERVICE_KEY )
+                
+            
+            for file_service_key in all_specific_file_domains:
+                
+                file_filter = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_FILE_SERVICE, file_service_key )
+                
+                ClientGUIMenus.AppendMenuItem( remove_menu, file_filter.ToString( win, filter_counts ), 'Remove all the files that are in this file domain.', win._Remove, file_filter )
+                
+            
+        
+        if has_local_and_remote:
+            
+            file_filter_local = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_LOCAL )
+            file_filter_remote = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_REMOTE )
+            
+            ClientGUIMenus.AppendSeparator( remove_menu )
+            
+            ClientGUIMenus.AppendMenuItem( remove_menu, file_filter_local.ToString( win, filter_counts ), 'Remove all the files that are in this client.', win._Remove, file_filter_local )
+            ClientGUIMenus.AppendMenuItem( remove_menu, file_filter_remote.ToString( win, filter_counts ), 'Remove all the files that are not in this client.', win._Remove, file_filter_remote )
+            
+        
+        not_selected_count = file_filter_not_selected.GetCount( win, filter_counts )
+        
+        if not_selected_count > 0 and selected_count > 0:
+            
+            ClientGUIMenus.AppendSeparator( remove_menu )
+            
+            ClientGUIMenus.AppendMenuItem( remove_menu, file_filter_not_selected.ToString( win, filter_counts ), 'Remove all the not selected files from the current view.', win._Remove, file_filter_not_selected )
+            
+        
+        ClientGUIMenus.AppendMenu( menu, remove_menu, 'remove' )
+        
+    
+def AddSelectMenu( win: MediaPanel, menu, filter_counts, all_specific_file_domains, has_local_and_remote ):
+    
+    file_filter_all = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_ALL )
+    
+    if file_filter_all.GetCount( win, filter_counts ) > 0:
+        
+        select_menu = QW.QMenu( menu )
+        
+        #
+        
+        file_filter_inbox = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_INBOX )
+        
+        file_filter_archive = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_ARCHIVE )
+        
+        file_filter_not_selected = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_NOT_SELECTED )
+        
+        file_filter_none = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_NONE )
+        
+        #
+        
+        if file_filter_all.GetCount( win, filter_counts ) > 0:
+            
+            ClientGUIMenus.AppendSeparator( select_menu )
+            
+            ClientGUIMenus.AppendMenuItem( select_menu, file_filter_all.ToString( win, filter_counts ), 'Select all the files in the current view.', win._Select, file_filter_all )
+            
+        
+        if file_filter_inbox.GetCount( win, filter_counts ) > 0 and file_filter_archive.GetCount( win, filter_counts ) > 0:
+            
+            ClientGUIMenus.AppendSeparator( select_menu )
+            
+            ClientGUIMenus.AppendMenuItem( select_menu, file_filter_inbox.ToString( win, filter_counts ), 'Select all the inbox files in the current view.', win._Select, file_filter_inbox )
+            
+            ClientGUIMenus.AppendMenuItem( select_menu, file_filter_archive.ToString( win, filter_counts ), 'Select all the archived files in the current view.', win._Select, file_filter_archive )
+            
+        
+        if len( all_specific_file_domains ) > 1:
+            
+            ClientGUIMenus.AppendSeparator( select_menu )
+            
+            all_specific_file_domains = list( all_specific_file_domains )
+            
+            if CC.TRASH_SERVICE_KEY in all_specific_file_domains:
+                
+                all_specific_file_domains.remove( CC.TRASH_SERVICE_KEY )
+                all_specific_file_domains.insert( 0, CC.TRASH_SERVICE_KEY )
+                
+            
+            if CC.LOCAL_FILE_SERVICE_KEY in all_specific_file_domains:
+                
+                all_specific_file_domains.remove( CC.LOCAL_FILE_SERVICE_KEY )
+                all_specific_file_domains.insert( 0, CC.LOCAL_FILE_SERVICE_KEY )
+                
+            
+            for file_service_key in all_specific_file_domains:
+                
+                file_filter = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_FILE_SERVICE, file_service_key )
+                
+                ClientGUIMenus.AppendMenuItem( select_menu, file_filter.ToString( win, filter_counts ), 'Select all the files in this file domain.', win._Select, file_filter )
+                
+            
+        
+        if has_local_and_remote:
+            
+            file_filter_local = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_LOCAL )
+            file_filter_remote = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_REMOTE )
+            
+            ClientGUIMenus.AppendSeparator( select_menu )
+            
+            ClientGUIMenus.AppendMenuItem( select_menu, file_filter_local.ToString( win, filter_counts ), 'Remove all the files that are in this client.', win._Select, file_filter_local )
+            ClientGUIMenus.AppendMenuItem( select_menu, file_filter_remote.ToString( win, filter_counts ), 'Remove all the files that are not in this client.', win._Select, file_filter_remote )
+            
+        
+        file_filter_selected = ClientMedia.FileFilter( ClientMedia.FILE_FILTER_SELECTED )
+        selected_count = file_filter_selected.GetCount( win, filter_counts )
+        
+        not_selected_count = file_filter_not_selected.GetCount( win, filter_counts )
+        
+        if selected_count > 0:
+            
+            if not_selected_count > 0:
+                
+                ClientGUIMenus.AppendSeparator( select_menu )
+                
+                ClientGUIMenus.AppendMenuItem( select_menu, file_filter_not_selected.ToString( win, filter_counts ), 'Swap what is and is not selected.', win._Select, file_filter_not_selected )
+                
+            
+            ClientGUIMenus.AppendSeparator( select_menu )
+            
+            ClientGUIMenus.AppendMenuItem( select_menu, file_filter_none.ToString( win, filter_counts ), 'Deselect everything selected.', win._Select, file_filter_none )
+            
+        
+        ClientGUIMenus.AppendMenu( menu, select_menu, 'select' )
         
     
-    def GetQtImage( self ):
+class Selectable( object ):
+    
+    def __init__( self ): self._selected = False
+    
+    def Deselect( self ): self._selected = False
+    
+    def IsSelected( self ): return self._selected
+    
+    def Select( self ): self._selected = True
+    
+class Thumbnail( Selectable ):
+    
+    def __init__( self, file_service_key ):
         
-        thumbnail_hydrus_bmp = HG.client_controller.GetCache( 'thumbnail' ).GetThumbnail( self )
+        Selectable.__init__( self )
+        
+        self._dump_status = CC.DUMPER_NOT_DUMPED
+        self._file_service_key = file_service_key
+        
+        self._last_tags = None
+        
+        self._last_upper_summary = None
+        self._last_lower_summary = None
+        
+    
+    def _GenerateQtImage( self, thumbnail_hydrus_bmp, draw_state ):
+        
+        ( selected, local, upper_summary, lower_summary, top_right_icon_names, num_files_str, top_left_icon_names ) = draw_state
         
         thumbnail_border = HG.client_controller.new_options.GetInteger( 'thumbnail_border' )
         
@@ -4625,17 +5687,13 @@ class Thumbnail( Selectable ):
         
         qt_image = HG.client_controller.bitmap_manager.GetQtImage( width, height, 24 )
         
-        inbox = self.HasInbox()
-        
-        local = self.GetLocationsManager().IsLocal()
-        
         painter = QG.QPainter( qt_image )
         
         new_options = HG.client_controller.new_options
         
         if not local:
             
-            if self._selected:
+            if selected:
                 
                 background_colour_type = CC.COLOUR_THUMB_BACKGROUND_REMOTE_SELECTED
                 
@@ -4646,7 +5704,7 @@ class Thumbnail( Selectable ):
             
         else:
             
-            if self._selected:
+            if selected:
                 
                 background_colour_type = CC.COLOUR_THUMB_BACKGROUND_SELECTED
                 
@@ -4698,92 +5756,70 @@ class Thumbnail( Selectable ):
         
         new_options = HG.client_controller.new_options
         
-        tags = self.GetTagsManager().GetCurrentAndPending( CC.COMBINED_TAG_SERVICE_KEY, ClientTags.TAG_DISPLAY_SINGLE_MEDIA )
-        
-        if len( tags ) > 0:
+        if len( upper_summary ) > 0 or len( lower_summary ) > 0:
             
             upper_tag_summary_generator = new_options.GetTagSummaryGenerator( 'thumbnail_top' )
             lower_tag_summary_generator = new_options.GetTagSummaryGenerator( 'thumbnail_bottom_right' )
             
-            if self._last_tags is not None and self._last_tags == tags:
+            if len( upper_summary ) > 0:
                 
-                upper_summary = self._last_upper_summary
-                lower_summary = self._last_lower_summary
+                text_colour_with_alpha = upper_tag_summary_generator.GetTextColour()
                 
-            else:
+                painter.setFont( QW.QApplication.font() )
                 
-                upper_summary = upper_tag_summary_generator.GenerateSummary( tags )
+                background_colour_with_alpha = upper_tag_summary_generator.GetBackgroundColour()
                 
-                lower_summary = lower_tag_summary_generator.GenerateSummary( tags )
+                painter.setBrush( QG.QBrush( background_colour_with_alpha ) )
                 
-                self._last_tags = set( tags )
+                text_size = painter.fontMetrics().size( QC.Qt.TextSingleLine, upper_summary )
                 
-                self._last_upper_summary = upper_summary
-                self._last_lower_summary = lower_summary
+                box_x = thumbnail_border
+                box_y = thumbnail_border
+                box_width = width - ( thumbnail_border * 2 )
+                box_height = text_size.height() + 2
+                
+                painter.setPen( QG.QPen( QC.Qt.NoPen ) )
+                
+                painter.drawRect( box_x, box_y, box_width, box_height )
+                
+                text_x = ( width - text_size.width() ) // 2
+                text_y = box_y + TEXT_BORDER
+                
+                painter.setPen( QG.QPen( text_colour_with_alpha ) )
+                
+                QP.DrawText( painter, text_x, text_y, upper_summary )
                 
             
-            if len( upper_summary ) > 0 or len( lower_summary ) > 0:
+            if len( lower_summary ) > 0:
                 
-                if len( upper_summary ) > 0:
-                    
-                    text_colour_with_alpha = upper_tag_summary_generator.GetTextColour()
-                    
-                    painter.setFont( QW.QApplication.font() )
-                    
-                    background_colour_with_alpha = upper_tag_summary_generator.GetBackgroundColour()
-                    
-                    painter.setBrush( QG.QBrush( background_colour_with_alpha ) )
-                    
-                    text_size = painter.fontMetrics().size( QC.Qt.TextSingleLine, upper_summary )
-                    
-                    box_x = thumbnail_border
-                    box_y = thumbnail_border
-                    box_width = width - ( thumbnail_border * 2 )
-                    box_height = text_size.height() + 2
-                    
-                    painter.setPen( QG.QPen( QC.Qt.NoPen ) )
-                    
-                    painter.drawRect( box_x, box_y, box_width, box_height )
-                    
-                    text_x = ( width - text_size.width() ) // 2
-                    text_y = box_y + TEXT_BORDER
-                    
-                    painter.setPen( QG.QPen( text_colour_with_alpha ) )
-                    
-                    QP.DrawText( painter, text_x, text_y, upper_summary )
-                    
+                text_colour_with_alpha = lower_tag_summary_generator.GetTextColour()
                 
-                if len( lower_summary ) > 0:
-                    
-                    text_colour_with_alpha = lower_tag_summary_generator.GetTextColour()
-                    
-                    painter.setFont( QW.QApplication.font() )
-                    
-                    background_colour_with_alpha = lower_tag_summary_generator.GetBackgroundColour()
-                    
-                    painter.setBrush( QG.QBrush( background_colour_with_alpha ) )
-                    
-                    text_size = painter.fontMetrics().size( QC.Qt.TextSingleLine, lower_summary )
-                    
-                    text_width = text_size.width()
-                    text_height = text_size.height()
-                    
-                    box_width = text_width + ( TEXT_BORDER * 2 )
-                    box_height = text_height + ( TEXT_BORDER * 2 )
-                    box_x = width - box_width - thumbnail_border
-                    box_y = height - text_height - thumbnail_border
-                    
-                    painter.setPen( QG.QPen( QC.Qt.NoPen ) )
-                    
-                    painter.drawRect( box_x, box_y, box_width, box_height )
-                    
-                    text_x = box_x + TEXT_BORDER
-                    text_y = box_y + TEXT_BORDER
-                    
-                    painter.setPen( QG.QPen( text_colour_with_alpha ) )
-                    
-                    QP.DrawText( painter, text_x, text_y, lower_summary )
-                    
+                painter.setFont( QW.QApplication.font() )
+                
+                background_colour_with_alpha = lower_tag_summary_generator.GetBackgroundColour()
+                
+                painter.setBrush( QG.QBrush( background_colour_with_alpha ) )
+                
+                text_size = painter.fontMetrics().size( QC.Qt.TextSingleLine, lower_summary )
+                
+                text_width = text_size.width()
+                text_height = text_size.height()
+                
+                box_width = text_width + ( TEXT_BORDER * 2 )
+                box_height = text_height + ( TEXT_BORDER * 2 )
+                box_x = width - box_width - thumbnail_border
+                box_y = height - text_height - thumbnail_border
+                
+                painter.setPen( QG.QPen( QC.Qt.NoPen ) )
+                
+                painter.drawRect( box_x, box_y, box_width, box_height )
+                
+                text_x = box_x + TEXT_BORDER
+                text_y = box_y + TEXT_BORDER
+                
+                painter.setPen( QG.QPen( text_colour_with_alpha ) )
+                
+                QP.DrawText( painter, text_x, text_y, lower_summary )
                 
             
         
@@ -4791,7 +5827,7 @@ class Thumbnail( Selectable ):
             
             if not local:
                 
-                if self._selected:
+                if selected:
                     
                     border_colour_type = CC.COLOUR_THUMB_BORDER_REMOTE_SELECTED
                     
@@ -4802,7 +5838,7 @@ class Thumbnail( Selectable ):
                 
             else:
                 
-                if self._selected:
+                if selected:
                     
                     border_colour_type = CC.COLOUR_THUMB_BORDER_SELECTED
                     
@@ -4836,29 +5872,9 @@ class Thumbnail( Selectable ):
             painter.drawRects( rectangles )
             
         
-        locations_manager = self.GetLocationsManager()
-        
-        icons_to_draw = []
-        
-        if locations_manager.IsDownloading():
-            
-            icons_to_draw.append( CC.global_pixmaps().downloading )
-            
-        
-        if self.HasNotes():
-            
-            icons_to_draw.append( CC.global_pixmaps().notes )
-            
-        
-        if CC.TRASH_SERVICE_KEY in locations_manager.GetCurrent() or CC.COMBINED_LOCAL_FILE_SERVICE_KEY in locations_manager.GetDeleted():
-            
-            icons_to_draw.append( CC.global_pixmaps().trash )
-            
+        global_pixmaps = CC.global_pixmaps()
         
-        if inbox:
-            
-            icons_to_draw.append( CC.global_pixmaps().inbox )
-            
+        icons_to_draw = [ getattr( global_pixmaps, icon_name ) for icon_name in top_right_icon_names ]
         
         if len( icons_to_draw ) > 0:
             
@@ -4872,11 +5888,9 @@ class Thumbnail( Selectable ):
                 
             
         
-        if self.IsCollection():
-            
-            painter.drawPixmap( 1, height-17, CC.global_pixmaps().collection )
+        if num_files_str is not None:
             
-            num_files_str = HydrusData.ToHumanInt( self.GetNumFiles() )
+            painter.drawPixmap( 1, height-17, global_pixmaps.collection )
             
             painter.setFont( QW.QApplication.font() )
             
@@ -4898,77 +5912,174 @@ class Thumbnail( Selectable ):
         
         # top left icons
         
-        icons_to_draw = []
+        icons_to_draw = [ getattr( global_pixmaps, icon_name ) for icon_name in top_left_icon_names ]
         
-        if self.HasAudio():
-            
-            icons_to_draw.append( CC.global_pixmaps().sound )
+        ICON_MARGIN = 1
+        ICON_SPACING = 2
+        
+        top_left_x = thumbnail_border + ICON_MARGIN
+        
+        for icon_to_draw in icons_to_draw:
             
-        elif self.HasDuration():
+            painter.drawPixmap( top_left_x, thumbnail_border + ICON_MARGIN, icon_to_draw )
             
-            icons_to_draw.append( CC.global_pixmaps().play )
+            top_left_x += icon_to_draw.width() + ICON_SPACING
             
         
-        services_manager = HG.client_controller.services_manager
+        return qt_image
         
-        current = locations_manager.GetCurrentRemote()
-        pending = locations_manager.GetPendingRemote()
-        petitioned = locations_manager.GetPetitionedRemote()
+    
+    def _GetDrawState( self ):
         
-        current_to_display = current.difference( petitioned )
+        # everything particular to this thumbnail that goes into drawing it, so we know when a cached drawing is still good
         
-        #
+        new_options = HG.client_controller.new_options
+        
+        locations_manager = self.GetLocationsManager()
+        
+        local = locations_manager.IsLocal()
         
-        service_types = [ services_manager.GetService( service_key ).GetServiceType() for service_key in current_to_display ]
+        tags = self.GetTagsManager().GetCurrentAndPending( CC.COMBINED_TAG_SERVICE_KEY, ClientTags.TAG_DISPLAY_SINGLE_MEDIA )
         
-        if HC.FILE_REPOSITORY in service_types:
+        if len( tags ) > 0:
+            
+            if self._last_tags is not None and self._last_tags == tags:
+                
+                upper_summary = self._last_upper_summary
+                lower_summary = self._last_lower_summary
+                
+            else:
+                
+                upper_tag_summary_generator = new_options.GetTagSummaryGenerator( 'thumbnail_top' )
+                lower_tag_summary_generator = new_options.GetTagSummaryGenerator( 'thumbnail_bottom_right' )
+                
+                upper_summary = upper_tag_summary_generator.GenerateSummary( tags )
+                
+                lower_summary = lower_tag_summary_generator.GenerateSummary( tags )
+                
+                self._last_tags = set( tags )
+                
+                self._last_upper_summary = upper_summary
+                self._last_lower_summary = lower_summary
+                
             
-            icons_to_draw.append( CC.global_pixmaps().file_repository )
+        else:
+            
+            upper_summary = ''
+            lower_summary = ''
             
         
-        if HC.IPFS in service_types:
+        top_right_icon_names = []
+        
+        if locations_manager.IsDownloading():
             
-            icons_to_draw.append( CC.global_pixmaps().ipfs )
+            top_right_icon_names.append( 'downloading' )
             
         
-        #
-        
-        service_types = [ services_manager.GetService( service_key ).GetServiceType() for service_key in pending ]
+        if self.HasNotes():
+            
+            top_right_icon_names.append( 'notes' )
+            
         
-        if HC.FILE_REPOSITORY in service_types:
+        if CC.TRASH_SERVICE_KEY in locations_manager.GetCurrent() or CC.COMBINED_LOCAL_FILE_SERVICE_KEY in locations_manager.GetDeleted():
             
-            icons_to_draw.append( CC.global_pixmaps().file_repository_pending )
+            top_right_icon_names.append( 'trash' )
             
         
-        if HC.IPFS in service_types:
+        if self.HasInbox():
             
-            icons_to_draw.append( CC.global_pixmaps().ipfs_pending )
+            top_right_icon_names.append( 'inbox' )
             
         
-        #
+        if self.IsCollection():
+            
+            num_files_str = HydrusData.ToHumanInt( self.GetNumFiles() )
+            
+        else:
+            
+            num_files_str = None
+            
         
-        service_types = [ services_manager.GetService( service_key ).GetServiceType() for service_key in petitioned ]
+        top_left_icon_names = []
         
-        if HC.FILE_REPOSITORY in service_types:
+        if self.HasAudio():
+            
+            top_left_icon_names.append( 'sound' )
             
-            icons_to_draw.append( CC.global_pixmaps().file_repository_petitioned )
+        elif self.HasDuration():
+            
+            top_left_icon_names.append( 'play' )
             
         
-        if HC.IPFS in service_types:
+        services_manager = HG.client_controller.services_manager
+        
+        current = locations_manager.GetCurrentRemote()
+        pending = locations_manager.GetPendingRemote()
+        petitioned = locations_manager.GetPetitionedRemote()
+        
+        current_to_display = current.difference( petitioned )
+        
+        for ( service_keys, suffix ) in ( ( current_to_display, '' ), ( pending, '_pending' ), ( petitioned, '_petitioned' ) ):
+            
+            service_types = [ services_manager.GetService( service_key ).GetServiceType() for service_key in service_keys ]
+            
+            if HC.FILE_REPOSITORY in service_types:
+                
+                top_left_icon_names.append( 'file_repository' + suffix )
+                
             
-            icons_to_draw.append( CC.global_pixmaps().ipfs_petitioned )
+            if HC.IPFS in service_types:
+                
+                top_left_icon_names.append( 'ipfs' + suffix )
+                
             
         
-        ICON_MARGIN = 1
-        ICON_SPACING = 2
+        return ( self._selected, local, upper_summary, lower_summary, tuple( top_right_icon_names ), num_files_str, tuple( top_left_icon_names ) )
         
-        top_left_x = thumbnail_border + ICON_MARGIN
+    
+    def _ScaleUpThumbnailDimensions( self, thumbnail_dimensions, scale_up_dimensions ):
         
-        for icon_to_draw in icons_to_draw:
+        ( thumb_width, thumb_height ) = thumbnail_dimensions
+        ( scale_up_width, scale_up_height ) = scale_up_dimensions
+        
+        # we want to expand the image so that the smallest dimension fills everything
+        
+        scale_factor = max( scale_up_width / thumb_width, scale_up_height / thumb_height )
+        
+        destination_width = int( round( thumb_width * scale_factor ) )
+        destination_height = int( round( thumb_height * scale_factor ) )
+        
+        offset_x = ( scale_up_width - destination_width ) // 2
+        offset_y = ( scale_up_height - destination_height ) // 2
+        
+        offset_position = ( offset_x, offset_y )
+        destination_dimensions = ( destination_width, destination_height )
+        
+        return ( offset_position, destination_dimensions )
+        
+    
+    def Dumped( self, dump_status ):
+        
+        self._dump_status = dump_status
+        
+    
+    def GetQtImage( self ):
+        
+        thumbnail_hydrus_bmp = HG.client_controller.GetCache( 'thumbnail' ).GetThumbnail( self )
+        
+        draw_state = self._GetDrawState()
+        
+        thumbnail_composite_cache = HG.client_controller.GetCache( 'thumbnail_composites' )
+        
+        key = ( self.GetDisplayMedia().GetHash(), self.IsCollection(), self._selected )
+        
+        qt_image = thumbnail_composite_cache.GetQtImage( key, thumbnail_hydrus_bmp, draw_state )
+        
+        if qt_image is None:
             
-            painter.drawPixmap( top_left_x, thumbnail_border + ICON_MARGIN, icon_to_draw )
+            qt_image = self._GenerateQtImage( thumbnail_hydrus_bmp, draw_state )
             
-            top_left_x += icon_to_draw.width() + ICON_SPACING
+            thumbnail_composite_cache.AddQtImage( key, thumbnail_hydrus_bmp, draw_state, qt_image )
             
         
         return qt_image
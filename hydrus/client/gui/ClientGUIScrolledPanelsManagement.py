@@ -22,6 +22,7 @@ from hydrus.core import HydrusTags
 from hydrus.core import HydrusText
 from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientMedia
+from hydrus.client import ClientParsing
 from hydrus.client import ClientRatings
 from hydrus.client import ClientServices
 from hydrus.client.gui import ClientGUIACDropdown
@@ -1937,6 +1938,15 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._show_new_on_file_seed_short_summary = QW.QCheckBox( misc )
             self._show_deleted_on_file_seed_short_summary = QW.QCheckBox( misc )
             
+            self._html_parsing_backend = ClientGUICommon.BetterChoice( misc )
+            
+            for html_parsing_backend in ( ClientParsing.HTML_PARSING_BACKEND_BS4, ClientParsing.HTML_PARSING_BACKEND_LXML ):
+                
+                self._html_parsing_backend.addItem( ClientParsing.html_parsing_backend_str_lookup[ html_parsing_backend ], html_parsing_backend )
+                
+            
+            self._html_parsing_backend.setToolTip( 'lxml parses big gallery pages much faster. Parsers can override this in their own settings. If lxml is not installed, beautifulsoup is always used.' )
+            
             if self._new_options.GetBoolean( 'advanced_mode' ):
                 
                 delay_min = 1
@@ -1982,6 +1992,7 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._stop_character.setText( self._new_options.GetString( 'stop_character' ) )
             self._show_new_on_file_seed_short_summary.setChecked( self._new_options.GetBoolean( 'show_new_on_file_seed_short_summary' ) )
             self._show_deleted_on_file_seed_short_summary.setChecked( self._new_options.GetBoolean( 'show_deleted_on_file_seed_short_summary' ) )
+            self._html_parsing_backend.SetValue( self._new_options.GetInteger( 'html_parsing_backend' ) )
             
             self._watcher_page_wait_period.setValue( self._new_options.GetInteger( 'watcher_page_wait_period' ) )
             self._watcher_page_wait_period.setToolTip( gallery_page_tt )
@@ -2041,6 +2052,7 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             rows.append( ( 'Delay time on a gallery/watcher network error:', self._downloader_network_error_delay ) )
             rows.append( ( 'Delay time on a subscription network error:', self._subscription_network_error_delay ) )
             rows.append( ( 'Delay time on a subscription other error:', self._subscription_other_error_delay ) )
+            rows.append( ( 'Default html parsing backend:', self._html_parsing_backend ) )
             
             gridbox = ClientGUICommon.WrapInGrid( misc, rows )
             
@@ -2083,6 +2095,7 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._new_options.SetString( 'stop_character', self._stop_character.text() )
             self._new_options.SetBoolean( 'show_new_on_file_seed_short_summary', self._show_new_on_file_seed_short_summary.isChecked() )
             self._new_options.SetBoolean( 'show_deleted_on_file_seed_short_summary', self._show_deleted_on_file_seed_short_summary.isChecked() )
+            self._new_options.SetInteger( 'html_parsing_backend', self._html_parsing_backend.GetValue() )
             
             self._new_options.SetInteger( 'subscription_network_error_delay', self._subscription_network_error_delay.GetValue() )
             self._new_options.SetInteger( 'subscription_other_error_delay', self._subscription_other_error_delay.GetValue() )
@@ -2428,6 +2441,9 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._trash_max_age = ClientGUICommon.NoneableSpinCtrl( self, '', none_phrase = 'no age limit', min = 0, max = 8640 )
             self._trash_max_size = ClientGUICommon.NoneableSpinCtrl( self, '', none_phrase = 'no size limit', min = 0, max = 20480 )
             
+            self._export_folder_copy_threads = QP.MakeQSpinBox( self, min = 1, max = 32 )
+            self._export_folder_copy_threads.setToolTip( 'How many files an export folder will copy at once. More can be faster on SSDs and network drives, but may thrash a spinning disk.' )
+            
             advanced_file_deletion_panel = ClientGUICommon.StaticBox( self, 'advanced file deletion and custom reasons' )
             
             self._use_advanced_file_deletion_dialog = QW.QCheckBox( advanced_file_deletion_panel )
@@ -2460,6 +2476,8 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._trash_max_age.SetValue( HC.options[ 'trash_max_age' ] )
             self._trash_max_size.SetValue( HC.options[ 'trash_max_size' ] )
             
+            self._export_folder_copy_threads.setValue( self._new_options.GetInteger( 'export_folder_copy_threads' ) )
+            
             self._use_advanced_file_deletion_dialog.setChecked( self._new_options.GetBoolean( 'use_advanced_file_deletion_dialog' ) )
             
             self._use_advanced_file_deletion_dialog.clicked.connect( self._UpdateAdvancedControls )
@@ -2487,6 +2505,7 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             rows.append( ( 'Number of hours a file can be in the trash before being deleted: ', self._trash_max_age ) )
             rows.append( ( 'Maximum size of trash (MB): ', self._trash_max_size ) )
             rows.append( ( 'Default export directory: ', self._export_location ) )
+            rows.append( ( 'Number of files an export folder copies at once: ', self._export_folder_copy_threads ) )
             
             gridbox = ClientGUICommon.WrapInGrid( self, rows )
             
@@ -2556,6 +2575,8 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             HC.options[ 'trash_max_age' ] = self._trash_max_age.GetValue()
             HC.options[ 'trash_max_size' ] = self._trash_max_size.GetValue()
             
+            self._new_options.SetInteger( 'export_folder_copy_threads', self._export_folder_copy_threads.value() )
+            
             self._new_options.SetBoolean( 'use_advanced_file_deletion_dialog', self._use_advanced_file_deletion_dialog.isChecked() )
             
             self._new_options.SetStringList( 'advanced_file_deletion_reasons', self._advanced_file_deletion_reasons.GetData() )
@@ -3096,6 +3117,9 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._file_maintenance_idle_throttle_velocity.setToolTip( tt )
             self._file_maintenance_active_throttle_velocity.setToolTip( tt )
             
+            self._file_maintenance_threads = QP.MakeQSpinBox( self._file_maintenance_panel, min = 1, max = 32 )
+            self._file_maintenance_threads.setToolTip( 'How many files a maintenance job will work on at once. Quick jobs like checking file presence will use all of these, but jobs that mostly talk to the database work one file at a time. More can be faster on SSDs, but may thrash a spinning disk. The throttles above still apply.' )
+            
             #
             
             self._maintenance_vacuum_period_days = ClientGUICommon.NoneableSpinCtrl( self._vacuum_panel, '', min = 28, max = 1000, none_phrase = 'do not automatically vacuum' )
@@ -3133,6 +3157,8 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             self._file_maintenance_active_throttle_velocity.SetValue( file_maintenance_active_throttle_velocity )
             
+            self._file_maintenance_threads.setValue( self._new_options.GetInteger( 'file_maintenance_threads' ) )
+            
             self._maintenance_vacuum_period_days.SetValue( self._new_options.GetNoneableInteger( 'maintenance_vacuum_period_days' ) )
             
             #
@@ -3195,6 +3221,7 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             rows.append( ( 'Idle throttle: ', self._file_maintenance_idle_throttle_velocity ) )
             rows.append( ( 'Run file maintenance during normal time: ', self._file_maintenance_during_active ) )
             rows.append( ( 'Normal throttle: ', self._file_maintenance_active_throttle_velocity ) )
+            rows.append( ( 'Number of files to work on at once: ', self._file_maintenance_threads ) )
             
             gridbox = ClientGUICommon.WrapInGrid( self._file_maintenance_panel, rows )
             
@@ -3286,6 +3313,8 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._new_options.SetInteger( 'file_maintenance_active_throttle_files', file_maintenance_active_throttle_files )
             self._new_options.SetInteger( 'file_maintenance_active_throttle_time_delta', file_maintenance_active_throttle_time_delta )
             
+            self._new_options.SetInteger( 'file_maintenance_threads', self._file_maintenance_threads.value() )
+            
             self._new_options.SetNoneableInteger( 'maintenance_vacuum_period_days', self._maintenance_vacuum_period_days.GetValue() )
             
         
@@ -3888,6 +3917,18 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._image_cache_timeout = ClientGUITime.TimeDeltaButton( media_panel, min = 300, days = True, hours = True, minutes = True )
             self._image_cache_timeout.setToolTip( 'The amount of time after which a rendered image in the cache will naturally be removed, if it is not shunted out due to a new member exceeding the size limit. Requires restart to kick in.' )
             
+            self._image_tile_cache_size = QP.MakeQSpinBox( media_panel, min=16, max=8192 )
+            self._image_tile_cache_size.setToolTip( 'The media viewer draws images in tiles at the current zoom. This is how much memory it may keep for tiles it has drawn, so panning and zooming back over them is quick. Requires restart to kick in.' )
+            
+            self._image_tile_cache_timeout = ClientGUITime.TimeDeltaButton( media_panel, min = 60, days = True, hours = True, minutes = True )
+            self._image_tile_cache_timeout.setToolTip( 'The amount of time after which a drawn image tile in the cache will naturally be removed, if it is not shunted out due to a new member exceeding the size limit. Requires restart to kick in.' )
+            
+            self._thumbnail_composite_cache_size = QP.MakeQSpinBox( media_panel, min=8, max=8192 )
+            self._thumbnail_composite_cache_size.setToolTip( 'The thumbnail grid keeps finished thumbnails, with their borders, banners and icons already drawn, so scrolling and selecting only has to copy them. This is how much memory it may use for that. Requires restart to kick in.' )
+            
+            self._thumbnail_composite_cache_timeout = ClientGUITime.TimeDeltaButton( media_panel, min = 60, days = True, hours = True, minutes = True )
+            self._thumbnail_composite_cache_timeout.setToolTip( 'The amount of time after which a finished thumbnail in the cache will naturally be removed, if it is not shunted out due to a new member exceeding the size limit. Requires restart to kick in.' )
+            
             #
             
             buffer_panel = ClientGUICommon.StaticBox( self, 'video buffer' )
@@ -3912,6 +3953,12 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             self._forced_search_limit = ClientGUICommon.NoneableSpinCtrl( misc_panel, '', min = 1, max = 100000 )
             
+            self._db_slow_job_profile_threshold_ms = ClientGUICommon.NoneableSpinCtrl( misc_panel, '', min = 100, max = 3600000, unit = 'ms', none_phrase = 'do not profile slow jobs' )
+            self._db_slow_job_profile_threshold_ms.setToolTip( 'If a database job takes longer than this, the next run of the same job will be profiled and the result written to the profile log in your db directory. This helps hydrus dev figure out where a lag came from without you having to turn on db profile mode.' )
+            
+            self._virtualised_page_threshold = ClientGUICommon.NoneableSpinCtrl( misc_panel, '', min = 1000, max = 100000000, unit = 'files', none_phrase = 'always load every file' )
+            self._virtualised_page_threshold.setToolTip( 'A search page with more files than this will only load the files you are looking at, rather than everything at once. This saves a lot of memory on very large pages, but such pages cannot collect, many sorts do not work, and most file actions need you to open your selection in a new page first.' )
+            
             #
             
             self._disk_cache_init_period.SetValue( self._new_options.GetNoneableInteger( 'disk_cache_init_period' ) )
@@ -3936,6 +3983,11 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._thumbnail_cache_timeout.SetValue( self._new_options.GetInteger( 'thumbnail_cache_timeout' ) )
             self._image_cache_timeout.SetValue( self._new_options.GetInteger( 'image_cache_timeout' ) )
             
+            self._image_tile_cache_size.setValue( self._new_options.GetInteger( 'image_tile_cache_size' ) // 1048576 )
+            self._image_tile_cache_timeout.SetValue( self._new_options.GetInteger( 'image_tile_cache_timeout' ) )
+            self._thumbnail_composite_cache_size.setValue( self._new_options.GetInteger( 'thumbnail_composite_cache_size' ) // 1048576 )
+            self._thumbnail_composite_cache_timeout.SetValue( self._new_options.GetInteger( 'thumbnail_composite_cache_timeout' ) )
+            
             self._video_buffer_size_mb.setValue( self._new_options.GetInteger( 'video_buffer_size_mb' ) )
             
             self._autocomplete_results_fetch_automatically.setChecked( self._new_options.GetBoolean( 'autocomplete_results_fetch_automatically' ) )
@@ -3944,6 +3996,10 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             self._forced_search_limit.SetValue( self._new_options.GetNoneableInteger( 'forced_search_limit' ) )
             
+            self._db_slow_job_profile_threshold_ms.SetValue( self._new_options.GetNoneableInteger( 'db_slow_job_profile_threshold_ms' ) )
+            
+            self._virtualised_page_threshold.SetValue( self._new_options.GetNoneableInteger( 'virtualised_page_threshold' ) )
+            
             #
             
             rows = []
@@ -3983,6 +4039,10 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             rows.append( ( 'MB memory reserved for image cache: ', fullscreens_sizer ) )
             rows.append( ( 'Thumbnail cache timeout: ', self._thumbnail_cache_timeout ) )
             rows.append( ( 'Image cache timeout: ', self._image_cache_timeout ) )
+            rows.append( ( 'MB memory reserved for image tile cache: ', self._image_tile_cache_size ) )
+            rows.append( ( 'Image tile cache timeout: ', self._image_tile_cache_timeout ) )
+            rows.append( ( 'MB memory reserved for finished thumbnail cache: ', self._thumbnail_composite_cache_size ) )
+            rows.append( ( 'Finished thumbnail cache timeout: ', self._thumbnail_composite_cache_timeout ) )
             
             gridbox = ClientGUICommon.WrapInGrid( media_panel, rows )
             
@@ -4034,6 +4094,8 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             rows = []
             
             rows.append( ( 'Forced system:limit for all searches: ', self._forced_search_limit ) )
+            rows.append( ( 'Profile database jobs that take longer than: ', self._db_slow_job_profile_threshold_ms ) )
+            rows.append( ( 'Only load the visible files on search pages bigger than: ', self._virtualised_page_threshold ) )
             
             gridbox = ClientGUICommon.WrapInGrid( misc_panel, rows )
             
@@ -4123,10 +4185,19 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._new_options.SetInteger( 'thumbnail_cache_timeout', self._thumbnail_cache_timeout.GetValue() )
             self._new_options.SetInteger( 'image_cache_timeout', self._image_cache_timeout.GetValue() )
             
+            self._new_options.SetInteger( 'image_tile_cache_size', self._image_tile_cache_size.value() * 1048576 )
+            self._new_options.SetInteger( 'image_tile_cache_timeout', self._image_tile_cache_timeout.GetValue() )
+            self._new_options.SetInteger( 'thumbnail_composite_cache_size', self._thumbnail_composite_cache_size.value() * 1048576 )
+            self._new_options.SetInteger( 'thumbnail_composite_cache_timeout', self._thumbnail_composite_cache_timeout.GetValue() )
+            
             self._new_options.SetInteger( 'video_buffer_size_mb', self._video_buffer_size_mb.value() )
             
             self._new_options.SetNoneableInteger( 'forced_search_limit', self._forced_search_limit.GetValue() )
             
+            self._new_options.SetNoneableInteger( 'db_slow_job_profile_threshold_ms', self._db_slow_job_profile_threshold_ms.GetValue() )
+            
+            self._new_options.SetNoneableInteger( 'virtualised_page_threshold', self._virtualised_page_threshold.GetValue() )
+            
             self._new_options.SetBoolean( 'autocomplete_results_fetch_automatically', self._autocomplete_results_fetch_automatically.isChecked() )
             self._new_options.SetNoneableInteger( 'autocomplete_exact_match_threshold', self._autocomplete_exact_match_threshold.GetValue() )
             
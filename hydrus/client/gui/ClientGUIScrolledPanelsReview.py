@@ -2017,6 +2017,93 @@ class ReviewAllBandwidthPanel( ClientGUIScrolledPanels.ReviewPanel ):
             
         
     
+class ReviewDBJobStatistics( ClientGUIScrolledPanels.ReviewPanel ):
+    
+    def __init__( self, parent, controller ):
+        
+        self._controller = controller
+        
+        ClientGUIScrolledPanels.ReviewPanel.__init__( self, parent )
+        
+        self._job_keys_to_rows = {}
+        
+        self._list_ctrl_panel = ClientGUIListCtrl.BetterListCtrlPanel( self )
+        
+        columns = [ ( 'type', 10 ), ( 'action', 36 ), ( 'count', 9 ), ( 'slow', 6 ), ( 'mean wait', 11 ), ( 'mean time', 11 ), ( 'p50', 11 ), ( 'p90', 11 ), ( 'p99', 11 ), ( 'max', 11 ), ( 'mean rows', -1 ) ]
+        
+        self._list_ctrl = ClientGUIListCtrl.BetterListCtrl( self._list_ctrl_panel, 'db job statistics review', 20, 30, columns, self._ConvertDataToListCtrlTuples )
+        
+        self._list_ctrl_panel.SetListCtrl( self._list_ctrl )
+        
+        self._list_ctrl_panel.AddButton( 'refresh snapshot', self._RefreshSnapshot )
+        self._list_ctrl_panel.AddButton( 'reset', self._Reset )
+        
+        #
+        
+        self._list_ctrl.Sort( 5, False )
+        
+        self._RefreshSnapshot()
+        
+        #
+        
+        text = 'These are the timings of every database job since boot. Wait is how long the job sat in the queue before the db got to it. The percentiles are over the most recent runs of each job.'
+        
+        st = ClientGUICommon.BetterStaticText( self, text )
+        st.setWordWrap( True )
+        
+        vbox = QP.VBoxLayout()
+        
+        QP.AddToLayout( vbox, st, CC.FLAGS_EXPAND_PERPENDICULAR )
+        QP.AddToLayout( vbox, self._list_ctrl_panel, CC.FLAGS_EXPAND_BOTH_WAYS )
+        
+        self.widget().setLayout( vbox )
+        
+    
+    def _ConvertDataToListCtrlTuples( self, job_key ):
+        
+        row = self._job_keys_to_rows[ job_key ]
+        
+        job_type = row[ 'job_type' ]
+        action = row[ 'action' ]
+        count = row[ 'count' ]
+        num_slow = row[ 'num_slow' ]
+        mean_wait_ms = row[ 'mean_wait_ms' ]
+        mean_time_ms = row[ 'mean_time_ms' ]
+        p50_time_ms = row[ 'p50_time_ms' ]
+        p90_time_ms = row[ 'p90_time_ms' ]
+        p99_time_ms = row[ 'p99_time_ms' ]
+        max_time_ms = row[ 'max_time_ms' ]
+        mean_rows = row[ 'mean_rows' ]
+        
+        pretty_count = HydrusData.ToHumanInt( count )
+        pretty_num_slow = HydrusData.ToHumanInt( num_slow )
+        
+        ( pretty_mean_wait, pretty_mean_time, pretty_p50_time, pretty_p90_time, pretty_p99_time, pretty_max_time ) = ( '{:.1f}ms'.format( ms ) for ms in ( mean_wait_ms, mean_time_ms, p50_time_ms, p90_time_ms, p99_time_ms, max_time_ms ) )
+        
+        pretty_mean_rows = '{:.1f}'.format( mean_rows )
+        
+        display_tuple = ( job_type, action, pretty_count, pretty_num_slow, pretty_mean_wait, pretty_mean_time, pretty_p50_time, pretty_p90_time, pretty_p99_time, pretty_max_time, pretty_mean_rows )
+        sort_tuple = ( job_type, action, count, num_slow, mean_wait_ms, mean_time_ms, p50_time_ms, p90_time_ms, p99_time_ms, max_time_ms, mean_rows )
+        
+        return ( display_tuple, sort_tuple )
+        
+    
+    def _RefreshSnapshot( self ):
+        
+        rows = self._controller.GetDBJobStatistics()
+        
+        self._job_keys_to_rows = { ( row[ 'job_type' ], row[ 'action' ] ) : row for row in rows }
+        
+        self._list_ctrl.SetData( list( self._job_keys_to_rows.keys() ) )
+        
+    
+    def _Reset( self ):
+        
+        self._controller.ResetDBJobStatistics()
+        
+        self._RefreshSnapshot()
+        
+    
 class ReviewDownloaderImport( ClientGUIScrolledPanels.ReviewPanel ):
     
     def __init__( self, parent, network_engine ):
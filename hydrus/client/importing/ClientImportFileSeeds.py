@@ -43,6 +43,7 @@ class FileImportJob( object ):
         
         self._hash = None
         self._pre_import_status = None
+        self._pre_import_note = ''
         
         self._file_info = None
         self._thumbnail_bytes = None
@@ -65,6 +66,35 @@ class FileImportJob( object ):
     
     def DoWork( self, status_hook = None ):
         
+        self.DoWorkBeforeDB( status_hook = status_hook )
+        
+        if self.IsNewToDB():
+            
+            if status_hook is not None:
+                
+                status_hook( 'updating database' )
+                
+            
+            ( import_status, note ) = HG.client_controller.WriteSynchronous( 'import_file', self )
+            
+        else:
+            
+            import_status = self._pre_import_status
+            note = self._pre_import_note
+            
+        
+        if HG.file_import_report_mode:
+            
+            HydrusData.ShowText( 'File import job is done, now publishing content updates' )
+            
+        
+        self.PubsubContentUpdates()
+        
+        return ( import_status, self._hash, note )
+        
+    
+    def DoWorkBeforeDB( self, status_hook = None ):
+        
         if HG.file_import_report_mode:
             
             HydrusData.ShowText( 'File import job starting work.' )
@@ -97,26 +127,6 @@ class FileImportJob( object ):
             
             HG.client_controller.client_files_manager.AddFile( hash, mime, self._temp_path, thumbnail_bytes = self._thumbnail_bytes )
             
-            if status_hook is not None:
-                
-                status_hook( 'updating database' )
-                
-            
-            ( import_status, note ) = HG.client_controller.WriteSynchronous( 'import_file', self )
-            
-        else:
-            
-            import_status = pre_import_status
-            
-        
-        if HG.file_import_report_mode:
-            
-            HydrusData.ShowText( 'File import job is done, now publishing content updates' )
-            
-        
-        self.PubsubContentUpdates()
-        
-        return ( import_status, hash, note )
         
     
     def GenerateHashAndStatus( self ):
@@ -130,14 +140,14 @@ class FileImportJob( object ):
             HydrusData.ShowText( 'File import job hash: {}'.format( self._hash.hex() ) )
             
         
-        ( self._pre_import_status, hash, note ) = HG.client_controller.Read( 'hash_status', 'sha256', self._hash, prefix = 'file recognised' )
+        ( self._pre_import_status, hash, self._pre_import_note ) = HG.client_controller.Read( 'hash_status', 'sha256', self._hash, prefix = 'file recognised' )
         
         if HG.file_import_report_mode:
             
-            HydrusData.ShowText( 'File import job pre-import status: {}, {}'.format( CC.status_string_lookup[ self._pre_import_status ], note ) )
+            HydrusData.ShowText( 'File import job pre-import status: {}, {}'.format( CC.status_string_lookup[ self._pre_import_status ], self._pre_import_note ) )
             
         
-        return ( self._pre_import_status, self._hash, note )
+        return ( self._pre_import_status, self._hash, self._pre_import_note )
         
     
     def GenerateInfo( self ):
@@ -251,6 +261,11 @@ class FileImportJob( object ):
         return mime
         
     
+    def GetPreImportNote( self ):
+        
+        return self._pre_import_note
+        
+    
     def GetPreImportStatus( self ):
         
         return self._pre_import_status
@@ -812,79 +827,71 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
     
     def ImportPath( self, file_seed_cache: "FileSeedCache", file_import_options: ClientImportOptions.FileImportOptions, limited_mimes = None, status_hook = None ):
         
-        try:
-            
-            if self.file_seed_type != FILE_SEED_TYPE_HDD:
-                
-                raise HydrusExceptions.VetoException( 'Attempted to import as a path, but I do not think I am a path!' )
-                
-            
-            path = self.file_seed_data
-            
-            if not os.path.exists( path ):
-                
-                raise HydrusExceptions.VetoException( 'Source file does not exist!' )
-                
-            
-            if limited_mimes is not None:
-                
-                mime = HydrusFileHandling.GetMime( path )
-                
-                if mime not in limited_mimes:
-                    
-                    raise HydrusExceptions.VetoException( 'Not in allowed mimes!' )
-                    
-                
+        ImportFileSeedPaths( file_seed_cache, ( self, ), file_import_options, limited_mimes = limited_mimes, status_hook = status_hook )
+        
+    
+    def IsAPostURL( self ):
+        
+        if self.file_seed_type == FILE_SEED_TYPE_URL:
             
-            ( os_file_handle, temp_path ) = HydrusPaths.GetTempPath()
+            ( url_type, match_name, can_parse ) = HG.client_controller.network_engine.domain_manager.GetURLParseCapability( self.file_seed_data )
             
-            try:
-                
-                copied = HydrusPaths.MirrorFile( path, temp_path )
-                
-                if not copied:
-                    
-                    raise Exception( 'File failed to copy to temp path--see log for error.' )
-                    
-                
-                self.Import( temp_path, file_import_options, status_hook = status_hook )
-                
-            finally:
+            if url_type == HC.URL_TYPE_POST:
                 
-                HydrusPaths.CleanUpTempPath( os_file_handle, temp_path )
+                return True
                 
             
-            self.WriteContentUpdates()
+        
+        return False
+        
+    
+    def PrepareImportPath( self, file_import_options: ClientImportOptions.FileImportOptions, limited_mimes = None, status_hook = None ) -> FileImportJob:
+        
+        if self.file_seed_type != FILE_SEED_TYPE_HDD:
             
-        except HydrusExceptions.MimeException as e:
+            raise HydrusExceptions.VetoException( 'Attempted to import as a path, but I do not think I am a path!' )
             
-            self.SetStatus( CC.STATUS_ERROR, exception = e )
+        
+        path = self.file_seed_data
+        
+        if not os.path.exists( path ):
             
-        except HydrusExceptions.VetoException as e:
+            raise HydrusExceptions.VetoException( 'Source file does not exist!' )
             
-            self.SetStatus( CC.STATUS_VETOED, note = str( e ) )
+        
+        if limited_mimes is not None:
             
-        except Exception as e:
+            mime = HydrusFileHandling.GetMime( path )
             
-            self.SetStatus( CC.STATUS_ERROR, exception = e )
+            if mime not in limited_mimes:
+                
+                raise HydrusExceptions.VetoException( 'Not in allowed mimes!' )
+                
             
         
-        file_seed_cache.NotifyFileSeedsUpdated( ( self, ) )
-        
-    
-    def IsAPostURL( self ):
+        ( os_file_handle, temp_path ) = HydrusPaths.GetTempPath()
         
-        if self.file_seed_type == FILE_SEED_TYPE_URL:
+        try:
             
-            ( url_type, match_name, can_parse ) = HG.client_controller.network_engine.domain_manager.GetURLParseCapability( self.file_seed_data )
+            copied = HydrusPaths.MirrorFile( path, temp_path )
             
-            if url_type == HC.URL_TYPE_POST:
+            if not copied:
                 
-                return True
+                raise Exception( 'File failed to copy to temp path--see log for error.' )
                 
             
+            file_import_job = FileImportJob( temp_path, file_import_options )
+            
+            file_import_job.DoWorkBeforeDB( status_hook = status_hook )
+            
+        finally:
+            
+            HydrusPaths.CleanUpTempPath( os_file_handle, temp_path )
+            
         
-        return False
+        self.SetHash( file_import_job.GetHash() )
+        
+        return file_import_job
         
     
     def IsDeleted( self ):
@@ -1369,22 +1376,12 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
         return did_substantial_work
         
     
-    def WriteContentUpdates( self, tag_import_options: typing.Optional[ ClientImportOptions.TagImportOptions ] = None ):
+    def GenerateServiceKeysToContentUpdates( self, tag_import_options: typing.Optional[ ClientImportOptions.TagImportOptions ] = None ):
         
         did_work = False
         
-        if self.status == CC.STATUS_ERROR:
-            
-            return did_work
-            
-        
         hash = self.GetHash()
         
-        if hash is None:
-            
-            return did_work
-            
-        
         # changed this to say that urls alone are not 'did work' since all url results are doing this, and when they have no tags, they are usually superfast db hits anyway
         # better to scream through an 'already in db' import list that flicker
         
@@ -1432,6 +1429,27 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
                 
             
         
+        return ( did_work, service_keys_to_content_updates )
+        
+    
+    def WriteContentUpdates( self, tag_import_options: typing.Optional[ ClientImportOptions.TagImportOptions ] = None ):
+        
+        did_work = False
+        
+        if self.status == CC.STATUS_ERROR:
+            
+            return did_work
+            
+        
+        hash = self.GetHash()
+        
+        if hash is None:
+            
+            return did_work
+            
+        
+        ( did_work, service_keys_to_content_updates ) = self.GenerateServiceKeysToContentUpdates( tag_import_options = tag_import_options )
+        
         if len( service_keys_to_content_updates ) > 0:
             
             HG.client_controller.WriteSynchronous( 'content_updates', service_keys_to_content_updates )
@@ -2044,6 +2062,29 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
         return None
         
     
+    def GetNextFileSeeds( self, status, num_to_get ):
+        
+        file_seeds = []
+        
+        with self._lock:
+            
+            for file_seed in self._file_seeds:
+                
+                if file_seed.status == status:
+                    
+                    file_seeds.append( file_seed )
+                    
+                    if len( file_seeds ) >= num_to_get:
+                        
+                        break
+                        
+                    
+                
+            
+        
+        return file_seeds
+        
+    
     def GetNumNewFilesSince( self, since: int ):
         
         num_files = 0
@@ -2288,6 +2329,142 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
     
 HydrusSerialisable.SERIALISABLE_TYPES_TO_OBJECT_TYPES[ HydrusSerialisable.SERIALISABLE_TYPE_FILE_SEED_CACHE ] = FileSeedCache
 
+def ImportFileSeedPaths( file_seed_cache: FileSeedCache, file_seeds: typing.Collection[ FileSeed ], file_import_options: ClientImportOptions.FileImportOptions, limited_mimes = None, status_hook = None ):
+    
+    # each file is hashed, checked and copied into the file store one at a time, but the db rows for the whole batch go in one job
+    
+    file_seeds_and_file_import_jobs = []
+    
+    for file_seed in file_seeds:
+        
+        try:
+            
+            file_import_job = file_seed.PrepareImportPath( file_import_options, limited_mimes = limited_mimes, status_hook = status_hook )
+            
+            file_seeds_and_file_import_jobs.append( ( file_seed, file_import_job ) )
+            
+        except HydrusExceptions.MimeException as e:
+            
+            file_seed.SetStatus( CC.STATUS_ERROR, exception = e )
+            
+        except HydrusExceptions.VetoException as e:
+            
+            file_seed.SetStatus( CC.STATUS_VETOED, note = str( e ) )
+            
+        except Exception as e:
+            
+            file_seed.SetStatus( CC.STATUS_ERROR, exception = e )
+            
+        
+    
+    if len( file_seeds_and_file_import_jobs ) > 0:
+        
+        new_file_import_jobs = [ file_import_job for ( file_seed, file_import_job ) in file_seeds_and_file_import_jobs if file_import_job.IsNewToDB() ]
+        
+        try:
+            
+            file_import_jobs_to_results = {}
+            
+            if len( new_file_import_jobs ) > 0:
+                
+                if status_hook is not None:
+                    
+                    status_hook( 'updating database' )
+                    
+                
+                results = HG.client_controller.WriteSynchronous( 'import_files', new_file_import_jobs )
+                
+                file_import_jobs_to_results = dict( zip( new_file_import_jobs, results ) )
+                
+            
+            for ( file_seed, file_import_job ) in file_seeds_and_file_import_jobs:
+                
+                if file_import_job in file_import_jobs_to_results:
+                    
+                    ( status, note ) = file_import_jobs_to_results[ file_import_job ]
+                    
+                else:
+                    
+                    status = file_import_job.GetPreImportStatus()
+                    note = file_import_job.GetPreImportNote()
+                    
+                
+                file_import_job.PubsubContentUpdates()
+                
+                file_seed.SetStatus( status, note = note )
+                
+            
+            # urls and fixed tags only go on files that actually made it in, so we wait for the results and then do them all in one job
+            
+            service_keys_to_content_updates = collections.defaultdict( list )
+            
+            for ( file_seed, file_import_job ) in file_seeds_and_file_import_jobs:
+                
+                if file_seed.status not in CC.SUCCESSFUL_IMPORT_STATES:
+                    
+                    continue
+                    
+                
+                ( did_work, file_seed_service_keys_to_content_updates ) = file_seed.GenerateServiceKeysToContentUpdates()
+                
+                for ( service_key, content_updates ) in file_seed_service_keys_to_content_updates.items():
+                    
+                    service_keys_to_content_updates[ service_key ].extend( content_updates )
+                    
+                
+            
+            if len( service_keys_to_content_updates ) > 0:
+                
+                HG.client_controller.WriteSynchronous( 'content_updates', service_keys_to_content_updates )
+                
+            
+        except Exception as e:
+            
+            if len( file_seeds_and_file_import_jobs ) == 1:
+                
+                ( file_seed, file_import_job ) = file_seeds_and_file_import_jobs[0]
+                
+                file_seed.SetStatus( CC.STATUS_ERROR, exception = e )
+                
+            else:
+                
+                HydrusData.Print( 'A batch file import failed, so its files will be imported one at a time. The error was:' )
+                HydrusData.PrintException( e, do_wait = False )
+                
+                for ( file_seed, file_import_job ) in file_seeds_and_file_import_jobs:
+                    
+                    try:
+                        
+                        if file_import_job.IsNewToDB():
+                            
+                            ( status, note ) = HG.client_controller.WriteSynchronous( 'import_file', file_import_job )
+                            
+                        else:
+                            
+                            status = file_import_job.GetPreImportStatus()
+                            note = file_import_job.GetPreImportNote()
+                            
+                        
+                        file_import_job.PubsubContentUpdates()
+                        
+                        file_seed.SetStatus( status, note = note )
+                        
+                        if status in CC.SUCCESSFUL_IMPORT_STATES:
+                            
+                            file_seed.WriteContentUpdates()
+                            
+                        
+                    except Exception as e:
+                        
+                        file_seed.SetStatus( CC.STATUS_ERROR, exception = e )
+                        
+                    
+                
+            
+        
+    
+    file_seed_cache.NotifyFileSeedsUpdated( file_seeds )
+    
 def GenerateFileSeedCacheStatus( file_seed_cache: FileSeedCache ):
     
     statuses_to_counts = file_seed_cache.GetStatusesToCounts()
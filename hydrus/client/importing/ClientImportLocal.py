@@ -1,5 +1,4 @@
 from hydrus.client import ClientConstants as CC
-from hydrus.client import ClientData
 from hydrus.client import ClientFiles
 from hydrus.client.importing import ClientImporting
 from hydrus.client.importing import ClientImportFileSeeds
@@ -15,6 +14,7 @@ from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusPaths
 from hydrus.core import HydrusSerialisable
 from hydrus.core import HydrusThreading
+import collections
 import os
 import threading
 import time
@@ -124,17 +124,15 @@ class HDDImport( HydrusSerialisable.SerialisableBase ):
     
     def _WorkOnFiles( self, page_key ):
         
-        file_seed = self._file_seed_cache.GetNextFileSeed( CC.STATUS_UNKNOWN )
+        file_seeds = self._file_seed_cache.GetNextFileSeeds( CC.STATUS_UNKNOWN, ClientImporting.LOCAL_FILE_IMPORT_BATCH_SIZE )
         
-        if file_seed is None:
+        if len( file_seeds ) == 0:
             
             return
             
         
         did_substantial_work = False
         
-        path = file_seed.file_seed_data
-        
         with self._lock:
             
             self._current_action = 'importing'
@@ -153,45 +151,50 @@ class HDDImport( HydrusSerialisable.SerialisableBase ):
                 
             
         
-        file_seed.ImportPath( self._file_seed_cache, self._file_import_options, status_hook = status_hook )
+        ClientImportFileSeeds.ImportFileSeedPaths( self._file_seed_cache, file_seeds, self._file_import_options, status_hook = status_hook )
         
         did_substantial_work = True
         
-        if file_seed.status in CC.SUCCESSFUL_IMPORT_STATES:
+        for file_seed in file_seeds:
             
-            if file_seed.ShouldPresent( self._file_import_options ):
-                
-                file_seed.PresentToPage( page_key )
-                
-                did_substantial_work = True
-                
+            path = file_seed.file_seed_data
             
-            if self._delete_after_success:
+            if file_seed.status in CC.SUCCESSFUL_IMPORT_STATES:
                 
-                try:
-                    
-                    ClientPaths.DeletePath( path )
+                if file_seed.ShouldPresent( self._file_import_options ):
                     
-                except Exception as e:
+                    file_seed.PresentToPage( page_key )
                     
-                    HydrusData.ShowText( 'While attempting to delete ' + path + ', the following error occurred:' )
-                    HydrusData.ShowException( e )
+                    did_substantial_work = True
                     
                 
-                txt_path = path + '.txt'
-                
-                if os.path.exists( txt_path ):
+                if self._delete_after_success:
                     
                     try:
                         
-                        ClientPaths.DeletePath( txt_path )
+                        ClientPaths.DeletePath( path )
                         
                     except Exception as e:
                         
-                        HydrusData.ShowText( 'While attempting to delete ' + txt_path + ', the following error occurred:' )
+                        HydrusData.ShowText( 'While attempting to delete ' + path + ', the following error occurred:' )
                         HydrusData.ShowException( e )
                         
                     
+                    txt_path = path + '.txt'
+                    
+                    if os.path.exists( txt_path ):
+                        
+                        try:
+                            
+                            ClientPaths.DeletePath( txt_path )
+                            
+                        except Exception as e:
+                            
+                            HydrusData.ShowText( 'While attempting to delete ' + txt_path + ', the following error occurred:' )
+                            HydrusData.ShowException( e )
+                            
+                        
+                    
                 
             
         
@@ -590,13 +593,13 @@ class ImportFolder( HydrusSerialisable.SerialisableBaseNamed ):
         
         while True:
             
-            file_seed = self._file_seed_cache.GetNextFileSeed( CC.STATUS_UNKNOWN )
+            file_seeds = self._file_seed_cache.GetNextFileSeeds( CC.STATUS_UNKNOWN, ClientImporting.LOCAL_FILE_IMPORT_BATCH_SIZE )
             
             p1 = HC.options[ 'pause_import_folders_sync' ] or self._paused
             p2 = HydrusThreading.IsThreadShuttingDown()
             p3 = job_key.IsCancelled()
             
-            if file_seed is None or p1 or p2 or p3:
+            if len( file_seeds ) == 0 or p1 or p2 or p3:
                 
                 break
                 
@@ -610,91 +613,121 @@ class ImportFolder( HydrusSerialisable.SerialisableBaseNamed ):
                 time_to_save = HydrusData.GetNow() + 600
                 
             
-            gauge_num_done = num_total_done + num_files_imported + 1
+            gauge_num_done = num_total_done + i + len( file_seeds )
             
             job_key.SetVariable( 'popup_text_1', 'importing file ' + HydrusData.ConvertValueRangeToPrettyString( gauge_num_done, num_total ) )
             job_key.SetVariable( 'popup_gauge_1', ( gauge_num_done, num_total ) )
             
-            path = file_seed.file_seed_data
-            
-            file_seed.ImportPath( self._file_seed_cache, self._file_import_options, limited_mimes = self._mimes )
+            # filename tags ride along in the batch import job as fixed tags
             
-            if file_seed.status in CC.SUCCESSFUL_IMPORT_STATES:
+            for file_seed in file_seeds:
                 
-                if file_seed.HasHash():
-                    
-                    hash = file_seed.GetHash()
+                path = file_seed.file_seed_data
+                
+                service_keys_to_tags = ClientTags.ServiceKeysToTags()
+                
+                for ( tag_service_key, filename_tagging_options ) in list(self._tag_service_keys_to_filename_tagging_options.items()):
                     
-                    if self._tag_import_options.HasAdditionalTags():
+                    if not HG.client_controller.services_manager.ServiceExists( tag_service_key ):
                         
-                        media_result = HG.client_controller.Read( 'media_result', hash )
+                        continue
                         
-                        downloaded_tags = []
+                    
+                    try:
                         
-                        service_keys_to_content_updates = self._tag_import_options.GetServiceKeysToContentUpdates( file_seed.status, media_result, downloaded_tags ) # additional tags
+                        tags = filename_tagging_options.GetTags( tag_service_key, path )
                         
-                        if len( service_keys_to_content_updates ) > 0:
+                        if len( tags ) > 0:
                             
-                            HG.client_controller.WriteSynchronous( 'content_updates', service_keys_to_content_updates )
+                            service_keys_to_tags[ tag_service_key ] = tags
                             
                         
+                    except Exception as e:
+                        
+                        HydrusData.ShowText( 'Trying to parse filename tags in the import folder "' + self._name + '" threw an error!' )
+                        
+                        HydrusData.ShowException( e )
+                        
+                    
+                
+                if len( service_keys_to_tags ) > 0:
+                    
+                    file_seed.SetFixedServiceKeysToTags( service_keys_to_tags )
+                    
+                
+            
+            ClientImportFileSeeds.ImportFileSeedPaths( self._file_seed_cache, file_seeds, self._file_import_options, limited_mimes = self._mimes )
+            
+            # additional tags need the stored media result, so they go in one write after the batch
+            
+            if self._tag_import_options.HasAdditionalTags():
+                
+                hashes_to_statuses = {}
+                
+                for file_seed in file_seeds:
+                    
+                    if file_seed.status in CC.SUCCESSFUL_IMPORT_STATES and file_seed.HasHash():
+                        
+                        hashes_to_statuses.setdefault( file_seed.GetHash(), file_seed.status )
+                        
+                    
+                
+                if len( hashes_to_statuses ) > 0:
                     
-                    service_keys_to_tags = ClientTags.ServiceKeysToTags()
+                    media_results = HG.client_controller.Read( 'media_results', list( hashes_to_statuses.keys() ) )
                     
-                    for ( tag_service_key, filename_tagging_options ) in list(self._tag_service_keys_to_filename_tagging_options.items()):
+                    service_keys_to_content_updates = collections.defaultdict( list )
+                    
+                    for media_result in media_results:
                         
-                        if not HG.client_controller.services_manager.ServiceExists( tag_service_key ):
-                            
-                            continue
-                            
+                        downloaded_tags = []
                         
-                        try:
-                            
-                            tags = filename_tagging_options.GetTags( tag_service_key, path )
-                            
-                            if len( tags ) > 0:
-                                
-                                service_keys_to_tags[ tag_service_key ] = tags
-                                
-                            
-                        except Exception as e:
-                            
-                            HydrusData.ShowText( 'Trying to parse filename tags in the import folder "' + self._name + '" threw an error!' )
+                        status = hashes_to_statuses[ media_result.GetHash() ]
+                        
+                        for ( service_key, content_updates ) in self._tag_import_options.GetServiceKeysToContentUpdates( status, media_result, downloaded_tags ).items(): # additional tags
                             
-                            HydrusData.ShowException( e )
+                            service_keys_to_content_updates[ service_key ].extend( content_updates )
                             
                         
                     
-                    if len( service_keys_to_tags ) > 0:
-                        
-                        service_keys_to_content_updates = ClientData.ConvertServiceKeysToTagsToServiceKeysToContentUpdates( { hash }, service_keys_to_tags )
+                    if len( service_keys_to_content_updates ) > 0:
                         
                         HG.client_controller.WriteSynchronous( 'content_updates', service_keys_to_content_updates )
                         
                     
                 
-                num_files_imported += 1
+            
+            for file_seed in file_seeds:
+                
+                path = file_seed.file_seed_data
                 
-                if hash not in presentation_hashes_fast:
+                if file_seed.status in CC.SUCCESSFUL_IMPORT_STATES:
                     
-                    if file_seed.ShouldPresent( self._file_import_options ):
-                        
-                        presentation_hashes.append( hash )
+                    hash = file_seed.GetHash()
+                    
+                    num_files_imported += 1
+                    
+                    if hash not in presentation_hashes_fast:
                         
-                        presentation_hashes_fast.add( hash )
+                        if file_seed.ShouldPresent( self._file_import_options ):
+                            
+                            presentation_hashes.append( hash )
+                            
+                            presentation_hashes_fast.add( hash )
+                            
                         
                     
+                elif file_seed.status == CC.STATUS_ERROR:
+                    
+                    HydrusData.Print( 'A file failed to import from import folder ' + self._name + ':' + path )
+                    
                 
-            elif file_seed.status == CC.STATUS_ERROR:
-                
-                HydrusData.Print( 'A file failed to import from import folder ' + self._name + ':' + path )
-                
-            
-            i += 1
-            
-            if i % 10 == 0:
+                i += 1
                 
-                self._ActionPaths()
+                if i % 10 == 0:
+                    
+                    self._ActionPaths()
+                    
                 
             
         
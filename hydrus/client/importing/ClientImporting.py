@@ -31,6 +31,8 @@ CHECKER_STATUS_404 = 2
 
 DID_SUBSTANTIAL_FILE_WORK_MINIMUM_SLEEP_TIME = 0.1
 
+LOCAL_FILE_IMPORT_BATCH_SIZE = 16
+
 REPEATING_JOB_TYPICAL_PERIOD = 30.0
 
 def ConvertAllParseResultsToFileSeeds( all_parse_results, source_url, file_import_options ):
@@ -7,29 +7,38 @@ from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusNetworking
 from hydrus.core import HydrusThreading
 from hydrus.core import HydrusSerialisable
-import threading
 
-class NetworkBandwidthManager( HydrusSerialisable.SerialisableBase ):
+class NetworkBandwidthManager( HydrusSerialisable.SerialisableBaseWithRows ):
     
     SERIALISABLE_TYPE = HydrusSerialisable.SERIALISABLE_TYPE_NETWORK_BANDWIDTH_MANAGER
     SERIALISABLE_NAME = 'Bandwidth Manager'
     SERIALISABLE_VERSION = 1
     
+    # a tracker row that has not been written in this long is for a domain or subscription we have stopped talking to
+    COLD_TRACKER_TIME_DELTA = 365 * 86400
+    
     def __init__( self ):
         
-        HydrusSerialisable.SerialisableBase.__init__( self )
+        HydrusSerialisable.SerialisableBaseWithRows.__init__( self )
         
         self.engine = None
         
+        # this is for the rules. trackers are saved to their own db rows, so they track what needs writing separately
         self._dirty = False
         
-        self._lock = threading.Lock()
+        self._dirty_tracker_network_contexts = set()
+        self._deleted_tracker_network_contexts = set()
+        
+        # what the last save took. anything dirtied while that save is going goes in the sets above, so SetClean does not lose it
+        self._saving_dirty_tracker_network_contexts = set()
+        self._saving_deleted_tracker_network_contexts = set()
         
         self._last_pages_gallery_query_timestamps = collections.defaultdict( lambda: 0 )
         self._last_subscriptions_gallery_query_timestamps = collections.defaultdict( lambda: 0 )
         self._last_watchers_query_timestamps = collections.defaultdict( lambda: 0 )
         
-        self._network_contexts_to_bandwidth_trackers = collections.defaultdict( HydrusNetworking.BandwidthTracker )
+        # most of these are for domains we will not talk to this boot, so they stay serialised until asked for
+        self._network_contexts_to_bandwidth_trackers = HydrusSerialisable.LazyDictionary( default_factory = HydrusNetworking.BandwidthTracker )
         self._network_contexts_to_bandwidth_rules = collections.defaultdict( HydrusNetworking.BandwidthRules )
         
         for context_type in [ CC.NETWORK_CONTEXT_GLOBAL, CC.NETWORK_CONTEXT_HYDRUS, CC.NETWORK_CONTEXT_DOMAIN, CC.NETWORK_CONTEXT_DOWNLOADER_PAGE, CC.NETWORK_CONTEXT_SUBSCRIPTION, CC.NETWORK_CONTEXT_WATCHER_PAGE ]:
@@ -55,6 +64,23 @@ class NetworkBandwidthManager( HydrusSerialisable.SerialisableBase ):
         return True
         
     
+    def _GetDirtySerialisableRows( self ):
+        
+        # if a previous save never got to SetClean, its rows go again
+        
+        self._saving_dirty_tracker_network_contexts.update( self._dirty_tracker_network_contexts )
+        self._saving_deleted_tracker_network_contexts.update( self._deleted_tracker_network_contexts )
+        
+        self._dirty_tracker_network_contexts = set()
+        self._deleted_tracker_network_contexts = set()
+        
+        rows = [ ( network_context.DumpToString(), self._network_contexts_to_bandwidth_trackers.GetSerialised( network_context ) ) for network_context in self._saving_dirty_tracker_network_contexts if network_context in self._network_contexts_to_bandwidth_trackers ]
+        
+        deletee_row_keys = [ network_context.DumpToString() for network_context in self._saving_deleted_tracker_network_contexts ]
+        
+        return ( rows, deletee_row_keys )
+        
+    
     def _GetRules( self, network_context ):
         
         if network_context not in self._network_contexts_to_bandwidth_rules:
@@ -68,12 +94,19 @@ class NetworkBandwidthManager( HydrusSerialisable.SerialisableBase ):
     def _GetSerialisableInfo( self ):
         
         # note this discards ephemeral network contexts, which have temporary identifiers that are generally invisible to the user
-        all_serialisable_trackers = [ ( network_context.GetSerialisableTuple(), tracker.GetSerialisableTuple() ) for ( network_context, tracker ) in list(self._network_contexts_to_bandwidth_trackers.items()) if not network_context.IsEphemeral() ]
+        all_serialisable_trackers = [ ( network_context.GetSerialisableTuple(), serialisable_tracker ) for ( network_context, serialisable_tracker ) in self._network_contexts_to_bandwidth_trackers.GetSerialisedItems() if not network_context.IsEphemeral() ]
         all_serialisable_rules = [ ( network_context.GetSerialisableTuple(), rules.GetSerialisableTuple() ) for ( network_context, rules ) in list(self._network_contexts_to_bandwidth_rules.items()) ]
         
         return ( all_serialisable_trackers, all_serialisable_rules )
         
     
+    def _GetSerialisableMainInfo( self ):
+        
+        all_serialisable_rules = [ ( network_context.GetSerialisableTuple(), rules.GetSerialisableTuple() ) for ( network_context, rules ) in list(self._network_contexts_to_bandwidth_rules.items()) ]
+        
+        return ( [], all_serialisable_rules )
+        
+    
     def _InitialiseFromSerialisableInfo( self, serialisable_info ):
         
         ( all_serialisable_trackers, all_serialisable_rules ) = serialisable_info
@@ -81,9 +114,11 @@ class NetworkBandwidthManager( HydrusSerialisable.SerialisableBase ):
         for ( serialisable_network_context, serialisable_tracker ) in all_serialisable_trackers:
             
             network_context = HydrusSerialisable.CreateFromSerialisableTuple( serialisable_network_context )
-            tracker = HydrusSerialisable.CreateFromSerialisableTuple( serialisable_tracker )
             
-            self._network_contexts_to_bandwidth_trackers[ network_context ] = tracker
+            self._network_contexts_to_bandwidth_trackers.SetSerialised( network_context, serialisable_tracker )
+            
+            # this is either a whole copy or an old single-dump save, so if it goes to the db, these need rows
+            self._dirty_tracker_network_contexts.add( network_context )
             
         
         for ( serialisable_network_context, serialisable_rules ) in all_serialisable_rules:
@@ -107,7 +142,7 @@ class NetworkBandwidthManager( HydrusSerialisable.SerialisableBase ):
             self._network_contexts_to_bandwidth_trackers[ network_context ].ReportRequestUsed()
             
         
-        self._SetDirty()
+        self._SetTrackersDirty( network_contexts )
         
     
     def _SetDirty( self ):
@@ -115,6 +150,32 @@ class NetworkBandwidthManager( HydrusSerialisable.SerialisableBase ):
         self._dirty = True
         
     
+    def _SetSerialisableRows( self, rows ):
+        
+        cold_timestamp = HydrusData.GetNow() - self.COLD_TRACKER_TIME_DELTA
+        
+        for ( row_key, timestamp, serialisable_tracker ) in rows:
+            
+            network_context = HydrusSerialisable.CreateFromString( row_key )
+            
+            if timestamp < cold_timestamp and network_context != ClientNetworkingContexts.GLOBAL_NETWORK_CONTEXT:
+                
+                # nothing has used this in a long time, so just its row is cleared next save
+                self._deleted_tracker_network_contexts.add( network_context )
+                
+                continue
+                
+            
+            self._network_contexts_to_bandwidth_trackers.SetSerialised( network_context, serialisable_tracker )
+            
+        
+    
+    def _SetTrackersDirty( self, network_contexts ):
+        
+        # ephemeral contexts never get saved
+        self._dirty_tracker_network_contexts.update( ( network_context for network_context in network_contexts if not network_context.IsEphemeral() ) )
+        
+    
     def AlreadyHaveExactlyTheseBandwidthRules( self, network_context, bandwidth_rules ):
         
         with self._lock:
@@ -231,16 +292,19 @@ class NetworkBandwidthManager( HydrusSerialisable.SerialisableBase ):
                     
                     del self._network_contexts_to_bandwidth_trackers[ network_context ]
                     
+                    self._dirty_tracker_network_contexts.discard( network_context )
+                    self._deleted_tracker_network_contexts.add( network_context )
+                    
                     if network_context == ClientNetworkingContexts.GLOBAL_NETWORK_CONTEXT:
                         
                         # just to reset it, so we have a 0 global context at all times
                         self._network_contexts_to_bandwidth_trackers[ ClientNetworkingContexts.GLOBAL_NETWORK_CONTEXT ] = HydrusNetworking.BandwidthTracker()
                         
+                        self._dirty_tracker_network_contexts.add( network_context )
+                        
                     
                 
             
-            self._SetDirty()
-            
         
     
     def GetDefaultRules( self ):
@@ -374,7 +438,7 @@ class NetworkBandwidthManager( HydrusSerialisable.SerialisableBase ):
         
         with self._lock:
             
-            return self._dirty
+            return self._dirty or len( self._dirty_tracker_network_contexts ) > 0 or len( self._deleted_tracker_network_contexts ) > 0 or len( self._saving_dirty_tracker_network_contexts ) > 0 or len( self._saving_deleted_tracker_network_contexts ) > 0
             
         
     
@@ -387,7 +451,7 @@ class NetworkBandwidthManager( HydrusSerialisable.SerialisableBase ):
                 self._network_contexts_to_bandwidth_trackers[ network_context ].ReportDataUsed( num_bytes )
                 
             
-            self._SetDirty()
+            self._SetTrackersDirty( network_contexts )
             
         
     
@@ -405,6 +469,9 @@ class NetworkBandwidthManager( HydrusSerialisable.SerialisableBase ):
             
             self._dirty = False
             
+            self._saving_dirty_tracker_network_contexts = set()
+            self._saving_deleted_tracker_network_contexts = set()
+            
         
     
     def SetRules( self, network_context, bandwidth_rules ):
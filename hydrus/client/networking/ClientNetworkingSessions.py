@@ -6,7 +6,6 @@ from hydrus.core import HydrusData
 from hydrus.core import HydrusSerialisable
 from hydrus.core import HydrusGlobals as HG
 import requests
-import threading
 
 try:
     
@@ -19,7 +18,7 @@ except:
     
     SOCKS_PROXY_OK = False
     
-class NetworkSessionManager( HydrusSerialisable.SerialisableBase ):
+class NetworkSessionManager( HydrusSerialisable.SerialisableBaseWithRows ):
     
     SERIALISABLE_TYPE = HydrusSerialisable.SERIALISABLE_TYPE_NETWORK_SESSION_MANAGER
     SERIALISABLE_NAME = 'Session Manager'
@@ -29,15 +28,21 @@ class NetworkSessionManager( HydrusSerialisable.SerialisableBase ):
     
     def __init__( self ):
         
-        HydrusSerialisable.SerialisableBase.__init__( self )
+        HydrusSerialisable.SerialisableBaseWithRows.__init__( self )
         
         self.engine = None
         
         self._dirty = False
         
-        self._lock = threading.Lock()
+        self._dirty_session_network_contexts = set()
+        self._deleted_session_network_contexts = set()
         
-        self._network_contexts_to_sessions = {}
+        # what the last save took. anything dirtied while that save is going goes in the sets above, so SetClean does not lose it
+        self._saving_dirty_session_network_contexts = set()
+        self._saving_deleted_session_network_contexts = set()
+        
+        # unpickling a session is not cheap, and most of them are for sites we will not visit this boot
+        self._network_contexts_to_sessions = HydrusSerialisable.LazyDictionary( deserialise_callable = self._DeserialiseSession, serialise_callable = self._SerialiseSession )
         
         self._network_contexts_to_session_timeouts = {}
         
@@ -65,6 +70,24 @@ class NetworkSessionManager( HydrusSerialisable.SerialisableBase ):
         session.cookies.clear_expired_cookies()
         
     
+    def _DeserialiseSession( self, network_context, pickled_session_hex ):
+        
+        try:
+            
+            session = pickle.loads( bytes.fromhex( pickled_session_hex ) )
+            
+        except:
+            
+            # new version of requests uses a diff format, wew
+            
+            return self._GenerateSession( network_context )
+            
+        
+        session.cookies.clear_session_cookies()
+        
+        return session
+        
+    
     def _GenerateSession( self, network_context ):
         
         session = requests.Session()
@@ -77,13 +100,35 @@ class NetworkSessionManager( HydrusSerialisable.SerialisableBase ):
         return session
         
     
+    def _GetDirtySerialisableRows( self ):
+        
+        # if a previous save never got to SetClean, its rows go again
+        
+        self._saving_dirty_session_network_contexts.update( self._dirty_session_network_contexts )
+        self._saving_deleted_session_network_contexts.update( self._deleted_session_network_contexts )
+        
+        self._dirty_session_network_contexts = set()
+        self._deleted_session_network_contexts = set()
+        
+        rows = [ ( network_context.DumpToString(), self._network_contexts_to_sessions.GetSerialised( network_context ) ) for network_context in self._saving_dirty_session_network_contexts if network_context in self._network_contexts_to_sessions ]
+        
+        deletee_row_keys = [ network_context.DumpToString() for network_context in self._saving_deleted_session_network_contexts ]
+        
+        return ( rows, deletee_row_keys )
+        
+    
     def _GetSerialisableInfo( self ):
         
-        serialisable_network_contexts_to_sessions = [ ( network_context.GetSerialisableTuple(), pickle.dumps( session ).hex() ) for ( network_context, session ) in list(self._network_contexts_to_sessions.items()) ]
+        serialisable_network_contexts_to_sessions = [ ( network_context.GetSerialisableTuple(), pickled_session_hex ) for ( network_context, pickled_session_hex ) in self._network_contexts_to_sessions.GetSerialisedItems() ]
         
         return serialisable_network_contexts_to_sessions
         
     
+    def _GetSerialisableMainInfo( self ):
+        
+        return []
+        
+    
     def _GetSessionNetworkContext( self, network_context ):
         
         # just in case one of these slips through somehow
@@ -105,20 +150,10 @@ class NetworkSessionManager( HydrusSerialisable.SerialisableBase ):
             
             network_context = HydrusSerialisable.CreateFromSerialisableTuple( serialisable_network_context )
             
-            try:
-                
-                session = pickle.loads( bytes.fromhex( pickled_session_hex ) )
-                
-            except:
-                
-                # new version of requests uses a diff format, wew
-                
-                continue
-                
+            self._network_contexts_to_sessions.SetSerialised( network_context, pickled_session_hex )
             
-            session.cookies.clear_session_cookies()
-            
-            self._network_contexts_to_sessions[ network_context ] = session
+            # this is either a whole copy or an old single-dump save, so if it goes to the db, these need rows
+            self._dirty_session_network_contexts.add( network_context )
             
         
     
@@ -140,10 +175,28 @@ class NetworkSessionManager( HydrusSerialisable.SerialisableBase ):
             
         
     
+    def _SerialiseSession( self, network_context, session ):
+        
+        return pickle.dumps( session ).hex()
+        
+    
     def _SetDirty( self ):
         
         self._dirty = True
         
+        # we do not know which sessions' cookies were changed, so save everything that has been used this boot
+        self._dirty_session_network_contexts.update( self._network_contexts_to_sessions.GetDeserialisedKeys() )
+        
+    
+    def _SetSerialisableRows( self, rows ):
+        
+        for ( row_key, timestamp, pickled_session_hex ) in rows:
+            
+            network_context = HydrusSerialisable.CreateFromString( row_key )
+            
+            self._network_contexts_to_sessions.SetSerialised( network_context, pickled_session_hex )
+            
+        
     
     def ClearSession( self, network_context ):
         
@@ -155,7 +208,8 @@ class NetworkSessionManager( HydrusSerialisable.SerialisableBase ):
                 
                 del self._network_contexts_to_sessions[ network_context ]
                 
-                self._SetDirty()
+                self._dirty_session_network_contexts.discard( network_context )
+                self._deleted_session_network_contexts.add( network_context )
                 
             
         
@@ -164,7 +218,7 @@ class NetworkSessionManager( HydrusSerialisable.SerialisableBase ):
         
         with self._lock:
             
-            return list(self._network_contexts_to_sessions.keys())
+            return self._network_contexts_to_sessions.keys()
             
         
     
@@ -202,7 +256,7 @@ class NetworkSessionManager( HydrusSerialisable.SerialisableBase ):
             
             #
             
-            self._SetDirty()
+            self._dirty_session_network_contexts.add( network_context )
             
             return session
             
@@ -219,7 +273,7 @@ class NetworkSessionManager( HydrusSerialisable.SerialisableBase ):
         
         with self._lock:
             
-            return self._dirty
+            return self._dirty or len( self._dirty_session_network_contexts ) > 0 or len( self._deleted_session_network_contexts ) > 0 or len( self._saving_dirty_session_network_contexts ) > 0 or len( self._saving_deleted_session_network_contexts ) > 0
             
         
     
@@ -237,13 +291,16 @@ class NetworkSessionManager( HydrusSerialisable.SerialisableBase ):
             
             self._dirty = False
             
+            self._saving_dirty_session_network_contexts = set()
+            self._saving_deleted_session_network_contexts = set()
+            
         
     
     def SetDirty( self ):
         
         with self._lock:
             
-            self._dirty = True
+            self._SetDirty()
             
         
     
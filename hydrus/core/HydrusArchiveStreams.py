@@ -0,0 +1,216 @@
+import struct
+import tarfile
+import time
+import zlib
+
+from hydrus.core import HydrusPaths
+
+# these write uncompressed zip and tar archives front to back, without seeking, so they can go straight down a socket
+# a member is ( name, size, timestamp, chunks ), where chunks is an iterable of bytes that should add up to size
+
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_NUM_ENTRIES_LIMIT = 0xFFFF
+
+ZIP64_PLACEHOLDER = 0xFFFFFFFF
+ZIP64_NUM_ENTRIES_PLACEHOLDER = 0xFFFF
+
+ZIP_FLAGS = 0x0808 # sizes and crc in a data descriptor after the file data, utf-8 names
+ZIP_VERSION = 20
+ZIP64_VERSION = 45
+ZIP_CREATE_SYSTEM_UNIX = 3
+ZIP_EXTERNAL_ATTR = 0o100644 << 16
+
+def _GetDOSTimeAndDate( timestamp ):
+    
+    t = time.localtime( timestamp )
+    
+    if t.tm_year < 1980:
+        
+        return ( 0, ( 1 << 5 ) | 1 )
+        
+    
+    dos_time = ( t.tm_hour << 11 ) | ( t.tm_min << 5 ) | ( t.tm_sec // 2 )
+    dos_date = ( ( t.tm_year - 1980 ) << 9 ) | ( t.tm_mon << 5 ) | t.tm_mday
+    
+    return ( dos_time, dos_date )
+    
+def GenerateTarChunks( members ):
+    
+    for ( name, size, timestamp, chunks ) in members:
+        
+        tar_info = tarfile.TarInfo( name )
+        
+        tar_info.size = size
+        tar_info.mtime = int( timestamp )
+        tar_info.mode = 0o644
+        
+        yield tar_info.tobuf( format = tarfile.PAX_FORMAT, encoding = 'utf-8' )
+        
+        num_bytes_written = 0
+        
+        for chunk in chunks:
+            
+            num_bytes_written += len( chunk )
+            
+            yield chunk
+            
+        
+        if num_bytes_written != size:
+            
+            raise Exception( '"{}" was {} bytes, not the {} bytes expected! The tar cannot continue.'.format( name, num_bytes_written, size ) )
+            
+        
+        remainder = size % tarfile.BLOCKSIZE
+        
+        if remainder > 0:
+            
+            yield b'\0' * ( tarfile.BLOCKSIZE - remainder )
+            
+        
+    
+    yield b'\0' * ( tarfile.BLOCKSIZE * 2 )
+    
+def GenerateZipChunks( members ):
+    
+    central_directory_entries = []
+    
+    offset = 0
+    
+    for ( name, size, timestamp, chunks ) in members:
+        
+        name_bytes = name.encode( 'utf-8' )
+        
+        ( dos_time, dos_date ) = _GetDOSTimeAndDate( timestamp )
+        
+        local_header_offset = offset
+        
+        # crc and sizes come in the data descriptor, but if this is a big one, we have to say so now
+        
+        if size >= ZIP64_LIMIT:
+            
+            version = ZIP64_VERSION
+            header_size = ZIP64_PLACEHOLDER
+            extra = struct.pack( '<HHQQ', 0x0001, 16, 0, 0 )
+            
+        else:
+            
+            version = ZIP_VERSION
+            header_size = 0
+            extra = b''
+            
+        
+        local_header = struct.pack( '<IHHHHHIIIHH', 0x04034b50, version, ZIP_FLAGS, 0, dos_time, dos_date, 0, header_size, header_size, len( name_bytes ), len( extra ) ) + name_bytes + extra
+        
+        yield local_header
+        
+        offset += len( local_header )
+        
+        crc = 0
+        num_bytes_written = 0
+        
+        for chunk in chunks:
+            
+            crc = zlib.crc32( chunk, crc )
+            
+            num_bytes_written += len( chunk )
+            
+            yield chunk
+            
+        
+        offset += num_bytes_written
+        
+        if size >= ZIP64_LIMIT:
+            
+            data_descriptor = struct.pack( '<IIQQ', 0x08074b50, crc, num_bytes_written, num_bytes_written )
+            
+        else:
+            
+            if num_bytes_written >= ZIP64_LIMIT:
+                
+                raise Exception( '"{}" was {} bytes, much more than the {} bytes expected! The zip cannot continue.'.format( name, num_bytes_written, size ) )
+                
+            
+            data_descriptor = struct.pack( '<IIII', 0x08074b50, crc, num_bytes_written, num_bytes_written )
+            
+        
+        yield data_descriptor
+        
+        offset += len( data_descriptor )
+        
+        central_directory_entries.append( ( name_bytes, dos_time, dos_date, crc, num_bytes_written, local_header_offset ) )
+        
+    
+    central_directory_offset = offset
+    
+    for ( name_bytes, dos_time, dos_date, crc, size, local_header_offset ) in central_directory_entries:
+        
+        zip64_fields = []
+        
+        if size >= ZIP64_LIMIT:
+            
+            zip64_fields.extend( ( size, size ) )
+            
+            header_size = ZIP64_PLACEHOLDER
+            
+        else:
+            
+            header_size = size
+            
+        
+        if local_header_offset >= ZIP64_LIMIT:
+            
+            zip64_fields.append( local_header_offset )
+            
+            header_local_header_offset = ZIP64_PLACEHOLDER
+            
+        else:
+            
+            header_local_header_offset = local_header_offset
+            
+        
+        if len( zip64_fields ) > 0:
+            
+            version = ZIP64_VERSION
+            extra = struct.pack( '<HH', 0x0001, 8 * len( zip64_fields ) ) + struct.pack( '<' + 'Q' * len( zip64_fields ), *zip64_fields )
+            
+        else:
+            
+            version = ZIP_VERSION
+            extra = b''
+            
+        
+        central_directory_header = struct.pack( '<IHHHHHHIIIHHHHHII', 0x02014b50, ( ZIP_CREATE_SYSTEM_UNIX << 8 ) | version, version, ZIP_FLAGS, 0, dos_time, dos_date, crc, header_size, header_size, len( name_bytes ), len( extra ), 0, 0, 0, ZIP_EXTERNAL_ATTR, header_local_header_offset ) + name_bytes + extra
+        
+        yield central_directory_header
+        
+        offset += len( central_directory_header )
+        
+    
+    central_directory_size = offset - central_directory_offset
+    
+    num_entries = len( central_directory_entries )
+    
+    if num_entries >= ZIP_NUM_ENTRIES_LIMIT or central_directory_offset >= ZIP64_LIMIT or central_directory_size >= ZIP64_LIMIT:
+        
+        zip64_end_of_central_directory_offset = offset
+        
+        yield struct.pack( '<IQHHIIQQQQ', 0x06064b50, 44, ( ZIP_CREATE_SYSTEM_UNIX << 8 ) | ZIP64_VERSION, ZIP64_VERSION, 0, 0, num_entries, num_entries, central_directory_size, central_directory_offset )
+        yield struct.pack( '<IIQI', 0x07064b50, 0, zip64_end_of_central_directory_offset, 1 )
+        
+        num_entries = ZIP64_NUM_ENTRIES_PLACEHOLDER
+        central_directory_size = ZIP64_PLACEHOLDER
+        central_directory_offset = ZIP64_PLACEHOLDER
+        
+    
+    yield struct.pack( '<IHHHHIIH', 0x06054b50, 0, 0, num_entries, num_entries, central_directory_size, central_directory_offset, 0 )
+    
+def IterateFileChunks( path ):
+    
+    with open( path, 'rb' ) as f:
+        
+        for block in HydrusPaths.ReadFileLikeAsBlocks( f ):
+            
+            yield block
+            
+        
+    
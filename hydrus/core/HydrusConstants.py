@@ -74,7 +74,7 @@ options = {}
 
 NETWORK_VERSION = 18
 SOFTWARE_VERSION = 396
-CLIENT_API_VERSION = 11
+CLIENT_API_VERSION = 12
 
 SERVER_THUMBNAIL_DIMENSIONS = ( 200, 200 )
 
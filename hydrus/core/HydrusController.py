@@ -400,6 +400,11 @@ class HydrusController( object ):
         return self.db_dir
         
     
+    def GetDBJobStatistics( self ):
+        
+        return self.db.GetJobStatistics()
+        
+    
     def GetDBStatus( self ):
         
         return self.db.GetStatus()
@@ -613,6 +618,11 @@ class HydrusController( object ):
         pass
         
     
+    def ResetDBJobStatistics( self ):
+        
+        self.db.ResetJobStatistics()
+        
+    
     def ResetIdleTimer( self ):
         
         self._timestamps[ 'last_user_action' ] = HydrusData.GetNow()
@@ -5,14 +5,20 @@ from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusPaths
 from hydrus.core import HydrusText
+import collections
 import os
 import queue
 import sqlite3
+import threading
 import traceback
 import time
 
 CONNECTION_REFRESH_TIME = 60 * 30
 
+JOB_STATISTICS_NUM_SAMPLES = 256
+
+SLOW_JOB_PROFILE_PERIOD = 60 * 10
+
 def CheckCanVacuum( db_path, stop_time = None ):
     
     db = sqlite3.connect( db_path, isolation_level = None, detect_types = sqlite3.PARSE_DECLTYPES )
@@ -175,6 +181,11 @@ class HydrusDB( object ):
         self._current_status = ''
         self._current_job_name = ''
         
+        self._job_statistics = JobStatistics()
+        
+        self._slow_job_keys_to_profile = set()
+        self._slow_job_keys_to_last_armed_times = {}
+        
         self._db = None
         self._c = None
         
@@ -422,6 +433,11 @@ class HydrusDB( object ):
         else: return row_count
         
     
+    def _GetSlowJobProfileThresholdMS( self ):
+        
+        return None
+        
+    
     def _InitCaches( self ):
         
         pass
@@ -582,6 +598,12 @@ class HydrusDB( object ):
         
         ( action, args, kwargs ) = job.GetCallableTuple()
         
+        started = HydrusData.GetNowPrecise()
+        
+        wait_time = started - job.GetCreationTime()
+        
+        num_rows = 0
+        
         try:
             
             if job_type in ( 'read_write', 'write' ):
@@ -606,6 +628,11 @@ class HydrusDB( object ):
                 result = self._Write( action, *args, **kwargs )
                 
             
+            if isinstance( result, ( list, set, frozenset, dict ) ):
+                
+                num_rows = len( result )
+                
+            
             if self._transaction_contains_writes and HydrusData.TimeHasPassed( self._transaction_started + self.TRANSACTION_COMMIT_TIME ):
                 
                 self._current_status = 'db committing'
@@ -662,6 +689,10 @@ class HydrusDB( object ):
             
             self.publish_status_update()
             
+            time_took = HydrusData.GetNowPrecise() - started
+            
+            self._RecordJobStatistics( job, wait_time, time_took, num_rows )
+            
         
     
     def _Read( self, action, *args, **kwargs ):
@@ -669,6 +700,31 @@ class HydrusDB( object ):
         raise NotImplementedError()
         
     
+    def _RecordJobStatistics( self, job, wait_time, time_took, num_rows ):
+        
+        job_key = ( job.GetType(), job.GetAction() )
+        
+        slow_job_profile_threshold_ms = self._GetSlowJobProfileThresholdMS()
+        
+        is_slow = slow_job_profile_threshold_ms is not None and time_took * 1000 > slow_job_profile_threshold_ms
+        
+        self._job_statistics.RecordJob( job_key, wait_time, time_took, num_rows, is_slow )
+        
+        if is_slow and not HG.db_profile_mode and job_key not in self._slow_job_keys_to_profile:
+            
+            # we can't know a job is slow until it is done, so we profile the next one of the same type. at most once every ten minutes per type
+            
+            if HydrusData.TimeHasPassed( self._slow_job_keys_to_last_armed_times.get( job_key, 0 ) + SLOW_JOB_PROFILE_PERIOD ):
+                
+                self._slow_job_keys_to_profile.add( job_key )
+                
+                self._slow_job_keys_to_last_armed_times[ job_key ] = HydrusData.GetNow()
+                
+                HydrusData.Print( 'The db job "{}" took {}, which is over the slow job threshold. The next run of it will be profiled.'.format( job.ToString(), HydrusData.TimeDeltaToPrettyTimeDelta( time_took ) ) )
+                
+            
+        
+    
     def _RepairDB( self ):
         
         pass
@@ -805,6 +861,11 @@ class HydrusDB( object ):
         return total
         
     
+    def GetJobStatistics( self ):
+        
+        return self._job_statistics.GetSnapshot()
+        
+    
     def GetStatus( self ):
         
         return ( self._current_status, self._current_job_name )
@@ -881,6 +942,21 @@ class HydrusDB( object ):
                         
                         HydrusData.Profile( summary, 'self._ProcessJob( job )', globals(), locals() )
                         
+                    elif ( job.GetType(), job.GetAction() ) in self._slow_job_keys_to_profile:
+                        
+                        self._slow_job_keys_to_profile.discard( ( job.GetType(), job.GetAction() ) )
+                        
+                        summary = 'Profiling slow ' + job.ToString()
+                        
+                        min_duration_ms = self._GetSlowJobProfileThresholdMS()
+                        
+                        if min_duration_ms is None:
+                            
+                            min_duration_ms = 20
+                            
+                        
+                        HydrusData.Profile( summary, 'self._ProcessJob( job )', globals(), locals(), min_duration_ms = min_duration_ms )
+                        
                     else:
                         
                         self._ProcessJob( job )
@@ -988,6 +1064,11 @@ class HydrusDB( object ):
         return self._ready_to_serve_requests
         
     
+    def ResetJobStatistics( self ):
+        
+        self._job_statistics.Reset()
+        
+    
     def Shutdown( self ):
         
         self._local_shutdown = True
@@ -1009,6 +1090,134 @@ class HydrusDB( object ):
         if synchronous: return job.GetResult()
         
     
+class JobStatistics( object ):
+    
+    def __init__( self ):
+        
+        self._lock = threading.Lock()
+        
+        self._job_keys_to_stats = {}
+        
+    
+    def _GetPercentile( self, sorted_values, percentile ):
+        
+        index = min( int( len( sorted_values ) * percentile ), len( sorted_values ) - 1 )
+        
+        return sorted_values[ index ]
+        
+    
+    def GetSnapshot( self ):
+        
+        with self._lock:
+            
+            snapshot = []
+            
+            for ( ( job_type, action ), stats ) in self._job_keys_to_stats.items():
+                
+                count = stats[ 'count' ]
+                
+                recent_times = sorted( stats[ 'recent_times' ] )
+                
+                row = {}
+                
+                row[ 'job_type' ] = job_type
+                row[ 'action' ] = action
+                row[ 'count' ] = count
+                row[ 'num_slow' ] = stats[ 'num_slow' ]
+                row[ 'mean_wait_ms' ] = round( stats[ 'total_wait' ] * 1000 / count, 3 )
+                row[ 'max_wait_ms' ] = round( stats[ 'max_wait' ] * 1000, 3 )
+                row[ 'mean_time_ms' ] = round( stats[ 'total_time' ] * 1000 / count, 3 )
+                row[ 'p50_time_ms' ] = round( self._GetPercentile( recent_times, 0.5 ) * 1000, 3 )
+                row[ 'p90_time_ms' ] = round( self._GetPercentile( recent_times, 0.9 ) * 1000, 3 )
+                row[ 'p99_time_ms' ] = round( self._GetPercentile( recent_times, 0.99 ) * 1000, 3 )
+                row[ 'max_time_ms' ] = round( stats[ 'max_time' ] * 1000, 3 )
+                row[ 'total_rows' ] = stats[ 'total_rows' ]
+                row[ 'mean_rows' ] = round( stats[ 'total_rows' ] / count, 3 )
+                
+                snapshot.append( row )
+                
+            
+            snapshot.sort( key = lambda row: ( row[ 'job_type' ], row[ 'action' ] ) )
+            
+            return snapshot
+            
+        
+    
+    def RecordJob( self, job_key, wait_time, time_took, num_rows, is_slow ):
+        
+        with self._lock:
+            
+            if job_key not in self._job_keys_to_stats:
+                
+                # percentiles are over the most recent samples, everything else is since boot
+                
+                stats = {}
+                
+                stats[ 'count' ] = 0
+                stats[ 'num_slow' ] = 0
+                stats[ 'total_wait' ] = 0.0
+                stats[ 'max_wait' ] = 0.0
+                stats[ 'total_time' ] = 0.0
+                stats[ 'max_time' ] = 0.0
+                stats[ 'total_rows' ] = 0
+                stats[ 'recent_times' ] = collections.deque( maxlen = JOB_STATISTICS_NUM_SAMPLES )
+                
+                self._job_keys_to_stats[ job_key ] = stats
+                
+            
+            stats = self._job_keys_to_stats[ job_key ]
+            
+            stats[ 'count' ] += 1
+            
+            if is_slow:
+                
+                stats[ 'num_slow' ] += 1
+                
+            
+            stats[ 'total_wait' ] += wait_time
+            stats[ 'max_wait' ] = max( stats[ 'max_wait' ], wait_time )
+            stats[ 'total_time' ] += time_took
+            stats[ 'max_time' ] = max( stats[ 'max_time' ], time_took )
+            stats[ 'total_rows' ] += num_rows
+            stats[ 'recent_times' ].append( time_took )
+            
+        
+    
+    def Reset( self ):
+        
+        with self._lock:
+            
+            self._job_keys_to_stats = {}
+            
+        
+    
+class TemporaryBlobTable( object ):
+    
+    def __init__( self, cursor, blob_iterable, column_name ):
+        
+        self._cursor = cursor
+        self._blob_iterable = blob_iterable
+        self._column_name = column_name
+        
+        self._table_name = 'mem.tempblob' + os.urandom( 32 ).hex()
+        
+    
+    def __enter__( self ):
+        
+        self._cursor.execute( 'CREATE TABLE {} ( {} BLOB_BYTES PRIMARY KEY );'.format( self._table_name, self._column_name ) )
+        
+        self._cursor.executemany( 'INSERT OR IGNORE INTO {} ( {} ) VALUES ( ? );'.format( self._table_name, self._column_name ), ( ( sqlite3.Binary( b ), ) for b in self._blob_iterable ) )
+        
+        return self._table_name
+        
+    
+    def __exit__( self, exc_type, exc_val, exc_tb ):
+        
+        self._cursor.execute( 'DROP TABLE {};'.format( self._table_name ) )
+        
+        return False
+        
+    
 class TemporaryIntegerTable( object ):
     
     def __init__( self, cursor, integer_iterable, column_name ):
@@ -42,6 +42,7 @@ class SizeException( VetoException ): pass
 class DecompressionBombException( SizeException ): pass
 
 class ParseException( HydrusException ): pass
+class ParseNodeNeedsTextException( HydrusException ): pass
 class StringConvertException( ParseException ): pass
 class StringMatchException( ParseException ): pass
 class URLClassException( ParseException ): pass
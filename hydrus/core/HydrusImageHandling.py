@@ -65,6 +65,8 @@ PILImage.MAX_IMAGE_PIXELS = None # this turns off decomp check entirely, wew
 
 PIL_ONLY_MIMETYPES = { HC.IMAGE_GIF, HC.IMAGE_ICON }
 
+JPEG_DECODE_REDUCTION_MARGIN = 2
+
 try:
     
     import cv2
@@ -80,6 +82,8 @@ try:
         CV_JPEG_THUMBNAIL_ENCODE_PARAMS = []
         CV_PNG_THUMBNAIL_ENCODE_PARAMS = []
         
+        CV_JPEG_REDUCED_IMREAD_FLAGS = {}
+        
     else:
         
         CV_IMREAD_FLAGS_SUPPORTS_ALPHA = cv2.IMREAD_UNCHANGED
@@ -88,6 +92,16 @@ try:
         CV_JPEG_THUMBNAIL_ENCODE_PARAMS = [ cv2.IMWRITE_JPEG_QUALITY, 92 ]
         CV_PNG_THUMBNAIL_ENCODE_PARAMS = [ cv2.IMWRITE_PNG_COMPRESSION, 9 ]
         
+        if hasattr( cv2, 'IMREAD_REDUCED_COLOR_2' ):
+            
+            # these decode the jpeg straight to 1/2, 1/4 or 1/8 size. they also do EXIF reorientation
+            CV_JPEG_REDUCED_IMREAD_FLAGS = { 2 : cv2.IMREAD_REDUCED_COLOR_2, 4 : cv2.IMREAD_REDUCED_COLOR_4, 8 : cv2.IMREAD_REDUCED_COLOR_8 }
+            
+        else:
+            
+            CV_JPEG_REDUCED_IMREAD_FLAGS = {}
+            
+        
     
     OPENCV_OK = True
     
@@ -143,7 +157,9 @@ def Dequantize( pil_image ):
     
     return pil_image
     
-def GenerateNumPyImage( path, mime, force_pil = False ):
+def GenerateNumPyImage( path, mime, force_pil = False, target_resolution = None ):
+    
+    # if you give a target_resolution, a jpeg may come back smaller than the file's real resolution, but never smaller than the target
     
     if HG.media_load_report_mode:
         
@@ -162,7 +178,7 @@ def GenerateNumPyImage( path, mime, force_pil = False ):
             HydrusData.ShowText( 'Loading with PIL' )
             
         
-        pil_image = GeneratePILImage( path )
+        pil_image = GeneratePILImage( path, target_resolution = target_resolution )
         
         numpy_image = GenerateNumPyImageFromPILImage( pil_image )
         
@@ -177,6 +193,26 @@ def GenerateNumPyImage( path, mime, force_pil = False ):
             
             flags = CV_IMREAD_FLAGS_SUPPORTS_EXIF_REORIENTATION
             
+            if target_resolution is not None and len( CV_JPEG_REDUCED_IMREAD_FLAGS ) > 0:
+                
+                try:
+                    
+                    with PILImage.open( path ) as pil_image:
+                        
+                        reduction = GetJPEGDecodeReduction( pil_image.size, target_resolution )
+                        
+                    
+                except:
+                    
+                    reduction = 1
+                    
+                
+                if reduction in CV_JPEG_REDUCED_IMREAD_FLAGS:
+                    
+                    flags = CV_JPEG_REDUCED_IMREAD_FLAGS[ reduction ]
+                    
+                
+            
         else:
             
             flags = CV_IMREAD_FLAGS_SUPPORTS_ALPHA
@@ -191,7 +227,7 @@ def GenerateNumPyImage( path, mime, force_pil = False ):
                 HydrusData.ShowText( 'OpenCV Failed, loading with PIL' )
                 
             
-            pil_image = GeneratePILImage( path )
+            pil_image = GeneratePILImage( path, target_resolution = target_resolution )
             
             numpy_image = GenerateNumPyImageFromPILImage( pil_image )
             
@@ -242,7 +278,7 @@ def GenerateNumPyImageFromPILImage( pil_image ):
     
     return numpy.fromstring( s, dtype = 'uint8' ).reshape( ( h, w, len( s ) // ( w * h ) ) )
     
-def GeneratePILImage( path ):
+def GeneratePILImage( path, target_resolution = None ):
     
     try:
         
@@ -253,6 +289,19 @@ def GeneratePILImage( path ):
         raise HydrusExceptions.MimeException( 'Could not load the image--it was likely malformed!' )
         
     
+    if target_resolution is not None and pil_image.format == 'JPEG':
+        
+        ( width, height ) = pil_image.size
+        
+        reduction = GetJPEGDecodeReduction( ( width, height ), target_resolution )
+        
+        if reduction > 1:
+            
+            # this has to happen before the load, so before any EXIF transpose
+            pil_image.draft( pil_image.mode, ( width // reduction, height // reduction ) )
+            
+        
+    
     if pil_image.format == 'JPEG' and hasattr( pil_image, '_getexif' ):
         
         try:
@@ -352,7 +401,7 @@ def GenerateThumbnailBytesFromStaticImagePath( path, target_resolution, mime ):
     
     if OPENCV_OK:
         
-        numpy_image = GenerateNumPyImage( path, mime )
+        numpy_image = GenerateNumPyImage( path, mime, target_resolution = target_resolution )
         
         thumbnail_numpy_image = ResizeNumPyImage( numpy_image, target_resolution )
         
@@ -368,13 +417,13 @@ def GenerateThumbnailBytesFromStaticImagePath( path, target_resolution, mime ):
             
         
     
-    pil_image = GeneratePILImage( path )
+    pil_image = GeneratePILImage( path, target_resolution = target_resolution )
     
     pil_image = Dequantize( pil_image )
     
     thumbnail_pil_image = pil_image.resize( target_resolution, PILImage.ANTIALIAS )
     
-    thumbnail_bytes = GenerateThumbnailBytesPIL( pil_image, mime )
+    thumbnail_bytes = GenerateThumbnailBytesPIL( thumbnail_pil_image, mime )
     
     return thumbnail_bytes
     
@@ -528,6 +577,27 @@ def GetImageProperties( path, mime ):
     
     return ( ( width, height ), duration, num_frames )
     
+def GetJPEGDecodeReduction( image_resolution, target_resolution ):
+    
+    # libjpeg can decode straight to 1/2, 1/4 or 1/8 size, which is much faster than a full decode and a resize
+    # we want the biggest reduction that still gives us at least JPEG_DECODE_REDUCTION_MARGIN times the target, so the final resize has something to work with
+    # sorted so an EXIF rotation between the file and the target doesn't matter
+    
+    ( image_short, image_long ) = sorted( image_resolution )
+    ( target_short, target_long ) = sorted( target_resolution )
+    
+    reduction = 1
+    
+    for candidate_reduction in ( 2, 4, 8 ):
+        
+        if image_short // candidate_reduction >= target_short * JPEG_DECODE_REDUCTION_MARGIN and image_long // candidate_reduction >= target_long * JPEG_DECODE_REDUCTION_MARGIN:
+            
+            reduction = candidate_reduction
+            
+        
+    
+    return reduction
+    
 # bigger number is worse quality
 # this is very rough and misses some finesse
 def GetJPEGQuantizationQualityEstimate( path ):
@@ -721,11 +791,11 @@ def ResizeNumPyImage( numpy_image, target_resolution ):
     ( target_width, target_height ) = target_resolution
     ( image_width, image_height ) = GetResolutionNumPy( numpy_image )
     
-    if target_width == image_width and target_height == target_width:
+    if target_width == image_width and target_height == image_height:
         
         return numpy_image
         
-    elif target_width > image_height or target_height > image_width:
+    elif target_width > image_width or target_height > image_height:
         
         interpolation = cv2.INTER_LANCZOS4
         
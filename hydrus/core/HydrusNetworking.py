@@ -1,3 +1,4 @@
+import array
 import calendar
 import collections
 import datetime
@@ -438,6 +439,165 @@ class BandwidthRules( HydrusSerialisable.SerialisableBase ):
     
 HydrusSerialisable.SERIALISABLE_TYPES_TO_OBJECT_TYPES[ HydrusSerialisable.SERIALISABLE_TYPE_BANDWIDTH_RULES ] = BandwidthRules
 
+class BandwidthUsageRing( object ):
+    
+    # a fixed number of time buckets in a ring, each holding the running total from before that bucket started
+    # the usage since any time the ring still covers is then one subtraction, and the ring never grows
+    # this is not thread-safe--the tracker that owns it does the locking
+    
+    def __init__( self, bucket_width, max_time_delta ):
+        
+        self._bucket_width = bucket_width
+        self._num_buckets = ( max_time_delta // bucket_width ) + 2
+        
+        # this is only made on the first add, so trackers that are only ever read stay small
+        self._totals_before = None
+        
+        self._first_bucket_id = None
+        self._last_bucket_id = None
+        
+        self._total = 0
+        
+    
+    def _GetOldestBucketId( self ):
+        
+        return max( self._first_bucket_id, self._last_bucket_id - self._num_buckets + 1 )
+        
+    
+    def _GetTotalBefore( self, bucket_id ):
+        
+        if self._last_bucket_id is None or bucket_id > self._last_bucket_id:
+            
+            return self._total
+            
+        
+        # anything older than the ring is gone, so it counts as nothing
+        bucket_id = max( bucket_id, self._GetOldestBucketId() )
+        
+        return self._totals_before[ bucket_id % self._num_buckets ]
+        
+    
+    def Add( self, timestamp, amount ):
+        
+        bucket_id = timestamp // self._bucket_width
+        
+        if self._last_bucket_id is None:
+            
+            self._totals_before = array.array( 'q', [ 0 ] ) * self._num_buckets
+            
+            self._first_bucket_id = bucket_id
+            self._last_bucket_id = bucket_id
+            
+            self._totals_before[ bucket_id % self._num_buckets ] = self._total
+            
+        elif bucket_id > self._last_bucket_id:
+            
+            # the buckets we skipped over were idle, so they start with the same running total as the new one
+            
+            for skipped_bucket_id in range( max( self._last_bucket_id + 1, bucket_id - self._num_buckets + 1 ), bucket_id + 1 ):
+                
+                self._totals_before[ skipped_bucket_id % self._num_buckets ] = self._total
+                
+            
+            self._last_bucket_id = bucket_id
+            
+        
+        # if the clock went backwards, this just goes in the latest bucket
+        
+        self._total += amount
+        
+    
+    def GetActiveBuckets( self ):
+        
+        if self._last_bucket_id is None:
+            
+            return []
+            
+        
+        active_buckets = []
+        
+        for bucket_id in range( self._GetOldestBucketId(), self._last_bucket_id + 1 ):
+            
+            usage = self._GetTotalBefore( bucket_id + 1 ) - self._GetTotalBefore( bucket_id )
+            
+            if usage > 0:
+                
+                active_buckets.append( ( bucket_id * self._bucket_width, usage ) )
+                
+            
+        
+        return active_buckets
+        
+    
+    def GetBucketUsage( self, timestamp ):
+        
+        bucket_id = timestamp // self._bucket_width
+        
+        return self._GetTotalBefore( bucket_id + 1 ) - self._GetTotalBefore( bucket_id )
+        
+    
+    def GetNewestBucketTimestampForUsage( self, usage ):
+        
+        # the start of the newest bucket where the usage from there to now is at least this much, or None if the ring does not have that much
+        
+        if self._last_bucket_id is None:
+            
+            return None
+            
+        
+        total_before_limit = self._total - usage
+        
+        low = self._GetOldestBucketId()
+        high = self._last_bucket_id
+        
+        if self._GetTotalBefore( low ) > total_before_limit:
+            
+            return None
+            
+        
+        # running totals only go up, so we can binary search
+        
+        while low < high:
+            
+            middle = ( low + high + 1 ) // 2
+            
+            if self._GetTotalBefore( middle ) <= total_before_limit:
+                
+                low = middle
+                
+            else:
+                
+                high = middle - 1
+                
+            
+        
+        return low * self._bucket_width
+        
+    
+    def GetUsageSince( self, timestamp ):
+        
+        # all the buckets that start at or after the timestamp
+        
+        bucket_id = - ( - timestamp // self._bucket_width )
+        
+        return self._total - self._GetTotalBefore( bucket_id )
+        
+    
+    def SetActiveBuckets( self, active_buckets, now ):
+        
+        # anything too old to ever be queried again is not worth a ring
+        
+        oldest_useful_timestamp = now - ( ( self._num_buckets - 1 ) * self._bucket_width )
+        
+        for ( timestamp, usage ) in sorted( active_buckets ):
+            
+            if timestamp >= oldest_useful_timestamp:
+                
+                self.Add( timestamp, usage )
+                
+            
+        
+    
 class BandwidthTracker( HydrusSerialisable.SerialisableBase ):
     
     SERIALISABLE_TYPE = HydrusSerialisable.SERIALISABLE_TYPE_BANDWIDTH_TRACKER
@@ -451,8 +611,6 @@ class BandwidthTracker( HydrusSerialisable.SerialisableBase ):
     MAX_HOURS_TIME_DELTA = 72 * 3600
     MAX_DAYS_TIME_DELTA = 31 * 86400
     
-    CACHE_MAINTENANCE_TIME_DELTA = 120
-    
     MIN_TIME_DELTA_FOR_USER = 10
     
     def __init__( self ):
@@ -461,54 +619,56 @@ class BandwidthTracker( HydrusSerialisable.SerialisableBase ):
         
         self._lock = threading.Lock()
         
-        self._next_cache_maintenance_timestamp = HydrusData.GetNow() + self.CACHE_MAINTENANCE_TIME_DELTA
-        
+        # months are the user's history, so they are kept. everything else is a fixed-size ring
         self._months_bytes = collections.Counter()
-        self._days_bytes = collections.Counter()
-        self._hours_bytes = collections.Counter()
-        self._minutes_bytes = collections.Counter()
-        self._seconds_bytes = collections.Counter()
-        
         self._months_requests = collections.Counter()
-        self._days_requests = collections.Counter()
-        self._hours_requests = collections.Counter()
-        self._minutes_requests = collections.Counter()
-        self._seconds_requests = collections.Counter()
+        
+        self._days_bytes = BandwidthUsageRing( 86400, self.MAX_DAYS_TIME_DELTA )
+        self._hours_bytes = BandwidthUsageRing( 3600, self.MAX_HOURS_TIME_DELTA )
+        self._minutes_bytes = BandwidthUsageRing( 60, self.MAX_MINUTES_TIME_DELTA )
+        self._seconds_bytes = BandwidthUsageRing( 1, self.MAX_SECONDS_TIME_DELTA )
+        
+        self._days_requests = BandwidthUsageRing( 86400, self.MAX_DAYS_TIME_DELTA )
+        self._hours_requests = BandwidthUsageRing( 3600, self.MAX_HOURS_TIME_DELTA )
+        self._minutes_requests = BandwidthUsageRing( 60, self.MAX_MINUTES_TIME_DELTA )
+        self._seconds_requests = BandwidthUsageRing( 1, self.MAX_SECONDS_TIME_DELTA )
         
     
     def _GetSerialisableInfo( self ):
         
-        dicts_flat = []
+        dicts_flat = [ list( self._months_bytes.items() ) ]
         
-        for d in ( self._months_bytes, self._days_bytes, self._hours_bytes, self._minutes_bytes, self._seconds_bytes, self._months_requests, self._days_requests, self._hours_requests, self._minutes_requests, self._seconds_requests ):
-            
-            dicts_flat.append( list( d.items() ) )
-            
+        dicts_flat.extend( ( ring.GetActiveBuckets() for ring in ( self._days_bytes, self._hours_bytes, self._minutes_bytes, self._seconds_bytes ) ) )
+        
+        dicts_flat.append( list( self._months_requests.items() ) )
+        
+        dicts_flat.extend( ( ring.GetActiveBuckets() for ring in ( self._days_requests, self._hours_requests, self._minutes_requests, self._seconds_requests ) ) )
         
         return dicts_flat
         
     
     def _InitialiseFromSerialisableInfo( self, serialisable_info ):
         
-        counters = [ collections.Counter( dict( flat_dict ) ) for flat_dict in serialisable_info ]
-        
         # unusual error someone reported by email--it came back an empty list, fugg
-        if len( counters ) != 10:
+        if len( serialisable_info ) != 10:
             
             return
             
         
-        self._months_bytes = counters[ 0 ]
-        self._days_bytes = counters[ 1 ]
-        self._hours_bytes = counters[ 2 ]
-        self._minutes_bytes = counters[ 3 ]
-        self._seconds_bytes = counters[ 4 ]
+        self._months_bytes = collections.Counter( dict( serialisable_info[ 0 ] ) )
+        self._months_requests = collections.Counter( dict( serialisable_info[ 5 ] ) )
+        
+        now = HydrusData.GetNow()
         
-        self._months_requests = counters[ 5 ]
-        self._days_requests = counters[ 6 ]
-        self._hours_requests = counters[ 7 ]
-        self._minutes_requests = counters[ 8 ]
-        self._seconds_requests = counters[ 9 ]
+        for ( ring, flat_dict ) in zip( ( self._days_bytes, self._hours_bytes, self._minutes_bytes, self._seconds_bytes ), serialisable_info[ 1 : 5 ] ):
+            
+            ring.SetActiveBuckets( flat_dict, now )
+            
+        
+        for ( ring, flat_dict ) in zip( ( self._days_requests, self._hours_requests, self._minutes_requests, self._seconds_requests ), serialisable_info[ 6 : 10 ] ):
+            
+            ring.SetActiveBuckets( flat_dict, now )
+            
         
     
     def _GetCurrentDateTime( self ):
@@ -517,29 +677,29 @@ class BandwidthTracker( HydrusSerialisable.SerialisableBase ):
         return datetime.datetime.utcfromtimestamp( HydrusData.GetNow() )
         
     
-    def _GetWindowAndCounter( self, bandwidth_type, time_delta ):
+    def _GetWindowAndRing( self, bandwidth_type, time_delta ):
         
         if bandwidth_type == HC.BANDWIDTH_TYPE_DATA:
             
             if time_delta < self.MAX_SECONDS_TIME_DELTA:
                 
                 window = 0
-                counter = self._seconds_bytes
+                ring = self._seconds_bytes
                 
             elif time_delta < self.MAX_MINUTES_TIME_DELTA:
                 
                 window = 60
-                counter = self._minutes_bytes
+                ring = self._minutes_bytes
                 
             elif time_delta < self.MAX_HOURS_TIME_DELTA:
                 
                 window = 3600
-                counter = self._hours_bytes
+                ring = self._hours_bytes
                 
             else:
                 
                 window = 86400
-                counter = self._days_bytes
+                ring = self._days_bytes
                 
             
         elif bandwidth_type == HC.BANDWIDTH_TYPE_REQUESTS:
@@ -547,26 +707,26 @@ class BandwidthTracker( HydrusSerialisable.SerialisableBase ):
             if time_delta < self.MAX_SECONDS_TIME_DELTA:
                 
                 window = 0
-                counter = self._seconds_requests
+                ring = self._seconds_requests
                 
             elif time_delta < self.MAX_MINUTES_TIME_DELTA:
                 
                 window = 60
-                counter = self._minutes_requests
+                ring = self._minutes_requests
                 
             elif time_delta < self.MAX_HOURS_TIME_DELTA:
                 
                 window = 3600
-                counter = self._hours_requests
+                ring = self._hours_requests
                 
             else:
                 
                 window = 86400
-                counter = self._days_requests
+                ring = self._days_requests
                 
             
         
-        return ( window, counter )
+        return ( window, ring )
         
     
     def _GetMonthTime( self, dt ):
@@ -598,7 +758,7 @@ class BandwidthTracker( HydrusSerialisable.SerialisableBase ):
                 
             
         
-        ( window, counter ) = self._GetWindowAndCounter( bandwidth_type, time_delta )
+        ( window, ring ) = self._GetWindowAndRing( bandwidth_type, time_delta )
         
         if time_delta == 1:
             
@@ -607,16 +767,7 @@ class BandwidthTracker( HydrusSerialisable.SerialisableBase ):
             # this causes 50% consumption as we consume in the second after the one we verified was clear
             # so, let's just check the current second and be happy with it
             
-            now = HydrusData.GetNow()
-            
-            if now in counter:
-                
-                return counter[ now ]
-                
-            else:
-                
-                return 0
-                
+            return ring.GetBucketUsage( HydrusData.GetNow() )
             
         else:
             
@@ -627,31 +778,10 @@ class BandwidthTracker( HydrusSerialisable.SerialisableBase ):
             
             since = HydrusData.GetNow() - search_time_delta
             
-            return sum( ( value for ( timestamp, value ) in list(counter.items()) if timestamp >= since ) )
+            return ring.GetUsageSince( since )
             
         
     
-    def _GetTimes( self, dt ):
-        
-        # collapse each time portion to the latest timestamp it covers
-        
-        ( year, month, day, hour, minute ) = ( dt.year, dt.month, dt.day, dt.hour, dt.minute )
-        
-        month_dt = datetime.datetime( year, month, 1 )
-        day_dt = datetime.datetime( year, month, day )
-        hour_dt = datetime.datetime( year, month, day, hour )
-        minute_dt = datetime.datetime( year, month, day, hour, minute )
-        
-        month_time = int( calendar.timegm( month_dt.timetuple() ) )
-        day_time = int( calendar.timegm( day_dt.timetuple() ) )
-        hour_time = int( calendar.timegm( hour_dt.timetuple() ) )
-        minute_time = int( calendar.timegm( minute_dt.timetuple() ) )
-        
-        second_time = int( calendar.timegm( dt.timetuple() ) )
-        
-        return ( month_time, day_time, hour_time, minute_time, second_time )
-        
-    
     def _GetUsage( self, bandwidth_type, time_delta, for_user ):
         
         if for_user and time_delta is not None and bandwidth_type == HC.BANDWIDTH_TYPE_DATA and time_delta <= self.MIN_TIME_DELTA_FOR_USER:
@@ -663,8 +793,6 @@ class BandwidthTracker( HydrusSerialisable.SerialisableBase ):
             usage = self._GetRawUsage( bandwidth_type, time_delta )
             
         
-        self._MaintainCache()
-        
         return usage
         
     
@@ -672,15 +800,25 @@ class BandwidthTracker( HydrusSerialisable.SerialisableBase ):
         
         SEARCH_DELTA = self.MIN_TIME_DELTA_FOR_USER
         
-        counter = self._seconds_bytes
+        ring = self._seconds_bytes
         
         now = HydrusData.GetNow()
         
         since = now - SEARCH_DELTA
         
-        valid_keys = [ key for key in list(counter.keys()) if key >= since ]
+        earliest_timestamp = None
         
-        if len( valid_keys ) == 0:
+        for timestamp in range( since, now + 1 ):
+            
+            if ring.GetBucketUsage( timestamp ) > 0:
+                
+                earliest_timestamp = timestamp
+                
+                break
+                
+            
+        
+        if earliest_timestamp is None:
             
             return 0
             
@@ -688,51 +826,15 @@ class BandwidthTracker( HydrusSerialisable.SerialisableBase ):
         # If we want the average speed over past five secs but nothing has happened in sec 4 and 5, we don't want to count them
         # otherwise your 1MB/s counts as 200KB/s
         
-        earliest_timestamp = min( valid_keys )
-        
         SAMPLE_DELTA = max( now - earliest_timestamp, 1 )
         
-        total_bytes = sum( ( counter[ key ] for key in valid_keys ) )
+        total_bytes = ring.GetUsageSince( since )
         
         time_delta_average_per_sec = total_bytes / SAMPLE_DELTA
         
         return time_delta_average_per_sec * time_delta
         
     
-    def _MaintainCache( self ):
-        
-        if HydrusData.TimeHasPassed( self._next_cache_maintenance_timestamp ):
-            
-            now = HydrusData.GetNow()
-            
-            oldest_second = now - self.MAX_SECONDS_TIME_DELTA
-            oldest_minute = now - self.MAX_MINUTES_TIME_DELTA
-            oldest_hour = now - self.MAX_HOURS_TIME_DELTA
-            oldest_day = now - self.MAX_DAYS_TIME_DELTA
-            
-            def clear_counter( counter, timestamp ):
-                
-                bad_keys = [ key for key in list(counter.keys()) if key < timestamp ]
-                
-                for bad_key in bad_keys:
-                    
-                    del counter[ bad_key ]
-                    
-                
-            
-            clear_counter( self._days_bytes, oldest_day )
-            clear_counter( self._days_requests, oldest_day )
-            clear_counter( self._hours_bytes, oldest_hour )
-            clear_counter( self._hours_requests, oldest_hour )
-            clear_counter( self._minutes_bytes, oldest_minute )
-            clear_counter( self._minutes_requests, oldest_minute )
-            clear_counter( self._seconds_bytes, oldest_second )
-            clear_counter( self._seconds_requests, oldest_second )
-            
-            self._next_cache_maintenance_timestamp = HydrusData.GetNow() + self.CACHE_MAINTENANCE_TIME_DELTA
-            
-        
-    
     def GetCurrentMonthSummary( self ):
         
         with self._lock:
@@ -810,35 +912,27 @@ class BandwidthTracker( HydrusSerialisable.SerialisableBase ):
                 # time_delta subtract that amount is the time we have to wait for usage to be less than max_allowed
                 # e.g. if in the past 24 hours there was a bunch of usage 16 hours ago clogging it up, we'll have to wait ~8 hours
                 
-                ( window, counter ) = self._GetWindowAndCounter( bandwidth_type, time_delta )
+                ( window, ring ) = self._GetWindowAndRing( bandwidth_type, time_delta )
                 
                 time_delta_in_which_bandwidth_counts = time_delta + window
                 
-                time_and_values = list(counter.items())
-                
-                time_and_values.sort( reverse = True )
-                
                 now = HydrusData.GetNow()
-                usage = 0
                 
-                for ( timestamp, value ) in time_and_values:
+                if ring.GetUsageSince( now - time_delta_in_which_bandwidth_counts ) < max_allowed: # not enough usage in our time delta to clog us up. no need to wait
                     
-                    current_search_time_delta = now - timestamp
+                    return 0
                     
-                    if current_search_time_delta > time_delta_in_which_bandwidth_counts: # we are searching beyond our time delta. no need to wait
-                        
-                        break
-                        
-                    
-                    usage += value
+                
+                timestamp = ring.GetNewestBucketTimestampForUsage( max_allowed )
+                
+                if timestamp is None:
                     
-                    if usage >= max_allowed:
-                        
-                        return time_delta_in_which_bandwidth_counts - current_search_time_delta
-                        
+                    return 0
                     
                 
-                return 0
+                current_search_time_delta = now - timestamp
+                
+                return max( 0, time_delta_in_which_bandwidth_counts - current_search_time_delta )
                 
             
         
@@ -847,21 +941,16 @@ class BandwidthTracker( HydrusSerialisable.SerialisableBase ):
         
         with self._lock:
             
-            dt = self._GetCurrentDateTime()
+            now = HydrusData.GetNow()
             
-            ( month_time, day_time, hour_time, minute_time, second_time ) = self._GetTimes( dt )
+            month_time = self._GetMonthTime( datetime.datetime.utcfromtimestamp( now ) )
             
             self._months_bytes[ month_time ] += num_bytes
             
-            self._days_bytes[ day_time ] += num_bytes
-            
-            self._hours_bytes[ hour_time ] += num_bytes
-            
-            self._minutes_bytes[ minute_time ] += num_bytes
-            
-            self._seconds_bytes[ second_time ] += num_bytes
-            
-            self._MaintainCache()
+            self._days_bytes.Add( now, num_bytes )
+            self._hours_bytes.Add( now, num_bytes )
+            self._minutes_bytes.Add( now, num_bytes )
+            self._seconds_bytes.Add( now, num_bytes )
             
         
     
@@ -869,21 +958,16 @@ class BandwidthTracker( HydrusSerialisable.SerialisableBase ):
         
         with self._lock:
             
-            dt = self._GetCurrentDateTime()
+            now = HydrusData.GetNow()
             
-            ( month_time, day_time, hour_time, minute_time, second_time ) = self._GetTimes( dt )
+            month_time = self._GetMonthTime( datetime.datetime.utcfromtimestamp( now ) )
             
             self._months_requests[ month_time ] += num_requests
             
-            self._days_requests[ day_time ] += num_requests
-            
-            self._hours_requests[ hour_time ] += num_requests
-            
-            self._minutes_requests[ minute_time ] += num_requests
-            
-            self._seconds_requests[ second_time ] += num_requests
-            
-            self._MaintainCache()
+            self._days_requests.Add( now, num_requests )
+            self._hours_requests.Add( now, num_requests )
+            self._minutes_requests.Add( now, num_requests )
+            self._seconds_requests.Add( now, num_requests )
             
         
     
@@ -1,5 +1,7 @@
 from hydrus.core import HydrusData
+from hydrus.core import HydrusExceptions
 import json
+import threading
 import zlib
 
 LZ4_OK = False
@@ -15,6 +17,18 @@ except: # ImportError wasn't enough here as Linux went up the shoot with a __ver
     
     print( 'Could not import lz4--nbd.' )
     
+ZSTD_OK = False
+
+try:
+    
+    import zstandard
+    
+    ZSTD_OK = True
+    
+except:
+    
+    pass
+    
 SERIALISABLE_TYPE_BASE = 0
 SERIALISABLE_TYPE_BASE_NAMED = 1
 SERIALISABLE_TYPE_SHORTCUT_SET = 2
@@ -101,27 +115,121 @@ SERIALISABLE_TYPE_NOTE_IMPORT_OPTIONS = 82
 
 SERIALISABLE_TYPES_TO_OBJECT_TYPES = {}
 
+# network bytes are either the old raw zlib (or, a long time ago, lz4) json, or this envelope:
+# magic, envelope version, encoding type, compression type, payload
+# zlib streams never start with a null byte, so the magic cannot be confused for the old format
+
+NETWORK_BYTES_ENVELOPE_MAGIC = b'\x00HSE'
+NETWORK_BYTES_ENVELOPE_VERSION = 1
+NETWORK_BYTES_ENVELOPE_HEADER_LENGTH = len( NETWORK_BYTES_ENVELOPE_MAGIC ) + 3
+
+ENCODING_TYPE_JSON = 0
+
+COMPRESSION_TYPE_NONE = 0
+COMPRESSION_TYPE_ZLIB = 1
+COMPRESSION_TYPE_LZ4 = 2
+COMPRESSION_TYPE_ZSTD = 3
+
+compression_type_str_lookup = {}
+
+compression_type_str_lookup[ COMPRESSION_TYPE_NONE ] = 'none'
+compression_type_str_lookup[ COMPRESSION_TYPE_ZLIB ] = 'zlib'
+compression_type_str_lookup[ COMPRESSION_TYPE_LZ4 ] = 'lz4'
+compression_type_str_lookup[ COMPRESSION_TYPE_ZSTD ] = 'zstd'
+
+def _CompressBytes( obj_bytes, compression_type, compression_level ):
+    
+    if compression_type == COMPRESSION_TYPE_NONE:
+        
+        return obj_bytes
+        
+    elif compression_type == COMPRESSION_TYPE_ZLIB:
+        
+        if compression_level is None:
+            
+            compression_level = 9
+            
+        
+        return zlib.compress( obj_bytes, compression_level )
+        
+    elif compression_type == COMPRESSION_TYPE_LZ4 and LZ4_OK:
+        
+        return lz4.block.compress( obj_bytes )
+        
+    elif compression_type == COMPRESSION_TYPE_ZSTD and ZSTD_OK:
+        
+        if compression_level is None:
+            
+            compression_level = 3
+            
+        
+        return zstandard.ZstdCompressor( level = compression_level ).compress( obj_bytes )
+        
+    else:
+        
+        raise HydrusExceptions.SerialisationException( 'Cannot compress with "{}"--it is unknown or its library is not available!'.format( compression_type_str_lookup.get( compression_type, compression_type ) ) )
+        
+    
+def _DecompressBytes( payload, compression_type ):
+    
+    if compression_type == COMPRESSION_TYPE_NONE:
+        
+        return payload
+        
+    elif compression_type == COMPRESSION_TYPE_ZLIB:
+        
+        return zlib.decompress( payload )
+        
+    elif compression_type == COMPRESSION_TYPE_LZ4 and LZ4_OK:
+        
+        return lz4.block.decompress( payload )
+        
+    elif compression_type == COMPRESSION_TYPE_ZSTD and ZSTD_OK:
+        
+        return zstandard.ZstdDecompressor().decompress( payload )
+        
+    else:
+        
+        raise HydrusExceptions.SerialisationException( 'Cannot decompress "{}" data--it is unknown or its library is not available!'.format( compression_type_str_lookup.get( compression_type, compression_type ) ) )
+        
+    
 def CreateFromNetworkBytes( network_string ):
     
-    try:
+    if network_string[ : len( NETWORK_BYTES_ENVELOPE_MAGIC ) ] == NETWORK_BYTES_ENVELOPE_MAGIC:
         
-        obj_bytes = zlib.decompress( network_string )
+        ( envelope_version, encoding_type, compression_type ) = network_string[ len( NETWORK_BYTES_ENVELOPE_MAGIC ) : NETWORK_BYTES_ENVELOPE_HEADER_LENGTH ]
         
-    except zlib.error:
+        if envelope_version > NETWORK_BYTES_ENVELOPE_VERSION or encoding_type != ENCODING_TYPE_JSON:
+            
+            raise HydrusExceptions.SerialisationException( 'This data was made by a newer version of hydrus! Please update and try again.' )
+            
+        
+        obj_bytes = _DecompressBytes( network_string[ NETWORK_BYTES_ENVELOPE_HEADER_LENGTH : ], compression_type )
         
-        if LZ4_OK:
+    else:
+        
+        try:
             
-            obj_bytes = lz4.block.decompress( network_string )
+            obj_bytes = zlib.decompress( network_string )
             
-        else:
+        except zlib.error:
             
-            raise
+            if LZ4_OK:
+                
+                obj_bytes = lz4.block.decompress( network_string )
+                
+            else:
+                
+                raise
+                
             
         
     
-    obj_string = str( obj_bytes, 'utf-8' )
+    # json can read the utf-8 bytes directly, which saves us a copy of what can be a very big string
     
-    return CreateFromString( obj_string )
+    obj_tuple = json.loads( obj_bytes )
+    
+    return CreateFromSerialisableTuple( obj_tuple )
     
 def CreateFromString( obj_string ):
     
@@ -154,6 +262,150 @@ def SetNonDupeName( obj, disallowed_names ):
     
     obj.SetName( non_dupe_name )
 
+class LazyDictionary( object ):
+    
+    # a dict that holds its values in serialised form until they are first asked for
+    # values that are never asked for go back out exactly as they came in, so managers with thousands of rarely used entries load and save quickly
+    # this is not thread-safe--use it under its owner's lock
+    
+    def __init__( self, deserialise_callable = None, serialise_callable = None, default_factory = None ):
+        
+        if deserialise_callable is None:
+            
+            deserialise_callable = lambda key, serialised_value: CreateFromSerialisableTuple( serialised_value )
+            
+        
+        if serialise_callable is None:
+            
+            serialise_callable = lambda key, value: value.GetSerialisableTuple()
+            
+        
+        self._deserialise_callable = deserialise_callable
+        self._serialise_callable = serialise_callable
+        self._default_factory = default_factory
+        
+        self._keys_to_values = {}
+        self._keys_to_serialised_values = {}
+        
+    
+    def __contains__( self, key ):
+        
+        return key in self._keys_to_values or key in self._keys_to_serialised_values
+        
+    
+    def __delitem__( self, key ):
+        
+        if key in self._keys_to_values:
+            
+            del self._keys_to_values[ key ]
+            
+        else:
+            
+            del self._keys_to_serialised_values[ key ]
+            
+        
+    
+    def __getitem__( self, key ):
+        
+        if key in self._keys_to_values:
+            
+            return self._keys_to_values[ key ]
+            
+        
+        if key in self._keys_to_serialised_values:
+            
+            serialised_value = self._keys_to_serialised_values.pop( key )
+            
+            value = self._deserialise_callable( key, serialised_value )
+            
+        elif self._default_factory is not None:
+            
+            value = self._default_factory()
+            
+        else:
+            
+            raise KeyError( key )
+            
+        
+        self._keys_to_values[ key ] = value
+        
+        return value
+        
+    
+    def __iter__( self ):
+        
+        return iter( self.keys() )
+        
+    
+    def __len__( self ):
+        
+        return len( self._keys_to_values ) + len( self._keys_to_serialised_values )
+        
+    
+    def __setitem__( self, key, value ):
+        
+        if key in self._keys_to_serialised_values:
+            
+            del self._keys_to_serialised_values[ key ]
+            
+        
+        self._keys_to_values[ key ] = value
+        
+    
+    def GetDeserialisedKeys( self ):
+        
+        return list( self._keys_to_values.keys() )
+        
+    
+    def GetNumDeserialised( self ):
+        
+        return len( self._keys_to_values )
+        
+    
+    def GetSerialised( self, key ):
+        
+        if key in self._keys_to_values:
+            
+            return self._serialise_callable( key, self._keys_to_values[ key ] )
+            
+        
+        return self._keys_to_serialised_values[ key ]
+        
+    
+    def GetSerialisedItems( self ):
+        
+        serialised_items = list( self._keys_to_serialised_values.items() )
+        
+        serialised_items.extend( ( ( key, self._serialise_callable( key, value ) ) for ( key, value ) in self._keys_to_values.items() ) )
+        
+        return serialised_items
+        
+    
+    def items( self ):
+        
+        return [ ( key, self[ key ] ) for key in self.keys() ]
+        
+    
+    def keys( self ):
+        
+        return list( self._keys_to_values.keys() ) + list( self._keys_to_serialised_values.keys() )
+        
+    
+    def SetSerialised( self, key, serialised_value ):
+        
+        if key in self._keys_to_values:
+            
+            del self._keys_to_values[ key ]
+            
+        
+        self._keys_to_serialised_values[ key ] = serialised_value
+        
+    
+    def values( self ):
+        
+        return [ value for ( key, value ) in self.items() ]
+        
+    
 class SerialisableBase( object ):
     
     SERIALISABLE_TYPE = SERIALISABLE_TYPE_BASE
@@ -175,13 +427,23 @@ class SerialisableBase( object ):
         return old_serialisable_info
         
     
-    def DumpToNetworkBytes( self ):
+    def DumpToNetworkBytes( self, compression_type = None, compression_level = None ):
+        
+        # no compression type gives the old raw zlib format, which every version can read. any zlib level is fine there
+        # anything else gives the envelope, which only this version and later can read
+        
+        if compression_type is None:
+            
+            obj_bytes = bytes( self.DumpToString(), 'utf-8' )
+            
+            return _CompressBytes( obj_bytes, COMPRESSION_TYPE_ZLIB, compression_level )
+            
         
-        obj_string = self.DumpToString()
+        obj_bytes = bytes( json.dumps( self.GetSerialisableTuple(), separators = ( ',', ':' ) ), 'utf-8' )
         
-        obj_bytes = bytes( obj_string, 'utf-8' )
+        header = NETWORK_BYTES_ENVELOPE_MAGIC + bytes( ( NETWORK_BYTES_ENVELOPE_VERSION, ENCODING_TYPE_JSON, compression_type ) )
         
-        return zlib.compress( obj_bytes, 9 )
+        return header + _CompressBytes( obj_bytes, compression_type, compression_level )
         
     
     def DumpToString( self ):
@@ -249,6 +511,59 @@ class SerialisableBaseNamed( SerialisableBase ):
         self._name = HydrusData.GetNonDupeName( self._name, disallowed_names )
         
     
+class SerialisableBaseWithRows( SerialisableBase ):
+    
+    # for big objects that are mostly a pile of independent entries, like the network managers' per-context data
+    # the db saves these as a small main dump plus one row per entry, and on later saves it only rewrites the rows that changed
+    # GetSerialisableTuple still gives the whole object, so duplicating, exporting and the old whole-dump db format all still work
+    
+    def __init__( self ):
+        
+        SerialisableBase.__init__( self )
+        
+        self._lock = threading.Lock()
+        
+    
+    def _GetDirtySerialisableRows( self ):
+        
+        # returns ( rows, deletee_row_keys ), where a row is ( row_key, serialisable_row_info ) and row_key is a str
+        # what it returns is what SetClean will mark clean, so anything dirtied after this call has to stay dirty
+        
+        raise NotImplementedError()
+        
+    
+    def _GetSerialisableMainInfo( self ):
+        
+        raise NotImplementedError()
+        
+    
+    def _SetSerialisableRows( self, rows ):
+        
+        # rows are ( row_key, timestamp, serialisable_row_info ), where timestamp is when the row was last written
+        
+        raise NotImplementedError()
+        
+    
+    def GetSerialisableMainTupleAndDirtyRows( self ):
+        
+        with self._lock:
+            
+            serialisable_main_info = self._GetSerialisableMainInfo()
+            
+            ( rows, deletee_row_keys ) = self._GetDirtySerialisableRows()
+            
+        
+        return ( ( self.SERIALISABLE_TYPE, self.SERIALISABLE_VERSION, serialisable_main_info ), rows, deletee_row_keys )
+        
+    
+    def SetSerialisableRows( self, rows ):
+        
+        with self._lock:
+            
+            self._SetSerialisableRows( rows )
+            
+        
+    
 class SerialisableDictionary( SerialisableBase, dict ):
     
     SERIALISABLE_TYPE = SERIALISABLE_TYPE_DICTIONARY
@@ -271,6 +271,118 @@ def ParseFileArguments( path, decompression_bombs_ok = False ):
     
 hydrus_favicon = FileResource( os.path.join( HC.STATIC_DIR, 'hydrus.ico' ), defaultType = 'image/x-icon' )
 
+class BodyGeneratorProducer( object ):
+    
+    # streams the chunks of a generator to the request. the chunks are made in a thread, one at a time, so disk and db work stays off the reactor
+    # twisted pauses us when the reader falls behind, so memory stays at about one chunk
+    
+    def __init__( self, request, body_generator, finished_callable = None ):
+        
+        self._request = request
+        self._body_generator = body_generator
+        self._finished_callable = finished_callable
+        
+        self._num_bytes_written = 0
+        
+        self._paused = False
+        self._working = False
+        self._stopped = False
+        
+    
+    def _callbackWriteChunk( self, chunk ):
+        
+        self._working = False
+        
+        if self._stopped:
+            
+            self._body_generator.close()
+            
+            return
+            
+        
+        if chunk is None:
+            
+            self._stopped = True
+            
+            self._request.unregisterProducer()
+            self._request.finish()
+            
+            if self._finished_callable is not None:
+                
+                self._finished_callable( self._num_bytes_written )
+                
+            
+            return
+            
+        
+        self._num_bytes_written += len( chunk )
+        
+        self._request.write( chunk )
+        
+        self._DoNextChunk()
+        
+    
+    def _errbackStop( self, failure ):
+        
+        self._working = False
+        self._stopped = True
+        
+        HydrusData.DebugPrint( failure.getTraceback() )
+        
+        # we have already sent a 200, so all we can do is hang up and let the reader see it is incomplete
+        
+        self._request.unregisterProducer()
+        self._request.loseConnection()
+        
+    
+    def _DoNextChunk( self ):
+        
+        if self._paused or self._working or self._stopped:
+            
+            return
+            
+        
+        self._working = True
+        
+        d = deferToThread( self._threadGetNextChunk )
+        
+        d.addCallbacks( self._callbackWriteChunk, self._errbackStop )
+        
+    
+    def _threadGetNextChunk( self ):
+        
+        return next( self._body_generator, None )
+        
+    
+    def pauseProducing( self ):
+        
+        self._paused = True
+        
+    
+    def resumeProducing( self ):
+        
+        self._paused = False
+        
+        self._DoNextChunk()
+        
+    
+    def start( self ):
+        
+        self._request.registerProducer( self, True )
+        
+        self._DoNextChunk()
+        
+    
+    def stopProducing( self ):
+        
+        self._stopped = True
+        
+        if not self._working:
+            
+            self._body_generator.close()
+            
+        
+    
 class HydrusDomain( object ):
     
     def __init__( self, local_only ):
@@ -508,6 +620,41 @@ class HydrusResource( Resource ):
             
             request.write( body_bytes )
             
+        elif response_context.HasBodyGenerator():
+            
+            mime = response_context.GetMime()
+            
+            content_type = HC.mime_mimetype_string_lookup[ mime ]
+            
+            filename = response_context.GetFilename()
+            
+            if filename is None:
+                
+                content_disposition = 'attachment'
+                
+            else:
+                
+                content_disposition = 'attachment; filename="' + filename + '"'
+                
+            
+            # no content length, so twisted will chunk it
+            
+            request.setHeader( 'Content-Type', content_type )
+            request.setHeader( 'Content-Disposition', content_disposition )
+            
+            def report_data_used( num_bytes ):
+                
+                self._reportDataUsed( request, num_bytes )
+                
+            
+            producer = BodyGeneratorProducer( request, response_context.GetBodyGenerator(), finished_callable = report_data_used )
+            
+            producer.start()
+            
+            content_length = 0
+            
+            do_finish = False
+            
         else:
             
             content_length = 0
@@ -889,7 +1036,7 @@ class HydrusResourceWelcome( HydrusResource ):
     
 class ResponseContext( object ):
     
-    def __init__( self, status_code, mime = HC.APPLICATION_JSON, body = None, path = None, cookies = None ):
+    def __init__( self, status_code, mime = HC.APPLICATION_JSON, body = None, path = None, cookies = None, body_generator = None, filename = None ):
         
         if body is None:
             
@@ -923,6 +1070,8 @@ class ResponseContext( object ):
         self._body_bytes = body_bytes
         self._path = path
         self._cookies = cookies
+        self._body_generator = body_generator
+        self._filename = filename
         
     
     def GetBodyBytes( self ):
@@ -930,8 +1079,15 @@ class ResponseContext( object ):
         return self._body_bytes
         
     
+    def GetBodyGenerator( self ):
+        
+        return self._body_generator
+        
+    
     def GetCookies( self ): return self._cookies
     
+    def GetFilename( self ): return self._filename
+    
     def GetMime( self ): return self._mime
     
     def GetPath( self ): return self._path
@@ -940,5 +1096,7 @@ class ResponseContext( object ):
     
     def HasBody( self ): return self._body_bytes is not None
     
+    def HasBodyGenerator( self ): return self._body_generator is not None
+    
     def HasPath( self ): return self._path is not None
     
@@ -23,6 +23,15 @@ import sqlite3
 # If you are only adding a couple tags, you can exclude the BigJob stuff. It just makes millions of sequential writes more efficient.
 
 
+# If you have millions of mappings, AddMappingsBulk is much faster than calling AddMappings over and over:
+
+# hta.BeginBigJob()
+# hta.AddMappingsBulk( my_complex_mappings_generator )
+# hta.CommitBigJob()
+
+# Similarly, GetHashesToTags and FilterHashes do many hashes in one go.
+
+
 # Also, this manages hashes as bytes, not hex, so if you have something like:
 
 # hash = ab156e87c5d6e215ab156e87c5d6e215
@@ -63,6 +72,8 @@ hash_str_to_type_lookup[ 'sha1' ] = HASH_TYPE_SHA1
 hash_str_to_type_lookup[ 'sha256' ] = HASH_TYPE_SHA256
 hash_str_to_type_lookup[ 'sha512' ] = HASH_TYPE_SHA512
 
+BULK_CHUNK_SIZE = 100000
+
 class HydrusTagArchive( object ):
     
     def __init__( self, path ):
@@ -85,6 +96,40 @@ class HydrusTagArchive( object ):
         self._c.executemany( 'INSERT OR IGNORE INTO mappings ( hash_id, tag_id ) VALUES ( ?, ? );', ( ( hash_id, tag_id ) for tag_id in tag_ids ) )
         
     
+    def _AddStagedMappings( self, hashes, tags_to_tag_indices, rows ):
+        
+        # the raw hashes and tags only go in once each, and the mappings are staged as pairs of integers, which is much cheaper to bind
+        
+        self._c.executemany( 'INSERT INTO temp.staged_hash_indices ( hash_index, hash ) VALUES ( ?, ? );', ( ( hash_index, sqlite3.Binary( hash ) ) for ( hash_index, hash ) in enumerate( hashes ) ) )
+        self._c.executemany( 'INSERT INTO temp.staged_tags ( tag_index, tag ) VALUES ( ?, ? );', ( ( tag_index, tag ) for ( tag, tag_index ) in tags_to_tag_indices.items() ) )
+        self._c.executemany( 'INSERT INTO temp.staged_mappings ( hash_index, tag_index ) VALUES ( ?, ? );', rows )
+        
+        for tag in tags_to_tag_indices.keys():
+            
+            if ':' in tag:
+                
+                ( namespace, subtag ) = tag.split( ':', 1 )
+                
+                if namespace != '' and namespace not in self._namespaces:
+                    
+                    self._c.execute( 'INSERT INTO namespaces ( namespace ) VALUES ( ? );', ( namespace, ) )
+                    
+                    self._namespaces.add( namespace )
+                    
+                
+            
+        
+        self._c.execute( 'INSERT OR IGNORE INTO hashes ( hash ) SELECT hash FROM temp.staged_hash_indices;' )
+        self._c.execute( 'INSERT OR IGNORE INTO tags ( tag ) SELECT tag FROM temp.staged_tags;' )
+        
+        # sorting here means we write to the mappings pk in order, which is much kinder to the disk
+        self._c.execute( 'INSERT OR IGNORE INTO mappings ( hash_id, tag_id ) SELECT hash_id, tag_id FROM temp.staged_mappings CROSS JOIN temp.staged_hash_indices USING ( hash_index ) CROSS JOIN hashes USING ( hash ) CROSS JOIN temp.staged_tags USING ( tag_index ) CROSS JOIN tags USING ( tag ) ORDER BY hash_id, tag_id;' )
+        
+        self._c.execute( 'DELETE FROM temp.staged_hash_indices;' )
+        self._c.execute( 'DELETE FROM temp.staged_tags;' )
+        self._c.execute( 'DELETE FROM temp.staged_mappings;' )
+        
+    
     def _InitDB( self ):
         
         self._c.execute( 'CREATE TABLE hash_type ( hash_type INTEGER );', )
@@ -92,8 +137,8 @@ class HydrusTagArchive( object ):
         self._c.execute( 'CREATE TABLE hashes ( hash_id INTEGER PRIMARY KEY, hash BLOB_BYTES );' )
         self._c.execute( 'CREATE UNIQUE INDEX hashes_hash_index ON hashes ( hash );' )
         
+        # no separate hash_id index, as the primary key already covers hash_id lookups and it just slows big imports down
         self._c.execute( 'CREATE TABLE mappings ( hash_id INTEGER, tag_id INTEGER, PRIMARY KEY ( hash_id, tag_id ) );' )
-        self._c.execute( 'CREATE INDEX mappings_hash_id_index ON mappings ( hash_id );' )
         
         self._c.execute( 'CREATE TABLE namespaces ( namespace TEXT );' )
         
@@ -185,6 +230,50 @@ class HydrusTagArchive( object ):
         self._AddMappings( hash_id, tag_ids )
         
     
+    def AddMappingsBulk( self, hashes_and_tags ):
+        
+        # rather than looking up every hash and tag one at a time, we stage big chunks of rows and then do the lookups and inserts as a few joins
+        
+        self._c.execute( 'CREATE TEMP TABLE IF NOT EXISTS staged_hash_indices ( hash_index INTEGER PRIMARY KEY, hash BLOB_BYTES );' )
+        self._c.execute( 'CREATE TEMP TABLE IF NOT EXISTS staged_tags ( tag_index INTEGER PRIMARY KEY, tag TEXT );' )
+        self._c.execute( 'CREATE TEMP TABLE IF NOT EXISTS staged_mappings ( hash_index INTEGER, tag_index INTEGER );' )
+        
+        hashes = []
+        tags_to_tag_indices = {}
+        rows = []
+        
+        for ( hash, tags ) in hashes_and_tags:
+            
+            hash_index = len( hashes )
+            
+            hashes.append( hash )
+            
+            for tag in tags:
+                
+                if tag not in tags_to_tag_indices:
+                    
+                    tags_to_tag_indices[ tag ] = len( tags_to_tag_indices )
+                    
+                
+                rows.append( ( hash_index, tags_to_tag_indices[ tag ] ) )
+                
+            
+            if len( rows ) >= BULK_CHUNK_SIZE:
+                
+                self._AddStagedMappings( hashes, tags_to_tag_indices, rows )
+                
+                hashes = []
+                tags_to_tag_indices = {}
+                rows = []
+                
+            
+        
+        if len( rows ) > 0:
+            
+            self._AddStagedMappings( hashes, tags_to_tag_indices, rows )
+            
+        
+    
     def Close( self ):
         
         self._c.close()
@@ -220,6 +309,42 @@ class HydrusTagArchive( object ):
         self._c.execute( 'DELETE FROM namespaces;' )
         
     
+    def FilterHashes( self, hashes ):
+        
+        self._c.execute( 'CREATE TEMP TABLE IF NOT EXISTS staged_hashes ( hash BLOB_BYTES PRIMARY KEY );' )
+        
+        self._c.executemany( 'INSERT OR IGNORE INTO temp.staged_hashes ( hash ) VALUES ( ? );', ( ( sqlite3.Binary( hash ), ) for hash in hashes ) )
+        
+        result = { hash for ( hash, ) in self._c.execute( 'SELECT hash FROM temp.staged_hashes CROSS JOIN hashes USING ( hash );' ) }
+        
+        self._c.execute( 'DELETE FROM temp.staged_hashes;' )
+        
+        return result
+        
+    
+    def GetHashesToTags( self, hashes ):
+        
+        self._c.execute( 'CREATE TEMP TABLE IF NOT EXISTS staged_hashes ( hash BLOB_BYTES PRIMARY KEY );' )
+        
+        self._c.executemany( 'INSERT OR IGNORE INTO temp.staged_hashes ( hash ) VALUES ( ? );', ( ( sqlite3.Binary( hash ), ) for hash in hashes ) )
+        
+        hashes_to_tags = {}
+        
+        for ( hash, tag ) in self._c.execute( 'SELECT hash, tag FROM temp.staged_hashes CROSS JOIN hashes USING ( hash ) CROSS JOIN mappings USING ( hash_id ) CROSS JOIN tags USING ( tag_id );' ):
+            
+            if hash not in hashes_to_tags:
+                
+                hashes_to_tags[ hash ] = set()
+                
+            
+            hashes_to_tags[ hash ].add( tag )
+            
+        
+        self._c.execute( 'DELETE FROM temp.staged_hashes;' )
+        
+        return hashes_to_tags
+        
+    
     def GetHashType( self ):
         
         result = self._c.execute( 'SELECT hash_type FROM hash_type;' ).fetchone()
@@ -323,21 +448,44 @@ class HydrusTagArchive( object ):
     
     def IterateMappings( self ):
         
-        hash_ids = [ hash_id for ( hash_id, ) in self._c.execute( 'SELECT hash_id FROM hashes;' ) ]
+        # one join, walked in hash_id order, so each hash's rows come out together
+        # this uses its own cursor so you can still call other methods while iterating
+        
+        cursor = self._db.cursor()
         
-        for hash_id in hash_ids:
+        try:
             
-            ( hash, ) = self._c.execute( 'SELECT hash FROM hashes WHERE hash_id = ?;', ( hash_id, ) ).fetchone()
+            current_hash = None
+            current_tags = set()
             
-            tags = self.GetTags( hash )
+            for ( hash, tag ) in cursor.execute( 'SELECT hash, tag FROM hashes CROSS JOIN mappings USING ( hash_id ) CROSS JOIN tags USING ( tag_id ) ORDER BY hash_id;' ):
+                
+                if hash != current_hash:
+                    
+                    if len( current_tags ) > 0:
+                        
+                        yield ( current_hash, current_tags )
+                        
+                    
+                    current_hash = hash
+                    current_tags = set()
+                    
+                
+                current_tags.add( tag )
+                
             
-            if len( tags ) > 0:
+            if len( current_tags ) > 0:
                 
-                yield ( hash, tags )
+                yield ( current_hash, current_tags )
                 
             
+        finally:
+            
+            cursor.close()
+            
         
     
+    
     def Optimise( self ):
         
         self._c.execute( 'VACUUM;' )
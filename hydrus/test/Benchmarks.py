@@ -0,0 +1,838 @@
+from hydrus.client import ClientCaches
+from hydrus.client import ClientConstants as CC
+from hydrus.client import ClientDB
+from hydrus.client import ClientSearch
+from hydrus.client import ClientServices
+from hydrus.client import ClientThreading
+from hydrus.client.importing import ClientImportFileSeeds
+from hydrus.client.importing import ClientImportOptions
+from hydrus.core import HydrusConstants as HC
+from hydrus.core import HydrusData
+from hydrus.core import HydrusGlobals as HG
+from hydrus.core import HydrusImageHandling
+from hydrus.core import HydrusNetwork
+from hydrus.core import HydrusNetworking
+from hydrus.core import HydrusSerialisable
+from hydrus.core import HydrusTagArchive
+from hydrus.server import ServerDB
+import hashlib
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import threading
+import time
+import traceback
+
+# these are the groups you can pick with --only. the synthetic client db is always built, since nearly everything else needs it
+BENCHMARK_GROUPS = [ 'file_search', 'autocomplete', 'bandwidth', 'media_results', 'phash', 'thumbnails', 'serialisation', 'parsing', 'repository', 'server', 'tag_archive' ]
+
+NAMESPACES = [ '', 'creator', 'series', 'character' ]
+
+IMPORT_BATCH_SIZE = 256
+MAPPINGS_WRITE_CHUNK_SIZE = 50000
+
+NUM_BANDWIDTH_TRACKERS = 10000
+
+NUM_PARSING_PAGES = 32
+NUM_PARSING_POSTS_PER_PAGE = 200
+PARSING_THREAD_COUNTS = [ 1, 2, 4, 8 ]
+
+class BenchmarkRunner( object ):
+    
+    def __init__( self, db_dir, num_files = 10000, num_tags = 1000, num_mappings = 100000, num_repository_mappings = 10000, num_runs = 5, seed = 0, only_run = None ):
+        
+        self._db_dir = db_dir
+        
+        self._num_files = num_files
+        self._num_tags = num_tags
+        self._num_mappings = num_mappings
+        self._num_repository_mappings = num_repository_mappings
+        self._num_runs = num_runs
+        self._seed = seed
+        
+        if only_run is None:
+            
+            only_run = BENCHMARK_GROUPS
+            
+        
+        self._only_run = set( only_run )
+        
+        self._random = random.Random( seed )
+        
+        self._db = None
+        
+        self._hashes = []
+        self._tags = []
+        
+        self._results = []
+        
+    
+    def _AddError( self, name, e ):
+        
+        HydrusData.Print( 'Benchmark "{}" failed!'.format( name ) )
+        HydrusData.Print( traceback.format_exc() )
+        
+        self._results.append( { 'name' : name, 'error' : str( e ) } )
+        
+    
+    def _AddResult( self, name, times, num_rows = None ):
+        
+        result = {}
+        
+        result[ 'name' ] = name
+        result[ 'runs' ] = len( times )
+        result[ 'min' ] = min( times )
+        result[ 'median' ] = statistics.median( times )
+        result[ 'mean' ] = statistics.mean( times )
+        result[ 'max' ] = max( times )
+        
+        if num_rows is not None:
+            
+            result[ 'rows' ] = num_rows
+            
+            if result[ 'median' ] > 0:
+                
+                result[ 'rows_per_second' ] = num_rows / result[ 'median' ]
+                
+            
+        
+        self._results.append( result )
+        
+        HydrusData.Print( '{}: median {} over {} runs'.format( name, HydrusData.TimeDeltaToPrettyTimeDelta( result[ 'median' ] ), HydrusData.ToHumanInt( len( times ) ) ) )
+        
+    
+    def _BuildClientDB( self ):
+        
+        self._db = ClientDB.DB( HG.test_controller, self._db_dir, 'client' )
+        
+        self._hashes = [ hashlib.sha256( 'synthetic file {}'.format( i ).encode( 'utf-8' ) ).digest() for i in range( self._num_files ) ]
+        
+        self._tags = [ self._GetTag( i ) for i in range( self._num_tags ) ]
+        
+        #
+        
+        file_import_options = ClientImportOptions.FileImportOptions()
+        
+        now = HydrusData.GetNow()
+        
+        phash_group_base = 0
+        
+        times = []
+        
+        for hashes in HydrusData.SplitListIntoChunks( self._hashes, IMPORT_BATCH_SIZE ):
+            
+            file_import_jobs = []
+            
+            for ( i, hash ) in enumerate( hashes ):
+                
+                # groups of eight near-identical phashes, so similar files search has something to find
+                
+                if i % 8 == 0:
+                    
+                    phash_group_base = self._random.getrandbits( 64 )
+                    
+                
+                phash = ( phash_group_base ^ ( 1 << ( i % 8 ) ) ).to_bytes( 8, 'big' )
+                
+                file_import_job = ClientImportFileSeeds.FileImportJob( 'synthetic path', file_import_options = file_import_options )
+                
+                file_import_job._hash = hash
+                file_import_job._file_info = ( self._random.randint( 10000, 10000000 ), HC.IMAGE_JPEG, self._random.randint( 100, 4000 ), self._random.randint( 100, 4000 ), None, None, False, None )
+                file_import_job._extra_hashes = ( hashlib.md5( hash ).digest(), hashlib.sha1( hash ).digest(), hashlib.sha512( hash ).digest() )
+                file_import_job._phashes = [ phash ]
+                file_import_job._file_modified_timestamp = now
+                
+                file_import_jobs.append( file_import_job )
+                
+            
+            started = HydrusData.GetNowPrecise()
+            
+            self._db.Write( 'import_files', True, file_import_jobs )
+            
+            times.append( HydrusData.GetNowPrecise() - started )
+            
+        
+        self._AddResult( 'import_files_total', [ sum( times ) ], num_rows = self._num_files )
+        
+        #
+        
+        weights = [ 1 / ( i + 1 ) for i in range( self._num_tags ) ]
+        
+        total_weight = sum( weights )
+        
+        service_keys_to_content_updates = { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : [] }
+        num_rows_pending = 0
+        num_rows_written = 0
+        
+        started = HydrusData.GetNowPrecise()
+        
+        for ( tag, weight ) in zip( self._tags, weights ):
+            
+            count = min( self._num_files, max( 1, int( self._num_mappings * weight / total_weight ) ) )
+            
+            hashes = [ self._hashes[ i ] for i in self._random.sample( range( self._num_files ), count ) ]
+            
+            for chunk_of_hashes in HydrusData.SplitListIntoChunks( hashes, MAPPINGS_WRITE_CHUNK_SIZE ):
+                
+                service_keys_to_content_updates[ CC.DEFAULT_LOCAL_TAG_SERVICE_KEY ].append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( tag, chunk_of_hashes ) ) )
+                
+                num_rows_pending += len( chunk_of_hashes )
+                
+                if num_rows_pending >= MAPPINGS_WRITE_CHUNK_SIZE:
+                    
+                    self._db.Write( 'content_updates', True, service_keys_to_content_updates )
+                    
+                    service_keys_to_content_updates = { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : [] }
+                    num_rows_written += num_rows_pending
+                    num_rows_pending = 0
+                    
+                
+            
+        
+        if num_rows_pending > 0:
+            
+            self._db.Write( 'content_updates', True, service_keys_to_content_updates )
+            
+            num_rows_written += num_rows_pending
+            
+        
+        self._AddResult( 'add_mappings_total', [ HydrusData.GetNowPrecise() - started ], num_rows = num_rows_written )
+        
+    
+    def _GetTag( self, i ):
+        
+        namespace = NAMESPACES[ i % len( NAMESPACES ) ]
+        
+        subtag = 'tag {}'.format( i )
+        
+        if namespace == '':
+            
+            return subtag
+            
+        else:
+            
+            return '{}:{}'.format( namespace, subtag )
+            
+        
+    
+    def _Read( self, action, *args, **kwargs ):
+        
+        return self._db.Read( action, *args, **kwargs )
+        
+    
+    def _RunAutocomplete( self ):
+        
+        tag_search_context = ClientSearch.TagSearchContext( service_key = CC.DEFAULT_LOCAL_TAG_SERVICE_KEY )
+        
+        for ( name, search_text ) in [ ( 'autocomplete_broad', 't*' ), ( 'autocomplete_narrow', 'tag 12*' ), ( 'autocomplete_namespace', 'creator:*' ), ( 'autocomplete_exact', self._tags[0] ) ]:
+            
+            self._TimeRuns( name, self._Read, 'autocomplete_predicates', tag_search_context = tag_search_context, search_text = search_text )
+            
+        
+    
+    def _RunBandwidth( self ):
+        
+        bandwidth_rules = HydrusNetworking.BandwidthRules()
+        
+        bandwidth_rules.AddRule( HC.BANDWIDTH_TYPE_REQUESTS, 1, 1 )
+        bandwidth_rules.AddRule( HC.BANDWIDTH_TYPE_REQUESTS, 300, 100 )
+        bandwidth_rules.AddRule( HC.BANDWIDTH_TYPE_DATA, 86400, 1024 * 1048576 )
+        bandwidth_rules.AddRule( HC.BANDWIDTH_TYPE_DATA, None, 64 * 1073741824 )
+        
+        bandwidth_trackers = [ HydrusNetworking.BandwidthTracker() for i in range( NUM_BANDWIDTH_TRACKERS ) ]
+        
+        def report():
+            
+            for bandwidth_tracker in bandwidth_trackers:
+                
+                bandwidth_tracker.ReportRequestUsed()
+                bandwidth_tracker.ReportDataUsed( 65536 )
+                
+            
+        
+        def check():
+            
+            for bandwidth_tracker in bandwidth_trackers:
+                
+                bandwidth_rules.CanStartRequest( bandwidth_tracker )
+                bandwidth_rules.GetWaitingEstimate( bandwidth_tracker )
+                
+            
+        
+        self._TimeRuns( 'bandwidth_report', report, num_rows = NUM_BANDWIDTH_TRACKERS )
+        self._TimeRuns( 'bandwidth_check', check, num_rows = NUM_BANDWIDTH_TRACKERS )
+        
+    
+    def _RunFileSearch( self ):
+        
+        common_tag = self._tags[0]
+        rare_tag = self._tags[-1]
+        
+        searches = []
+        
+        searches.append( ( 'file_search_everything', [ ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_SYSTEM_EVERYTHING ) ] ) )
+        searches.append( ( 'file_search_inbox', [ ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_SYSTEM_INBOX ) ] ) )
+        searches.append( ( 'file_search_common_tag', [ ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_TAG, common_tag ) ] ) )
+        searches.append( ( 'file_search_rare_tag', [ ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_TAG, rare_tag ) ] ) )
+        searches.append( ( 'file_search_namespace', [ ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_NAMESPACE, 'creator' ) ] ) )
+        searches.append( ( 'file_search_wildcard', [ ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_WILDCARD, 'tag 1*' ) ] ) )
+        
+        if len( self._tags ) > 1:
+            
+            searches.append( ( 'file_search_tag_and_negated_tag', [ ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_TAG, common_tag ), ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_TAG, self._tags[1], inclusive = False ) ] ) )
+            
+        
+        for ( name, predicates ) in searches:
+            
+            self._TimeFileSearch( name, predicates )
+            
+        
+    
+    def _RunMediaResults( self ):
+        
+        query_hash_ids = list( self._SearchFiles( [ ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_SYSTEM_EVERYTHING ) ] ) )
+        
+        for num_to_fetch in ( 1, 256 ):
+            
+            hash_ids = self._random.sample( query_hash_ids, min( num_to_fetch, len( query_hash_ids ) ) )
+            
+            self._TimeRuns( 'media_results_{}'.format( num_to_fetch ), self._Read, 'media_results_from_ids', hash_ids, num_rows = len( hash_ids ) )
+            
+        
+    
+    def _RunParsing( self ):
+        
+        pages = []
+        
+        for i in range( NUM_PARSING_PAGES ):
+            
+            posts = []
+            
+            for j in range( NUM_PARSING_POSTS_PER_PAGE ):
+                
+                post_id = i * NUM_PARSING_POSTS_PER_PAGE + j
+                
+                tags = ' '.join( self._tags[ k % len( self._tags ) ] for k in range( post_id, post_id + 10 ) )
+                
+                posts.append( '<div class="post" id="p{}"><a href="/post/{}"><img src="/thumbs/{}.jpg" title="{}" /></a></div>'.format( post_id, post_id, post_id, tags ) )
+                
+            
+            pages.append( '<html><head><title>gallery page {}</title></head><body><div id="posts">{}</div><a class="next" href="/gallery?page={}">next</a></body></html>'.format( i, ''.join( posts ), i + 1 ) )
+            
+        
+        def parse_pages( parsing_cache, pages_to_parse ):
+            
+            for page in pages_to_parse:
+                
+                parsing_cache.GetSoup( page )
+                
+            
+        
+        def parse_in_threads( num_threads, same_page ):
+            
+            parsing_cache = ClientCaches.ParsingCache()
+            
+            if same_page:
+                
+                thread_pages = [ [ pages[0] ] for i in range( num_threads ) ]
+                
+            else:
+                
+                thread_pages = [ pages[ i : : num_threads ] for i in range( num_threads ) ]
+                
+            
+            threads = [ threading.Thread( target = parse_pages, args = ( parsing_cache, pages_to_parse ) ) for pages_to_parse in thread_pages ]
+            
+            for thread in threads:
+                
+                thread.start()
+                
+            
+            for thread in threads:
+                
+                thread.join()
+                
+            
+        
+        # rows here are pages, so rows_per_second is parse throughput
+        # html5lib is pure python and holds the GIL, so do not expect this to go up with more threads. what it checks is that the cache lock no longer makes it go down
+        # it is also the baseline to beat if parsing ever moves out to other processes
+        
+        for num_threads in PARSING_THREAD_COUNTS:
+            
+            self._TimeRuns( 'parsing_html_{}_threads'.format( num_threads ), parse_in_threads, num_threads, False, num_rows = len( pages ) )
+            
+        
+        # everyone wants the same page at once, which should be one parse
+        
+        num_threads = max( PARSING_THREAD_COUNTS )
+        
+        self._TimeRuns( 'parsing_html_same_page_{}_threads'.format( num_threads ), parse_in_threads, num_threads, True, num_rows = 1 )
+        
+    
+    def _RunPHash( self ):
+        
+        self._TimeRuns( 'phash_tree_maintenance', self._db.Write, 'maintain_similar_files_tree', True, num_runs = 1 )
+        
+        hash = self._random.choice( self._hashes )
+        
+        for max_hamming in ( 0, 4, 8 ):
+            
+            self._TimeFileSearch( 'phash_search_distance_{}'.format( max_hamming ), [ ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_SYSTEM_SIMILAR_TO, ( ( hash, ), max_hamming ) ) ] )
+            
+        
+    
+    def _RunRepository( self ):
+        
+        service_key = HydrusData.GenerateKey()
+        
+        services = self._Read( 'services' )
+        
+        services.append( ClientServices.GenerateService( service_key, HC.TAG_REPOSITORY, 'benchmark tag repo' ) )
+        
+        self._db.Write( 'update_services', True, services )
+        
+        #
+        
+        num_repository_files = min( self._num_files, self._num_repository_mappings )
+        
+        definitions_update = HydrusNetwork.DefinitionsUpdate()
+        
+        for ( service_hash_id, hash ) in enumerate( self._hashes[ : num_repository_files ], start = 1 ):
+            
+            definitions_update.AddRow( ( HC.DEFINITIONS_TYPE_HASHES, service_hash_id, hash ) )
+            
+        
+        for ( service_tag_id, tag ) in enumerate( self._tags, start = 1 ):
+            
+            definitions_update.AddRow( ( HC.DEFINITIONS_TYPE_TAGS, service_tag_id, tag ) )
+            
+        
+        content_update = HydrusNetwork.ContentUpdate()
+        
+        num_mappings_per_tag = max( 1, self._num_repository_mappings // len( self._tags ) )
+        
+        num_content_rows = 0
+        
+        for service_tag_id in range( 1, len( self._tags ) + 1 ):
+            
+            service_hash_ids = self._random.sample( range( 1, num_repository_files + 1 ), min( num_mappings_per_tag, num_repository_files ) )
+            
+            content_update.AddRow( ( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( service_tag_id, service_hash_ids ) ) )
+            
+            num_content_rows += len( service_hash_ids )
+            
+            if num_content_rows >= self._num_repository_mappings:
+                
+                break
+                
+            
+        
+        job_key = ClientThreading.JobKey()
+        
+        work_time = 3600
+        
+        # this mirrors what the repository service does when it processes an update it has downloaded
+        
+        definition_hash = HydrusData.GenerateKey()
+        
+        iterator_dict = {}
+        
+        iterator_dict[ 'service_hash_ids_to_hashes' ] = iter( definitions_update.GetHashIdsToHashes().items() )
+        iterator_dict[ 'service_tag_ids_to_tags' ] = iter( definitions_update.GetTagIdsToTags().items() )
+        
+        started = HydrusData.GetNowPrecise()
+        
+        while len( iterator_dict ) > 0:
+            
+            self._db.Write( 'process_repository_definitions', True, service_key, definition_hash, iterator_dict, job_key, work_time )
+            
+        
+        self._AddResult( 'repository_process_definitions', [ HydrusData.GetNowPrecise() - started ], num_rows = definitions_update.GetNumRows() )
+        
+        content_hash = HydrusData.GenerateKey()
+        
+        iterator_dict = {}
+        
+        iterator_dict[ 'new_mappings' ] = HydrusData.SmoothOutMappingIterator( content_update.GetNewMappings(), 50 )
+        
+        started = HydrusData.GetNowPrecise()
+        
+        while len( iterator_dict ) > 0:
+            
+            self._db.Write( 'process_repository_content', True, service_key, content_hash, iterator_dict, job_key, work_time )
+            
+        
+        self._AddResult( 'repository_process_content', [ HydrusData.GetNowPrecise() - started ], num_rows = content_update.GetNumRows() )
+        
+        #
+        
+        self._db.Write( 'update_services', True, [ service for service in services if service.GetServiceKey() != service_key ] )
+        
+    
+    def _RunSerialisation( self ):
+        
+        num_file_seeds = min( self._num_files, 100000 )
+        
+        file_seed_cache = ClientImportFileSeeds.FileSeedCache()
+        
+        file_seeds = [ ClientImportFileSeeds.FileSeed( ClientImportFileSeeds.FILE_SEED_TYPE_URL, 'https://synthetic.site/post/{}'.format( i ) ) for i in range( num_file_seeds ) ]
+        
+        file_seed_cache.AddFileSeeds( file_seeds )
+        
+        obj_string = file_seed_cache.DumpToString()
+        network_bytes = file_seed_cache.DumpToNetworkBytes()
+        
+        self._TimeRuns( 'serialisation_dump_to_string', file_seed_cache.DumpToString, num_rows = num_file_seeds )
+        self._TimeRuns( 'serialisation_load_from_string', HydrusSerialisable.CreateFromString, obj_string, num_rows = num_file_seeds )
+        self._TimeRuns( 'serialisation_dump_to_network_bytes', file_seed_cache.DumpToNetworkBytes, num_rows = num_file_seeds )
+        self._TimeRuns( 'serialisation_load_from_network_bytes', HydrusSerialisable.CreateFromNetworkBytes, network_bytes, num_rows = num_file_seeds )
+        
+        self._TimeRuns( 'serialisation_dump_to_network_bytes_zlib_3', file_seed_cache.DumpToNetworkBytes, compression_level = 3, num_rows = num_file_seeds )
+        
+        compression_types = [ HydrusSerialisable.COMPRESSION_TYPE_ZLIB ]
+        
+        if HydrusSerialisable.LZ4_OK:
+            
+            compression_types.append( HydrusSerialisable.COMPRESSION_TYPE_LZ4 )
+            
+        
+        if HydrusSerialisable.ZSTD_OK:
+            
+            compression_types.append( HydrusSerialisable.COMPRESSION_TYPE_ZSTD )
+            
+        
+        for compression_type in compression_types:
+            
+            name = 'serialisation_envelope_{}'.format( HydrusSerialisable.compression_type_str_lookup[ compression_type ] )
+            
+            compression_level = 1 if compression_type == HydrusSerialisable.COMPRESSION_TYPE_ZLIB else None
+            
+            envelope_bytes = file_seed_cache.DumpToNetworkBytes( compression_type = compression_type, compression_level = compression_level )
+            
+            self._TimeRuns( name + '_dump', file_seed_cache.DumpToNetworkBytes, compression_type = compression_type, compression_level = compression_level, num_rows = num_file_seeds )
+            self._TimeRuns( name + '_load', HydrusSerialisable.CreateFromNetworkBytes, envelope_bytes, num_rows = num_file_seeds )
+            
+        
+    
+    def _RunServer( self ):
+        
+        db = ServerDB.DB( HG.test_controller, self._db_dir, 'server' )
+        
+        try:
+            
+            admin_access_key = db.Read( 'access_key', HC.SERVER_ADMIN_KEY, b'init' )
+            
+            admin_account_key = db.Read( 'account_key_from_access_key', HC.SERVER_ADMIN_KEY, admin_access_key )
+            
+            admin_account = db.Read( 'account', HC.SERVER_ADMIN_KEY, admin_account_key )
+            
+            tag_service_key = HydrusData.GenerateKey()
+            
+            services = db.Read( 'services' )
+            
+            services.append( HydrusNetwork.GenerateService( tag_service_key, HC.TAG_REPOSITORY, 'benchmark tag repo', 45871 ) )
+            
+            service_keys_to_access_keys = db.Write( 'services', True, admin_account, services )
+            
+            tag_access_key = service_keys_to_access_keys[ tag_service_key ]
+            
+            tag_account_key = db.Read( 'account_key_from_access_key', tag_service_key, tag_access_key )
+            
+            tag_account = db.Read( 'account', tag_service_key, tag_account_key )
+            
+            #
+            
+            num_repository_files = min( self._num_files, self._num_repository_mappings )
+            
+            num_mappings_per_tag = max( 1, self._num_repository_mappings // len( self._tags ) )
+            
+            client_to_server_update = HydrusNetwork.ClientToServerUpdate()
+            
+            num_rows = 0
+            
+            for tag in self._tags:
+                
+                hashes = self._random.sample( self._hashes[ : num_repository_files ], min( num_mappings_per_tag, num_repository_files ) )
+                
+                client_to_server_update.AddContent( HC.CONTENT_UPDATE_PEND, HydrusNetwork.Content( HC.CONTENT_TYPE_MAPPINGS, ( tag, hashes ) ) )
+                
+                num_rows += len( hashes )
+                
+                if num_rows >= self._num_repository_mappings:
+                    
+                    break
+                    
+                
+            
+            begin = HydrusData.GetNow() - 1
+            
+            started = HydrusData.GetNowPrecise()
+            
+            db.Write( 'update', True, tag_service_key, tag_account, client_to_server_update, HydrusData.GetNow() )
+            
+            self._AddResult( 'server_process_client_update', [ HydrusData.GetNowPrecise() - started ], num_rows = num_rows )
+            
+            end = HydrusData.GetNow() + 1
+            
+            started = HydrusData.GetNowPrecise()
+            
+            db.Write( 'create_update', True, tag_service_key, begin, end )
+            
+            self._AddResult( 'server_create_update', [ HydrusData.GetNowPrecise() - started ], num_rows = num_rows )
+            
+        finally:
+            
+            db.Shutdown()
+            
+            while not db.LoopIsFinished():
+                
+                time.sleep( 0.1 )
+                
+            
+        
+    
+    def _RunTagArchive( self ):
+        
+        # per-row calls against the bulk calls, on the same synthetic mappings
+        
+        num_tags_per_file = max( 1, min( self._num_tags, self._num_mappings // max( 1, self._num_files ) ) )
+        
+        hashes_and_tags = [ ( hashlib.md5( hash ).digest(), self._random.sample( self._tags, num_tags_per_file ) ) for hash in self._hashes ]
+        
+        num_rows = len( hashes_and_tags ) * num_tags_per_file
+        
+        per_row_path = os.path.join( self._db_dir, 'benchmark_per_row.db' )
+        bulk_path = os.path.join( self._db_dir, 'benchmark_bulk.db' )
+        
+        def add_per_row():
+            
+            hta = HydrusTagArchive.HydrusTagArchive( per_row_path )
+            
+            hta.SetHashType( HydrusTagArchive.HASH_TYPE_MD5 )
+            
+            hta.BeginBigJob()
+            
+            for ( hash, tags ) in hashes_and_tags:
+                
+                hta.AddMappings( hash, tags )
+                
+            
+            hta.CommitBigJob()
+            
+            hta.Close()
+            
+        
+        def add_bulk():
+            
+            hta = HydrusTagArchive.HydrusTagArchive( bulk_path )
+            
+            hta.SetHashType( HydrusTagArchive.HASH_TYPE_MD5 )
+            
+            hta.BeginBigJob()
+            
+            hta.AddMappingsBulk( hashes_and_tags )
+            
+            hta.CommitBigJob()
+            
+            hta.Close()
+            
+        
+        self._TimeRuns( 'tag_archive_add_mappings_per_row', add_per_row, num_runs = 1, num_rows = num_rows )
+        self._TimeRuns( 'tag_archive_add_mappings_bulk', add_bulk, num_runs = 1, num_rows = num_rows )
+        
+        hta = HydrusTagArchive.HydrusTagArchive( bulk_path )
+        
+        try:
+            
+            lookup_hashes = [ hash for ( hash, tags ) in self._random.sample( hashes_and_tags, min( 1000, len( hashes_and_tags ) ) ) ]
+            
+            def get_tags_per_row():
+                
+                return { hash : hta.GetTags( hash ) for hash in lookup_hashes }
+                
+            
+            def has_hash_per_row():
+                
+                return { hash for hash in lookup_hashes if hta.HasHash( hash ) }
+                
+            
+            def iterate_per_row():
+                
+                for hash in list( hta.IterateHashes() ):
+                    
+                    hta.GetTags( hash )
+                    
+                
+            
+            def iterate_join():
+                
+                for row in hta.IterateMappings():
+                    
+                    pass
+                    
+                
+            
+            self._TimeRuns( 'tag_archive_get_tags_per_row', get_tags_per_row, num_rows = len( lookup_hashes ) )
+            self._TimeRuns( 'tag_archive_get_hashes_to_tags', hta.GetHashesToTags, lookup_hashes, num_rows = len( lookup_hashes ) )
+            self._TimeRuns( 'tag_archive_has_hash_per_row', has_hash_per_row, num_rows = len( lookup_hashes ) )
+            self._TimeRuns( 'tag_archive_filter_hashes', hta.FilterHashes, lookup_hashes, num_rows = len( lookup_hashes ) )
+            self._TimeRuns( 'tag_archive_iterate_per_row', iterate_per_row, num_runs = 1, num_rows = num_rows )
+            self._TimeRuns( 'tag_archive_iterate_mappings', iterate_join, num_runs = 1, num_rows = num_rows )
+            
+        finally:
+            
+            hta.Close()
+            
+        
+    
+    def _RunThumbnails( self ):
+        
+        for ( name, filename, mime ) in [ ( 'thumbnail_decode_jpeg', 'muh_jpg.jpg', HC.IMAGE_JPEG ), ( 'thumbnail_decode_png', 'muh_png.png', HC.IMAGE_PNG ) ]:
+            
+            path = os.path.join( HC.STATIC_DIR, 'testing', filename )
+            
+            thumbnail_bytes = HydrusImageHandling.GenerateThumbnailBytesFromStaticImagePath( path, ( 150, 125 ), mime )
+            
+            thumbnail_path = os.path.join( self._db_dir, 'benchmark_thumbnail_' + filename )
+            
+            with open( thumbnail_path, 'wb' ) as f:
+                
+                f.write( thumbnail_bytes )
+                
+            
+            self._TimeRuns( name, HydrusImageHandling.GenerateNumPyImage, thumbnail_path, mime )
+            
+        
+        # a big jpeg, to compare a full decode and resize with the decoder scaling it down for us
+        
+        pil_image = HydrusImageHandling.GeneratePILImage( os.path.join( HC.STATIC_DIR, 'testing', 'muh_jpg.jpg' ) )
+        
+        pil_image = HydrusImageHandling.Dequantize( pil_image ).resize( ( 4000, 3000 ), HydrusImageHandling.PILImage.BICUBIC )
+        
+        big_jpeg_path = os.path.join( self._db_dir, 'benchmark_big_jpeg.jpg' )
+        
+        pil_image.save( big_jpeg_path, 'JPEG', quality = 90 )
+        
+        target_resolution = HydrusImageHandling.GetThumbnailResolution( ( 4000, 3000 ), ( 150, 125 ) )
+        
+        def generate_thumbnail_bytes_full_decode():
+            
+            numpy_image = HydrusImageHandling.GenerateNumPyImage( big_jpeg_path, HC.IMAGE_JPEG )
+            
+            thumbnail_numpy_image = HydrusImageHandling.ResizeNumPyImage( numpy_image, target_resolution )
+            
+            HydrusImageHandling.GenerateThumbnailBytesNumPy( thumbnail_numpy_image, HC.IMAGE_JPEG )
+            
+        
+        self._TimeRuns( 'thumbnail_generate_big_jpeg_full_decode', generate_thumbnail_bytes_full_decode )
+        self._TimeRuns( 'thumbnail_generate_big_jpeg', HydrusImageHandling.GenerateThumbnailBytesFromStaticImagePath, big_jpeg_path, target_resolution, HC.IMAGE_JPEG )
+        
+    
+    def _SearchFiles( self, predicates ):
+        
+        tag_search_context = ClientSearch.TagSearchContext( service_key = CC.DEFAULT_LOCAL_TAG_SERVICE_KEY )
+        
+        file_search_context = ClientSearch.FileSearchContext( file_service_key = CC.LOCAL_FILE_SERVICE_KEY, tag_search_context = tag_search_context, predicates = predicates )
+        
+        return self._Read( 'file_query_ids', file_search_context, apply_implicit_limit = False )
+        
+    
+    def _TimeFileSearch( self, name, predicates ):
+        
+        self._TimeRuns( name, self._SearchFiles, predicates )
+        
+    
+    def _TimeRuns( self, name, func, *args, num_runs = None, num_rows = None, **kwargs ):
+        
+        if num_runs is None:
+            
+            num_runs = self._num_runs
+            
+        
+        times = []
+        
+        for i in range( num_runs ):
+            
+            started = HydrusData.GetNowPrecise()
+            
+            func( *args, **kwargs )
+            
+            times.append( HydrusData.GetNowPrecise() - started )
+            
+        
+        self._AddResult( name, times, num_rows = num_rows )
+        
+    
+    def GetResults( self ):
+        
+        results = {}
+        
+        results[ 'software_version' ] = HC.SOFTWARE_VERSION
+        results[ 'timestamp' ] = HydrusData.GetNow()
+        results[ 'platform' ] = sys.platform
+        results[ 'python_version' ] = platform.python_version()
+        results[ 'scale' ] = { 'files' : self._num_files, 'tags' : self._num_tags, 'mappings' : self._num_mappings, 'repository_mappings' : self._num_repository_mappings, 'runs' : self._num_runs, 'seed' : self._seed }
+        results[ 'benchmarks' ] = list( self._results )
+        
+        return results
+        
+    
+    def GetResultsJSON( self ):
+        
+        return json.dumps( self.GetResults(), indent = 4 )
+        
+    
+    def Run( self ):
+        
+        HydrusData.Print( 'Building synthetic client db with {} files, {} tags and about {} mappings.'.format( HydrusData.ToHumanInt( self._num_files ), HydrusData.ToHumanInt( self._num_tags ), HydrusData.ToHumanInt( self._num_mappings ) ) )
+        
+        self._BuildClientDB()
+        
+        try:
+            
+            groups_to_callables = {}
+            
+            groups_to_callables[ 'file_search' ] = self._RunFileSearch
+            groups_to_callables[ 'autocomplete' ] = self._RunAutocomplete
+            groups_to_callables[ 'bandwidth' ] = self._RunBandwidth
+            groups_to_callables[ 'media_results' ] = self._RunMediaResults
+            groups_to_callables[ 'phash' ] = self._RunPHash
+            groups_to_callables[ 'thumbnails' ] = self._RunThumbnails
+            groups_to_callables[ 'serialisation' ] = self._RunSerialisation
+            groups_to_callables[ 'parsing' ] = self._RunParsing
+            groups_to_callables[ 'repository' ] = self._RunRepository
+            groups_to_callables[ 'server' ] = self._RunServer
+            groups_to_callables[ 'tag_archive' ] = self._RunTagArchive
+            
+            for group in BENCHMARK_GROUPS:
+                
+                if group not in self._only_run:
+                    
+                    continue
+                    
+                
+                try:
+                    
+                    groups_to_callables[ group ]()
+                    
+                except Exception as e:
+                    
+                    self._AddError( group, e )
+                    
+                
+            
+        finally:
+            
+            self._db.Shutdown()
+            
+            while not self._db.LoopIsFinished():
+                
+                time.sleep( 0.1 )
+                
+            
+        
+    
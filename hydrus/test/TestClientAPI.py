@@ -13,6 +13,7 @@ from hydrus.client import ClientTags
 import collections
 import hashlib
 import http.client
+import io
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusTags
@@ -21,9 +22,11 @@ import json
 import os
 import random
 import shutil
+import tarfile
 import time
 import unittest
 import urllib
+import zipfile
 from twisted.internet import reactor
 from hydrus.core import HydrusData
 from hydrus.core import HydrusGlobals as HG
@@ -128,6 +131,7 @@ class TestClientAPI( unittest.TestCase ):
         permissions_to_set_up.append( ( 'add_urls', [ ClientAPI.CLIENT_API_PERMISSION_ADD_URLS ] ) )
         permissions_to_set_up.append( ( 'manage_pages', [ ClientAPI.CLIENT_API_PERMISSION_MANAGE_PAGES ] ) )
         permissions_to_set_up.append( ( 'manage_cookies', [ ClientAPI.CLIENT_API_PERMISSION_MANAGE_COOKIES ] ) )
+        permissions_to_set_up.append( ( 'manage_database', [ ClientAPI.CLIENT_API_PERMISSION_MANAGE_DATABASE ] ) )
         permissions_to_set_up.append( ( 'search_all_files', [ ClientAPI.CLIENT_API_PERMISSION_SEARCH_FILES ] ) )
         permissions_to_set_up.append( ( 'search_green_files', [ ClientAPI.CLIENT_API_PERMISSION_SEARCH_FILES ] ) )
         
@@ -1352,6 +1356,49 @@ class TestClientAPI( unittest.TestCase ):
         self.assertEqual( frozen_result_cookies, frozen_expected_cookies )
         
     
+    def _test_manage_database( self, connection, set_up_permissions ):
+        
+        api_permissions = set_up_permissions[ 'manage_database' ]
+        
+        access_key_hex = api_permissions.GetAccessKey().hex()
+        
+        headers = { 'Hydrus-Client-API-Access-Key' : access_key_hex }
+        
+        #
+        
+        path = '/manage_database/get_db_job_statistics'
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        text = str( data, 'utf-8' )
+        
+        self.assertEqual( response.status, 200 )
+        
+        d = json.loads( text )
+        
+        self.assertEqual( d[ 'db_job_statistics' ], HG.test_controller.GetDBJobStatistics() )
+        
+        #
+        
+        api_permissions = set_up_permissions[ 'manage_pages' ]
+        
+        access_key_hex = api_permissions.GetAccessKey().hex()
+        
+        headers = { 'Hydrus-Client-API-Access-Key' : access_key_hex }
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 403 )
+        
+    
     def _test_manage_pages( self, connection, set_up_permissions ):
         
         api_permissions = set_up_permissions[ 'manage_pages' ]
@@ -1973,6 +2020,179 @@ class TestClientAPI( unittest.TestCase ):
         os.unlink( thumb_path )
         
     
+    def _test_files_archive( self, connection, set_up_permissions ):
+        
+        hash_1 = os.urandom( 32 )
+        hash_2 = os.urandom( 32 )
+        
+        file_ids_to_hashes = { 1 : hash_1, 2 : hash_2 }
+        hashes_to_source_paths = { hash_1 : os.path.join( HC.STATIC_DIR, 'hydrus.png' ), hash_2 : os.path.join( HC.STATIC_DIR, 'hydrus_small.png' ) }
+        
+        media_results = []
+        
+        for ( file_id, hash ) in file_ids_to_hashes.items():
+            
+            file_info_manager = ClientMediaManagers.FileInfoManager( file_id, hash, size = os.path.getsize( hashes_to_source_paths[ hash ] ), mime = HC.IMAGE_PNG, width = 20, height = 20 )
+            
+            tags_manager = ClientMediaManagers.TagsManager( {} )
+            
+            locations_manager = ClientMediaManagers.LocationsManager( set(), set(), set(), set() )
+            ratings_manager = ClientMediaManagers.RatingsManager( {} )
+            notes_manager = ClientMediaManagers.NotesManager( {} )
+            file_viewing_stats_manager = ClientMediaManagers.FileViewingStatsManager( 0, 0, 0, 0 )
+            
+            media_results.append( ClientMedia.MediaResult( file_info_manager, tags_manager, locations_manager, ratings_manager, notes_manager, file_viewing_stats_manager ) )
+            
+            shutil.copy2( hashes_to_source_paths[ hash ], HG.test_controller.client_files_manager.GetFilePath( hash, HC.IMAGE_PNG, check_file_exists = False ) )
+            
+        
+        # the archive only includes the ids it asked for, so this can give back everything every time
+        HG.test_controller.SetRead( 'media_results_from_ids', media_results )
+        
+        def get_archive( query ):
+            
+            path = '/get_files/files_archive?{}'.format( query )
+            
+            connection.request( 'GET', path, headers = headers )
+            
+            response = connection.getresponse()
+            
+            data = response.read()
+            
+            return ( response, data )
+            
+        
+        def get_zip_names( data ):
+            
+            with zipfile.ZipFile( io.BytesIO( data ) ) as z:
+                
+                return z.namelist()
+                
+            
+        
+        def get_filename( hash ):
+            
+            return hash.hex() + '.png'
+            
+        
+        # not in the last search
+        
+        api_permissions = set_up_permissions[ 'search_green_files' ]
+        
+        headers = { 'Hydrus-Client-API-Access-Key' : api_permissions.GetAccessKey().hex() }
+        
+        ( response, data ) = get_archive( 'file_ids={}'.format( urllib.parse.quote( json.dumps( [ 99 ] ) ) ) )
+        
+        self.assertEqual( response.status, 403 )
+        
+        #
+        
+        api_permissions = set_up_permissions[ 'everything' ]
+        
+        headers = { 'Hydrus-Client-API-Access-Key' : api_permissions.GetAccessKey().hex() }
+        
+        ( response, data ) = get_archive( '' )
+        
+        self.assertEqual( response.status, 400 )
+        
+        # file_ids, zip by default
+        
+        ( response, data ) = get_archive( 'file_ids={}'.format( urllib.parse.quote( json.dumps( [ 1, 2 ] ) ) ) )
+        
+        self.assertEqual( response.status, 200 )
+        self.assertEqual( response.getheader( 'Content-Type' ), HC.mime_mimetype_string_lookup[ HC.APPLICATION_ZIP ] )
+        
+        with zipfile.ZipFile( io.BytesIO( data ) ) as z:
+            
+            self.assertEqual( z.namelist(), [ get_filename( hash_1 ), get_filename( hash_2 ) ] )
+            
+            for hash in ( hash_1, hash_2 ):
+                
+                with open( hashes_to_source_paths[ hash ], 'rb' ) as f:
+                    
+                    self.assertEqual( z.read( get_filename( hash ) ), f.read() )
+                    
+                
+            
+        
+        # hashes, as tar
+        
+        HG.test_controller.SetRead( 'hash_ids_to_hashes', file_ids_to_hashes )
+        
+        ( response, data ) = get_archive( 'hashes={}&archive_type=tar'.format( urllib.parse.quote( json.dumps( [ hash_2.hex(), hash_1.hex() ] ) ) ) )
+        
+        self.assertEqual( response.status, 200 )
+        
+        with tarfile.open( fileobj = io.BytesIO( data ) ) as t:
+            
+            self.assertEqual( t.getnames(), [ get_filename( hash_2 ), get_filename( hash_1 ) ] )
+            
+            with open( hashes_to_source_paths[ hash_2 ], 'rb' ) as f:
+                
+                self.assertEqual( t.extractfile( get_filename( hash_2 ) ).read(), f.read() )
+                
+            
+        
+        ( response, data ) = get_archive( 'file_ids={}&archive_type=rar'.format( urllib.parse.quote( json.dumps( [ 1 ] ) ) ) )
+        
+        self.assertEqual( response.status, 400 )
+        
+        # tags
+        
+        HG.test_controller.SetRead( 'file_query_ids', [ 2, 1 ] )
+        
+        ( response, data ) = get_archive( 'tags={}'.format( urllib.parse.quote( json.dumps( [ 'kino' ] ) ) ) )
+        
+        self.assertEqual( response.status, 200 )
+        self.assertEqual( get_zip_names( data ), [ get_filename( hash_2 ), get_filename( hash_1 ) ] )
+        
+        # metadata sidecars
+        
+        ( response, data ) = get_archive( 'file_ids={}&include_metadata=true'.format( urllib.parse.quote( json.dumps( [ 1, 2 ] ) ) ) )
+        
+        self.assertEqual( response.status, 200 )
+        
+        with zipfile.ZipFile( io.BytesIO( data ) ) as z:
+            
+            self.assertEqual( z.namelist(), [ get_filename( hash_1 ), get_filename( hash_1 ) + '.json', get_filename( hash_2 ), get_filename( hash_2 ) + '.json' ] )
+            
+            metadata_row = json.loads( str( z.read( get_filename( hash_2 ) + '.json' ), 'utf-8' ) )
+            
+            self.assertEqual( metadata_row[ 'file_id' ], 2 )
+            self.assertEqual( metadata_row[ 'hash' ], hash_2.hex() )
+            self.assertEqual( metadata_row[ 'mime' ], 'image/png' )
+            
+        
+        # resuming
+        
+        HG.test_controller.SetRead( 'hash_ids_to_hashes', { 2 : hash_2 } )
+        
+        ( response, data ) = get_archive( 'file_ids={}&start_hash={}'.format( urllib.parse.quote( json.dumps( [ 1, 2 ] ) ), hash_2.hex() ) )
+        
+        self.assertEqual( response.status, 200 )
+        self.assertEqual( get_zip_names( data ), [ get_filename( hash_2 ) ] )
+        
+        ( response, data ) = get_archive( 'file_ids={}&offset=1'.format( urllib.parse.quote( json.dumps( [ 1, 2 ] ) ) ) )
+        
+        self.assertEqual( response.status, 200 )
+        self.assertEqual( get_zip_names( data ), [ get_filename( hash_2 ) ] )
+        
+        unknown_hash = os.urandom( 32 )
+        
+        HG.test_controller.SetRead( 'hash_ids_to_hashes', { 12345 : unknown_hash } )
+        
+        ( response, data ) = get_archive( 'file_ids={}&start_hash={}'.format( urllib.parse.quote( json.dumps( [ 1, 2 ] ) ), unknown_hash.hex() ) )
+        
+        self.assertEqual( response.status, 404 )
+        
+        #
+        
+        for hash in ( hash_1, hash_2 ):
+            
+            os.unlink( HG.test_controller.client_files_manager.GetFilePath( hash, HC.IMAGE_PNG ) )
+            
+        
+    
     def _test_permission_failures( self, connection, set_up_permissions ):
         
         pass
@@ -1993,8 +2213,10 @@ class TestClientAPI( unittest.TestCase ):
         self._test_add_tags( connection, set_up_permissions )
         self._test_add_urls( connection, set_up_permissions )
         self._test_manage_cookies( connection, set_up_permissions )
+        self._test_manage_database( connection, set_up_permissions )
         self._test_manage_pages( connection, set_up_permissions )
         self._test_search_files( connection, set_up_permissions )
+        self._test_files_archive( connection, set_up_permissions )
         self._test_permission_failures( connection, set_up_permissions )
         self._test_cors_fails( connection )
         
@@ -0,0 +1,204 @@
+from hydrus.client import ClientCaches
+from hydrus.core import HydrusConstants as HC
+from hydrus.core import HydrusData
+from hydrus.test import TestController
+import json
+import threading
+import unittest
+
+class FakeQtImage( object ):
+    
+    def height( self ):
+        
+        return 100
+        
+    
+    def width( self ):
+        
+        return 150
+        
+    
+class FakeMedia( object ):
+    
+    def __init__( self, mime, resolution ):
+        
+        self._hash = HydrusData.GenerateKey()
+        self._mime = mime
+        self._resolution = resolution
+        
+    
+    def GetHash( self ): return self._hash
+    
+    def GetMime( self ): return self._mime
+    
+    def GetResolution( self ): return self._resolution
+    
+
+class TestParsingCache( unittest.TestCase ):
+    
+    def test_cache( self ):
+        
+        parsing_cache = ClientCaches.ParsingCache()
+        
+        json_text = json.dumps( { 'posts' : [ { 'id' : i } for i in range( 100 ) ] } )
+        
+        j1 = parsing_cache.GetJSON( json_text )
+        j2 = parsing_cache.GetJSON( json_text )
+        
+        self.assertEqual( j1, json.loads( json_text ) )
+        self.assertIs( j1, j2 )
+        
+        ( num_entries, total_size, cache_size ) = parsing_cache.GetSizeStatus()
+        
+        self.assertEqual( num_entries, 1 )
+        self.assertEqual( total_size, len( json_text ) * ClientCaches.PARSING_CACHE_JSON_SIZE_MULTIPLIER )
+        
+    
+    def test_concurrent( self ):
+        
+        parsing_cache = ClientCaches.ParsingCache()
+        
+        json_text = json.dumps( [ { 'id' : i, 'tags' : [ 'tag {}'.format( j ) for j in range( 20 ) ] } for i in range( 2000 ) ] )
+        
+        results = []
+        
+        def do_it():
+            
+            results.append( parsing_cache.GetJSON( json_text ) )
+            
+        
+        threads = [ threading.Thread( target = do_it ) for i in range( 8 ) ]
+        
+        for thread in threads:
+            
+            thread.start()
+            
+        
+        for thread in threads:
+            
+            thread.join()
+            
+        
+        self.assertEqual( len( results ), 8 )
+        
+        # everyone waits on the one parse rather than doing their own
+        
+        for result in results:
+            
+            self.assertIs( result, results[0] )
+            
+        
+    
+    def test_memory_limit( self ):
+        
+        json_texts = [ json.dumps( [ i ] * 1000 ) for i in range( 10 ) ]
+        
+        one_size = len( json_texts[0] ) * ClientCaches.PARSING_CACHE_JSON_SIZE_MULTIPLIER
+        
+        parsing_cache = ClientCaches.ParsingCache( cache_size = one_size * 3 )
+        
+        for json_text in json_texts:
+            
+            parsing_cache.GetJSON( json_text )
+            
+        
+        ( num_entries, total_size, cache_size ) = parsing_cache.GetSizeStatus()
+        
+        self.assertEqual( num_entries, 3 )
+        self.assertLessEqual( total_size, cache_size )
+        
+        # the most recent are kept
+        
+        j = parsing_cache.GetJSON( json_texts[-1] )
+        
+        self.assertIs( j, parsing_cache.GetJSON( json_texts[-1] ) )
+        
+        # something too big for the whole cache is parsed but not kept
+        
+        big_json_text = json.dumps( list( range( 10000 ) ) )
+        
+        self.assertEqual( parsing_cache.GetJSON( big_json_text ), list( range( 10000 ) ) )
+        
+        ( num_entries, total_size, cache_size ) = parsing_cache.GetSizeStatus()
+        
+        self.assertEqual( num_entries, 3 )
+        
+    
+class TestRenderedImageCache( unittest.TestCase ):
+    
+    def test_prefetch( self ):
+        
+        mock_controller = TestController.MockController()
+        
+        one_size = 1000 * 1000 * 3
+        
+        mock_controller.options = { 'fullscreen_cache_size' : int( one_size * 4.5 / ClientCaches.IMAGE_PREFETCH_BUDGET_FRACTION ) }
+        
+        image_cache = ClientCaches.RenderedImageCache( mock_controller )
+        
+        medias = [ FakeMedia( HC.IMAGE_PNG, ( 1000, 1000 ) ) for i in range( 10 ) ]
+        
+        image_cache.PrefetchImageRenderers( [ ( media, None ) for media in medias ] )
+        
+        # only as much as the budget, and the most important comes out first
+        
+        self.assertEqual( [ media for ( media, target_resolution ) in reversed( image_cache._prefetch_queue ) ], medias[ : 4 ] )
+        
+        # a jpeg that can decode smaller is cheaper
+        
+        big_jpeg = FakeMedia( HC.IMAGE_JPEG, ( 4000, 4000 ) )
+        
+        image_cache.PrefetchImageRenderers( [ ( big_jpeg, ( 500, 500 ) ) ] + [ ( media, None ) for media in medias ] )
+        
+        self.assertEqual( [ media for ( media, target_resolution ) in reversed( image_cache._prefetch_queue ) ], [ big_jpeg ] + medias[ : 3 ] )
+        
+        image_cache.PrefetchImageRenderers( [ ( big_jpeg, None ) ] )
+        
+        self.assertEqual( image_cache._prefetch_queue, [] )
+        
+    
+class TestThumbnailCompositeCache( unittest.TestCase ):
+    
+    def test_staleness( self ):
+        
+        mock_controller = TestController.MockController()
+        
+        composite_cache = ClientCaches.ThumbnailCompositeCache( mock_controller )
+        
+        key = ( HydrusData.GenerateKey(), False, False )
+        
+        thumbnail_bmp = object()
+        
+        draw_state = ( False, True, 'upper', 'lower', ( 'inbox', ), None, () )
+        
+        qt_image = FakeQtImage()
+        
+        self.assertIsNone( composite_cache.GetQtImage( key, thumbnail_bmp, draw_state ) )
+        
+        composite_cache.AddQtImage( key, thumbnail_bmp, draw_state, qt_image )
+        
+        self.assertIs( composite_cache.GetQtImage( key, thumbnail_bmp, tuple( draw_state ) ), qt_image )
+        
+        # archiving changes what we draw
+        
+        archived_draw_state = ( False, True, 'upper', 'lower', (), None, () )
+        
+        self.assertIsNone( composite_cache.GetQtImage( key, thumbnail_bmp, archived_draw_state ) )
+        
+        # the real thumb coming in after the placeholder also needs a redraw
+        
+        self.assertIsNone( composite_cache.GetQtImage( key, object(), draw_state ) )
+        
+        # a stale entry is replaced
+        
+        new_qt_image = FakeQtImage()
+        
+        composite_cache.AddQtImage( key, thumbnail_bmp, archived_draw_state, new_qt_image )
+        
+        self.assertIs( composite_cache.GetQtImage( key, thumbnail_bmp, archived_draw_state ), new_qt_image )
+        
+        composite_cache.Clear()
+        
+        self.assertIsNone( composite_cache.GetQtImage( key, thumbnail_bmp, archived_draw_state ) )
+        
+    
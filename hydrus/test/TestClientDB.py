@@ -22,6 +22,7 @@ from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusVideoHandling
 from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusNetwork
+from hydrus.core import HydrusPaths
 from hydrus.core import HydrusSerialisable
 import itertools
 import os
@@ -189,6 +190,32 @@ class TestClientDB( unittest.TestCase ):
         self.assertEqual( result, [] )
         
     
+    def test_db_job_statistics( self ):
+        
+        TestClientDB._db.ResetJobStatistics()
+        
+        services = self._read( 'services' )
+        services = self._read( 'services' )
+        
+        job_statistics = TestClientDB._db.GetJobStatistics()
+        
+        rows = [ row for row in job_statistics if row[ 'job_type' ] == 'read' and row[ 'action' ] == 'services' ]
+        
+        self.assertEqual( len( rows ), 1 )
+        
+        row = rows[0]
+        
+        self.assertEqual( row[ 'count' ], 2 )
+        self.assertEqual( row[ 'total_rows' ], len( services ) * 2 )
+        self.assertEqual( row[ 'num_slow' ], 0 )
+        self.assertLessEqual( row[ 'p50_time_ms' ], row[ 'max_time_ms' ] )
+        self.assertGreaterEqual( row[ 'max_wait_ms' ], 0 )
+        
+        TestClientDB._db.ResetJobStatistics()
+        
+        self.assertEqual( TestClientDB._db.GetJobStatistics(), [] )
+        
+    
     def test_export_folders( self ):
         
         tag_search_context = ClientSearch.TagSearchContext( service_key = HydrusData.GenerateKey() )
@@ -197,11 +224,172 @@ class TestClientDB( unittest.TestCase ):
         
         export_folder = ClientExporting.ExportFolder( 'test path', export_type = HC.EXPORT_FOLDER_TYPE_REGULAR, delete_from_client_after_export = False, file_search_context = file_search_context, period = 3600, phrase = '{hash}' )
         
+        hash = HydrusData.GenerateKey()
+        
+        manifest = { hash.hex() + '.jpg' : ( hash, 12345, 1500000000 ) }
+        
+        export_folder.SetManifest( 'test path', manifest )
+        
         self._write( 'serialisable', export_folder )
         
         [ result ] = self._read( 'serialisable_named', HydrusSerialisable.SERIALISABLE_TYPE_EXPORT_FOLDER )
         
         self.assertEqual( result.GetName(), export_folder.GetName() )
+        self.assertEqual( result.GetManifest(), ( 'test path', manifest ) )
+        
+    
+    def test_export_folders_work( self ):
+        
+        TestClientDB._clear_db()
+        
+        file_import_jobs = []
+        
+        for filename in ( 'muh_jpg.jpg', 'muh_png.png' ):
+            
+            path = os.path.join( HC.STATIC_DIR, 'testing', filename )
+            
+            file_import_job = ClientImportFileSeeds.FileImportJob( path )
+            
+            file_import_job.GenerateHashAndStatus()
+            
+            file_import_job.GenerateInfo()
+            
+            file_import_jobs.append( file_import_job )
+            
+            HG.test_controller.client_files_manager.AddFile( file_import_job.GetHash(), file_import_job.GetMime(), path )
+            
+        
+        self._write( 'import_files', file_import_jobs )
+        
+        ( jpg_hash, png_hash ) = [ file_import_job.GetHash() for file_import_job in file_import_jobs ]
+        
+        media_results = self._read( 'media_results', ( jpg_hash, png_hash ) )
+        
+        hashes_to_media_results = { media_result.GetHash() : media_result for media_result in media_results }
+        
+        ( jpg_media_result, png_media_result ) = ( hashes_to_media_results[ jpg_hash ], hashes_to_media_results[ png_hash ] )
+        
+        test_dir = HydrusPaths.GetTempDir()
+        
+        try:
+            
+            HydrusPaths.MakeSureDirectoryExists( os.path.join( test_dir, 'old' ) )
+            
+            with open( os.path.join( test_dir, 'stray.txt' ), 'w' ) as f: f.write( 'stray' )
+            with open( os.path.join( test_dir, 'old', 'stray.txt' ), 'w' ) as f: f.write( 'stray' )
+            
+            export_folder = ClientExporting.ExportFolder( 'test export', path = test_dir, export_type = HC.EXPORT_FOLDER_TYPE_SYNCHRONISE, phrase = '{hash}' )
+            
+            HG.test_controller.SetRead( 'file_query_ids', [ jpg_media_result.GetHashId(), png_media_result.GetHashId() ] )
+            HG.test_controller.SetRead( 'media_results_from_ids', [ jpg_media_result, png_media_result ] )
+            
+            # first run has no manifest, so it looks at what is there and clears out what it does not know
+            
+            export_folder.DoWork()
+            
+            ( manifest_path, manifest ) = export_folder.GetManifest()
+            
+            self.assertEqual( manifest_path, test_dir )
+            self.assertEqual( { hash for ( hash, size, modified_timestamp ) in manifest.values() }, { jpg_hash, png_hash } )
+            
+            filenames_to_hashes = { filename : hash for ( filename, ( hash, size, modified_timestamp ) ) in manifest.items() }
+            hashes_to_paths = { hash : os.path.join( test_dir, filename ) for ( filename, hash ) in filenames_to_hashes.items() }
+            
+            self.assertEqual( set( os.listdir( test_dir ) ), set( filenames_to_hashes.keys() ) )
+            
+            # unchanged files are skipped, so if we scribble on the jpg without touching its size or time, it stays scribbled on
+            
+            jpg_path = hashes_to_paths[ jpg_hash ]
+            png_path = hashes_to_paths[ png_hash ]
+            
+            jpg_stat = os.stat( jpg_path )
+            
+            with open( jpg_path, 'wb' ) as f: f.write( b'\x00' * jpg_stat.st_size )
+            
+            os.utime( jpg_path, ( jpg_stat.st_atime, jpg_stat.st_mtime ) )
+            
+            # but a file that changed on disk is copied again
+            
+            with open( png_path, 'wb' ) as f: f.write( b'blarg' )
+            
+            export_folder.RunNow()
+            
+            export_folder.DoWork()
+            
+            with open( jpg_path, 'rb' ) as f: self.assertEqual( f.read(), b'\x00' * jpg_stat.st_size )
+            
+            with open( png_path, 'rb' ) as f: png_data = f.read()
+            with open( os.path.join( HC.STATIC_DIR, 'testing', 'muh_png.png' ), 'rb' ) as f: self.assertEqual( png_data, f.read() )
+            
+            # synchronise deletes what is no longer in the search
+            
+            HG.test_controller.SetRead( 'file_query_ids', [ jpg_media_result.GetHashId() ] )
+            HG.test_controller.SetRead( 'media_results_from_ids', [ jpg_media_result ] )
+            
+            export_folder.RunNow()
+            
+            export_folder.DoWork()
+            
+            self.assertTrue( os.path.exists( jpg_path ) )
+            self.assertFalse( os.path.exists( png_path ) )
+            
+            ( manifest_path, manifest ) = export_folder.GetManifest()
+            
+            self.assertEqual( [ hash for ( hash, size, modified_timestamp ) in manifest.values() ], [ jpg_hash ] )
+            
+        finally:
+            
+            HG.test_controller.ClearWrites( 'serialisable' )
+            
+            shutil.rmtree( test_dir )
+            
+        
+    
+    def test_export_folders_copy_error( self ):
+        
+        TestClientDB._clear_db()
+        
+        path = os.path.join( HC.STATIC_DIR, 'testing', 'muh_png.png' )
+        
+        file_import_job = ClientImportFileSeeds.FileImportJob( path )
+        
+        file_import_job.GenerateHashAndStatus()
+        
+        file_import_job.GenerateInfo()
+        
+        HG.test_controller.client_files_manager.AddFile( file_import_job.GetHash(), file_import_job.GetMime(), path )
+        
+        self._write( 'import_files', [ file_import_job ] )
+        
+        media_result = self._read( 'media_result', file_import_job.GetHash() )
+        
+        test_dir = HydrusPaths.GetTempDir()
+        
+        try:
+            
+            HydrusPaths.MakeSureDirectoryExists( test_dir )
+            
+            # a file in the way of the subdirectory, so the copy worker cannot make it
+            
+            with open( os.path.join( test_dir, 'sub' ), 'w' ) as f: f.write( 'in the way' )
+            
+            export_folder = ClientExporting.ExportFolder( 'test export', path = test_dir, export_type = HC.EXPORT_FOLDER_TYPE_REGULAR, phrase = 'sub' + os.path.sep + '{hash}' )
+            
+            HG.test_controller.SetRead( 'file_query_ids', [ media_result.GetHashId() ] )
+            HG.test_controller.SetRead( 'media_results_from_ids', [ media_result ] )
+            
+            export_folder.DoWork()
+            
+            ( name, path, export_type, delete_from_client_after_export, file_search_context, run_regularly, period, phrase, last_checked, paused, run_now ) = export_folder.ToTuple()
+            
+            self.assertTrue( paused )
+            
+        finally:
+            
+            HG.test_controller.ClearWrites( 'serialisable' )
+            
+            shutil.rmtree( test_dir )
+            
         
     
     def test_file_query_ids( self ):
@@ -859,6 +1047,60 @@ class TestClientDB( unittest.TestCase ):
             
         
     
+    def test_import_files( self ):
+        
+        TestClientDB._clear_db()
+        
+        test_files = []
+        
+        test_files.append( ( 'muh_jpg.jpg', '5d884d84813beeebd59a35e474fa3e4742d0f2b6679faa7609b245ddbbd05444', HC.IMAGE_JPEG ) )
+        test_files.append( ( 'muh_png.png', 'cdc67d3b377e6e1397ffa55edc5b50f6bdf4482c7a6102c6f27fa351429d6f49', HC.IMAGE_PNG ) )
+        test_files.append( ( 'muh_jpg.jpg', '5d884d84813beeebd59a35e474fa3e4742d0f2b6679faa7609b245ddbbd05444', HC.IMAGE_JPEG ) )
+        
+        file_import_jobs = []
+        
+        for ( filename, hex_hash, mime ) in test_files:
+            
+            path = os.path.join( HC.STATIC_DIR, 'testing', filename )
+            
+            file_import_job = ClientImportFileSeeds.FileImportJob( path )
+            
+            file_import_job.GenerateHashAndStatus()
+            
+            file_import_job.GenerateInfo()
+            
+            file_import_jobs.append( file_import_job )
+            
+        
+        results = self._write( 'import_files', file_import_jobs )
+        
+        self.assertEqual( [ status for ( status, note ) in results ], [ CC.STATUS_SUCCESSFUL_AND_NEW, CC.STATUS_SUCCESSFUL_AND_NEW, CC.STATUS_SUCCESSFUL_BUT_REDUNDANT ] )
+        
+        for ( filename, hex_hash, mime ) in test_files:
+            
+            hash = bytes.fromhex( hex_hash )
+            
+            media_result = self._read( 'media_result', hash )
+            
+            self.assertEqual( media_result.GetHash(), hash )
+            self.assertEqual( media_result.GetMime(), mime )
+            self.assertIn( CC.LOCAL_FILE_SERVICE_KEY, media_result.GetLocationsManager().GetCurrent() )
+            
+        
+        # the db only calls a file redundant if it is actually in the file store
+        
+        for ( filename, hex_hash, mime ) in test_files[:2]:
+            
+            path = os.path.join( HC.STATIC_DIR, 'testing', filename )
+            
+            HG.test_controller.client_files_manager.AddFile( bytes.fromhex( hex_hash ), mime, path )
+            
+        
+        results = self._write( 'import_files', file_import_jobs[:2] )
+        
+        self.assertEqual( [ status for ( status, note ) in results ], [ CC.STATUS_SUCCESSFUL_BUT_REDUNDANT, CC.STATUS_SUCCESSFUL_BUT_REDUNDANT ] )
+        
+    
     def test_import_folders( self ):
         
         import_folder_1 = ClientImportLocal.ImportFolder( 'imp 1', path = TestController.DB_DIR, mimes = HC.VIDEO, publish_files_to_popup_button = False )
@@ -1030,6 +1272,70 @@ class TestClientDB( unittest.TestCase ):
         self.assertEqual( mr_num_words, None )
         
     
+    def test_migration_convert_hashes( self ):
+        
+        TestClientDB._clear_db()
+        
+        file_import_jobs = []
+        
+        for filename in ( 'muh_jpg.jpg', 'muh_png.png' ):
+            
+            file_import_job = ClientImportFileSeeds.FileImportJob( os.path.join( HC.STATIC_DIR, 'testing', filename ) )
+            
+            file_import_job.GenerateHashAndStatus()
+            
+            file_import_job.GenerateInfo()
+            
+            file_import_jobs.append( file_import_job )
+            
+        
+        self._write( 'import_files', file_import_jobs )
+        
+        ( jpg_hash, png_hash ) = [ file_import_job.GetHash() for file_import_job in file_import_jobs ]
+        ( ( jpg_md5, jpg_sha1, jpg_sha512 ), ( png_md5, png_sha1, png_sha512 ) ) = [ file_import_job.GetExtraHashes() for file_import_job in file_import_jobs ]
+        
+        # the png goes to the trash, so it is no longer in my files
+        
+        content_update = HydrusData.ContentUpdate( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_DELETE, ( png_hash, ) )
+        
+        self._write( 'content_updates', { CC.LOCAL_FILE_SERVICE_KEY : [ content_update ] } )
+        
+        unknown_md5 = os.urandom( 16 )
+        unknown_hash = os.urandom( 32 )
+        
+        #
+        
+        result = self._read( 'migration_convert_hashes', [ jpg_md5, png_md5, unknown_md5, None ], 'md5', 'sha256' )
+        
+        self.assertEqual( result, { jpg_md5 : jpg_hash, png_md5 : png_hash } )
+        
+        result = self._read( 'migration_convert_hashes', [ jpg_sha1, png_sha1 ], 'sha1', 'sha256' )
+        
+        self.assertEqual( result, { jpg_sha1 : jpg_hash, png_sha1 : png_hash } )
+        
+        result = self._read( 'migration_convert_hashes', [ jpg_hash, png_hash, unknown_hash ], 'sha256', 'md5' )
+        
+        self.assertEqual( result, { jpg_hash : jpg_md5, png_hash : png_md5 } )
+        
+        #
+        
+        result = self._read( 'migration_convert_hashes', [ jpg_md5, png_md5 ], 'md5', 'sha256', file_service_key = CC.LOCAL_FILE_SERVICE_KEY )
+        
+        self.assertEqual( result, { jpg_md5 : jpg_hash } )
+        
+        result = self._read( 'migration_convert_hashes', [ jpg_sha1, png_sha1 ], 'sha1', 'sha256', file_service_key = CC.TRASH_SERVICE_KEY )
+        
+        self.assertEqual( result, { png_sha1 : png_hash } )
+        
+        result = self._read( 'migration_convert_hashes', [ jpg_hash, png_hash, unknown_hash ], 'sha256', 'sha256', file_service_key = CC.LOCAL_FILE_SERVICE_KEY )
+        
+        self.assertEqual( result, { jpg_hash : jpg_hash } )
+        
+        result = self._read( 'migration_convert_hashes', [ jpg_hash, png_hash ], 'sha256', 'sha1', file_service_key = CC.COMBINED_LOCAL_FILE_SERVICE_KEY )
+        
+        self.assertEqual( result, { jpg_hash : jpg_sha1, png_hash : png_sha1 } )
+        
+    
     def test_nums_pending( self ):
         
         result = self._read( 'nums_pending' )
@@ -1039,6 +1345,37 @@ class TestClientDB( unittest.TestCase ):
         # we can do more testing when I add repo service to this testing framework
         
     
+    def test_orphan_hashes( self ):
+        
+        TestClientDB._clear_db()
+        
+        path = os.path.join( HC.STATIC_DIR, 'hydrus.png' )
+        
+        file_import_job = ClientImportFileSeeds.FileImportJob( path )
+        
+        file_import_job.GenerateHashAndStatus()
+        
+        file_import_job.GenerateInfo()
+        
+        self._write( 'import_file', file_import_job )
+        
+        hash = file_import_job.GetHash()
+        
+        unknown_hash = HydrusData.GenerateKey()
+        
+        self.assertEqual( self._read( 'orphan_hashes', 'file', [ hash, unknown_hash ] ), { unknown_hash } )
+        self.assertEqual( self._read( 'orphan_hashes', 'thumbnail', [ hash, unknown_hash ] ), { unknown_hash } )
+        
+        #
+        
+        self.assertEqual( self._read( 'client_files_prefix_fingerprints' ), {} )
+        
+        self._write( 'client_files_prefix_fingerprints', [ ( 'f00', 'test location', 123456789, 5, 1500000000 ) ] )
+        self._write( 'client_files_prefix_fingerprints', [ ( 'f00', 'test location', 123456790, 6, 1500000001 ) ] )
+        
+        self.assertEqual( self._read( 'client_files_prefix_fingerprints' ), { 'f00' : ( 'test location', 123456790, 6, 1500000001 ) } )
+        
+    
     def test_pending( self ):
         
         service_key = HydrusData.GenerateKey()
@@ -1092,6 +1429,59 @@ class TestClientDB( unittest.TestCase ):
         self.assertTrue( result, ( pixiv_id, password ) )
         
     
+    def test_related_tags_cooccurrence_cache( self ):
+        
+        TestClientDB._clear_db()
+        
+        service_key = CC.DEFAULT_LOCAL_TAG_SERVICE_KEY
+        
+        ( hash_1, hash_2, hash_3 ) = [ os.urandom( 32 ) for i in range( 3 ) ]
+        
+        def do_content_updates( content_updates ):
+            
+            self._write( 'content_updates', { service_key : content_updates } )
+            
+        
+        def get_related_tags( search_tags ):
+            
+            predicates = self._read( 'related_tags', service_key, hash_1, search_tags, 10, 1.0 )
+            
+            return { predicate.GetValue() : predicate.GetCount( HC.CONTENT_STATUS_CURRENT ) for predicate in predicates }
+            
+        
+        content_updates = []
+        
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'a', ( hash_1, hash_2, hash_3 ) ) ) )
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'b', ( hash_1, hash_2 ) ) ) )
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'c', ( hash_1, ) ) ) )
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'd', ( hash_3, ) ) ) )
+        
+        do_content_updates( content_updates )
+        
+        self._write( 'regenerate_tag_cooccurrence_cache', service_key )
+        
+        self._write( 'maintain_tag_cooccurrence_cache' )
+        
+        self.assertEqual( get_related_tags( [ 'a' ] ), { 'b' : 2, 'c' : 1, 'd' : 1 } )
+        self.assertEqual( get_related_tags( [ 'b' ] ), { 'a' : 2, 'c' : 1 } )
+        
+        # incremental updates
+        
+        content_updates = []
+        
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'e', ( hash_2, ) ) ) )
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_DELETE, ( 'd', ( hash_3, ) ) ) )
+        
+        do_content_updates( content_updates )
+        
+        self.assertEqual( get_related_tags( [ 'a' ] ), { 'b' : 2, 'c' : 1, 'e' : 1 } )
+        self.assertEqual( get_related_tags( [ 'e' ] ), { 'a' : 1, 'b' : 1 } )
+        
+        #
+        
+        self._write( 'delete_tag_cooccurrence_cache', service_key )
+        
+    
     def test_services( self ):
         
         result = self._read( 'services', ( HC.LOCAL_FILE_DOMAIN, HC.LOCAL_FILE_TRASH_DOMAIN, HC.COMBINED_LOCAL_FILE, HC.LOCAL_TAG ) )
@@ -1,12 +1,17 @@
 from hydrus.client import ClientDaemons
+from hydrus.client import ClientFiles
 from hydrus.client.importing import ClientImporting
 from hydrus.client.importing import ClientImportLocal
+from hydrus.client.importing import ClientImportOptions
 from hydrus.client import ClientPaths
+from hydrus.client import ClientThreading
 import collections
 from hydrus.core import HydrusConstants as HC
 import os
 import shutil
 import stat
+import threading
+import time
 import unittest
 from hydrus.core import HydrusData
 from hydrus.client import ClientConstants as CC
@@ -53,13 +58,18 @@ class TestDaemons( unittest.TestCase ):
             HG.test_controller.SetRead( 'serialisable_named', import_folder )
             
             HG.test_controller.ClearWrites( 'import_file' )
+            HG.test_controller.ClearWrites( 'import_files' )
             HG.test_controller.ClearWrites( 'serialisable' )
             
             ClientDaemons.DAEMONCheckImportFolders()
             
             import_file = HG.test_controller.GetWrite( 'import_file' )
             
-            self.assertEqual( len( import_file ), 3 )
+            self.assertEqual( len( import_file ), 0 )
+            
+            [ ( ( file_import_jobs, ), empty_dict ) ] = HG.test_controller.GetWrite( 'import_files' )
+            
+            self.assertEqual( len( file_import_jobs ), 3 )
             
             # I need to expand tests here with the new file system
             
@@ -79,3 +89,352 @@ class TestDaemons( unittest.TestCase ):
             
         
     
+    def test_import_folders_daemon_batch_fallback( self ):
+        
+        test_dir = HydrusPaths.GetTempDir()
+        
+        try:
+            
+            HG.test_controller.SetRead( 'hash_status', ( CC.STATUS_UNKNOWN, None, '' ) )
+            
+            HydrusPaths.MakeSureDirectoryExists( test_dir )
+            
+            HydrusPaths.MirrorFile( os.path.join( HC.STATIC_DIR, 'hydrus.png' ), os.path.join( test_dir, '0' ) )
+            HydrusPaths.MirrorFile( os.path.join( HC.STATIC_DIR, 'testing', 'muh_png.png' ), os.path.join( test_dir, '1' ) )
+            
+            actions = {}
+            
+            actions[ CC.STATUS_SUCCESSFUL_AND_NEW ] = CC.IMPORT_FOLDER_DELETE
+            actions[ CC.STATUS_SUCCESSFUL_BUT_REDUNDANT ] = CC.IMPORT_FOLDER_DELETE
+            actions[ CC.STATUS_DELETED ] = CC.IMPORT_FOLDER_DELETE
+            actions[ CC.STATUS_ERROR ] = CC.IMPORT_FOLDER_IGNORE
+            
+            import_folder = ClientImportLocal.ImportFolder( 'imp', path = test_dir, actions = actions )
+            
+            HG.test_controller.SetRead( 'serialisable_names', [ 'imp' ] )
+            HG.test_controller.SetRead( 'serialisable_named', import_folder )
+            
+            HG.test_controller.ClearWrites( 'import_file' )
+            HG.test_controller.ClearWrites( 'import_files' )
+            HG.test_controller.ClearWrites( 'serialisable' )
+            
+            # the batch job fails, so each file should be retried on its own
+            
+            HG.test_controller.SetWriteException( 'import_files', Exception( 'Batch failed to import for some reason!' ) )
+            
+            try:
+                
+                ClientDaemons.DAEMONCheckImportFolders()
+                
+            finally:
+                
+                HG.test_controller.SetWriteException( 'import_files', None )
+                
+            
+            [ ( ( file_import_jobs, ), empty_dict ) ] = HG.test_controller.GetWrite( 'import_files' )
+            
+            self.assertEqual( len( file_import_jobs ), 2 )
+            
+            import_file = HG.test_controller.GetWrite( 'import_file' )
+            
+            self.assertEqual( len( import_file ), 2 )
+            
+            self.assertEqual( { file_import_job.GetHash() for ( ( file_import_job, ), empty_dict ) in import_file }, { file_import_job.GetHash() for file_import_job in file_import_jobs } )
+            
+            self.assertTrue( not os.path.exists( os.path.join( test_dir, '0' ) ) )
+            self.assertTrue( not os.path.exists( os.path.join( test_dir, '1' ) ) )
+            
+        finally:
+            
+            shutil.rmtree( test_dir )
+            
+        
+    
+    def test_import_folders_daemon_filename_tags( self ):
+        
+        test_dir = HydrusPaths.GetTempDir()
+        
+        try:
+            
+            HydrusPaths.MakeSureDirectoryExists( test_dir )
+            
+            HydrusPaths.MirrorFile( os.path.join( HC.STATIC_DIR, 'hydrus.png' ), os.path.join( test_dir, '0' ) )
+            
+            filename_tagging_options = ClientImportOptions.FilenameTaggingOptions()
+            
+            filename_tagging_options.SimpleSetTuple( set(), False, ( True, 'filename' ), {} )
+            
+            tag_service_keys_to_filename_tagging_options = { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : filename_tagging_options }
+            
+            actions = {}
+            
+            actions[ CC.STATUS_SUCCESSFUL_AND_NEW ] = CC.IMPORT_FOLDER_IGNORE
+            actions[ CC.STATUS_SUCCESSFUL_BUT_REDUNDANT ] = CC.IMPORT_FOLDER_IGNORE
+            actions[ CC.STATUS_DELETED ] = CC.IMPORT_FOLDER_IGNORE
+            actions[ CC.STATUS_ERROR ] = CC.IMPORT_FOLDER_IGNORE
+            
+            def get_filename_tags():
+                
+                tags = set()
+                
+                for ( ( service_keys_to_content_updates, ), kwargs ) in HG.test_controller.GetWrite( 'content_updates' ):
+                    
+                    for content_update in service_keys_to_content_updates.get( CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, [] ):
+                        
+                        ( data_type, action, row ) = content_update.ToTuple()
+                        
+                        if data_type == HC.CONTENT_TYPE_MAPPINGS:
+                            
+                            ( tag, hashes ) = row
+                            
+                            tags.add( tag )
+                            
+                        
+                    
+                
+                return tags
+                
+            
+            # a previously deleted file is skipped, so it gets no filename tags
+            
+            HG.test_controller.SetRead( 'hash_status', ( CC.STATUS_DELETED, None, '' ) )
+            
+            import_folder = ClientImportLocal.ImportFolder( 'imp', path = test_dir, tag_service_keys_to_filename_tagging_options = tag_service_keys_to_filename_tagging_options, actions = actions )
+            
+            self.assertTrue( import_folder._file_import_options.ExcludesDeleted() )
+            
+            HG.test_controller.SetRead( 'serialisable_names', [ 'imp' ] )
+            HG.test_controller.SetRead( 'serialisable_named', import_folder )
+            
+            HG.test_controller.ClearWrites( 'content_updates' )
+            HG.test_controller.ClearWrites( 'import_files' )
+            
+            ClientDaemons.DAEMONCheckImportFolders()
+            
+            self.assertEqual( HG.test_controller.GetWrite( 'import_files' ), [] )
+            
+            self.assertEqual( get_filename_tags(), set() )
+            
+            # a new file does
+            
+            HG.test_controller.SetRead( 'hash_status', ( CC.STATUS_UNKNOWN, None, '' ) )
+            
+            import_folder = ClientImportLocal.ImportFolder( 'imp', path = test_dir, tag_service_keys_to_filename_tagging_options = tag_service_keys_to_filename_tagging_options, actions = actions )
+            
+            HG.test_controller.SetRead( 'serialisable_named', import_folder )
+            
+            ClientDaemons.DAEMONCheckImportFolders()
+            
+            self.assertEqual( get_filename_tags(), { 'filename:0' } )
+            
+        finally:
+            
+            shutil.rmtree( test_dir )
+            
+        
+    
+class FakeMaintenanceMediaResult( object ):
+    
+    def __init__( self, hash ):
+        
+        self._hash = hash
+        
+    
+    def GetHash( self ):
+        
+        return self._hash
+        
+    
+class TestFilesMaintenance( unittest.TestCase ):
+    
+    def _GetManager( self ):
+        
+        manager = ClientFiles.FilesMaintenanceManager( HG.test_controller )
+        
+        self._lock = threading.Lock()
+        self._num_running = 0
+        self._max_running = 0
+        
+        def run_job_on_file( media_result, job_type ):
+            
+            with self._lock:
+                
+                self._num_running += 1
+                self._max_running = max( self._max_running, self._num_running )
+                
+            
+            time.sleep( 0.02 )
+            
+            with self._lock:
+                
+                self._num_running -= 1
+                
+            
+            return ( None, False, False )
+            
+        
+        manager._RunJobOnFile = run_job_on_file
+        
+        return manager
+        
+    
+    def _GetMediaResults( self, num_files ):
+        
+        return [ FakeMaintenanceMediaResult( HydrusData.GenerateKey() ) for i in range( num_files ) ]
+        
+    
+    def test_batched_clears( self ):
+        
+        manager = self._GetManager()
+        
+        media_results = self._GetMediaResults( 250 )
+        
+        HG.test_controller.ClearWrites( 'file_maintenance_clear_jobs' )
+        
+        manager._RunJob( media_results, ClientFiles.REGENERATE_FILE_DATA_JOB_FIX_PERMISSIONS, ClientThreading.JobKey() )
+        
+        writes = HG.test_controller.GetWrite( 'file_maintenance_clear_jobs' )
+        
+        # a save every hundred, and the rest when the job is done
+        
+        self.assertEqual( [ len( cleared_jobs ) for ( ( cleared_jobs, ), kwargs ) in writes ], [ 100, 100, 50 ] )
+        
+        cleared_hashes = [ hash for ( ( cleared_jobs, ), kwargs ) in writes for ( hash, job_type, additional_data ) in cleared_jobs ]
+        
+        self.assertEqual( sorted( cleared_hashes ), sorted( ( media_result.GetHash() for media_result in media_results ) ) )
+        
+    
+    def test_immediate_work_waits_on_background_work( self ):
+        
+        manager = self._GetManager()
+        
+        background_media_results = self._GetMediaResults( 200 )
+        immediate_media_results = self._GetMediaResults( 10 )
+        
+        immediate_hashes = { media_result.GetHash() for media_result in immediate_media_results }
+        
+        running = collections.Counter()
+        overlaps = []
+        
+        def run_job_on_file( media_result, job_type ):
+            
+            is_immediate = media_result.GetHash() in immediate_hashes
+            
+            with self._lock:
+                
+                running[ is_immediate ] += 1
+                
+                if running[ True ] > 0 and running[ False ] > 0:
+                    
+                    overlaps.append( media_result.GetHash() )
+                    
+                
+            
+            time.sleep( 0.01 )
+            
+            with self._lock:
+                
+                running[ is_immediate ] -= 1
+                
+            
+            return ( None, False, False )
+            
+        
+        manager._RunJobOnFile = run_job_on_file
+        
+        background_files_started = threading.Event()
+        
+        def wait_to_work():
+            
+            background_files_started.set()
+            
+            if manager._reset_background_event.is_set():
+                
+                manager._reset_background_event.clear()
+                
+                return False
+                
+            
+            return True
+            
+        
+        background_thread = threading.Thread( target = manager._RunJob, args = ( background_media_results, ClientFiles.REGENERATE_FILE_DATA_JOB_FIX_PERMISSIONS, ClientThreading.JobKey() ), kwargs = { 'wait_to_work' : wait_to_work } )
+        
+        background_thread.start()
+        
+        background_files_started.wait( 5 )
+        
+        manager.RunJobImmediately( immediate_media_results, ClientFiles.REGENERATE_FILE_DATA_JOB_FIX_PERMISSIONS, pub_job_key = False )
+        
+        background_thread.join()
+        
+        self.assertEqual( overlaps, [] )
+        
+        HG.test_controller.ClearWrites( 'file_maintenance_clear_jobs' )
+        
+    
+    def test_pool_size( self ):
+        
+        manager = self._GetManager()
+        
+        HG.test_controller.ClearWrites( 'file_maintenance_clear_jobs' )
+        
+        HG.test_controller.new_options.SetInteger( 'file_maintenance_threads', 3 )
+        
+        try:
+            
+            manager._RunJob( self._GetMediaResults( 30 ), ClientFiles.REGENERATE_FILE_DATA_JOB_FIX_PERMISSIONS, ClientThreading.JobKey() )
+            
+            self.assertEqual( self._max_running, 3 )
+            
+            # one thread means no pool at all
+            
+            HG.test_controller.new_options.SetInteger( 'file_maintenance_threads', 1 )
+            
+            self._max_running = 0
+            
+            manager._RunJob( self._GetMediaResults( 10 ), ClientFiles.REGENERATE_FILE_DATA_JOB_FIX_PERMISSIONS, ClientThreading.JobKey() )
+            
+            self.assertEqual( self._max_running, 1 )
+            
+        finally:
+            
+            HG.test_controller.new_options.SetInteger( 'file_maintenance_threads', 4 )
+            
+            HG.test_controller.ClearWrites( 'file_maintenance_clear_jobs' )
+            
+        
+    
+    def test_per_type_limits( self ):
+        
+        manager = self._GetManager()
+        
+        HG.test_controller.ClearWrites( 'file_maintenance_clear_jobs' )
+        
+        HG.test_controller.new_options.SetInteger( 'file_maintenance_threads', 16 )
+        
+        try:
+            
+            # the similar files tree work is all db, so it does not get a pool
+            
+            manager._RunJob( self._GetMediaResults( 10 ), ClientFiles.REGENERATE_FILE_DATA_JOB_CHECK_SIMILAR_FILES_MEMBERSHIP, ClientThreading.JobKey() )
+            
+            self.assertEqual( self._max_running, 1 )
+            
+            for job_type in ( ClientFiles.REGENERATE_FILE_DATA_JOB_FILE_METADATA, ClientFiles.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE ):
+                
+                self._max_running = 0
+                
+                manager._RunJob( self._GetMediaResults( 40 ), job_type, ClientThreading.JobKey() )
+                
+                self.assertEqual( self._max_running, ClientFiles.regen_file_enum_to_max_threads_lookup[ job_type ] )
+                
+            
+        finally:
+            
+            HG.test_controller.new_options.SetInteger( 'file_maintenance_threads', 4 )
+            
+            HG.test_controller.ClearWrites( 'file_maintenance_clear_jobs' )
+            
+        
+    
@@ -1,12 +1,87 @@
 from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientImageHandling
+from hydrus.client import ClientRendering
 import collections
 from hydrus.core import HydrusConstants as HC
+from hydrus.core import HydrusData
+from hydrus.core import HydrusGlobals as HG
+from hydrus.core import HydrusImageHandling
+from hydrus.core import HydrusPaths
+import numpy
 import os
+import threading
 import unittest
+from qtpy import QtCore as QC
+
+class FakeMedia( object ):
+    
+    def __init__( self, hash, mime, resolution ):
+        
+        self._hash = hash
+        self._mime = mime
+        self._resolution = resolution
+        
+    
+    def GetHash( self ): return self._hash
+    
+    def GetMime( self ): return self._mime
+    
+    def GetNumFrames( self ): return 1
+    
+    def GetResolution( self ): return self._resolution
+    
 
 class TestImageHandling( unittest.TestCase ):
     
+    def test_clip_resize( self ):
+        
+        ( ys, xs ) = numpy.mgrid[ 0 : 200, 0 : 300 ]
+        
+        numpy_image = numpy.dstack( [ 127 + 100 * numpy.sin( xs / 7 ) * numpy.cos( ys / 9 ), xs * 255 / 300, ys * 255 / 200 ] ).astype( numpy.uint8 )
+        
+        half_numpy_image = ClientImageHandling.GenerateHalfSizeNumPyImage( numpy_image )
+        
+        self.assertEqual( half_numpy_image.shape, ( 100, 150, 3 ) )
+        
+        tile_dimension = 128
+        
+        for ( target_width, target_height ) in ( ( 300, 200 ), ( 750, 500 ), ( 1000, 667 ), ( 210, 140 ) ):
+            
+            x_scale = target_width / 300
+            y_scale = target_height / 200
+            
+            tiled_numpy_image = numpy.zeros( ( target_height, target_width, 3 ), dtype = numpy.uint8 )
+            
+            for y in range( 0, target_height, tile_dimension ):
+                
+                for x in range( 0, target_width, tile_dimension ):
+                    
+                    width = min( tile_dimension, target_width - x )
+                    height = min( tile_dimension, target_height - y )
+                    
+                    clip = ( x / x_scale, y / y_scale, width / x_scale, height / y_scale )
+                    
+                    tiled_numpy_image[ y : y + height, x : x + width ] = ClientImageHandling.ResizeNumPyImageClipForMediaViewer( HC.IMAGE_PNG, numpy_image, clip, ( width, height ) )
+                    
+                
+            
+            # the tiles should have no seams
+            
+            whole_numpy_image = ClientImageHandling.ResizeNumPyImageClipForMediaViewer( HC.IMAGE_PNG, numpy_image, ( 0, 0, 300, 200 ), ( target_width, target_height ) )
+            
+            self.assertTrue( ( tiled_numpy_image == whole_numpy_image ).all() )
+            
+            if x_scale >= 1.0:
+                
+                # and scaling up, they should sample just like a normal resize
+                
+                resized_numpy_image = ClientImageHandling.ResizeNumPyImageForMediaViewer( HC.IMAGE_PNG, numpy_image, ( target_width, target_height ) )
+                
+                self.assertLessEqual( numpy.abs( tiled_numpy_image.astype( int ) - resized_numpy_image.astype( int ) ).max(), 2 )
+                
+            
+        
+    
     def test_phash( self ):
         
         phashes = ClientImageHandling.GenerateShapePerceptualHashes( os.path.join( HC.STATIC_DIR, 'hydrus.png' ), HC.IMAGE_PNG )
@@ -21,3 +96,115 @@ class TestImageHandling( unittest.TestCase ):
         
         self.assertEqual( phashes, set( [ b'\xb4M\xc7\xb2M\xcb8\x1c' ] ) )
         
+    
+    def test_reduced_jpeg_decode( self ):
+        
+        self.assertEqual( HydrusImageHandling.GetJPEGDecodeReduction( ( 4000, 3000 ), ( 150, 112 ) ), 8 )
+        self.assertEqual( HydrusImageHandling.GetJPEGDecodeReduction( ( 4000, 3000 ), ( 1000, 750 ) ), 2 )
+        self.assertEqual( HydrusImageHandling.GetJPEGDecodeReduction( ( 3000, 4000 ), ( 1000, 750 ) ), 2 )
+        self.assertEqual( HydrusImageHandling.GetJPEGDecodeReduction( ( 4000, 3000 ), ( 2000, 1500 ) ), 1 )
+        
+        ( ys, xs ) = numpy.mgrid[ 0 : 1200, 0 : 1600 ]
+        
+        numpy_image = numpy.dstack( [ 127 + 100 * numpy.sin( xs / 37 ) * numpy.cos( ys / 41 ), xs * 255 / 1600, ys * 255 / 1200 ] ).astype( numpy.uint8 )
+        
+        ( os_file_handle, temp_path ) = HydrusPaths.GetTempPath( suffix = '.jpg' )
+        
+        try:
+            
+            HydrusImageHandling.GeneratePILImageFromNumPyImage( numpy_image ).save( temp_path, 'JPEG', quality = 95 )
+            
+            target_resolution = HydrusImageHandling.GetThumbnailResolution( ( 1600, 1200 ), ( 150, 125 ) )
+            
+            full_thumbnail = HydrusImageHandling.ResizeNumPyImage( HydrusImageHandling.GenerateNumPyImage( temp_path, HC.IMAGE_JPEG ), target_resolution )
+            
+            for force_pil in ( False, True ):
+                
+                reduced_numpy_image = HydrusImageHandling.GenerateNumPyImage( temp_path, HC.IMAGE_JPEG, force_pil = force_pil, target_resolution = target_resolution )
+                
+                self.assertEqual( reduced_numpy_image.shape, ( 300, 400, 3 ) )
+                
+                reduced_thumbnail = HydrusImageHandling.ResizeNumPyImage( reduced_numpy_image, target_resolution )
+                
+                self.assertLessEqual( numpy.abs( reduced_thumbnail.astype( int ) - full_thumbnail.astype( int ) ).max(), 8 )
+                
+            
+            # not a jpeg, so no reduction
+            
+            png_numpy_image = HydrusImageHandling.GenerateNumPyImage( os.path.join( HC.STATIC_DIR, 'hydrus.png' ), HC.IMAGE_PNG, target_resolution = ( 1, 1 ) )
+            
+            self.assertEqual( png_numpy_image.shape, HydrusImageHandling.GenerateNumPyImage( os.path.join( HC.STATIC_DIR, 'hydrus.png' ), HC.IMAGE_PNG ).shape )
+            
+        finally:
+            
+            HydrusPaths.CleanUpTempPath( os_file_handle, temp_path )
+            
+        
+    
+    def test_renderer_full_load_in_background( self ):
+        
+        ( ys, xs ) = numpy.mgrid[ 0 : 1200, 0 : 1600 ]
+        
+        numpy_image = numpy.dstack( [ xs * 255 / 1600, ys * 255 / 1200, ( xs + ys ) * 255 / 2800 ] ).astype( numpy.uint8 )
+        
+        ( os_file_handle, temp_path ) = HydrusPaths.GetTempPath( suffix = '.jpg' )
+        
+        try:
+            
+            HydrusImageHandling.GeneratePILImageFromNumPyImage( numpy_image ).save( temp_path, 'JPEG', quality = 95 )
+            
+            hash = HydrusData.GenerateKey()
+            
+            HG.test_controller.client_files_manager.AddFile( hash, HC.IMAGE_JPEG, temp_path )
+            
+        finally:
+            
+            HydrusPaths.CleanUpTempPath( os_file_handle, temp_path )
+            
+        
+        media = FakeMedia( hash, HC.IMAGE_JPEG, ( 1600, 1200 ) )
+        
+        image_renderer = ClientRendering.ImageRenderer( media, target_resolution = ( 400, 300 ), initialise_in_thread = False )
+        
+        image_renderer.Initialise()
+        
+        self.assertFalse( image_renderer.IsFullQuality() )
+        
+        # hold the worker up, so we can see the first draw does not wait for it
+        
+        gate = threading.Event()
+        loaded = threading.Event()
+        
+        original_load = image_renderer.LoadFullNumPyImage
+        
+        def gated_load():
+            
+            gate.wait( 10 )
+            
+            original_load()
+            
+            loaded.set()
+            
+        
+        image_renderer.LoadFullNumPyImage = gated_load
+        
+        clip_rect = QC.QRect( 512, 512, 512, 512 )
+        target_resolution = QC.QSize( 1600, 1200 )
+        
+        tile = image_renderer._GetNumPyImage( clip_rect = clip_rect, target_resolution = target_resolution )
+        
+        self.assertEqual( tile.shape, ( 512, 512, 3 ) )
+        self.assertFalse( image_renderer.IsFullQuality() )
+        
+        gate.set()
+        
+        self.assertTrue( loaded.wait( 10 ) )
+        
+        self.assertTrue( image_renderer.IsFullQuality() )
+        
+        tile = image_renderer._GetNumPyImage( clip_rect = clip_rect, target_resolution = target_resolution )
+        
+        self.assertEqual( tile.shape, ( 512, 512, 3 ) )
+        self.assertLessEqual( numpy.abs( tile.astype( int ) - numpy_image[ 512 : 1024, 512 : 1024 ].astype( int ) ).max(), 8 )
+        
+    
@@ -0,0 +1,493 @@
+from hydrus.client import ClientConstants as CC
+from hydrus.client import ClientMedia
+from hydrus.client import ClientMediaManagers
+from hydrus.client import ClientTags
+from hydrus.core import HydrusConstants as HC
+from hydrus.core import HydrusData
+import collections
+import gc
+import random
+import threading
+import unittest
+
+class FakeMediaList( object ):
+    
+    def __init__( self ):
+        
+        self.service_keys_to_content_updates = None
+        
+    
+    def ProcessContentUpdates( self, service_keys_to_content_updates ):
+        
+        self.service_keys_to_content_updates = service_keys_to_content_updates
+        
+    
+class FakeController( object ):
+    
+    def sub( self, *args, **kwargs ):
+        
+        pass
+        
+    
+class FakeSingletonMedia( object ):
+    
+    def __init__( self, hash, statuses_to_tags ):
+        
+        self._hash = hash
+        self.statuses_to_tags = statuses_to_tags
+        
+    
+    def GetHash( self ):
+        
+        return self._hash
+        
+    
+    def GetStatusesToTags( self, service_key, tag_display_type ):
+        
+        return self.statuses_to_tags
+        
+    
+    def GetTagsManager( self ):
+        
+        return self
+        
+    
+    def IsCollection( self ):
+        
+        return False
+        
+    
+def GetSizeMediaResult( hash, size ):
+    
+    file_info_manager = ClientMediaManagers.FileInfoManager( 1, hash, size = size, mime = HC.IMAGE_PNG, width = 200, height = 200 )
+    
+    tags_manager = ClientMediaManagers.TagsManager( collections.defaultdict( HydrusData.default_dict_set ) )
+    locations_manager = ClientMediaManagers.LocationsManager( { CC.LOCAL_FILE_SERVICE_KEY }, set(), set(), set(), inbox = True )
+    ratings_manager = ClientMediaManagers.RatingsManager( {} )
+    notes_manager = ClientMediaManagers.NotesManager( {} )
+    file_viewing_stats_manager = ClientMediaManagers.FileViewingStatsManager( 0, 0, 0, 0 )
+    
+    return ClientMedia.MediaResult( file_info_manager, tags_manager, locations_manager, ratings_manager, notes_manager, file_viewing_stats_manager )
+    
+def FakeHash( hash_id ):
+    
+    return hash_id.to_bytes( 32, 'big' )
+    
+class FakeMediaResult( object ):
+    
+    def __init__( self, hash_id ):
+        
+        self._hash_id = hash_id
+        
+    
+    def GetHash( self ):
+        
+        return FakeHash( self._hash_id )
+        
+    
+    def GetHashId( self ):
+        
+        return self._hash_id
+        
+    
+class TestIndexRanges( unittest.TestCase ):
+    
+    def test_add( self ):
+        
+        index_ranges = ClientMedia.IndexRanges()
+        
+        index_ranges.AddRange( 10, 20 )
+        index_ranges.AddRange( 30, 40 )
+        
+        self.assertEqual( index_ranges.GetRanges(), [ ( 10, 20 ), ( 30, 40 ) ] )
+        self.assertEqual( len( index_ranges ), 20 )
+        
+        index_ranges.AddRange( 20, 25 )
+        
+        self.assertEqual( index_ranges.GetRanges(), [ ( 10, 25 ), ( 30, 40 ) ] )
+        
+        index_ranges.AddRange( 5, 35 )
+        
+        self.assertEqual( index_ranges.GetRanges(), [ ( 5, 40 ) ] )
+        
+        index_ranges.AddIndices( [ 50, 3, 51, 52, 40, 50 ] )
+        
+        self.assertEqual( index_ranges.GetRanges(), [ ( 3, 4 ), ( 5, 41 ), ( 50, 53 ) ] )
+        
+        self.assertIn( 3, index_ranges )
+        self.assertIn( 40, index_ranges )
+        self.assertNotIn( 4, index_ranges )
+        self.assertNotIn( 41, index_ranges )
+        self.assertNotIn( 53, index_ranges )
+        
+        self.assertEqual( list( index_ranges.IterateIndices() ), [ 3 ] + list( range( 5, 41 ) ) + [ 50, 51, 52 ] )
+        
+    
+    def test_inverse( self ):
+        
+        index_ranges = ClientMedia.IndexRanges()
+        
+        self.assertEqual( index_ranges.GetInverse( 10 ).GetRanges(), [ ( 0, 10 ) ] )
+        
+        index_ranges.AddRange( 0, 3 )
+        index_ranges.AddRange( 5, 7 )
+        
+        self.assertEqual( index_ranges.GetInverse( 10 ).GetRanges(), [ ( 3, 5 ), ( 7, 10 ) ] )
+        
+        index_ranges.AddRange( 7, 10 )
+        
+        self.assertEqual( index_ranges.GetInverse( 10 ).GetRanges(), [ ( 3, 5 ) ] )
+        
+    
+    def test_remove( self ):
+        
+        index_ranges = ClientMedia.IndexRanges()
+        
+        index_ranges.AddRange( 0, 100 )
+        
+        index_ranges.RemoveRange( 10, 20 )
+        
+        self.assertEqual( index_ranges.GetRanges(), [ ( 0, 10 ), ( 20, 100 ) ] )
+        
+        index_ranges.RemoveRange( 5, 25 )
+        
+        self.assertEqual( index_ranges.GetRanges(), [ ( 0, 5 ), ( 25, 100 ) ] )
+        
+        index_ranges.RemoveRange( 0, 5 )
+        index_ranges.RemoveRange( 99, 200 )
+        
+        self.assertEqual( index_ranges.GetRanges(), [ ( 25, 99 ) ] )
+        
+        index_ranges.RemoveRange( 0, 25 )
+        
+        self.assertEqual( index_ranges.GetRanges(), [ ( 25, 99 ) ] )
+        
+        index_ranges.RemoveRange( 0, 1000 )
+        
+        self.assertEqual( index_ranges.GetRanges(), [] )
+        self.assertEqual( len( index_ranges ), 0 )
+        
+    
+class TestMediaListHashIndex( unittest.TestCase ):
+    
+    def test_routing( self ):
+        
+        index = ClientMedia.MediaListHashIndex( FakeController(), lambda o: True )
+        
+        ( hash_1, hash_2, hash_3 ) = [ HydrusData.GenerateKey() for i in range( 3 ) ]
+        
+        media_list_1 = FakeMediaList()
+        media_list_2 = FakeMediaList()
+        media_list_all = FakeMediaList()
+        
+        id_1 = index.AddMediaList( media_list_1 )
+        id_2 = index.AddMediaList( media_list_2 )
+        id_all = index.AddMediaList( media_list_all, wants_all_hashes = True )
+        
+        index.SetHashes( id_1, { hash_1, hash_2 } )
+        index.AddHashes( id_2, [ hash_2 ] )
+        
+        content_update = HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'tag', { hash_1 } ) )
+        
+        index.ProcessContentUpdates( { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : [ content_update ] } )
+        
+        self.assertEqual( media_list_1.service_keys_to_content_updates, { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : [ content_update ] } )
+        self.assertEqual( media_list_2.service_keys_to_content_updates, None )
+        self.assertEqual( media_list_all.service_keys_to_content_updates, { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : [ content_update ] } )
+        
+        # only the updates that touch a list go to it
+        
+        media_list_1.service_keys_to_content_updates = None
+        
+        content_update_2 = HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'tag', { hash_2, hash_3 } ) )
+        content_update_3 = HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'tag', { hash_3 } ) )
+        
+        index.ProcessContentUpdates( { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : [ content_update_2, content_update_3 ] } )
+        
+        self.assertEqual( media_list_1.service_keys_to_content_updates, { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : [ content_update_2 ] } )
+        self.assertEqual( media_list_2.service_keys_to_content_updates, { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : [ content_update_2 ] } )
+        self.assertEqual( media_list_all.service_keys_to_content_updates, { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : [ content_update_2, content_update_3 ] } )
+        
+        # losing media
+        
+        media_list_1.service_keys_to_content_updates = None
+        
+        index.SetHashes( id_1, { hash_2 } )
+        
+        index.ProcessContentUpdates( { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : [ content_update ] } )
+        
+        self.assertEqual( media_list_1.service_keys_to_content_updates, None )
+        
+        self.assertEqual( index.GetNumHashes(), 1 )
+        
+        # closing
+        
+        del media_list_1
+        del media_list_2
+        
+        gc.collect()
+        
+        self.assertEqual( index.GetNumHashes(), 0 )
+        
+    
+    def test_collection_while_locked( self ):
+        
+        index = ClientMedia.MediaListHashIndex( FakeController(), lambda o: True )
+        
+        media_list = FakeMediaList()
+        
+        media_list_id = index.AddMediaList( media_list )
+        
+        index.SetHashes( media_list_id, { HydrusData.GenerateKey() } )
+        
+        # a reference cycle, so only the garbage collector can free it
+        media_list.cycle = media_list
+        
+        del media_list
+        
+        # the collector can run at any allocation, including one made while the index holds its lock
+        
+        def collect_under_lock():
+            
+            with index._lock:
+                
+                gc.collect()
+                
+            
+        
+        thread = threading.Thread( target = collect_under_lock, daemon = True )
+        
+        thread.start()
+        
+        thread.join( 10 )
+        
+        self.assertFalse( thread.is_alive() )
+        
+        self.assertEqual( index.GetNumHashes(), 0 )
+        
+    
+class TestSorting( unittest.TestCase ):
+    
+    def test_file_info_update_resorts( self ):
+        
+        hashes = [ HydrusData.GenerateKey() for i in range( 3 ) ]
+        
+        media_list = ClientMedia.MediaList( CC.LOCAL_FILE_SERVICE_KEY, [ GetSizeMediaResult( hash, size ) for ( hash, size ) in zip( hashes, ( 100, 200, 300 ) ) ] )
+        
+        media_sort = ClientMedia.MediaSort( ( 'system', CC.SORT_FILES_BY_FILESIZE ), CC.SORT_ASC )
+        
+        media_list.Sort( media_sort )
+        
+        self.assertEqual( [ media.GetHash() for media in media_list.GetSortedMedia() ], hashes )
+        
+        # the first file got regenerated and is now the biggest, so its cached sort key has to go
+        
+        media_list.UpdateFileInfo( { hashes[0] : GetSizeMediaResult( hashes[0], 400 ) } )
+        
+        media_list.Sort( media_sort )
+        
+        self.assertEqual( [ media.GetHash() for media in media_list.GetSortedMedia() ], hashes[1:] + hashes[:1] )
+        
+    
+    def test_sorted_indices( self ):
+        
+        r = random.Random( 0 )
+        
+        num_items = 500
+        
+        items = list( range( num_items ) )
+        
+        numeric_passes = [ ( [ r.randint( 0, 5 ) for i in items ], False ), ( [ r.choice( [ -1, 0.5, 3 ] ) for i in items ], True ) ]
+        mixed_passes = [ ( [ r.randint( 0, 5 ) for i in items ], True ), ( [ [ r.choice( 'ab' ) ] for i in items ], False ) ]
+        
+        for sort_passes in ( numeric_passes, mixed_passes ):
+            
+            expected = list( items )
+            
+            for ( keys, reverse ) in sort_passes:
+                
+                expected.sort( key = lambda i: keys[ i ], reverse = reverse )
+                
+            
+            self.assertEqual( ClientMedia.GetSortedIndices( sort_passes ), expected )
+            
+        
+        self.assertEqual( ClientMedia.GetSortedIndices( [] ), [] )
+        self.assertEqual( ClientMedia.GetSortedIndices( [ ( [], False ) ] ), [] )
+        
+    
+    def test_sorted_list( self ):
+        
+        sorted_list = ClientMedia.SortedList( [ 3, 1, 2 ] )
+        
+        sorted_list.set_sorted_items( [ 3, 2, 1 ], lambda x: x, reverse = True )
+        
+        self.assertEqual( list( sorted_list ), [ 3, 2, 1 ] )
+        self.assertEqual( sorted_list.index( 1 ), 2 )
+        
+        sorted_list.insert_items( [ 5, 0 ] )
+        
+        self.assertEqual( list( sorted_list ), [ 5, 3, 2, 1, 0 ] )
+        
+    
+class TestTagCountIndex( unittest.TestCase ):
+    
+    def _GetStatusesToTags( self, current = None, pending = None ):
+        
+        statuses_to_tags = collections.defaultdict( set )
+        
+        if current is not None:
+            
+            statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ] = set( current )
+            
+        
+        if pending is not None:
+            
+            statuses_to_tags[ HC.CONTENT_STATUS_PENDING ] = set( pending )
+            
+        
+        return statuses_to_tags
+        
+    
+    def test_counts( self ):
+        
+        media_1 = FakeSingletonMedia( HydrusData.GenerateKey(), self._GetStatusesToTags( current = [ 'blue eyes', 'character:samus aran' ] ) )
+        media_2 = FakeSingletonMedia( HydrusData.GenerateKey(), self._GetStatusesToTags( current = [ 'blue eyes' ], pending = [ 'blonde hair' ] ) )
+        
+        tag_count_index = ClientMedia.TagCountIndex( CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, ClientTags.TAG_DISPLAY_STORAGE )
+        
+        tag_count_index.AddMedia( [ media_1, media_2, media_1 ] )
+        
+        ( current_tags_to_count, deleted_tags_to_count, pending_tags_to_count, petitioned_tags_to_count ) = tag_count_index.GetTagsToCounts()
+        
+        self.assertEqual( tag_count_index.GetNumFiles(), 2 )
+        self.assertEqual( current_tags_to_count, { 'blue eyes' : 2, 'character:samus aran' : 1 } )
+        self.assertEqual( pending_tags_to_count, { 'blonde hair' : 1 } )
+        self.assertEqual( len( deleted_tags_to_count ), 0 )
+        
+        # a tag change only needs those files counted again
+        
+        media_2.statuses_to_tags = self._GetStatusesToTags( current = [ 'blue eyes', 'blonde hair' ] )
+        
+        tag_count_index.RefreshHashes( { media_2.GetHash() } )
+        
+        ( current_tags_to_count, deleted_tags_to_count, pending_tags_to_count, petitioned_tags_to_count ) = tag_count_index.GetTagsToCounts()
+        
+        self.assertEqual( current_tags_to_count, { 'blue eyes' : 2, 'character:samus aran' : 1, 'blonde hair' : 1 } )
+        self.assertEqual( len( pending_tags_to_count ), 0 )
+        
+        tag_count_index.RemoveHashesNotIn( { media_2.GetHash() } )
+        
+        ( current_tags_to_count, deleted_tags_to_count, pending_tags_to_count, petitioned_tags_to_count ) = tag_count_index.GetTagsToCounts()
+        
+        self.assertEqual( tag_count_index.GetNumFiles(), 1 )
+        self.assertEqual( current_tags_to_count, { 'blue eyes' : 1, 'blonde hair' : 1 } )
+        
+    
+    def test_search( self ):
+        
+        media_1 = FakeSingletonMedia( HydrusData.GenerateKey(), self._GetStatusesToTags( current = [ 'blue eyes', 'character:samus aran' ] ) )
+        media_2 = FakeSingletonMedia( HydrusData.GenerateKey(), self._GetStatusesToTags( current = [ 'blue eyes' ], pending = [ 'blonde hair' ] ) )
+        
+        tag_count_index = ClientMedia.TagCountIndex( CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, ClientTags.TAG_DISPLAY_STORAGE )
+        
+        tag_count_index.AddMedia( [ media_1, media_2 ] )
+        
+        self.assertEqual( tag_count_index.GetCurrentAndPendingCountsForSearch( 'bl*' ), ( { 'blue eyes' : 2 }, { 'blonde hair' : 1 } ) )
+        self.assertEqual( tag_count_index.GetCurrentAndPendingCountsForSearch( 'ey*' ), ( { 'blue eyes' : 2 }, {} ) )
+        self.assertEqual( tag_count_index.GetCurrentAndPendingCountsForSearch( 'samus*' ), ( { 'character:samus aran' : 1 }, {} ) )
+        self.assertEqual( tag_count_index.GetCurrentAndPendingCountsForSearch( 'character:sam*' ), ( { 'character:samus aran' : 1 }, {} ) )
+        self.assertEqual( tag_count_index.GetCurrentAndPendingCountsForSearch( 'red*' ), ( {}, {} ) )
+        
+        # new tags turning up get searched too
+        
+        media_3 = FakeSingletonMedia( HydrusData.GenerateKey(), self._GetStatusesToTags( current = [ 'red eyes' ] ) )
+        
+        tag_count_index.AddMedia( [ media_3 ] )
+        
+        self.assertEqual( tag_count_index.GetCurrentAndPendingCountsForSearch( 'red*' ), ( { 'red eyes' : 1 }, {} ) )
+        
+        tag_count_index.RemoveHashesNotIn( { media_1.GetHash() } )
+        
+        self.assertEqual( tag_count_index.GetCurrentAndPendingCountsForSearch( 'bl*' ), ( { 'blue eyes' : 1 }, {} ) )
+        
+    
+class TestVirtualMediaList( unittest.TestCase ):
+    
+    def test_media_results( self ):
+        
+        virtual_media_list = ClientMedia.VirtualMediaList( b'file_service', list( range( 20000 ) ), { hash_id : FakeHash( hash_id ) for hash_id in range( 20000 ) } )
+        
+        self.assertEqual( virtual_media_list.GetMissingHashIds( -5, 3 ), [ 0, 1, 2 ] )
+        
+        virtual_media_list.CacheMediaResults( [ FakeMediaResult( hash_id ) for hash_id in range( 1, 3 ) ] )
+        
+        self.assertEqual( virtual_media_list.GetMissingHashIds( 0, 3 ), [ 0 ] )
+        self.assertEqual( virtual_media_list.GetMediaResult( 1 ).GetHashId(), 1 )
+        self.assertIsNone( virtual_media_list.GetMediaResult( 0 ) )
+        
+        # 1 was just looked at, so 2 goes first
+        
+        virtual_media_list.CacheMediaResults( [ FakeMediaResult( hash_id ) for hash_id in range( 3, ClientMedia.VIRTUAL_MEDIA_RESULT_CACHE_SIZE + 2 ) ] )
+        
+        self.assertTrue( virtual_media_list.HasMediaResult( 1 ) )
+        self.assertFalse( virtual_media_list.HasMediaResult( 2 ) )
+        
+        virtual_media_list.AppendMediaResults( [ FakeMediaResult( 1 ), FakeMediaResult( 20000 ) ] )
+        
+        self.assertEqual( virtual_media_list.GetNumFiles(), 20001 )
+        self.assertEqual( virtual_media_list.GetIndex( 20000 ), 20000 )
+        self.assertIsNone( virtual_media_list.GetIndex( 20001 ) )
+        
+        # the hashes come with the ids, so we never go to the db for them
+        
+        self.assertEqual( virtual_media_list.GetHashes( ordered = True )[ -2 : ], [ FakeHash( 19999 ), FakeHash( 20000 ) ] )
+        self.assertEqual( len( virtual_media_list.GetHashes() ), 20001 )
+        
+    
+    def test_selection( self ):
+        
+        virtual_media_list = ClientMedia.VirtualMediaList( b'file_service', [ 10, 11, 12, 13, 14, 15, 10 ], { hash_id : FakeHash( hash_id ) for hash_id in range( 10, 16 ) } )
+        
+        self.assertEqual( virtual_media_list.GetNumFiles(), 6 )
+        
+        virtual_media_list.SelectRange( 1, 3 )
+        virtual_media_list.SelectRange( 5, 100 )
+        
+        self.assertEqual( virtual_media_list.GetSelectedHashIds(), [ 11, 12, 15 ] )
+        self.assertEqual( virtual_media_list.GetNumSelected(), 3 )
+        
+        # selection follows the files through a sort
+        
+        virtual_media_list.SetSortedHashIds( [ 15, 14, 13, 12, 11, 10 ] )
+        
+        self.assertEqual( virtual_media_list.GetSelectedHashIds(), [ 15, 12, 11 ] )
+        self.assertTrue( virtual_media_list.IsSelected( 0 ) )
+        self.assertFalse( virtual_media_list.IsSelected( 1 ) )
+        
+        virtual_media_list.RemoveHashIds( { 12, 14 } )
+        
+        self.assertEqual( virtual_media_list.GetHashIds(), [ 15, 13, 11, 10 ] )
+        self.assertEqual( virtual_media_list.GetHashes( ordered = True ), [ FakeHash( hash_id ) for hash_id in ( 15, 13, 11, 10 ) ] )
+        self.assertEqual( virtual_media_list.GetHashes(), { FakeHash( hash_id ) for hash_id in ( 15, 13, 11, 10 ) } )
+        self.assertEqual( virtual_media_list.GetSelectedHashIds(), [ 15, 11 ] )
+        
+        virtual_media_list.InvertSelection()
+        
+        self.assertEqual( virtual_media_list.GetSelectedHashIds(), [ 13, 10 ] )
+        
+        virtual_media_list.DeselectRange( 3, 4 )
+        
+        self.assertEqual( virtual_media_list.GetSelectedHashIds(), [ 13 ] )
+        
+        virtual_media_list.SelectAll()
+        
+        virtual_media_list.SetSortedHashIds( [ 10, 11, 13, 15 ] )
+        
+        self.assertEqual( virtual_media_list.GetNumSelected(), 4 )
+        
+        virtual_media_list.SelectNone()
+        
+        self.assertEqual( virtual_media_list.GetSelectedHashIds(), [] )
+        
+    
@@ -221,6 +221,83 @@ class TestBandwidthManager( unittest.TestCase ):
         pass
         
     
+    def test_dirty_rows( self ):
+        
+        DOMAIN_NETWORK_CONTEXT = ClientNetworkingContexts.NetworkContext( CC.NETWORK_CONTEXT_DOMAIN, MOCK_DOMAIN )
+        SUBDOMAIN_NETWORK_CONTEXT = ClientNetworkingContexts.NetworkContext( CC.NETWORK_CONTEXT_DOMAIN, MOCK_SUBDOMAIN )
+        PAGE_NETWORK_CONTEXT = ClientNetworkingContexts.NetworkContext( CC.NETWORK_CONTEXT_DOWNLOADER_PAGE, HydrusData.GenerateKey() )
+        
+        bm = ClientNetworkingBandwidth.NetworkBandwidthManager()
+        
+        bm.ReportRequestUsed( [ ClientNetworkingContexts.GLOBAL_NETWORK_CONTEXT, DOMAIN_NETWORK_CONTEXT, SUBDOMAIN_NETWORK_CONTEXT, PAGE_NETWORK_CONTEXT ] )
+        
+        self.assertTrue( bm.IsDirty() )
+        
+        ( main_tuple, rows, deletee_row_keys ) = bm.GetSerialisableMainTupleAndDirtyRows()
+        
+        # the page is ephemeral, so it never gets a row
+        self.assertEqual( { row_key for ( row_key, serialisable_tracker ) in rows }, { network_context.DumpToString() for network_context in ( ClientNetworkingContexts.GLOBAL_NETWORK_CONTEXT, DOMAIN_NETWORK_CONTEXT, SUBDOMAIN_NETWORK_CONTEXT ) } )
+        self.assertEqual( deletee_row_keys, [] )
+        
+        bm.SetClean()
+        
+        self.assertFalse( bm.IsDirty() )
+        
+        # only what changes is written
+        
+        bm.ReportDataUsed( [ DOMAIN_NETWORK_CONTEXT ], 256 )
+        bm.DeleteHistory( [ SUBDOMAIN_NETWORK_CONTEXT ] )
+        
+        ( main_tuple, rows, deletee_row_keys ) = bm.GetSerialisableMainTupleAndDirtyRows()
+        
+        self.assertEqual( [ row_key for ( row_key, serialisable_tracker ) in rows ], [ DOMAIN_NETWORK_CONTEXT.DumpToString() ] )
+        self.assertEqual( deletee_row_keys, [ SUBDOMAIN_NETWORK_CONTEXT.DumpToString() ] )
+        
+        # use while the save is going is kept for the next save
+        
+        bm.ReportRequestUsed( [ ClientNetworkingContexts.GLOBAL_NETWORK_CONTEXT ] )
+        
+        bm.SetClean()
+        
+        self.assertTrue( bm.IsDirty() )
+        
+        ( main_tuple_2, rows_2, deletee_row_keys_2 ) = bm.GetSerialisableMainTupleAndDirtyRows()
+        
+        self.assertEqual( [ row_key for ( row_key, serialisable_tracker ) in rows_2 ], [ ClientNetworkingContexts.GLOBAL_NETWORK_CONTEXT.DumpToString() ] )
+        self.assertEqual( deletee_row_keys_2, [] )
+        
+        # and if a save fails before SetClean, the next one takes its rows too
+        
+        bm.ReportRequestUsed( [ DOMAIN_NETWORK_CONTEXT ] )
+        
+        ( main_tuple_2, rows_2, deletee_row_keys_2 ) = bm.GetSerialisableMainTupleAndDirtyRows()
+        
+        self.assertEqual( { row_key for ( row_key, serialisable_tracker ) in rows_2 }, { network_context.DumpToString() for network_context in ( ClientNetworkingContexts.GLOBAL_NETWORK_CONTEXT, DOMAIN_NETWORK_CONTEXT ) } )
+        
+        bm.SetClean()
+        
+        self.assertFalse( bm.IsDirty() )
+        
+        # loading rows back, cold ones are dropped and cleared from disk
+        
+        bm_loaded = ClientNetworkingBandwidth.NetworkBandwidthManager()
+        
+        bm_loaded.InitialiseFromSerialisableInfo( main_tuple[1], main_tuple[2] )
+        
+        now = HydrusData.GetNow()
+        cold = now - ( ClientNetworkingBandwidth.NetworkBandwidthManager.COLD_TRACKER_TIME_DELTA + 86400 )
+        
+        bm_loaded.SetSerialisableRows( [ ( row_key, now, serialisable_tracker ) for ( row_key, serialisable_tracker ) in rows ] + [ ( SUBDOMAIN_NETWORK_CONTEXT.DumpToString(), cold, HydrusNetworking.BandwidthTracker().GetSerialisableTuple() ) ] )
+        
+        self.assertEqual( bm_loaded.GetTracker( DOMAIN_NETWORK_CONTEXT ).GetUsage( HC.BANDWIDTH_TYPE_DATA, None ), 256 )
+        self.assertEqual( bm_loaded.GetNetworkContextsForUser(), { DOMAIN_NETWORK_CONTEXT } )
+        
+        ( main_tuple, rows, deletee_row_keys ) = bm_loaded.GetSerialisableMainTupleAndDirtyRows()
+        
+        self.assertEqual( rows, [] )
+        self.assertEqual( deletee_row_keys, [ SUBDOMAIN_NETWORK_CONTEXT.DumpToString() ] )
+        
+    
 class TestNetworkingDomain( unittest.TestCase ):
     
     def test_url_classes( self ):
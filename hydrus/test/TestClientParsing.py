@@ -0,0 +1,457 @@
+import bs4
+import json
+from hydrus.client import ClientDefaults
+from hydrus.client import ClientParsing
+from hydrus.core import HydrusConstants as HC
+import unittest
+
+# no example pages ship with the default parsers, so these cover the structures they look for, plus some junk
+
+BOORU_FILE_PAGE = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Image #123456 - Example Booru</title>
+<meta property="og:image" content="https://img.example.com/original/ab/cd/abcdef.png">
+<meta property="og:video" content="https://img.example.com/original/ab/cd/abcdef.webm">
+<link rel="image_src" href="https://img.example.com/sample/abcdef.jpg">
+<link rel="next" href="/posts/123457">
+<script type="text/javascript">var Post = { "id" : 123456, "tags" : "<li class=\\"tag-type-general\\">" };</script>
+<style>.tag-type-artist { color: #a00; }</style>
+</head>
+<body class="c-posts a-show">
+<div id="sidebar">
+<section id="tag-list">
+<ul id="tag-sidebar" class="tag-sidebar">
+<li class="tag-type-artist tag"><a href="/wiki?title=artist_name">?</a> <a class="search-tag" href="/posts?tags=artist_name" itemprop="keywords">artist name</a> <span class="post-count">120</span></li>
+<li class="tag-type-copyright tag"><a href="/wiki?title=series">?</a> <a class="search-tag" href="/posts?tags=series" itemprop="keywords">series</a></li>
+<li class="tag-type-character tag"><a href="/wiki?title=character">?</a> <a class="search-tag" href="/posts?tags=character_(series)" itemprop="keywords">character (series)</a></li>
+<li class="tag-type-general tag"><a href="/wiki?title=blue_sky">?</a> <a class="search-tag" href="/posts?tags=blue_sky" itemprop="keywords">blue sky</a></li>
+<li class="tag-type-general tag"><a href="/wiki?title=cloud">?</a> <a class="search-tag" href="/posts?tags=cloud" itemprop="keywords">cloud</a></li>
+<li class="tag-type-metadata tag"><a class="search-tag" href="/posts?tags=highres">highres</a></li>
+<li class="tag-type-meta tag"><a class="search-tag" href="/posts?tags=absurdres">absurdres</a></li>
+<li class="tag-type-0"><a href="/wiki">?</a> <a href="/posts?tags=tree">tree</a></li>
+<li class="tag-type-1"><a href="/wiki">?</a> <a href="/posts?tags=someone">someone</a></li>
+<li class="tag-type-3"><a href="/wiki">?</a> <a href="/posts?tags=a_series">a series</a></li>
+<li class="tag-type-4"><a href="/wiki">?</a> <a href="/posts?tags=a_character">a character</a></li>
+<li class="tag-type-5"><a href="/wiki">?</a> <a href="/posts?tags=meta_thing">meta thing</a></li>
+<li class="tag-type-idol"><a class="search-tag" href="/?tags=idol">idol</a></li>
+<li class="tag-type-studio"><a class="search-tag" href="/?tags=studio">studio</a></li>
+<li class="tag-type-medium"><a class="search-tag" href="/?tags=medium">medium</a></li>
+<li class="tag-type-genre"><a class="search-tag" href="/?tags=genre">genre</a></li>
+</ul>
+</section>
+<section id="post-information">
+<h1>Information</h1>
+<ul>
+<li>ID: 123456</li>
+<li>Posted: <time datetime="2020-05-17T12:34:56-04:00" title="2020-05-17 12:34:56 -0400">2 months ago</time></li>
+<li>Size: <a href="https://img.example.com/original/ab/cd/abcdef.png">1.23 MB</a> .png (1000x1400)</li>
+<li>Source: <a href="https://www.example.net/artworks/987654" rel="nofollow">example.net/artworks/987654</a></li>
+<li>Rating: Safe</li>
+<li>Score: <span>42</span></li>
+</ul>
+</section>
+<div id="stats">
+<ul>
+<li>Id: 123456</li>
+<li>Posted: 2020-05-17 12:34:56<br>by <a href="/user/1">uploader</a></li>
+<li>Source: <a href="http://www.example.net/source" rel="nofollow">http://www.example.net/source</a></li>
+<li>Rating: Questionable</li>
+<li><a href="/original/abcdef.png" id="highres">Original image</a></li>
+</ul>
+</div>
+</div>
+<div id="content">
+<section id="image-container" class="image-container note-container" data-file-url="https://img.example.com/original/ab/cd/abcdef.png">
+<div id="note-container"><div class="note-box" style="top: 10px">a note</div></div>
+<picture><source srcset="https://img.example.com/sample/abcdef.webp"><img id="image" alt="img" class="fit-width" src="https://img.example.com/sample/abcdef.jpg"></picture>
+</section>
+<div class="image-container"><img id="main_image" src="/images/main.jpg" class="box-shadow999"></div>
+<video id="Videomain" controls><source src="/videos/abcdef.webm" type="video/webm"></video>
+<object><embed src="/flash/abcdef.swf" type="application/x-shockwave-flash"></object>
+<form action="/post/vote" method="post"><input type="hidden" id="source" name="source" value="https://www.example.net/source2"><input type="submit" value="Image Only"></form>
+<p>Original source for the image: <a href="https://www.example.net/original" target="_blank">link</a></p>
+<p class="user_icon"><a href="/members.php?id=55"><img src="/icons/55.png" alt="icon"></a></p>
+<!-- <a href="/not/a/real/link">commented out</a> -->
+</div>
+</body>
+</html>'''
+
+BOORU_GALLERY_PAGE = '''<html><head><title>Image List</title>
+<link rel="next" href="/index.php?page=post&amp;s=list&amp;tags=blue_sky&amp;pid=42">
+</head>
+<body>
+<div id="post-list-posts" class="content">
+<span id="s1" class="thumb"><a id="p1" href="/index.php?page=post&amp;s=view&amp;id=1"><img src="/thumbs/1.jpg" alt="blue sky cloud" class="preview"></a></span>
+<span id="s2" class="thumb blacklisted"><a id="p2" href="/index.php?page=post&amp;s=view&amp;id=2"><img src="/thumbs/2.jpg" alt="blue sky"></a></span>
+<article class="post-preview" data-id="3"><a href="/posts/3"><img src="/thumbs/3.jpg"></a></article>
+<article class="post-preview post-status-deleted" data-id="4"><a href="/posts/4"><img src="/thumbs/4.jpg"></a></article>
+<div class="thumb"><a class="thumb" href="/post/view/5"><img src="/thumbs/5.jpg"></a></div>
+<div class="thumb"><a class="thumbLink" href="/post/view/6"><img src="/thumbs/6.jpg" class="shadowedimage"></a></div>
+<div class="item-container"><a class="full-size-container" href="/view/7"></a><div class="item-details-main">title seven</div><div class="item-user">someone</div></div>
+<div class="galleryHeader">Gallery</div>
+</div>
+<div id="paginator" class="pagination">
+<a href="?pid=0">&lt;&lt;</a> <b>1</b> <a href="?pid=42">2</a> <a href="?pid=84" alt="next">&gt;</a>
+<a rel="next" id="paginator-next" href="/posts?page=2">Next</a>
+<a rel="nofollow" href="?pid=84">Next &gt;&gt;</a>
+</div>
+<ul class="pagination"><li class="arrow"><a href="/gallery/2">&raquo;</a></li><li class="next"><a href="/gallery/3">Next</a></li></ul>
+<div id="right_button"><a href="/page/2">Gallery</a></div>
+<table class="image_info"><tr><td>Uploader</td><td><a href="/user/someone">someone</a></td></tr><tr><td>Tags</td><td>  <a href="/t/one">one</a></td></tr></table>
+</body></html>'''
+
+SOCIAL_PAGE = '''<?xml version="1.0" encoding="UTF-8"?>
+<html lang="en"><head><title>someone on Example: "a tweet"</title></head>
+<body>
+<div class="permalink-tweet-container">
+<div class="tweet permalink-tweet js-original-tweet" data-tweet-id="111">
+<div class="permalink-header"><a class="account-group" href="/someone"><span class="username">@<b>someone</b></span></a>
+<small class="time"><a class="tweet-timestamp" href="/someone/status/111" title="5:00 PM - 1 Jan 2020"><span data-time="1577898000">Jan 1</span></a></small></div>
+<p class="tweet-text">a tweet <a href="/hashtag/tag">#tag</a></p>
+<div class="AdaptiveMedia-container"><div class="AdaptiveMedia-photoContainer" data-image-url="https://pbs.example.com/media/abc.jpg"><img data-aria-label-part src="https://pbs.example.com/media/abc.jpg" alt=""></div></div>
+</div>
+</div>
+<ol id="stream-items"><li class="js-stream-item stream-item" data-item-type="tweet" data-item-id="112"><div class="tweet" data-permalink-path="/someone/status/112"></div></li>
+<li class="js-pinned js-stream-item" data-item-type="tweet"><div class="tweet" data-permalink-path="/someone/status/113"></div></li></ol>
+<div class="dev-view-deviation"><div class="dev-title-container"><h1><a href="/art/thing-1">thing</a> <small class="author"><span class="username-with-symbol"><a class="username user-link" href="/artist">artist</a></span></small></h1></div>
+<div class="dev-metainfo-details"><dl><dt>Image Size</dt><dd>1.2 MB</dd><dt>Resolution</dt><dd>1000&times;1400</dd></dl></div>
+<div data-hook="art_stage"><img class="dev-content-full" src="https://images.example.com/full.png"><img class="dev-content-normal" src="https://images.example.com/normal.png"></div>
+<div data-hook="deviation_meta"><span class="text">PNG 1000 × 1400</span><span class="text">not a size</span></div>
+<a class="dev-page-download" href="https://www.example.com/download/1">Download</a>
+<div class="authorlinks"><a href="/artist/gallery">Gallery</a></div>
+</div>
+<div id="picBox"><div class="boxtitle"><div class="imageTitle">a title</div><p class="title">a title</p></div><div class="boxbody"><img src="/pictures/full.jpg" alt="img"></div>
+<span id="submittime_exact" itemprop="datePublished">2020-01-01 12:00:00</span><span itemprop="name">a title</span></div>
+<div id="tag_list"><div id="kw_scroll"><span class="tag_name"><a href="/search?word=one">one</a></span><span class="tag_name"><a href="/search?word=two">two</a></span></div></div>
+<h2 class="illust_title">illust</h2>
+<div id="files_area"><a href="/files/1.png" title="Download (no tags in filename)">dl</a><a href="/files/1.png" title="Download (tags in filename)">dl</a><a href="/view/1.png" title="View (no tags in filename)">v</a><a href="/view/1.png" title="View (tags in filename)">v</a></div>
+<div class="content magicboxParent"><a href="/full/1.png"><img class="shadowedimage" src="/small/1.png"></a></div>
+<div class="is-video"><video src="/v.mp4"><source src="/v.webm"></video></div>
+<span class="tag dropdown" data-tag-category="" data-tag-name="artist:someone"><a href="/tags/artist-someone">artist:someone</a></span>
+<span class="tag dropdown" data-tag-category="character" data-tag-name="a character">a character</span>
+<span class="tag dropdown" data-tag-category="rating" data-tag-name="safe">safe</span>
+<span class="tag dropdown" data-tag-category="origin" data-tag-name="artist:x">x</span>
+<span class="tag dropdown" data-tag-category="oc" data-tag-name="oc:y">y</span>
+<span class="tag dropdown" data-tag-category="content-official" data-tag-name="official">official</span>
+<div class="agegate">you must be 18</div>
+<a href="/login">Login</a>
+<fugg_pixiv>custom element</fugg_pixiv>
+</body></html>'''
+
+MALFORMED_PAGE = '''<html><body>
+<div id="tag-list"><ul><li class="tag-type-general"><a class="search-tag" href="/a">unclosed one
+<li class="tag-type-general"><a class="search-tag" href="/b">unclosed two</a>
+<li class="  tag-type-artist   other  "><a class=search-tag href=/c>loose attrs</a></ul>
+<p>first para<p>second para <b>bold<i>overlap</b> italic</i>
+<div id=stats><li>Rating: Explicit<li>Source: <a href="//example.com/x">x</a></div>
+<table><tr><td>no tbody</td><td><a href="/td/link">td link</a></td></tr></table>
+<script>document.write( '<a href="/script/link">x</a>' );</script>
+<template><li class="tag-type-general"><a class="search-tag" href="/template">in a template</a></li></template>
+<ruby>kanji<rp>(</rp><rt>kana</rt><rp>)</rp></ruby>
+<a href="/empty"></a><a href="/space"> </a><a class="" href="/emptyclass">empty class</a>
+</div>
+</body></html>'''
+
+EXAMPLE_PAGES = [ BOORU_FILE_PAGE, BOORU_GALLERY_PAGE, SOCIAL_PAGE, MALFORMED_PAGE, '', '<div><a href="/fragment">a fragment</a></div>' ]
+
+def GetHTMLFormulae( page_parser ):
+    
+    formulae = []
+    
+    def walk_formula( formula ):
+        
+        if isinstance( formula, ClientParsing.ParseFormulaHTML ):
+            
+            formulae.append( formula )
+            
+        elif isinstance( formula, ClientParsing.ParseFormulaCompound ):
+            
+            for sub_formula in formula.ToTuple()[0]:
+                
+                walk_formula( sub_formula )
+                
+            
+        
+    
+    def walk_page_parser( page_parser ):
+        
+        ( sub_page_parsers, content_parsers ) = page_parser.GetContentParsers()
+        
+        for ( formula, sub_page_parser ) in sub_page_parsers:
+            
+            walk_formula( formula )
+            
+            walk_page_parser( sub_page_parser )
+            
+        
+        for content_parser in content_parsers:
+            
+            walk_formula( content_parser.ToTuple()[2] )
+            
+        
+    
+    walk_page_parser( page_parser )
+    
+    return formulae
+    
+def NormaliseHTML( html ):
+    
+    # bs4 and lxml write the same tree slightly differently (attribute order, class whitespace), so write both out the same way
+    
+    return str( bs4.BeautifulSoup( html, 'lxml' ) )
+    
+class TestHTMLParsingBackends( unittest.TestCase ):
+    
+    def _compare( self, formula, page ):
+        
+        ( tag_rules, content_to_fetch, attribute_to_fetch, string_match, string_converter ) = formula.ToTuple()
+        
+        # beautifulsoup over lxml's parser, so we are only testing the rules and not the tree builder
+        soup = bs4.BeautifulSoup( page, 'lxml' )
+        
+        bs4_raw_texts = formula._GetRawTextsFromTags( formula._FindHTMLTags( soup ) )
+        
+        tree = ClientParsing.GetLXMLTree( page )
+        
+        lxml_raw_texts = formula._GetRawTextsFromLXMLTags( formula._FindLXMLTags( tree ) )
+        
+        if content_to_fetch == ClientParsing.HTML_CONTENT_HTML:
+            
+            bs4_raw_texts = [ NormaliseHTML( raw_text ) for raw_text in bs4_raw_texts ]
+            lxml_raw_texts = [ NormaliseHTML( raw_text ) for raw_text in lxml_raw_texts ]
+            
+        
+        self.assertEqual( bs4_raw_texts, lxml_raw_texts, formula.ToPrettyMultilineString() )
+        
+        return len( bs4_raw_texts ) > 0
+        
+    
+    def test_default_parsers( self ):
+        
+        formulae = []
+        
+        for page_parser in ClientDefaults.GetDefaultParsers():
+            
+            formulae.extend( GetHTMLFormulae( page_parser ) )
+            
+        
+        self.assertGreater( len( formulae ), 0 )
+        
+        num_found = 0
+        
+        for formula in formulae:
+            
+            self.assertTrue( formula._CanUseLXML(), formula.ToPrettyMultilineString() )
+            
+            for page in EXAMPLE_PAGES:
+                
+                if self._compare( formula, page ):
+                    
+                    num_found += 1
+                    
+                
+            
+        
+        # make sure the corpus is actually exercising things
+        
+        self.assertGreater( num_found, len( formulae ) // 2 )
+        
+    
+    def test_rules( self ):
+        
+        def rule_formula( tag_rules, content_to_fetch = ClientParsing.HTML_CONTENT_ATTRIBUTE, attribute_to_fetch = 'href' ):
+            
+            return ClientParsing.ParseFormulaHTML( tag_rules = tag_rules, content_to_fetch = content_to_fetch, attribute_to_fetch = attribute_to_fetch )
+            
+        
+        descend = lambda tag_name, tag_attributes = None, tag_index = None: ClientParsing.ParseRuleHTML( rule_type = ClientParsing.HTML_RULE_TYPE_DESCENDING, tag_name = tag_name, tag_attributes = tag_attributes, tag_index = tag_index )
+        ascend = lambda tag_name, tag_depth: ClientParsing.ParseRuleHTML( rule_type = ClientParsing.HTML_RULE_TYPE_ASCENDING, tag_name = tag_name, tag_depth = tag_depth )
+        
+        formulae = []
+        
+        formulae.append( rule_formula( [ descend( 'li', { 'class' : 'tag-type-general' } ), descend( 'a', tag_index = 1 ) ] ) )
+        formulae.append( rule_formula( [ descend( None, { 'class' : 'tag-type-general tag' } ), descend( 'a', { 'class' : 'search-tag' } ) ] ) )
+        formulae.append( rule_formula( [ descend( 'li', { 'class' : 'tag-type-artist other' } ) ], attribute_to_fetch = 'class' ) )
+        formulae.append( rule_formula( [ descend( 'span', { 'class' : 'thumb' } ) ], attribute_to_fetch = 'class' ) )
+        formulae.append( rule_formula( [ descend( 'a', { 'class' : '' } ) ] ) )
+        formulae.append( rule_formula( [ descend( None, { 'rel' : 'next' } ) ] ) )
+        formulae.append( rule_formula( [ descend( None, { 'rel' : 'next nofollow' } ) ] ) )
+        formulae.append( rule_formula( [ descend( 'a', tag_index = 0 ), ascend( None, 3 ) ], content_to_fetch = ClientParsing.HTML_CONTENT_STRING ) )
+        formulae.append( rule_formula( [ descend( 'a', tag_index = 0 ), ascend( None, 20 ), descend( 'title' ) ], content_to_fetch = ClientParsing.HTML_CONTENT_STRING ) )
+        formulae.append( rule_formula( [ descend( 'a' ), ascend( 'li', 1 ) ], content_to_fetch = ClientParsing.HTML_CONTENT_HTML ) )
+        formulae.append( rule_formula( [ descend( 'a' ), ascend( 'div', 2 ) ], attribute_to_fetch = 'id' ) )
+        formulae.append( rule_formula( [ descend( None ) ], content_to_fetch = ClientParsing.HTML_CONTENT_STRING ) )
+        formulae.append( rule_formula( [ descend( 'script' ) ], content_to_fetch = ClientParsing.HTML_CONTENT_STRING ) )
+        formulae.append( rule_formula( [ descend( 'ruby' ) ], content_to_fetch = ClientParsing.HTML_CONTENT_STRING ) )
+        formulae.append( rule_formula( [ descend( 'template' ) ], content_to_fetch = ClientParsing.HTML_CONTENT_STRING ) )
+        formulae.append( rule_formula( [ descend( 'p' ) ], content_to_fetch = ClientParsing.HTML_CONTENT_HTML ) )
+        formulae.append( rule_formula( [ descend( 'td', tag_index = 1 ) ], content_to_fetch = ClientParsing.HTML_CONTENT_HTML ) )
+        
+        for formula in formulae:
+            
+            self.assertTrue( formula._CanUseLXML() )
+            
+            for page in EXAMPLE_PAGES:
+                
+                self._compare( formula, page )
+                
+            
+        
+        # these can't be done exactly in xpath, so they fall back to bs4
+        
+        self.assertFalse( rule_formula( [ descend( 'a', { 'xml:lang' : 'en' } ) ] )._CanUseLXML() )
+        self.assertFalse( rule_formula( [ descend( 'a', { 'title' : 'non breaking' } ) ] )._CanUseLXML() )
+        self.assertFalse( rule_formula( [ descend( 'a]|//b', {} ) ] )._CanUseLXML() )
+        
+    
+    def test_page_parser_backend( self ):
+        
+        formula = ClientParsing.ParseFormulaHTML( tag_rules = [ ClientParsing.ParseRuleHTML( rule_type = ClientParsing.HTML_RULE_TYPE_DESCENDING, tag_name = 'a', tag_attributes = { 'class' : 'search-tag' } ) ], content_to_fetch = ClientParsing.HTML_CONTENT_STRING )
+        
+        content_parser = ClientParsing.ContentParser( name = 'tags', content_type = HC.CONTENT_TYPE_MAPPINGS, formula = formula, additional_info = '' )
+        
+        page_parser = ClientParsing.PageParser( 'test parser', content_parsers = [ content_parser ], html_parsing_backend = ClientParsing.HTML_PARSING_BACKEND_LXML )
+        
+        dupe_page_parser = page_parser.Duplicate()
+        
+        self.assertEqual( dupe_page_parser.GetHTMLParsingBackend(), ClientParsing.HTML_PARSING_BACKEND_LXML )
+        
+        results = {}
+        
+        for html_parsing_backend in ( ClientParsing.HTML_PARSING_BACKEND_BS4, ClientParsing.HTML_PARSING_BACKEND_LXML ):
+            
+            page_parser.SetHTMLParsingBackend( html_parsing_backend )
+            
+            parsing_context = {}
+            
+            all_parse_results = page_parser.Parse( parsing_context, BOORU_FILE_PAGE )
+            
+            # the parser's choice should not leak out into the caller's context
+            self.assertEqual( parsing_context, {} )
+            
+            results[ html_parsing_backend ] = sorted( ClientParsing.GetTagsFromParseResults( all_parse_results[0] ) )
+            
+        
+        self.assertEqual( results[ ClientParsing.HTML_PARSING_BACKEND_BS4 ], results[ ClientParsing.HTML_PARSING_BACKEND_LXML ] )
+        self.assertIn( 'blue sky', results[ ClientParsing.HTML_PARSING_BACKEND_LXML ] )
+        
+        self.assertEqual( ClientParsing.GetHTMLParsingBackend( { 'html_parsing_backend' : ClientParsing.HTML_PARSING_BACKEND_LXML } ), ClientParsing.HTML_PARSING_BACKEND_LXML )
+        self.assertEqual( ClientParsing.GetHTMLParsingBackend( {} ), ClientParsing.HTML_PARSING_BACKEND_BS4 )
+        
+    
+class TestSubPageParsingNodes( unittest.TestCase ):
+    
+    def _compare_posts( self, sub_page_formula, formulae, page, parsing_context ):
+        
+        nodes = sub_page_formula.ParseSeparatedContent( parsing_context, page )
+        texts = sub_page_formula.Parse( parsing_context, page )
+        
+        self.assertEqual( len( nodes ), len( texts ) )
+        
+        for ( node, text ) in zip( nodes, texts ):
+            
+            if isinstance( node, ClientParsing.ParsingNode ):
+                
+                self.assertEqual( node.GetText(), text )
+                
+            
+            for formula in formulae:
+                
+                self.assertEqual( formula.Parse( parsing_context, node ), formula.Parse( parsing_context, text ), formula.ToPrettyMultilineString() )
+                
+            
+        
+        return nodes
+        
+    
+    def test_html( self ):
+        
+        descend = lambda tag_name, tag_attributes = None, tag_index = None: ClientParsing.ParseRuleHTML( rule_type = ClientParsing.HTML_RULE_TYPE_DESCENDING, tag_name = tag_name, tag_attributes = tag_attributes, tag_index = tag_index )
+        ascend = lambda tag_name, tag_depth: ClientParsing.ParseRuleHTML( rule_type = ClientParsing.HTML_RULE_TYPE_ASCENDING, tag_name = tag_name, tag_depth = tag_depth )
+        
+        formulae = []
+        
+        for page_parser in ClientDefaults.GetDefaultParsers():
+            
+            formulae.extend( GetHTMLFormulae( page_parser ) )
+            
+        
+        for tag_rules in ( [ descend( 'a' ), ascend( 'li', 1 ) ], [ descend( 'a' ), ascend( None, 1 ) ], [ descend( 'a' ), ascend( None, 3 ) ], [ descend( None, { 'class' : 'tag' } ) ], [ descend( 'li', tag_index = 0 ) ], [ descend( None ) ] ):
+            
+            for content_to_fetch in ( ClientParsing.HTML_CONTENT_ATTRIBUTE, ClientParsing.HTML_CONTENT_STRING, ClientParsing.HTML_CONTENT_HTML ):
+                
+                formulae.append( ClientParsing.ParseFormulaHTML( tag_rules = tag_rules, content_to_fetch = content_to_fetch, attribute_to_fetch = 'href' ) )
+                
+            
+        
+        num_nodes = 0
+        
+        for html_parsing_backend in ( ClientParsing.HTML_PARSING_BACKEND_BS4, ClientParsing.HTML_PARSING_BACKEND_LXML ):
+            
+            parsing_context = { 'html_parsing_backend' : html_parsing_backend }
+            
+            for page in EXAMPLE_PAGES:
+                
+                for tag_name in ( 'li', 'div', 'span', 'a', 'p', 'body' ):
+                    
+                    sub_page_formula = ClientParsing.ParseFormulaHTML( tag_rules = [ descend( tag_name ) ], content_to_fetch = ClientParsing.HTML_CONTENT_HTML )
+                    
+                    nodes = self._compare_posts( sub_page_formula, formulae, page, parsing_context )
+                    
+                    num_nodes += len( [ node for node in nodes if isinstance( node, ClientParsing.ParsingNode ) ] )
+                    
+                    if tag_name == 'body':
+                        
+                        # whole documents still go down as text
+                        self.assertNotIn( True, [ isinstance( node, ClientParsing.ParsingNode ) for node in nodes ] )
+                        
+                    
+                
+            
+        
+        self.assertGreater( num_nodes, 0 )
+        
+        # if the posts' text has to change, they go down as text
+        
+        string_converter = ClientParsing.StringConverter( transformations = [ ( ClientParsing.STRING_TRANSFORMATION_APPEND_TEXT, ' ' ) ], example_string = 'example' )
+        
+        sub_page_formula = ClientParsing.ParseFormulaHTML( tag_rules = [ descend( 'li' ) ], content_to_fetch = ClientParsing.HTML_CONTENT_HTML, string_converter = string_converter )
+        
+        self.assertNotIn( True, [ isinstance( node, ClientParsing.ParsingNode ) for node in sub_page_formula.ParseSeparatedContent( {}, BOORU_FILE_PAGE ) ] )
+        
+    
+    def test_json( self ):
+        
+        page = json.dumps( { 'posts' : [ { 'id' : 1, 'tags' : [ 'blue sky', 'cloud' ], 'file' : { 'url' : 'https://example.com/1.png' } }, { 'id' : 2, 'tags' : [], 'file' : None }, 'not a post', 3.5 ] } )
+        
+        dict_key = lambda key: ( ClientParsing.JSON_PARSE_RULE_TYPE_DICT_KEY, ClientParsing.StringMatch( match_type = ClientParsing.STRING_MATCH_FIXED, match_value = key, example_string = key ) )
+        all_items = ( ClientParsing.JSON_PARSE_RULE_TYPE_ALL_ITEMS, None )
+        
+        sub_page_formula = ClientParsing.ParseFormulaJSON( parse_rules = [ dict_key( 'posts' ), all_items ], content_to_fetch = ClientParsing.JSON_CONTENT_JSON )
+        
+        formulae = []
+        
+        formulae.append( ClientParsing.ParseFormulaJSON( parse_rules = [ dict_key( 'tags' ), all_items ] ) )
+        formulae.append( ClientParsing.ParseFormulaJSON( parse_rules = [ dict_key( 'file' ), dict_key( 'url' ) ] ) )
+        formulae.append( ClientParsing.ParseFormulaJSON( parse_rules = [ dict_key( 'file' ) ], content_to_fetch = ClientParsing.JSON_CONTENT_JSON ) )
+        formulae.append( ClientParsing.ParseFormulaJSON( parse_rules = [], content_to_fetch = ClientParsing.JSON_CONTENT_DICT_KEYS ) )
+        formulae.append( ClientParsing.ParseFormulaJSON( parse_rules = [], content_to_fetch = ClientParsing.JSON_CONTENT_STRING ) )
+        
+        nodes = self._compare_posts( sub_page_formula, formulae, page, {} )
+        
+        self.assertEqual( len( nodes ), 4 )
+        self.assertEqual( nodes[0].GetNode()[ 'id' ], 1 )
+        
+        # and through a page parser
+        
+        content_parser = ClientParsing.ContentParser( name = 'tags', content_type = HC.CONTENT_TYPE_MAPPINGS, formula = formulae[0], additional_info = '' )
+        
+        sub_page_parser = ClientParsing.PageParser( 'post parser', content_parsers = [ content_parser ] )
+        
+        page_parser = ClientParsing.PageParser( 'test parser', sub_page_parsers = [ ( sub_page_formula, sub_page_parser ) ] )
+        
+        all_parse_results = page_parser.Parse( {}, page )
+        
+        self.assertEqual( [ sorted( ClientParsing.GetTagsFromParseResults( parse_results ) ) for parse_results in all_parse_results ], [ [ 'blue sky', 'cloud' ] ] )
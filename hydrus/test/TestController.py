@@ -16,6 +16,7 @@ from hydrus.client import ClientAPI
 from hydrus.client import ClientDefaults
 from hydrus.client import ClientFiles
 from hydrus.client import ClientManagers
+from hydrus.client import ClientMedia
 from hydrus.client.networking import ClientNetworking
 from hydrus.client.networking import ClientNetworkingBandwidth
 from hydrus.client.networking import ClientNetworkingDomain
@@ -31,6 +32,7 @@ from hydrus.core import HydrusSessions
 from hydrus.core import HydrusTags
 from hydrus.core import HydrusThreading
 from hydrus.test import TestClientAPI
+from hydrus.test import TestClientCaches
 from hydrus.test import TestClientConstants
 from hydrus.test import TestClientDaemons
 from hydrus.test import TestClientData
@@ -40,17 +42,21 @@ from hydrus.test import TestClientImageHandling
 from hydrus.test import TestClientImportOptions
 from hydrus.test import TestClientImportSubscriptions
 from hydrus.test import TestClientListBoxes
+from hydrus.test import TestClientMedia
 from hydrus.test import TestClientMigration
 from hydrus.test import TestClientNetworking
+from hydrus.test import TestClientParsing
 from hydrus.test import TestClientTags
 from hydrus.test import TestClientThreading
 from hydrus.test import TestDialogs
 from hydrus.test import TestFunctions
+from hydrus.test import TestHydrusArchiveStreams
 from hydrus.test import TestHydrusNATPunch
 from hydrus.test import TestHydrusNetworking
 from hydrus.test import TestHydrusSerialisable
 from hydrus.test import TestHydrusServer
 from hydrus.test import TestHydrusSessions
+from hydrus.test import TestHydrusTagArchive
 from hydrus.test import TestServerDB
 from twisted.internet import reactor
 from hydrus.client import ClientCaches
@@ -94,6 +100,11 @@ class MockController( object ):
         return HG.test_controller.CallToThread( callable, *args, **kwargs )
         
     
+    def CallToThreadLongRunning( self, callable, *args, **kwargs ):
+        
+        pass # no daemon loops running behind the test's back
+        
+    
     def JustWokeFromSleep( self ):
         
         return False
@@ -251,6 +262,8 @@ class Controller( object ):
         
         self._writes = collections.defaultdict( list )
         
+        self._write_exceptions = {}
+        
         self._managers = {}
         
         self.services_manager = ClientManagers.ServicesManager( self )
@@ -274,6 +287,7 @@ class Controller( object ):
         self.tag_siblings_manager = ClientManagers.TagSiblingsManager( self )
         self.tag_parents_manager = ClientManagers.TagParentsManager( self )
         self._managers[ 'undo' ] = ClientManagers.UndoManager( self )
+        self.media_list_hash_index = ClientMedia.MediaListHashIndex( self, lambda o: True )
         self.server_session_manager = HydrusSessions.HydrusSessionManagerServer()
         
         self.bitmap_manager = ClientManagers.BitmapManager( self )
@@ -523,6 +537,27 @@ class Controller( object ):
         }
         
     
+    def GetDBJobStatistics( self ):
+        
+        return [
+            {
+                "job_type" : "read",
+                "action" : "services",
+                "count" : 2,
+                "num_slow" : 0,
+                "mean_wait_ms" : 0.5,
+                "max_wait_ms" : 1.0,
+                "mean_time_ms" : 2.0,
+                "p50_time_ms" : 1.5,
+                "p90_time_ms" : 2.5,
+                "p99_time_ms" : 2.5,
+                "max_time_ms" : 2.5,
+                "total_rows" : 8,
+                "mean_rows" : 4.0
+            }
+        ]
+        
+    
     def GetFilesDir( self ):
         
         return self._server_files_dir
@@ -668,14 +703,19 @@ class Controller( object ):
             
         if run_all or self.only_run == 'data':
             
+            suites.append( unittest.TestLoader().loadTestsFromModule( TestClientCaches ) )
             suites.append( unittest.TestLoader().loadTestsFromModule( TestClientConstants ) )
             suites.append( unittest.TestLoader().loadTestsFromModule( TestClientData ) )
             suites.append( unittest.TestLoader().loadTestsFromModule( TestClientImportOptions ) )
+            suites.append( unittest.TestLoader().loadTestsFromModule( TestClientMedia ) )
+            suites.append( unittest.TestLoader().loadTestsFromModule( TestClientParsing ) )
             suites.append( unittest.TestLoader().loadTestsFromModule( TestClientTags ) )
             suites.append( unittest.TestLoader().loadTestsFromModule( TestClientThreading ) )
             suites.append( unittest.TestLoader().loadTestsFromModule( TestFunctions ) )
+            suites.append( unittest.TestLoader().loadTestsFromModule( TestHydrusArchiveStreams ) )
             suites.append( unittest.TestLoader().loadTestsFromModule( TestHydrusSerialisable ) )
             suites.append( unittest.TestLoader().loadTestsFromModule( TestHydrusSessions ) )
+            suites.append( unittest.TestLoader().loadTestsFromModule( TestHydrusTagArchive ) )
             
         if run_all or self.only_run == 'db':
             
@@ -751,6 +791,23 @@ class Controller( object ):
         self._cookies[ name ] = value
         
     
+    def SetWriteException( self, name, exception ):
+        
+        # None clears it
+        
+        if exception is None:
+            
+            if name in self._write_exceptions:
+                
+                del self._write_exceptions[ name ]
+                
+            
+        else:
+            
+            self._write_exceptions[ name ] = exception
+            
+        
+    
     def ShouldStopThisWork( self, maintenance_mode, stop_time = None ):
         
         return False
@@ -787,6 +844,11 @@ class Controller( object ):
         
         self._writes[ name ].append( ( args, kwargs ) )
         
+        if name in self._write_exceptions:
+            
+            raise self._write_exceptions[ name ]
+            
+        
         if name == 'import_file':
             
             ( file_import_job, ) = args
@@ -800,5 +862,18 @@ class Controller( object ):
                 return ( CC.STATUS_SUCCESSFUL_AND_NEW, 'test note' )
                 
             
+        elif name == 'import_files':
+            
+            ( file_import_jobs, ) = args
+            
+            if True in ( file_import_job.GetHash().hex() == 'a593942cb7ea9ffcd8ccf2f0fa23c338e23bfecd9a3e508dfc0bcf07501ead08' for file_import_job in file_import_jobs ):
+                
+                raise Exception( 'File failed to import for some reason!' )
+                
+            else:
+                
+                return [ ( CC.STATUS_SUCCESSFUL_AND_NEW, 'test note' ) for file_import_job in file_import_jobs ]
+                
+            
         
     
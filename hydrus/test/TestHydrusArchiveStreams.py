@@ -0,0 +1,81 @@
+import io
+import os
+import tarfile
+import unittest
+import zipfile
+
+from hydrus.core import HydrusArchiveStreams
+
+class TestArchiveStreams( unittest.TestCase ):
+    
+    def _GetMembers( self ):
+        
+        data_1 = os.urandom( 1500 )
+        data_2 = b''
+        data_3 = os.urandom( 512 )
+        
+        members = []
+        
+        members.append( ( 'one.jpg', len( data_1 ), 1600000000, [ data_1[ : 1000 ], data_1[ 1000 : ] ] ) )
+        members.append( ( 'two.txt', len( data_2 ), 1600000000, [] ) )
+        members.append( ( 'three.png', len( data_3 ), 1600000000, [ data_3 ] ) )
+        
+        expected = { 'one.jpg' : data_1, 'two.txt' : data_2, 'three.png' : data_3 }
+        
+        return ( members, expected )
+        
+    
+    def test_tar( self ):
+        
+        ( members, expected ) = self._GetMembers()
+        
+        archive_bytes = b''.join( HydrusArchiveStreams.GenerateTarChunks( members ) )
+        
+        self.assertEqual( len( archive_bytes ) % tarfile.BLOCKSIZE, 0 )
+        
+        with tarfile.open( fileobj = io.BytesIO( archive_bytes ) ) as t:
+            
+            self.assertEqual( t.getnames(), [ 'one.jpg', 'two.txt', 'three.png' ] )
+            
+            for ( name, data ) in expected.items():
+                
+                self.assertEqual( t.extractfile( name ).read(), data )
+                
+            
+        
+        # a file that lies about its size should not make a broken tar silently
+        
+        with self.assertRaises( Exception ):
+            
+            b''.join( HydrusArchiveStreams.GenerateTarChunks( [ ( 'bad.jpg', 10, 1600000000, [ b'123' ] ) ] ) )
+            
+        
+    
+    def test_zip( self ):
+        
+        ( members, expected ) = self._GetMembers()
+        
+        archive_bytes = b''.join( HydrusArchiveStreams.GenerateZipChunks( members ) )
+        
+        with zipfile.ZipFile( io.BytesIO( archive_bytes ) ) as z:
+            
+            self.assertEqual( z.namelist(), [ 'one.jpg', 'two.txt', 'three.png' ] )
+            
+            self.assertIsNone( z.testzip() )
+            
+            for ( name, data ) in expected.items():
+                
+                self.assertEqual( z.read( name ), data )
+                
+            
+        
+        # empty
+        
+        archive_bytes = b''.join( HydrusArchiveStreams.GenerateZipChunks( [] ) )
+        
+        with zipfile.ZipFile( io.BytesIO( archive_bytes ) ) as z:
+            
+            self.assertEqual( z.namelist(), [] )
+            
+        
+    
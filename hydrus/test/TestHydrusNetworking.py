@@ -7,6 +7,7 @@ import unittest
 from hydrus.core import HydrusData
 from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusNetworking
+from hydrus.core import HydrusSerialisable
 from mock import patch
 
 now = HydrusData.GetNow()
@@ -521,3 +522,59 @@ class TestBandwidthTracker( unittest.TestCase ):
             
         
     
+    def test_bandwidth_tracker_history( self ):
+        
+        bandwidth_tracker = HydrusNetworking.BandwidthTracker()
+        
+        now = HydrusData.GetNow()
+        
+        # one request a minute for two hours
+        
+        for i in range( 120 ):
+            
+            with patch.object( HydrusData, 'GetNow', return_value = now + i * 60 ):
+                
+                bandwidth_tracker.ReportRequestUsed()
+                bandwidth_tracker.ReportDataUsed( 100 )
+                
+            
+        
+        last = now + 119 * 60
+        
+        with patch.object( HydrusData, 'GetNow', return_value = last ):
+            
+            self.assertEqual( bandwidth_tracker.GetUsage( HC.BANDWIDTH_TYPE_REQUESTS, 1 ), 1 )
+            self.assertEqual( bandwidth_tracker.GetUsage( HC.BANDWIDTH_TYPE_REQUESTS, 200 ), 4 )
+            self.assertEqual( bandwidth_tracker.GetUsage( HC.BANDWIDTH_TYPE_REQUESTS, 86400 * 4 ), 120 )
+            
+            # ten requests in the past ten minutes clogs us up until the oldest of them is out
+            
+            waiting_estimate = bandwidth_tracker.GetWaitingEstimate( HC.BANDWIDTH_TYPE_REQUESTS, 600, 10 )
+            
+            self.assertTrue( 0 < waiting_estimate <= 120 )
+            
+            self.assertEqual( bandwidth_tracker.GetWaitingEstimate( HC.BANDWIDTH_TYPE_REQUESTS, 600, 1000 ), 0 )
+            
+            # save and load keeps it all
+            
+            loaded_bandwidth_tracker = HydrusSerialisable.CreateFromString( bandwidth_tracker.DumpToString() )
+            
+            for time_delta in ( 1, 200, 3600, 86400 * 4, None ):
+                
+                self.assertEqual( loaded_bandwidth_tracker.GetUsage( HC.BANDWIDTH_TYPE_REQUESTS, time_delta ), bandwidth_tracker.GetUsage( HC.BANDWIDTH_TYPE_REQUESTS, time_delta ) )
+                self.assertEqual( loaded_bandwidth_tracker.GetUsage( HC.BANDWIDTH_TYPE_DATA, time_delta ), bandwidth_tracker.GetUsage( HC.BANDWIDTH_TYPE_DATA, time_delta ) )
+                
+            
+        
+        # a long time later, the short windows are empty but the month remembers
+        
+        with patch.object( HydrusData, 'GetNow', return_value = last + 86400 * 40 ):
+            
+            self.assertEqual( bandwidth_tracker.GetUsage( HC.BANDWIDTH_TYPE_REQUESTS, 200 ), 0 )
+            self.assertEqual( bandwidth_tracker.GetUsage( HC.BANDWIDTH_TYPE_REQUESTS, 86400 * 4 ), 0 )
+            self.assertEqual( bandwidth_tracker.GetWaitingEstimate( HC.BANDWIDTH_TYPE_REQUESTS, 600, 10 ), 0 )
+            
+            self.assertEqual( sum( ( usage for ( date_str, usage ) in bandwidth_tracker.GetMonthlyDataUsage() ) ), 12000 )
+            
+        
+    
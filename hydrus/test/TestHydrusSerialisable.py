@@ -17,11 +17,13 @@ from hydrus.client import ClientSearch
 from hydrus.client import ClientTags
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
+from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusNetwork
 from hydrus.core import HydrusSerialisable
 from hydrus.test import TestController as TC
 import os
 import unittest
+import zlib
 from qtpy import QtCore as QC
 
 class TestSerialisables( unittest.TestCase ):
@@ -74,6 +76,33 @@ class TestSerialisables( unittest.TestCase ):
         
         test_func( obj, dupe_obj )
         
+        #
+        
+        compression_types = [ HydrusSerialisable.COMPRESSION_TYPE_NONE, HydrusSerialisable.COMPRESSION_TYPE_ZLIB ]
+        
+        if HydrusSerialisable.LZ4_OK:
+            
+            compression_types.append( HydrusSerialisable.COMPRESSION_TYPE_LZ4 )
+            
+        
+        if HydrusSerialisable.ZSTD_OK:
+            
+            compression_types.append( HydrusSerialisable.COMPRESSION_TYPE_ZSTD )
+            
+        
+        for compression_type in compression_types:
+            
+            network_bytes = obj.DumpToNetworkBytes( compression_type = compression_type )
+            
+            self.assertTrue( network_bytes.startswith( HydrusSerialisable.NETWORK_BYTES_ENVELOPE_MAGIC ) )
+            
+            dupe_obj = HydrusSerialisable.CreateFromNetworkBytes( network_bytes )
+            
+            self.assertIsNot( obj, dupe_obj )
+            
+            test_func( obj, dupe_obj )
+            
+        
     
     def test_basics( self ):
         
@@ -130,6 +159,70 @@ class TestSerialisables( unittest.TestCase ):
         self._dump_and_load_and_test( db, test )
         
     
+    def test_lazy_dictionary( self ):
+        
+        d = HydrusSerialisable.LazyDictionary( default_factory = HydrusSerialisable.SerialisableDictionary )
+        
+        serialisable_value_1 = HydrusSerialisable.SerialisableDictionary( { 1 : 2 } ).GetSerialisableTuple()
+        serialisable_value_2 = HydrusSerialisable.SerialisableDictionary( { 3 : 4 } ).GetSerialisableTuple()
+        
+        d.SetSerialised( 'a', serialisable_value_1 )
+        d.SetSerialised( 'b', serialisable_value_2 )
+        
+        self.assertEqual( len( d ), 2 )
+        self.assertIn( 'a', d )
+        self.assertEqual( d.GetNumDeserialised(), 0 )
+        
+        self.assertEqual( d[ 'a' ], { 1 : 2 } )
+        self.assertEqual( d.GetNumDeserialised(), 1 )
+        
+        d[ 'a' ][ 5 ] = 6
+        
+        self.assertEqual( d[ 'c' ], {} )
+        self.assertEqual( len( d ), 3 )
+        
+        # untouched values go back out as they came in, touched ones are serialised fresh
+        
+        serialised_items = dict( d.GetSerialisedItems() )
+        
+        self.assertIs( serialised_items[ 'b' ], serialisable_value_2 )
+        self.assertEqual( HydrusSerialisable.CreateFromSerialisableTuple( serialised_items[ 'a' ] ), { 1 : 2, 5 : 6 } )
+        
+        del d[ 'b' ]
+        
+        self.assertNotIn( 'b', d )
+        self.assertEqual( set( d.keys() ), { 'a', 'c' } )
+        
+        with self.assertRaises( KeyError ):
+            
+            HydrusSerialisable.LazyDictionary()[ 'missing' ]
+            
+        
+    
+    def test_network_bytes_compatibility( self ):
+        
+        d = HydrusSerialisable.SerialisableDictionary( { i : 'test' + str( i ) for i in range( 20 ) } )
+        
+        # old clients do a plain zlib decompress, so the default output has to stay plain zlib at any level
+        
+        for compression_level in ( 1, 3, 9 ):
+            
+            network_bytes = d.DumpToNetworkBytes( compression_level = compression_level )
+            
+            self.assertEqual( HydrusSerialisable.CreateFromString( str( zlib.decompress( network_bytes ), 'utf-8' ) ), d )
+            self.assertEqual( HydrusSerialisable.CreateFromNetworkBytes( network_bytes ), d )
+            
+        
+        network_bytes = d.DumpToNetworkBytes( compression_type = HydrusSerialisable.COMPRESSION_TYPE_ZLIB, compression_level = 1 )
+        
+        future_network_bytes = HydrusSerialisable.NETWORK_BYTES_ENVELOPE_MAGIC + bytes( ( HydrusSerialisable.NETWORK_BYTES_ENVELOPE_VERSION + 1, ) ) + network_bytes[ HydrusSerialisable.NETWORK_BYTES_ENVELOPE_HEADER_LENGTH - 2 : ]
+        
+        with self.assertRaises( HydrusExceptions.SerialisationException ):
+            
+            HydrusSerialisable.CreateFromNetworkBytes( future_network_bytes )
+            
+        
+    
     def test_SERIALISABLE_TYPE_APPLICATION_COMMAND( self ):
         
         def test( obj, dupe_obj ):
@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from hydrus.core import HydrusTagArchive
+
+class TestTagArchive( unittest.TestCase ):
+    
+    @classmethod
+    def setUpClass( cls ):
+        
+        cls._dir = tempfile.mkdtemp()
+        
+    
+    @classmethod
+    def tearDownClass( cls ):
+        
+        shutil.rmtree( cls._dir )
+        
+    
+    def test_bulk( self ):
+        
+        hashes_to_tags = { os.urandom( 16 ) : { 'tag {}'.format( i % 7 ), 'series:series {}'.format( i % 3 ) } for i in range( 50 ) }
+        
+        path = os.path.join( self._dir, 'bulk.db' )
+        
+        hta = HydrusTagArchive.HydrusTagArchive( path )
+        
+        hta.SetHashType( HydrusTagArchive.HASH_TYPE_MD5 )
+        
+        hta.BeginBigJob()
+        
+        hta.AddMappingsBulk( hashes_to_tags.items() )
+        
+        # adding the same again should be a no-op
+        hta.AddMappingsBulk( hashes_to_tags.items() )
+        
+        hta.CommitBigJob()
+        
+        self.assertEqual( dict( hta.IterateMappings() ), hashes_to_tags )
+        
+        self.assertEqual( hta.GetNamespaces(), { '', 'series' } )
+        
+        ( some_hash, some_tags ) = list( hashes_to_tags.items() )[0]
+        
+        self.assertEqual( hta.GetTags( some_hash ), some_tags )
+        
+        missing_hash = os.urandom( 16 )
+        
+        lookup_hashes = list( hashes_to_tags.keys() )[ : 10 ] + [ missing_hash ]
+        
+        self.assertEqual( hta.GetHashesToTags( lookup_hashes ), { hash : hashes_to_tags[ hash ] for hash in lookup_hashes[ : 10 ] } )
+        self.assertEqual( hta.FilterHashes( lookup_hashes ), set( lookup_hashes[ : 10 ] ) )
+        
+        hta.Close()
+        
+    
+    def test_mixed_lookups_and_bulk( self ):
+        
+        # lookups and bulk adds stage into temp tables on the same connection, so run them in every order
+        
+        first_hashes_to_tags = { os.urandom( 16 ) : { 'tag {}'.format( i % 4 ), 'character:samus' } for i in range( 10 ) }
+        second_hashes_to_tags = { os.urandom( 16 ) : { 'tag {}'.format( i % 3 ) } for i in range( 10 ) }
+        
+        path = os.path.join( self._dir, 'mixed.db' )
+        
+        hta = HydrusTagArchive.HydrusTagArchive( path )
+        
+        all_hashes = list( first_hashes_to_tags.keys() ) + list( second_hashes_to_tags.keys() )
+        
+        self.assertEqual( hta.FilterHashes( all_hashes ), set() )
+        self.assertEqual( hta.GetHashesToTags( all_hashes ), {} )
+        
+        hta.AddMappingsBulk( first_hashes_to_tags.items() )
+        
+        self.assertEqual( hta.FilterHashes( all_hashes ), set( first_hashes_to_tags.keys() ) )
+        self.assertEqual( hta.GetHashesToTags( all_hashes ), first_hashes_to_tags )
+        
+        hta.AddMappingsBulk( second_hashes_to_tags.items() )
+        
+        all_hashes_to_tags = dict( first_hashes_to_tags )
+        all_hashes_to_tags.update( second_hashes_to_tags )
+        
+        self.assertEqual( hta.GetHashesToTags( all_hashes ), all_hashes_to_tags )
+        self.assertEqual( hta.FilterHashes( all_hashes ), set( all_hashes ) )
+        self.assertEqual( dict( hta.IterateMappings() ), all_hashes_to_tags )
+        
+        hta.Close()
+        
+    
+    def test_per_row_and_bulk_agree( self ):
+        
+        hashes_to_tags = { os.urandom( 16 ) : { 'tag {}'.format( i % 5 ), 'creator:someone' } for i in range( 20 ) }
+        
+        per_row_path = os.path.join( self._dir, 'per_row.db' )
+        
+        hta = HydrusTagArchive.HydrusTagArchive( per_row_path )
+        
+        for ( hash, tags ) in hashes_to_tags.items():
+            
+            hta.AddMappings( hash, tags )
+            
+        
+        hta.AddMapping( os.urandom( 16 ), 'tag 0' )
+        
+        per_row_result = dict( hta.IterateMappings() )
+        
+        hta.Close()
+        
+        bulk_path = os.path.join( self._dir, 'bulk_2.db' )
+        
+        hta = HydrusTagArchive.HydrusTagArchive( bulk_path )
+        
+        hta.AddMappingsBulk( per_row_result.items() )
+        
+        self.assertEqual( dict( hta.IterateMappings() ), per_row_result )
+        
+        hta.Close()
+        
+    